@@ -0,0 +1,140 @@
+"""
+Carga de las sub-aplicaciones (licitaciones, SICIAP, Tienda Virtual) una vez por proceso.
+
+Antes main_app.py ejecutaba spec_from_file_location + exec_module en cada rerun
+de Streamlit: cada clic volvía a ejecutar módulos de miles de líneas con todos
+sus efectos de nivel superior. Aquí cada módulo se importa una sola vez, queda
+registrado en sys.modules con su nombre y solo se vuelve a importar cuando
+cambia la fecha de modificación del archivo. Cada sub-aplicación expone una
+función render() que dibuja la página; el tiempo de importación y el de render
+se miden por separado.
+
+Como db_registry, el módulo se importa por nombre y sobrevive a los reruns.
+"""
+
+import importlib.util
+import logging
+import os
+import sys
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# nombre -> (módulo, mtime del archivo al importarlo)
+_MODULOS = {}
+# nombre -> métricas de importación y render
+_METRICAS = {}
+_LOCK = threading.Lock()
+
+
+def _metricas(nombre):
+    return _METRICAS.setdefault(nombre, {
+        'modulo': nombre,
+        'importaciones': 0,
+        'ultimo_import_ms': None,
+        'renders': 0,
+        'ultimo_render_ms': None,
+        'render_medio_ms': None,
+        'render_max_ms': 0.0,
+        '_render_total': 0.0,
+    })
+
+
+def cargar(nombre, ruta):
+    """
+    Devuelve el módulo de una sub-aplicación, importándolo solo la primera vez
+    o cuando el archivo cambió desde la última importación.
+
+    Args:
+        nombre: Nombre del módulo (p. ej. 'siciap_app')
+        ruta: Ruta del archivo .py
+
+    Returns:
+        Módulo importado. Los errores de importación (SyntaxError incluido) se
+        propagan y la versión anterior, si existía, se mantiene.
+    """
+    mtime = os.path.getmtime(ruta)
+    entrada = _MODULOS.get(nombre)
+    if entrada is not None and entrada[1] == mtime:
+        return entrada[0]
+
+    with _LOCK:
+        entrada = _MODULOS.get(nombre)
+        if entrada is not None and entrada[1] == mtime:
+            return entrada[0]
+
+        inicio = time.perf_counter()
+        spec = importlib.util.spec_from_file_location(nombre, ruta)
+        if spec is None:
+            raise ImportError(f"No se pudo cargar {os.path.basename(ruta)}")
+        modulo = importlib.util.module_from_spec(spec)
+
+        anterior = sys.modules.get(nombre)
+        sys.modules[nombre] = modulo
+        try:
+            spec.loader.exec_module(modulo)
+        except BaseException:
+            if anterior is not None:
+                sys.modules[nombre] = anterior
+            else:
+                sys.modules.pop(nombre, None)
+            raise
+
+        duracion = time.perf_counter() - inicio
+        _MODULOS[nombre] = (modulo, mtime)
+        metricas = _metricas(nombre)
+        metricas['importaciones'] += 1
+        metricas['ultimo_import_ms'] = round(duracion * 1000, 1)
+        logger.info(
+            f"Módulo {nombre} {'recargado' if entrada else 'importado'} en {duracion:.2f}s"
+        )
+        return modulo
+
+
+def renderizar(nombre, ruta, entrada='render'):
+    """
+    Carga la sub-aplicación (si hace falta) y ejecuta su punto de entrada.
+
+    Args:
+        nombre: Nombre del módulo
+        ruta: Ruta del archivo .py
+        entrada: Función que dibuja la página
+
+    Raises:
+        AttributeError: Si el módulo no define la función de entrada
+    """
+    modulo = cargar(nombre, ruta)
+    funcion = getattr(modulo, entrada, None)
+    if funcion is None:
+        raise AttributeError(f"El módulo {nombre} no tiene función {entrada}()")
+
+    inicio = time.perf_counter()
+    try:
+        return funcion()
+    finally:
+        duracion = time.perf_counter() - inicio
+        with _LOCK:
+            metricas = _metricas(nombre)
+            metricas['renders'] += 1
+            metricas['_render_total'] += duracion
+            metricas['ultimo_render_ms'] = round(duracion * 1000, 1)
+            metricas['render_medio_ms'] = round(metricas['_render_total'] / metricas['renders'] * 1000, 1)
+            metricas['render_max_ms'] = round(max(metricas['render_max_ms'], duracion * 1000), 1)
+
+
+def estadisticas():
+    """Métricas de importación y render por sub-aplicación"""
+    with _LOCK:
+        return [
+            {clave: valor for clave, valor in metricas.items() if not clave.startswith('_')}
+            for metricas in _METRICAS.values()
+        ]
+
+
+def descartar(nombre=None):
+    """Fuerza a reimportar en el próximo uso (un módulo, o todos)"""
+    with _LOCK:
+        for clave in list(_MODULOS):
+            if nombre is None or clave == nombre:
+                _MODULOS.pop(clave)
@@ -0,0 +1,318 @@
+"""
+Escritura asíncrona y por lotes de la auditoría (oxigeno.auditoria).
+
+registrar_actividad hacía un INSERT síncrono por evento en la ruta de cada
+request (login, cargas, órdenes), en una conexión aparte. Aquí los eventos se
+encolan en memoria con su fecha/hora y usuario ya resueltos, y un hilo de fondo
+los escribe en orden con un INSERT multi-fila por lote.
+
+Garantías:
+    - Orden: un único hilo escritor consume la cola FIFO. Si la cola se llena
+      (base caída o lenta) los eventos siguientes se agregan, también en orden,
+      a un archivo de desborde; mientras ese archivo tenga eventos nada nuevo
+      entra a la cola, y el escritor lo vacía después de la cola y antes de
+      volver a aceptar eventos en memoria.
+    - Sin bloqueos: registrar nunca espera a la cola ni a la base de datos.
+    - Sin pérdidas: un lote que falla por la conexión se reintenta; si falla
+      por los datos de algún evento (SQLSTATE 22/23) los eventos malos se
+      aíslan por bisección sin reintentos ni esperas (ver biseccion) y quedan
+      en un archivo JSON Lines de respaldo, igual que los lotes que agotan los
+      reintentos.
+    - Al terminar el proceso (atexit) se vacía la cola antes de salir; el
+      archivo de desborde que quede se retoma al iniciar el siguiente proceso.
+
+Como db_registry, el módulo queda en sys.modules y el hilo sobrevive a los reruns.
+
+Configuración (variables de entorno):
+    AUDITORIA_MAX_COLA     eventos en memoria antes de desbordar a disco
+    AUDITORIA_LOTE         eventos por INSERT
+    AUDITORIA_INTERVALO    segundos máximos que un evento espera en la cola
+    AUDITORIA_DESBORDE     archivo de eventos en espera cuando la cola está llena
+    AUDITORIA_RESPALDO     archivo de eventos que no se pudieron escribir
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+import biseccion
+
+MAX_COLA = int(os.getenv("AUDITORIA_MAX_COLA", 10000))
+LOTE = int(os.getenv("AUDITORIA_LOTE", 200))
+INTERVALO = float(os.getenv("AUDITORIA_INTERVALO", 1.0))
+DESBORDE = os.getenv(
+    "AUDITORIA_DESBORDE", os.path.join(tempfile.gettempdir(), "sistema_mspbs_auditoria_desborde.jsonl")
+)
+RESPALDO = os.getenv(
+    "AUDITORIA_RESPALDO", os.path.join(tempfile.gettempdir(), "sistema_mspbs_auditoria_pendiente.jsonl")
+)
+REINTENTOS = 3
+
+COLUMNAS = [
+    'usuario_id', 'usuario_nombre', 'accion', 'modulo', 'descripcion', 'detalles',
+    'esquema_afectado', 'registro_afectado_id', 'valores_anteriores', 'valores_nuevos', 'fecha_hora'
+]
+COLUMNAS_JSON = ('detalles', 'valores_anteriores', 'valores_nuevos')
+
+logger = logging.getLogger(__name__)
+
+_COLA = queue.Queue(maxsize=MAX_COLA)
+_FIN = object()
+_LOCK = threading.Lock()
+_HILO = None
+_OBTENER_ENGINE = None
+
+# Protege el archivo de desborde y el indicador; True mientras haya eventos en disco
+_LOCK_DESBORDE = threading.Lock()
+_DESBORDANDO = os.path.exists(DESBORDE) or os.path.exists(DESBORDE + '.procesando')
+
+_ESTADISTICAS = {'encolados': 0, 'escritos': 0, 'lotes': 0, 'desbordados': 0, 'respaldados': 0}
+
+
+def _serializar(valor):
+    return json.dumps(valor, default=str) if valor else None
+
+
+def _insertar(conn, eventos):
+    """Un INSERT multi-fila para todo el lote"""
+    filas = []
+    parametros = {}
+    for i, evento in enumerate(eventos):
+        marcadores = []
+        for columna in COLUMNAS:
+            clave = f"{columna}_{i}"
+            parametros[clave] = evento.get(columna)
+            if columna in COLUMNAS_JSON:
+                marcadores.append(f"CAST(:{clave} AS jsonb)")
+            else:
+                marcadores.append(f":{clave}")
+        filas.append(f"({', '.join(marcadores)})")
+
+    conn.execute(
+        text(f"INSERT INTO oxigeno.auditoria ({', '.join(COLUMNAS)}) VALUES {', '.join(filas)}"),
+        parametros
+    )
+
+
+def _escribir(engine, eventos):
+    """
+    Escribe un lote en una transacción. Si algún evento tiene datos inválidos
+    se aísla por bisección (SAVEPOINT) y se devuelve en la lista de rechazos;
+    los errores que no son de datos se propagan.
+
+    Returns:
+        list: (evento, mensaje de error) de los eventos rechazados
+    """
+    rechazos = []
+    with engine.begin() as conn:
+        biseccion.insertar_con_biseccion(
+            lambda bloque: _insertar(conn, bloque),
+            eventos, eventos, rechazos,
+            savepoint=lambda nivel: conn.begin_nested()
+        )
+    return rechazos
+
+
+def _respaldar(evento, error):
+    """Último recurso: el evento queda en disco para reprocesarlo a mano"""
+    try:
+        with open(RESPALDO, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({**evento, 'error': str(error)}, default=str) + "\n")
+        _ESTADISTICAS['respaldados'] += 1
+    except OSError as e:
+        logger.error(f"Evento de auditoría perdido ({evento.get('accion')}): {error}; respaldo: {e}")
+
+
+def _escribir_lote(eventos):
+    """
+    Escribe un lote. Solo los errores de conexión o de la base se reintentan
+    con espera; los eventos con datos inválidos van directo al respaldo.
+    """
+    error = None
+    for intento in range(REINTENTOS):
+        try:
+            engine = _OBTENER_ENGINE() if _OBTENER_ENGINE else None
+            if engine is None:
+                # Solo API REST: sin conexión directa la auditoría queda en el log
+                for evento in eventos:
+                    print(f"Auditoría (API REST): {evento['accion']} - {evento['modulo']} - {evento['descripcion']}")
+                return
+            rechazos = _escribir(engine, eventos)
+            for evento, mensaje in rechazos:
+                _respaldar(evento, mensaje)
+            _ESTADISTICAS['escritos'] += len(eventos) - len(rechazos)
+            _ESTADISTICAS['lotes'] += 1
+            return
+        except Exception as e:
+            error = e
+            if intento < REINTENTOS - 1:
+                time.sleep(min(2 ** intento, 10))
+
+    logger.warning(f"Lote de auditoría de {len(eventos)} eventos falló ({error}); queda en el respaldo")
+    for evento in eventos:
+        _respaldar(evento, error)
+
+
+def _desbordar(evento):
+    """Agrega un evento al archivo de desborde (llamar con _LOCK_DESBORDE tomado)"""
+    global _DESBORDANDO
+    try:
+        with open(DESBORDE, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(evento, default=str) + "\n")
+        _DESBORDANDO = True
+        _ESTADISTICAS['desbordados'] += 1
+    except OSError as e:
+        _respaldar(evento, f"desborde no disponible: {e}")
+
+
+def _leer_desborde(ruta):
+    """Eventos de un archivo de desborde, con fecha_hora de vuelta a datetime"""
+    eventos = []
+    with open(ruta, encoding='utf-8') as f:
+        for linea in f:
+            if not linea.strip():
+                continue
+            evento = json.loads(linea)
+            if evento.get('fecha_hora'):
+                evento['fecha_hora'] = datetime.fromisoformat(evento['fecha_hora'])
+            eventos.append(evento)
+    return eventos
+
+
+def _drenar_desborde():
+    """
+    Escribe los eventos desbordados a disco, en orden y por lotes. El archivo se
+    renombra antes de procesarlo para que registrar pueda seguir agregando; el
+    indicador solo se apaga cuando no quedó nada nuevo, y recién ahí los
+    eventos vuelven a la cola en memoria.
+    """
+    global _DESBORDANDO
+    procesando = DESBORDE + '.procesando'
+    while True:
+        with _LOCK_DESBORDE:
+            # Un .procesando que quedó de un proceso anterior va primero
+            if not os.path.exists(procesando):
+                if not os.path.exists(DESBORDE):
+                    _DESBORDANDO = False
+                    return
+                os.replace(DESBORDE, procesando)
+        try:
+            eventos = _leer_desborde(procesando)
+        except (OSError, ValueError) as e:
+            logger.error(f"Archivo de desborde de auditoría ilegible ({e}); se mueve al respaldo")
+            os.replace(procesando, RESPALDO + f".desborde_{int(time.time())}")
+            continue
+        for inicio in range(0, len(eventos), LOTE):
+            _escribir_lote(eventos[inicio:inicio + LOTE])
+        os.remove(procesando)
+
+
+def _bucle():
+    """Hilo escritor: junta eventos hasta LOTE o INTERVALO y los escribe en orden"""
+    terminar = False
+    while not terminar:
+        try:
+            evento = _COLA.get(timeout=INTERVALO)
+        except queue.Empty:
+            # Cola vacía: lo desbordado es lo siguiente en orden
+            if _DESBORDANDO:
+                _drenar_desborde()
+            continue
+        if evento is _FIN:
+            _COLA.task_done()
+            break
+        lote = [evento]
+        limite = time.monotonic() + INTERVALO
+        while len(lote) < LOTE:
+            restante = limite - time.monotonic()
+            try:
+                siguiente = _COLA.get(timeout=max(restante, 0)) if restante > 0 else _COLA.get_nowait()
+            except queue.Empty:
+                break
+            if siguiente is _FIN:
+                _COLA.task_done()
+                terminar = True
+                break
+            lote.append(siguiente)
+        try:
+            _escribir_lote(lote)
+        finally:
+            for _ in lote:
+                _COLA.task_done()
+
+
+def _iniciar():
+    global _HILO
+    with _LOCK:
+        if _HILO is None or not _HILO.is_alive():
+            _HILO = threading.Thread(target=_bucle, name='auditoria', daemon=True)
+            _HILO.start()
+
+
+def registrar(evento, obtener_engine):
+    """
+    Encola un evento de auditoría; no espera a la cola ni a la base de datos.
+
+    Args:
+        evento: dict con las columnas de oxigeno.auditoria (detalles y valores como
+            objetos Python, se serializan aquí); fecha_hora por defecto es ahora
+        obtener_engine: Función sin argumentos que devuelve el engine directo, o
+            None si solo hay API REST (se llama desde el hilo escritor)
+    """
+    global _OBTENER_ENGINE
+    _OBTENER_ENGINE = obtener_engine
+
+    evento = dict(evento)
+    evento.setdefault('fecha_hora', datetime.now())
+    for columna in COLUMNAS_JSON:
+        evento[columna] = _serializar(evento.get(columna))
+
+    _iniciar()
+    with _LOCK_DESBORDE:
+        if not _DESBORDANDO:
+            try:
+                _COLA.put_nowait(evento)
+                _ESTADISTICAS['encolados'] += 1
+                return
+            except queue.Full:
+                pass
+        # Cola llena (base caída o lenta) o desborde pendiente: a disco, detrás
+        # de los anteriores, sin esperar
+        _desbordar(evento)
+
+
+def vaciar(timeout=None):
+    """Espera a que se escriban los eventos encolados y desbordados; devuelve True si no quedó nada pendiente"""
+    if _HILO is None:
+        return True
+    limite = None if timeout is None else time.monotonic() + timeout
+    while _COLA.unfinished_tasks or _DESBORDANDO:
+        if limite is not None and time.monotonic() > limite:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def estadisticas():
+    """Contadores del escritor, eventos pendientes en la cola y si hay desborde en disco"""
+    return {**_ESTADISTICAS, 'pendientes': _COLA.qsize(), 'desborde': _DESBORDANDO}
+
+
+@atexit.register
+def _cerrar():
+    """Al terminar el proceso: escribir lo pendiente y detener el hilo"""
+    if _HILO is None or not _HILO.is_alive():
+        return
+    try:
+        _COLA.put(_FIN, timeout=5)
+    except queue.Full:
+        pass
+    _HILO.join(timeout=30)
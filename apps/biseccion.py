@@ -0,0 +1,130 @@
+"""
+Aislamiento de filas con error por bisección, compartido por los importadores
+(siciap_app, licitaciones_app).
+
+Cuando una sentencia multi-fila falla, el bloque se divide en mitades, cada una
+protegida por un SAVEPOINT, hasta aislar las filas con error: O(k log n)
+sentencias para k filas malas en un bloque de n, en lugar de una por fila.
+
+Solo se bisecta ante errores de datos (SQLSTATE clase 22, excepción de datos, y
+23, violación de restricción), que dependen de filas concretas, y ante errores
+del driver al adaptar un valor (DataError sin SQLSTATE, StatementError de
+SQLAlchemy sin error de la base). Cualquier otro error (columna o tabla
+inexistente, permiso denegado, conexión caída, un error de Python dentro de
+insertar) afecta a todas las filas por igual: se propaga de inmediato para
+abortar la importación en lugar de partir el lote hasta fila por fila y mandar
+todo a cuarentena.
+"""
+
+from contextlib import contextmanager
+
+# Clases de SQLSTATE que dependen del contenido de la fila
+CLASES_ERROR_DATOS = ('22', '23')
+
+
+def sqlstate(error):
+    """
+    SQLSTATE de un error de PostgreSQL (psycopg2, psycopg 3, pg8000, o envuelto
+    por SQLAlchemy), o None si no viene de la base (p. ej. error de adaptación).
+    """
+    original = getattr(error, 'orig', None) or error
+    codigo = getattr(original, 'sqlstate', None) or getattr(original, 'pgcode', None)
+    if codigo:
+        return codigo
+    # pg8000: el primer argumento es un dict con el campo 'C'
+    if original.args and isinstance(original.args[0], dict):
+        return original.args[0].get('C')
+    return None
+
+
+# Clases de excepción DBAPI (PEP 249), por nombre para no depender del driver
+CLASES_DBAPI_DATOS = frozenset({'DataError', 'IntegrityError'})
+CLASES_DBAPI_CONEXION = frozenset({'OperationalError', 'InterfaceError'})
+
+
+def _nombres_clases(error):
+    return {clase.__name__ for clase in type(error).__mro__}
+
+
+def es_error_de_datos(error):
+    """
+    True si el error depende de las filas (se puede aislar por bisección).
+
+    Con SQLSTATE decide la clase (22/23). Sin SQLSTATE solo cuentan los
+    errores del driver al adaptar un valor: DataError/IntegrityError, o un
+    StatementError de SQLAlchemy cuyo origen no es un error de la base (falló
+    la conversión de un parámetro). Una conexión caída o invalidada, cualquier
+    otro error DBAPI y las excepciones de Python (KeyError, TypeError en el
+    código de insertar) no son de datos.
+    """
+    if getattr(error, 'connection_invalidated', False):
+        return False
+    codigo = sqlstate(error)
+    if codigo:
+        return codigo[:2] in CLASES_ERROR_DATOS
+
+    original = getattr(error, 'orig', None)
+    nombres = _nombres_clases(error)
+    nombres_original = _nombres_clases(original) if original is not None else set()
+    if (nombres | nombres_original) & CLASES_DBAPI_CONEXION:
+        return False
+    if (nombres | nombres_original) & CLASES_DBAPI_DATOS:
+        return True
+    if 'StatementError' in nombres and original is not None:
+        # Error al procesar un parámetro antes de llegar a la base
+        return not nombres_original & {'DatabaseError', 'InterfaceError'}
+    return False
+
+
+def mensaje_error(error):
+    """Primera línea del mensaje, para el reporte de filas rechazadas"""
+    return str(getattr(error, 'orig', None) or error).strip().split('\n')[0]
+
+
+@contextmanager
+def savepoint_dbapi(cursor, nombre):
+    """SAVEPOINT sobre un cursor DBAPI: se libera si el bloque termina bien y se revierte si falla"""
+    cursor.execute(f"SAVEPOINT {nombre}")
+    try:
+        yield
+    except BaseException:
+        cursor.execute(f"ROLLBACK TO SAVEPOINT {nombre}")
+        cursor.execute(f"RELEASE SAVEPOINT {nombre}")
+        raise
+    cursor.execute(f"RELEASE SAVEPOINT {nombre}")
+
+
+def insertar_con_biseccion(insertar, filas, indices, rechazos, savepoint, nivel=0):
+    """
+    Inserta un bloque de filas aislando por bisección las que tienen errores de datos.
+
+    Args:
+        insertar: Función insertar(filas) que ejecuta la(s) sentencia(s) del bloque
+            y devuelve la cantidad insertada (None = len(filas))
+        filas: Lista de filas del bloque
+        indices: Identificador de cada fila para el reporte (índice, número de fila...)
+        rechazos: Lista a la que se agregan (indice, mensaje de error)
+        savepoint: Función savepoint(nivel) que devuelve un context manager de
+            SAVEPOINT (savepoint_dbapi, o conn.begin_nested de SQLAlchemy)
+
+    Returns:
+        int: Cantidad de filas insertadas
+
+    Raises:
+        El error original si no es de datos (esquema, permisos, conexión)
+    """
+    try:
+        with savepoint(nivel):
+            insertadas = insertar(filas)
+        return len(filas) if insertadas is None else insertadas
+    except Exception as e:
+        if not es_error_de_datos(e):
+            raise
+        if len(filas) == 1:
+            rechazos.append((indices[0], mensaje_error(e)))
+            return 0
+        mitad = len(filas) // 2
+        return (
+            insertar_con_biseccion(insertar, filas[:mitad], indices[:mitad], rechazos, savepoint, nivel + 1)
+            + insertar_con_biseccion(insertar, filas[mitad:], indices[mitad:], rechazos, savepoint, nivel + 1)
+        )
@@ -0,0 +1,219 @@
+"""
+Registro de conexiones PostgreSQL compartido por todo el proceso.
+
+main_app.py vuelve a ejecutar los módulos de apps/ en cada rerun de Streamlit,
+por lo que cualquier engine creado como variable global del módulo se pierde y
+se abre un pool nuevo. Este módulo se importa por nombre (apps/ está en
+sys.path) y queda en sys.modules, de modo que los engines registrados aquí
+sobreviven a los reruns y se comparten entre main_app, siciap_app,
+licitaciones_app y dashboard_mspbs.
+
+Configuración (st.secrets['db_pool'] o variables de entorno):
+    pool_size / DB_POOL_SIZE                 conexiones permanentes por pool
+    max_overflow / DB_MAX_OVERFLOW           conexiones extra en picos
+    pool_recycle / DB_POOL_RECYCLE           segundos antes de reciclar
+    pool_timeout / DB_POOL_TIMEOUT           espera máxima por una conexión
+    statement_timeout_<app> / DB_STATEMENT_TIMEOUT_<APP>
+                                             milisegundos por sentencia (0 = sin límite)
+"""
+
+import os
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.pool import QueuePool
+
+# Valores por defecto del pool
+POOL_DEFAULTS = {
+    'pool_size': 5,
+    'max_overflow': 10,
+    'pool_recycle': 1800,
+    'pool_timeout': 30,
+}
+
+# Timeout de sentencia por aplicación (ms). SICIAP hace cargas masivas.
+STATEMENT_TIMEOUT_DEFAULTS = {
+    'main': 30000,
+    'licitaciones': 60000,
+    'dashboard': 30000,
+    'siciap': 600000,
+}
+
+_ENGINES = {}
+_DRIVERS = {}
+_LOCK = threading.Lock()
+
+
+class _QueuePoolMedido(QueuePool):
+    """QueuePool que acumula el tiempo de espera al obtener una conexión"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+
+    def _do_get(self):
+        inicio = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            espera = time.perf_counter() - inicio
+            with self._stats_lock:
+                self.checkouts += 1
+                self.espera_total += espera
+                if espera > self.espera_max:
+                    self.espera_max = espera
+
+
+def _leer_secrets_pool():
+    """Lee la sección [db_pool] de st.secrets si existe"""
+    try:
+        import streamlit as st
+        if hasattr(st, 'secrets') and 'db_pool' in st.secrets:
+            return dict(st.secrets['db_pool'])
+    except Exception:
+        pass
+    return {}
+
+
+def obtener_config_pool():
+    """Devuelve la configuración efectiva del pool (secrets > entorno > defaults)"""
+    secrets = _leer_secrets_pool()
+    config = {}
+    for clave, defecto in POOL_DEFAULTS.items():
+        valor = secrets.get(clave, os.getenv(f"DB_{clave.upper()}", defecto))
+        try:
+            config[clave] = int(valor)
+        except (TypeError, ValueError):
+            config[clave] = defecto
+    return config
+
+
+def obtener_statement_timeout(app):
+    """Timeout de sentencia en milisegundos para una aplicación"""
+    secrets = _leer_secrets_pool()
+    valor = secrets.get(
+        f"statement_timeout_{app}",
+        os.getenv(f"DB_STATEMENT_TIMEOUT_{app.upper()}", STATEMENT_TIMEOUT_DEFAULTS.get(app, 0))
+    )
+    try:
+        return max(0, int(valor))
+    except (TypeError, ValueError):
+        return STATEMENT_TIMEOUT_DEFAULTS.get(app, 0)
+
+
+def _registrar_statement_timeout(engine, timeout_ms):
+    """Fija statement_timeout en cada conexión física nueva del pool"""
+
+    @event.listens_for(engine, "connect")
+    def _fijar_timeout(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute(f"SET statement_timeout = {int(timeout_ms)}")
+        finally:
+            cursor.close()
+        # El SET abre una transacción en drivers sin autocommit; confirmarla
+        # evita que el rollback del checkin revierta el valor.
+        dbapi_conn.commit()
+
+
+def obtener_engine(app, url, connect_args=None, probar=False):
+    """
+    Devuelve el engine registrado para (app, url), creándolo la primera vez.
+
+    Args:
+        app: Nombre de la aplicación ('main', 'siciap', 'licitaciones', 'dashboard')
+        url: URL de conexión SQLAlchemy
+        connect_args: Argumentos del driver (solo se usan al crear el engine)
+        probar: Si True, ejecuta SELECT 1 al crear el engine; si falla, el engine
+            se descarta y la excepción se propaga sin quedar registrado.
+
+    Returns:
+        Engine de SQLAlchemy con pool compartido
+    """
+    clave = (app, str(url))
+    engine = _ENGINES.get(clave)
+    if engine is not None:
+        return engine
+
+    with _LOCK:
+        engine = _ENGINES.get(clave)
+        if engine is not None:
+            return engine
+
+        config = obtener_config_pool()
+        engine = create_engine(
+            url,
+            connect_args=connect_args or {},
+            poolclass=_QueuePoolMedido,
+            pool_pre_ping=True,
+            pool_size=config['pool_size'],
+            max_overflow=config['max_overflow'],
+            pool_recycle=config['pool_recycle'],
+            pool_timeout=config['pool_timeout'],
+        )
+
+        timeout_ms = obtener_statement_timeout(app)
+        if timeout_ms:
+            _registrar_statement_timeout(engine, timeout_ms)
+
+        if probar:
+            try:
+                with engine.connect() as conn:
+                    conn.execute(text("SELECT 1"))
+            except Exception:
+                engine.dispose()
+                raise
+
+        _ENGINES[clave] = engine
+        return engine
+
+
+def driver_detectado(destino):
+    """Driver que funcionó antes para un destino (host, puerto, base, usuario), o None"""
+    return _DRIVERS.get(destino)
+
+
+def recordar_driver(destino, driver):
+    """Recuerda el driver que funcionó para un destino durante la vida del proceso"""
+    _DRIVERS[destino] = driver
+
+
+def estadisticas_pools():
+    """
+    Estado de cada pool registrado.
+
+    Returns:
+        Lista de dicts con app, driver, host, tamaño, conexiones en uso,
+        overflow y tiempos de espera acumulados.
+    """
+    filas = []
+    for (app, _url), engine in list(_ENGINES.items()):
+        pool = engine.pool
+        checkouts = getattr(pool, 'checkouts', 0)
+        espera_total = getattr(pool, 'espera_total', 0.0)
+        filas.append({
+            'app': app,
+            'driver': engine.dialect.driver,
+            'host': engine.url.host,
+            'pool_size': pool.size(),
+            'en_uso': pool.checkedout(),
+            'disponibles': pool.checkedin(),
+            'overflow': max(0, pool.overflow()),
+            'checkouts': checkouts,
+            'espera_media_ms': round(espera_total / checkouts * 1000, 2) if checkouts else 0.0,
+            'espera_max_ms': round(getattr(pool, 'espera_max', 0.0) * 1000, 2),
+            'statement_timeout_ms': obtener_statement_timeout(app),
+        })
+    return filas
+
+
+def liberar_engines(app=None):
+    """Cierra los pools registrados (todos, o solo los de una aplicación)"""
+    with _LOCK:
+        for clave in list(_ENGINES):
+            if app is None or clave[0] == app:
+                _ENGINES.pop(clave).dispose()
@@ -0,0 +1,520 @@
+"""
+Lectura de libros Excel en streaming, compartida por siciap_app y licitaciones_app.
+
+pd.read_excel(sheet_name=None) materializa todas las hojas a la vez y cada
+llamada vuelve a parsear el archivo completo, de modo que el pre-análisis,
+la carga y los métodos de respaldo de un mismo archivo lo leían varias veces.
+Aquí los libros se recorren con openpyxl en modo read_only/data_only (filas
+en bloques, sin construir el árbol XML completo) y solo se parsean las hojas
+pedidas. Las hojas leídas completas se guardan por huella SHA-256 del
+contenido y nombre de hoja, en una caché LRU acotada en bytes (memoria real
+de los DataFrames); quien termina una carga la libera con liberar_cache. Como
+db_registry, el módulo queda en sys.modules y la caché sobrevive a los reruns
+de Streamlit.
+
+Las cargas grandes no necesitan la hoja completa: iterar_filas e
+iterar_primera_hoja_con_datos entregan bloques de EXCEL_CHUNK_FILAS filas que
+se pueden mapear y enviar por COPY uno a uno, con memoria acotada al bloque.
+
+Además, los DataFrames ya parseados y mapeados de una carga se pueden guardar
+en disco en formato Parquet, identificados por la huella de la carga
+(contenido + configuración de mapeo), para reintentar rápido tras un error de
+base de datos: completos por hoja (guardar_parquet) o por bloques
+(guardar_parquet_bloques / iterar_parquet). El directorio se poda por LRU al
+superar el tamaño máximo.
+
+Configuración (variables de entorno):
+    EXCEL_CHUNK_FILAS        filas por bloque al recorrer una hoja
+    EXCEL_CACHE_MAX_MB       memoria máxima de las hojas parseadas en caché (0 = desactivada)
+    EXCEL_PARQUET_DIR        directorio de la caché Parquet
+    EXCEL_PARQUET_MAX_MB     tamaño máximo de la caché Parquet (0 = desactivada)
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import openpyxl
+import pandas as pd
+
+CHUNK_FILAS = int(os.getenv("EXCEL_CHUNK_FILAS", 5000))
+CACHE_MAX_MB = int(os.getenv("EXCEL_CACHE_MAX_MB", 256))
+PARQUET_DIR = os.getenv(
+    "EXCEL_PARQUET_DIR", os.path.join(tempfile.gettempdir(), "sistema_mspbs_parquet")
+)
+PARQUET_MAX_MB = int(os.getenv("EXCEL_PARQUET_MAX_MB", 512))
+
+logger = logging.getLogger(__name__)
+
+# clave -> (valor, bytes). Claves: (huella, 'hoja', nombre), (huella, 'nombres'),
+# (huella, 'primera') para la primera hoja con datos
+_CACHE = OrderedDict()
+_CACHE_BYTES = 0
+_LOCK = threading.Lock()
+
+
+def obtener_bytes(origen):
+    """Devuelve el contenido de un archivo subido, un BytesIO o bytes"""
+    if isinstance(origen, (bytes, bytearray)):
+        return bytes(origen)
+    if hasattr(origen, 'getvalue'):
+        return origen.getvalue()
+    if hasattr(origen, 'seek'):
+        origen.seek(0)
+    return origen.read()
+
+
+def huella_contenido(contenido):
+    """SHA-256 hexadecimal del contenido de un archivo"""
+    return hashlib.sha256(obtener_bytes(contenido)).hexdigest()
+
+
+def huella_carga(contenido, configuracion=None):
+    """
+    Huella de una carga: SHA-256 del contenido más la configuración de mapeo.
+    El mismo archivo cargado con otro mapeo o a otro destino da otra huella.
+    """
+    huella = hashlib.sha256(obtener_bytes(contenido))
+    if configuracion is not None:
+        huella.update(json.dumps(configuracion, sort_keys=True, default=str).encode('utf-8'))
+    return huella.hexdigest()
+
+
+def _fila_vacia(fila):
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in fila)
+
+
+def _nombres_columnas(fila):
+    """Nombres de columna con el mismo criterio que pandas (Unnamed: i, duplicados .1)"""
+    nombres = []
+    vistos = {}
+    for i, valor in enumerate(fila):
+        if valor is None or (isinstance(valor, str) and not valor.strip()):
+            nombre = f"Unnamed: {i}"
+        else:
+            nombre = valor
+        if nombre in vistos:
+            vistos[nombre] += 1
+            nombre = f"{nombre}.{vistos[nombre]}"
+        else:
+            vistos[nombre] = 0
+        nombres.append(nombre)
+    return nombres
+
+
+def _iterar_hoja(hoja, encabezado=True, tamano_chunk=None):
+    """Recorre una hoja de openpyxl devolviendo DataFrames de hasta tamano_chunk filas"""
+    tamano_chunk = tamano_chunk or CHUNK_FILAS
+    columnas = None
+    ancho = 0
+    bloque = []
+
+    for fila in hoja.iter_rows(values_only=True):
+        # Igual que pandas, las filas completamente vacías se omiten
+        if _fila_vacia(fila):
+            continue
+
+        if encabezado and columnas is None:
+            # Descartar celdas vacías a la derecha del encabezado
+            ancho = max(i for i, v in enumerate(fila) if not _fila_vacia((v,))) + 1
+            columnas = _nombres_columnas(fila[:ancho])
+            continue
+
+        if encabezado:
+            fila = tuple(fila[:ancho]) + (None,) * (ancho - len(fila))
+        bloque.append(fila)
+
+        if len(bloque) >= tamano_chunk:
+            yield pd.DataFrame.from_records(bloque, columns=columnas).infer_objects()
+            bloque = []
+
+    if bloque:
+        yield pd.DataFrame.from_records(bloque, columns=columnas).infer_objects()
+    elif encabezado and columnas is not None:
+        # Hoja con encabezado pero sin datos
+        yield pd.DataFrame(columns=columnas)
+
+
+def _unir_bloques(bloques):
+    bloques = list(bloques)
+    if not bloques:
+        return pd.DataFrame()
+    if len(bloques) == 1:
+        return bloques[0]
+    return pd.concat(bloques, ignore_index=True)
+
+
+def iterar_filas(origen, hoja=None, encabezado=True, tamano_chunk=None):
+    """
+    Recorre una hoja de un libro Excel en bloques, sin cargarla completa.
+
+    Args:
+        origen: Archivo subido, BytesIO o bytes (.xlsx)
+        hoja: Nombre de la hoja (None = primera hoja)
+        encabezado: Si True, la primera fila no vacía son los nombres de columna;
+            si False, las columnas se numeran como con header=None
+        tamano_chunk: Filas por bloque (por defecto CHUNK_FILAS)
+
+    Yields:
+        DataFrames con tipos inferidos de los valores de las celdas
+    """
+    libro = openpyxl.load_workbook(
+        BytesIO(obtener_bytes(origen)), read_only=True, data_only=True
+    )
+    try:
+        ws = libro[hoja] if hoja else libro.worksheets[0]
+        yield from _iterar_hoja(ws, encabezado=encabezado, tamano_chunk=tamano_chunk)
+    finally:
+        libro.close()
+
+
+def leer_hoja(origen, hoja=None, encabezado=True):
+    """Lee una hoja completa armándola a partir de los bloques de iterar_filas"""
+    return _unir_bloques(iterar_filas(origen, hoja=hoja, encabezado=encabezado))
+
+
+def iterar_primera_hoja_con_datos(origen, tamano_chunk=None):
+    """
+    Recorre en bloques la primera hoja del libro que tenga al menos una fila
+    con datos; las hojas anteriores vacías se saltan sin materializarlas.
+
+    Yields:
+        DataFrames de hasta tamano_chunk filas (ninguno si el libro no tiene datos)
+    """
+    libro = openpyxl.load_workbook(
+        BytesIO(obtener_bytes(origen)), read_only=True, data_only=True
+    )
+    try:
+        for ws in libro.worksheets:
+            bloques = _iterar_hoja(ws, tamano_chunk=tamano_chunk)
+            for df in bloques:
+                if not df.empty:
+                    yield df
+                    yield from bloques
+                    return
+    finally:
+        libro.close()
+
+
+def _tamano_df(df):
+    """Memoria ocupada por un DataFrame, incluidos los objetos (textos) de las celdas"""
+    try:
+        return int(df.memory_usage(deep=True).sum())
+    except Exception:
+        return 0
+
+
+def _cache_obtener(clave):
+    with _LOCK:
+        entrada = _CACHE.get(clave)
+        if entrada is None:
+            return None
+        _CACHE.move_to_end(clave)
+        return entrada[0]
+
+
+def _cache_guardar(clave, valor, tamano=0):
+    """Guarda una entrada y descarta las menos usadas hasta quedar bajo CACHE_MAX_MB"""
+    global _CACHE_BYTES
+    limite = CACHE_MAX_MB * 1024 * 1024
+    if tamano > limite:
+        # Una hoja más grande que toda la caché no se guarda: desalojaría todo lo demás
+        return
+    with _LOCK:
+        anterior = _CACHE.pop(clave, None)
+        if anterior is not None:
+            _CACHE_BYTES -= anterior[1]
+        _CACHE[clave] = (valor, tamano)
+        _CACHE_BYTES += tamano
+        while _CACHE_BYTES > limite and _CACHE:
+            _clave, (_valor, tamano_descartado) = _CACHE.popitem(last=False)
+            _CACHE_BYTES -= tamano_descartado
+
+
+def _parsear_hojas(contenido, hojas=None):
+    """
+    Parsea las hojas pedidas de un libro (openpyxl streaming, o pandas para .xls).
+
+    Returns:
+        tuple: (nombres de todas las hojas del libro, dict nombre -> DataFrame de las pedidas)
+    """
+    try:
+        libro = openpyxl.load_workbook(BytesIO(contenido), read_only=True, data_only=True)
+    except Exception:
+        # Formatos que openpyxl no abre (p. ej. .xls): lectura clásica de pandas
+        with pd.ExcelFile(BytesIO(contenido)) as excel:
+            nombres = list(excel.sheet_names)
+            return nombres, {
+                nombre: excel.parse(nombre) for nombre in nombres
+                if hojas is None or nombre in hojas
+            }
+
+    try:
+        nombres = list(libro.sheetnames)
+        return nombres, {
+            ws.title: _unir_bloques(_iterar_hoja(ws)) for ws in libro.worksheets
+            if hojas is None or ws.title in hojas
+        }
+    finally:
+        libro.close()
+
+
+def nombres_hojas(origen):
+    """Nombres de las hojas de un libro, sin parsear su contenido"""
+    contenido = obtener_bytes(origen)
+    clave = (huella_contenido(contenido), 'nombres')
+    nombres = _cache_obtener(clave)
+    if nombres is None:
+        try:
+            libro = openpyxl.load_workbook(BytesIO(contenido), read_only=True)
+            try:
+                nombres = list(libro.sheetnames)
+            finally:
+                libro.close()
+        except Exception:
+            with pd.ExcelFile(BytesIO(contenido)) as excel:
+                nombres = list(excel.sheet_names)
+        _cache_guardar(clave, nombres)
+    return list(nombres)
+
+
+def leer_libro(origen, hojas=None):
+    """
+    Lee hojas de un libro Excel, parseando solo las que no estén ya en caché.
+
+    Args:
+        origen: Archivo subido, BytesIO o bytes
+        hojas: Nombres de las hojas a leer (None = todas). Los nombres que no
+            existen en el libro se ignoran.
+
+    Returns:
+        dict: nombre de hoja -> DataFrame en el orden del libro
+        (equivalente a pd.read_excel(sheet_name=None) restringido a las hojas pedidas)
+    """
+    contenido = obtener_bytes(origen)
+    huella = huella_contenido(contenido)
+
+    nombres = _cache_obtener((huella, 'nombres'))
+    if nombres is not None:
+        pedidas = [n for n in nombres if hojas is None or n in hojas]
+    else:
+        pedidas = None if hojas is None else list(hojas)
+
+    resultado = {}
+    faltantes = None
+    if pedidas is not None:
+        faltantes = []
+        for nombre in pedidas:
+            df = _cache_obtener((huella, 'hoja', nombre))
+            if df is None:
+                faltantes.append(nombre)
+            else:
+                resultado[nombre] = df
+
+    if faltantes is None or faltantes:
+        nombres, leidas = _parsear_hojas(contenido, faltantes)
+        _cache_guardar((huella, 'nombres'), nombres)
+        for nombre, df in leidas.items():
+            _cache_guardar((huella, 'hoja', nombre), df, _tamano_df(df))
+            resultado[nombre] = df
+
+    # Copias superficiales: quien llama puede renombrar o reasignar columnas
+    # sin alterar la versión en caché
+    return {nombre: resultado[nombre].copy(deep=False) for nombre in nombres if nombre in resultado}
+
+
+def leer_primera_hoja_con_datos(origen):
+    """
+    Devuelve la primera hoja del libro que tenga al menos una fila con datos, o
+    None. Las hojas posteriores no se parsean.
+    """
+    contenido = obtener_bytes(origen)
+    clave = (huella_contenido(contenido), 'primera')
+    df = _cache_obtener(clave)
+    if df is None:
+        try:
+            df = _unir_bloques(iterar_primera_hoja_con_datos(contenido))
+        except Exception:
+            # Formatos que openpyxl no abre (p. ej. .xls)
+            df = pd.DataFrame()
+            with pd.ExcelFile(BytesIO(contenido)) as excel:
+                for nombre in excel.sheet_names:
+                    hoja = excel.parse(nombre)
+                    if not hoja.empty and hoja.dropna(how='all').shape[0] > 0:
+                        df = hoja
+                        break
+        if df.empty:
+            return None
+        _cache_guardar(clave, df, _tamano_df(df))
+    return df.copy(deep=False)
+
+
+def liberar_cache(origen=None):
+    """
+    Descarta de la memoria las hojas parseadas de un archivo (archivo subido,
+    BytesIO o bytes), o todas si origen es None. Se llama al terminar una carga.
+    """
+    global _CACHE_BYTES
+    huella = None if origen is None else huella_contenido(origen)
+    with _LOCK:
+        for clave in list(_CACHE):
+            if huella is None or clave[0] == huella:
+                _CACHE_BYTES -= _CACHE.pop(clave)[1]
+
+
+def _tamano_directorio(ruta):
+    total = 0
+    for raiz, _dirs, archivos in os.walk(ruta):
+        for nombre in archivos:
+            try:
+                total += os.path.getsize(os.path.join(raiz, nombre))
+            except OSError:
+                pass
+    return total
+
+
+def _podar_parquet():
+    """Elimina las entradas menos usadas hasta quedar bajo PARQUET_MAX_MB"""
+    try:
+        entradas = [
+            os.path.join(PARQUET_DIR, nombre) for nombre in os.listdir(PARQUET_DIR)
+            if not nombre.startswith('.')
+        ]
+    except OSError:
+        return
+    tamanos = {ruta: _tamano_directorio(ruta) for ruta in entradas}
+    total = sum(tamanos.values())
+    limite = PARQUET_MAX_MB * 1024 * 1024
+    for ruta in sorted(entradas, key=os.path.getmtime):
+        if total <= limite:
+            break
+        shutil.rmtree(ruta, ignore_errors=True)
+        total -= tamanos[ruta]
+
+
+def guardar_parquet(huella, hojas):
+    """
+    Guarda en disco los DataFrames de una carga ya parseada/mapeada.
+
+    Args:
+        huella: Huella de la carga (huella_carga)
+        hojas: dict nombre -> DataFrame
+
+    Returns:
+        bool: True si quedó guardada. Un DataFrame que Parquet no admite (p. ej.
+        columnas con tipos mezclados) solo se registra en el log.
+    """
+    if PARQUET_MAX_MB <= 0:
+        return False
+    destino = os.path.join(PARQUET_DIR, huella)
+    if os.path.isdir(destino):
+        return True
+    try:
+        os.makedirs(PARQUET_DIR, exist_ok=True)
+        temporal = tempfile.mkdtemp(prefix='.', dir=PARQUET_DIR)
+        try:
+            nombres = list(hojas)
+            for i, nombre in enumerate(nombres):
+                hojas[nombre].to_parquet(os.path.join(temporal, f"{i}.parquet"), index=False)
+            with open(os.path.join(temporal, 'hojas.json'), 'w', encoding='utf-8') as f:
+                json.dump(nombres, f)
+            os.rename(temporal, destino)
+        except Exception:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+    except Exception as e:
+        logger.warning(f"No se pudo guardar la caché Parquet {huella[:12]}: {e}")
+        return False
+    _podar_parquet()
+    return True
+
+
+def leer_parquet(huella):
+    """Devuelve dict nombre -> DataFrame de una carga guardada, o None si no está en caché"""
+    origen = os.path.join(PARQUET_DIR, huella)
+    if not os.path.isdir(origen):
+        return None
+    try:
+        with open(os.path.join(origen, 'hojas.json'), encoding='utf-8') as f:
+            nombres = json.load(f)
+        hojas = {
+            nombre: pd.read_parquet(os.path.join(origen, f"{i}.parquet"))
+            for i, nombre in enumerate(nombres)
+        }
+        # Marcar como usada recientemente para la poda LRU
+        os.utime(origen)
+        return hojas
+    except Exception as e:
+        logger.warning(f"Caché Parquet {huella[:12]} ilegible, se descarta: {e}")
+        shutil.rmtree(origen, ignore_errors=True)
+        return None
+
+
+def guardar_parquet_bloques(huella, bloques):
+    """
+    Guarda en disco una carga ya mapeada que llega en bloques (DataFrames con
+    las mismas columnas), escribiendo cada bloque a medida que se consume: la
+    memoria queda acotada a un bloque. La entrada solo aparece en la caché
+    cuando se escribieron todos.
+
+    Returns:
+        bool: True si quedó guardada (o ya existía). Con la caché desactivada
+        devuelve False sin consumir los bloques; si falla a mitad de camino los
+        bloques ya consumidos se pierden y quien llama debe volver a generarlos.
+    """
+    if PARQUET_MAX_MB <= 0:
+        return False
+    destino = os.path.join(PARQUET_DIR, huella)
+    if os.path.isdir(destino):
+        return True
+    try:
+        os.makedirs(PARQUET_DIR, exist_ok=True)
+        temporal = tempfile.mkdtemp(prefix='.', dir=PARQUET_DIR)
+        try:
+            cantidad = 0
+            for df in bloques:
+                df.to_parquet(os.path.join(temporal, f"bloque_{cantidad}.parquet"), index=False)
+                cantidad += 1
+            with open(os.path.join(temporal, 'bloques.json'), 'w', encoding='utf-8') as f:
+                json.dump({'bloques': cantidad}, f)
+            os.rename(temporal, destino)
+        except BaseException:
+            shutil.rmtree(temporal, ignore_errors=True)
+            raise
+    except Exception as e:
+        logger.warning(f"No se pudo guardar la caché Parquet {huella[:12]}: {e}")
+        return False
+    _podar_parquet()
+    return True
+
+
+def iterar_parquet(huella):
+    """
+    Devuelve un iterador sobre los bloques de una carga guardada con
+    guardar_parquet_bloques, o None si no está en caché.
+    """
+    origen = os.path.join(PARQUET_DIR, huella)
+    try:
+        with open(os.path.join(origen, 'bloques.json'), encoding='utf-8') as f:
+            cantidad = json.load(f)['bloques']
+    except (OSError, ValueError, KeyError):
+        return None
+    # Marcar como usada recientemente para la poda LRU
+    os.utime(origen)
+
+    def _bloques():
+        for i in range(cantidad):
+            yield pd.read_parquet(os.path.join(origen, f"bloque_{i}.parquet"))
+
+    return _bloques()
+
+
+def descartar_parquet(huella):
+    """Elimina la entrada de una carga (p. ej. cuando ya quedó confirmada en la base)"""
+    shutil.rmtree(os.path.join(PARQUET_DIR, huella), ignore_errors=True)
@@ -0,0 +1,422 @@
+"""
+Cola de trabajos en segundo plano compartida por todo el proceso.
+
+Las importaciones pesadas (cargas SICIAP, importación CSV de proveedores de
+licitaciones) corrían en el hilo del script de Streamlit: cualquier interacción
+con un widget o un cierre del navegador las cortaba a mitad de camino y la
+interfaz quedaba congelada mientras tanto. Aquí se ejecutan en un pool de hilos
+del proceso y el estado de cada trabajo se persiste en disco, de modo que el
+usuario puede iniciar una carga, navegar a otra página y volver a ver el
+resultado en "Trabajos".
+
+La carga Excel de licitaciones (cargar_archivo_a_postgres) sigue en el hilo del
+script: al terminar completa la tabla llamado con los datos del formulario de
+la misma página, y cargar_archivo_con_configuracion no tiene llamadores en la
+interfaz.
+
+Como db_registry, el módulo se importa por nombre y queda en sys.modules, así
+que la cola sobrevive a los reruns. Las funciones de carga informan avance y
+atienden cancelaciones con reportar_progreso() y verificar_cancelacion(); ambas
+no hacen nada cuando se llaman fuera de un trabajo. Dentro de un trabajo no hay
+contexto de Streamlit: st.* no muestra nada, por lo que los datos de la sesión
+(usuario, configuración) se pasan como argumentos al enviarlo.
+
+Configuración (variables de entorno):
+    JOBS_MAX_WORKERS   trabajos simultáneos
+    JOBS_DIR           directorio del estado persistido
+    JOBS_HISTORIAL     trabajos terminados que se conservan
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_WORKERS = int(os.getenv("JOBS_MAX_WORKERS", 2))
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(tempfile.gettempdir(), "sistema_mspbs_jobs"))
+HISTORIAL = int(os.getenv("JOBS_HISTORIAL", 200))
+
+# Segundos mínimos entre escrituras del estado mientras un trabajo avanza
+INTERVALO_GUARDADO = 2.0
+
+ESTADOS_ACTIVOS = ('en_cola', 'ejecutando')
+
+logger = logging.getLogger(__name__)
+
+_TRABAJOS = {}
+_LOCK = threading.RLock()
+_LOCAL = threading.local()
+_EXECUTOR = None
+_CARGADO = False
+_ULTIMO_GUARDADO = 0.0
+
+
+class TrabajoCancelado(BaseException):
+    """
+    Se lanza dentro de un trabajo cuando el usuario pidió cancelarlo. Hereda de
+    BaseException (como KeyboardInterrupt) para atravesar los 'except Exception'
+    de los procesadores y llegar hasta el ejecutor; los bloques finally siguen
+    liberando conexiones.
+    """
+
+
+class Trabajo:
+    """Estado de un trabajo en segundo plano"""
+
+    CAMPOS = (
+        'id', 'nombre', 'app', 'usuario', 'estado', 'creado', 'iniciado', 'finalizado',
+        'filas', 'filas_totales', 'mensaje', 'resultado', 'error',
+    )
+
+    def __init__(self, nombre, app=None, usuario=None, filas_totales=None, id=None):
+        self.id = id or uuid.uuid4().hex[:12]
+        self.nombre = nombre
+        self.app = app
+        self.usuario = usuario
+        self.estado = 'en_cola'
+        self.creado = time.time()
+        self.iniciado = None
+        self.finalizado = None
+        self.filas = 0
+        self.filas_totales = filas_totales
+        self.mensaje = ''
+        self.resultado = None
+        self.error = None
+        self._cancelar = threading.Event()
+
+    @property
+    def activo(self):
+        return self.estado in ESTADOS_ACTIVOS
+
+    @property
+    def duracion(self):
+        """Segundos de ejecución (hasta ahora si sigue corriendo)"""
+        if not self.iniciado:
+            return 0.0
+        return (self.finalizado or time.time()) - self.iniciado
+
+    @property
+    def filas_por_segundo(self):
+        duracion = self.duracion
+        return self.filas / duracion if self.filas and duracion > 0 else 0.0
+
+    @property
+    def avance(self):
+        """Fracción completada (0-1) o None si no se conoce el total"""
+        if not self.filas_totales:
+            return None
+        return min(1.0, self.filas / self.filas_totales)
+
+    def a_dict(self):
+        datos = {campo: getattr(self, campo) for campo in self.CAMPOS}
+        datos['filas_por_segundo'] = round(self.filas_por_segundo, 1)
+        return datos
+
+    @classmethod
+    def desde_dict(cls, datos):
+        trabajo = cls(datos.get('nombre', ''), id=datos.get('id'))
+        for campo in cls.CAMPOS:
+            if campo in datos:
+                setattr(trabajo, campo, datos[campo])
+        return trabajo
+
+
+def _ruta_estado():
+    return os.path.join(JOBS_DIR, 'trabajos.json')
+
+
+def _cargar():
+    """Lee el estado persistido la primera vez que se usa la cola en el proceso"""
+    global _CARGADO
+    if _CARGADO:
+        return
+    _CARGADO = True
+    try:
+        with open(_ruta_estado(), encoding='utf-8') as f:
+            datos = json.load(f)
+    except (OSError, ValueError):
+        return
+    for item in datos:
+        trabajo = Trabajo.desde_dict(item)
+        if trabajo.activo:
+            # El proceso que lo ejecutaba ya no existe
+            trabajo.estado = 'interrumpido'
+            trabajo.mensaje = 'El servidor se reinició durante la ejecución'
+            trabajo.finalizado = trabajo.finalizado or time.time()
+        _TRABAJOS.setdefault(trabajo.id, trabajo)
+
+
+def _guardar(forzar=False):
+    """Persiste el estado de todos los trabajos (escritura atómica, con límite de frecuencia)"""
+    global _ULTIMO_GUARDADO
+    with _LOCK:
+        ahora = time.time()
+        if not forzar and ahora - _ULTIMO_GUARDADO < INTERVALO_GUARDADO:
+            return
+        _ULTIMO_GUARDADO = ahora
+
+        terminados = sorted(
+            (t for t in _TRABAJOS.values() if not t.activo), key=lambda t: t.creado, reverse=True
+        )
+        for trabajo in terminados[HISTORIAL:]:
+            _TRABAJOS.pop(trabajo.id, None)
+
+        datos = [t.a_dict() for t in _TRABAJOS.values()]
+        try:
+            os.makedirs(JOBS_DIR, exist_ok=True)
+            fd, temporal = tempfile.mkstemp(dir=JOBS_DIR, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(datos, f, default=str)
+            os.replace(temporal, _ruta_estado())
+        except OSError as e:
+            logger.warning(f"No se pudo guardar el estado de los trabajos: {e}")
+
+
+def _obtener_executor():
+    global _EXECUTOR
+    with _LOCK:
+        if _EXECUTOR is None:
+            _EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='trabajo')
+        return _EXECUTOR
+
+
+def _ejecutar(trabajo, funcion, args, kwargs):
+    _LOCAL.trabajo = trabajo
+    try:
+        if trabajo._cancelar.is_set():
+            return
+        trabajo.estado = 'ejecutando'
+        trabajo.iniciado = time.time()
+        _guardar(forzar=True)
+
+        resultado = funcion(*args, **kwargs)
+
+        trabajo.resultado = resultado
+        trabajo.estado = 'completado'
+    except TrabajoCancelado:
+        trabajo.estado = 'cancelado'
+        trabajo.mensaje = 'Cancelado por el usuario'
+    except Exception as e:
+        trabajo.estado = 'error'
+        trabajo.error = f"{e}\n{traceback.format_exc()}"
+        logger.error(f"Trabajo {trabajo.id} ({trabajo.nombre}) falló: {e}")
+    finally:
+        trabajo.finalizado = time.time()
+        _LOCAL.trabajo = None
+        _guardar(forzar=True)
+
+
+def enviar(nombre, funcion, *args, app=None, usuario=None, filas_totales=None, **kwargs):
+    """
+    Encola funcion(*args, **kwargs) para ejecutarla en segundo plano.
+
+    Args:
+        nombre: Descripción que se muestra en la página de trabajos
+        funcion: Callable a ejecutar; su valor de retorno queda como resultado
+            (debe ser serializable a JSON o se guardará como texto)
+        app: Aplicación que lo envía ('siciap', 'licitaciones', ...)
+        usuario: Usuario que lo envía
+        filas_totales: Total de filas esperado, si se conoce de antemano
+
+    Returns:
+        str: Id del trabajo
+    """
+    with _LOCK:
+        _cargar()
+        trabajo = Trabajo(nombre, app=app, usuario=usuario, filas_totales=filas_totales)
+        _TRABAJOS[trabajo.id] = trabajo
+    _guardar(forzar=True)
+    _obtener_executor().submit(_ejecutar, trabajo, funcion, args, kwargs)
+    return trabajo.id
+
+
+def trabajo_actual():
+    """Trabajo que se está ejecutando en este hilo, o None"""
+    return getattr(_LOCAL, 'trabajo', None)
+
+
+def reportar_progreso(filas=None, incremento=None, total=None, mensaje=None):
+    """
+    Actualiza el avance del trabajo actual. Fuera de un trabajo no hace nada.
+
+    Args:
+        filas: Filas procesadas en total hasta ahora
+        incremento: Filas procesadas desde el último reporte
+        total: Total de filas esperado
+        mensaje: Texto de estado
+    """
+    trabajo = trabajo_actual()
+    if trabajo is None:
+        return
+    if total is not None:
+        trabajo.filas_totales = total
+    if filas is not None:
+        trabajo.filas = filas
+    if incremento:
+        trabajo.filas += incremento
+    if mensaje is not None:
+        trabajo.mensaje = mensaje
+    _guardar()
+
+
+def verificar_cancelacion():
+    """Lanza TrabajoCancelado si se pidió cancelar el trabajo actual"""
+    trabajo = trabajo_actual()
+    if trabajo is not None and trabajo._cancelar.is_set():
+        raise TrabajoCancelado()
+
+
+def _es_de(trabajo, usuario):
+    """True si el trabajo pertenece al usuario (None = cualquiera; '' = trabajos sin usuario)"""
+    return usuario is None or (trabajo.usuario or '') == usuario
+
+
+def usuario_de_sesion():
+    """
+    Usuario con el que filtrar los trabajos en la sesión de Streamlit actual:
+    None (todos) para administradores; si no, su username ('' sin sesión
+    iniciada: solo los trabajos enviados sin usuario).
+    """
+    import streamlit as st
+
+    if st.session_state.get('user_role') == 'admin':
+        return None
+    return st.session_state.get('username') or ''
+
+
+def cancelar(id_trabajo, usuario=None):
+    """
+    Pide la cancelación de un trabajo. Uno en cola no llega a empezar; uno en
+    ejecución se detiene en el siguiente punto de control (entre lotes).
+
+    Args:
+        id_trabajo: Id del trabajo
+        usuario: Solo se cancela si el trabajo es de este usuario (None = cualquiera)
+
+    Returns:
+        bool: True si el trabajo estaba activo (y era del usuario)
+    """
+    with _LOCK:
+        _cargar()
+        trabajo = _TRABAJOS.get(id_trabajo)
+        if trabajo is None or not trabajo.activo or not _es_de(trabajo, usuario):
+            return False
+        trabajo._cancelar.set()
+        if trabajo.estado == 'en_cola':
+            trabajo.estado = 'cancelado'
+            trabajo.mensaje = 'Cancelado antes de iniciar'
+            trabajo.finalizado = time.time()
+        else:
+            trabajo.mensaje = 'Cancelación solicitada...'
+    _guardar(forzar=True)
+    return True
+
+
+def obtener(id_trabajo):
+    """Trabajo por id, o None"""
+    with _LOCK:
+        _cargar()
+        return _TRABAJOS.get(id_trabajo)
+
+
+def listar(app=None, usuario=None):
+    """
+    Trabajos (opcionalmente de una app o usuario), del más reciente al más
+    antiguo. usuario='' devuelve los enviados sin usuario.
+    """
+    with _LOCK:
+        _cargar()
+        trabajos = list(_TRABAJOS.values())
+    if app is not None:
+        trabajos = [t for t in trabajos if t.app == app]
+    if usuario is not None:
+        trabajos = [t for t in trabajos if _es_de(t, usuario)]
+    return sorted(trabajos, key=lambda t: t.creado, reverse=True)
+
+
+def limpiar_terminados(usuario=None):
+    """Borra del historial los trabajos (del usuario; None = todos) que ya no están activos; devuelve cuántos"""
+    with _LOCK:
+        _cargar()
+        terminados = [t.id for t in _TRABAJOS.values() if not t.activo and _es_de(t, usuario)]
+        for id_trabajo in terminados:
+            _TRABAJOS.pop(id_trabajo, None)
+    _guardar(forzar=True)
+    return len(terminados)
+
+
+# Etiquetas de estado para la interfaz
+ETIQUETAS_ESTADO = {
+    'en_cola': '⏳ En cola',
+    'ejecutando': '⚙️ Ejecutando',
+    'completado': '✅ Completado',
+    'error': '❌ Error',
+    'cancelado': '🚫 Cancelado',
+    'interrumpido': '⚠️ Interrumpido',
+}
+
+
+def mostrar_trabajos(app=None, usuario=None, limite=None, clave='trabajos'):
+    """
+    Muestra los trabajos con su avance, velocidad y botón de cancelación.
+
+    Args:
+        app: Filtrar por aplicación (None = todas)
+        usuario: Filtrar por usuario (None = todos; ver usuario_de_sesion); solo
+            se pueden cancelar los trabajos mostrados
+        limite: Cantidad máxima de trabajos a mostrar
+        clave: Prefijo de las keys de los widgets (para usarlo en varias páginas)
+    """
+    import streamlit as st
+    from datetime import datetime
+
+    trabajos = listar(app=app, usuario=usuario)
+    if limite:
+        trabajos = trabajos[:limite]
+
+    if not trabajos:
+        st.info("No hay trabajos en segundo plano")
+        return
+
+    if st.button("🔄 Actualizar estado", key=f"{clave}_actualizar"):
+        st.rerun()
+
+    for trabajo in trabajos:
+        creado = datetime.fromtimestamp(trabajo.creado).strftime('%d/%m/%Y %H:%M:%S')
+        titulo = f"{ETIQUETAS_ESTADO.get(trabajo.estado, trabajo.estado)} · {trabajo.nombre} · {creado}"
+        with st.expander(titulo, expanded=trabajo.activo):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                if trabajo.filas_totales:
+                    st.metric("Filas", f"{trabajo.filas:,} / {trabajo.filas_totales:,}")
+                else:
+                    st.metric("Filas", f"{trabajo.filas:,}")
+            with col2:
+                st.metric("Filas/seg", f"{trabajo.filas_por_segundo:,.0f}")
+            with col3:
+                st.metric("Duración", f"{trabajo.duracion:.1f} s")
+
+            if trabajo.avance is not None:
+                st.progress(trabajo.avance)
+            if trabajo.mensaje:
+                st.caption(trabajo.mensaje)
+            if trabajo.usuario:
+                st.caption(f"Usuario: {trabajo.usuario}")
+
+            if trabajo.estado == 'completado' and trabajo.resultado is not None:
+                if isinstance(trabajo.resultado, (dict, list)):
+                    st.json(trabajo.resultado)
+                else:
+                    st.write(trabajo.resultado)
+            if trabajo.error:
+                st.error(trabajo.error.splitlines()[0])
+                st.code(trabajo.error)
+
+            if trabajo.activo and st.button("🛑 Cancelar", key=f"{clave}_cancelar_{trabajo.id}"):
+                cancelar(trabajo.id, usuario=usuario)
+                st.rerun()
@@ -1,6 +1,7 @@
 # =============================================================================
 # IMPORTS
 # =============================================================================
+import csv
 import hashlib
 import io
 import json
@@ -9,9 +10,19 @@ import openpyxl
 import os
 import pandas as pd
 import streamlit as st
+import tempfile
 import time
 from datetime import datetime, timedelta, date
-from sqlalchemy import create_engine, text
+from decimal import Decimal
+from sqlalchemy import text
+
+import auditoria
+import biseccion
+import db_registry
+import excel_stream
+import jobs
+import migraciones
+import pdf_render
 
 # =============================================================================
 # CONFIGURACIÓN DE BASE DE DATOS
@@ -148,18 +159,16 @@ def get_direct_connection():
     try:
         password_escaped = quote_plus(password)
         conn_str = f"postgresql://{user}:{password_escaped}@{host}:{port}/{dbname}?sslmode=require"
-        engine = create_engine(
+        engine = db_registry.obtener_engine(
+            'licitaciones',
             conn_str,
             connect_args={
                 "client_encoding": "utf8",
                 "connect_timeout": 10,
                 "sslmode": "require"
             },
-            pool_pre_ping=True
+            probar=True
         )
-        # Probar conexión
-        with engine.connect() as test_conn:
-            test_conn.execute(text("SELECT 1"))
         return engine
     except Exception as e:
         # No mostrar error aquí, solo retornar None
@@ -461,8 +470,8 @@ def pre_analizar_excel(archivo_excel):
     Realiza un pre-análisis del archivo Excel para mostrar estructura y permitir mapeo
     """
     try:
-        archivo_excel.seek(0)
-        excel_data = pd.read_excel(archivo_excel, sheet_name=None, engine='openpyxl')
+        # Parseo en streaming, compartido con la carga posterior del mismo archivo
+        excel_data = excel_stream.leer_libro(archivo_excel)
         
         analisis = {
             'hojas': {},
@@ -795,409 +804,435 @@ def configurar_tabla_usuarios():
                 st.warning(f"No se pudo verificar la tabla: {e}")
             return
         
-        # Conexión directa - crear tabla normalmente
-        with engine.connect() as conn:
-            # Crear esquema si no existe
-            conn.execute(text("""
-                CREATE SCHEMA IF NOT EXISTS oxigeno;
-            """))
-            conn.commit()
-            
-            # Crear tabla en public para que funcione con API REST
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS public.usuarios (
-                    id INTEGER NOT NULL,
-                    cedula VARCHAR(20) NOT NULL,
-                    username VARCHAR(50) NOT NULL,
-                    password VARCHAR(200) NOT NULL,
-                    nombre_completo VARCHAR(100) NOT NULL,
-                    role VARCHAR(20) NOT NULL DEFAULT 'user',
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    ultimo_cambio_password TIMESTAMP,
-                    CONSTRAINT usuarios_pkey PRIMARY KEY (id),
-                    CONSTRAINT usuarios_cedula_unique UNIQUE (cedula),
-                    CONSTRAINT usuarios_username_unique UNIQUE (username)
-                );
-            """))
-            conn.commit()
-            
-            # Crear secuencia si no existe
-            conn.execute(text("""
-                CREATE SEQUENCE IF NOT EXISTS usuarios_id_seq;
-                ALTER TABLE public.usuarios ALTER COLUMN id SET DEFAULT nextval('usuarios_id_seq');
-                ALTER SEQUENCE usuarios_id_seq OWNED BY public.usuarios.id;
-            """))
-            conn.commit()
-            
-            # Verificar si existe el usuario admin
-            query = text("SELECT COUNT(*) FROM public.usuarios WHERE username = 'admin'")
-            result = conn.execute(query)
-            count = result.scalar()
-            
-            if count == 0:
-                # Crear usuario admin por defecto
-                password_hash = hashlib.sha256("admin".encode()).hexdigest()
-                
-                query = text("""
-                    INSERT INTO public.usuarios (cedula, username, password, nombre_completo, role, ultimo_cambio_password)
-                    VALUES ('123456', 'admin', :password, 'Administrador del Sistema', 'admin', CURRENT_TIMESTAMP)
-                """)
-                
-                conn.execute(query, {'password': password_hash})
-                print("Usuario admin creado")
-                
-            return True
+        # Conexión directa: la tabla se crea con las migraciones versionadas
+        resultado = asegurar_esquema_licitaciones('usuarios')
+        return resultado is not None and resultado['error'] is None
     except Exception as e:
         print(f"Error configurando tabla de usuarios: {e}")
         return False
 
 # Función para configurar la tabla de archivos cargados
 def configurar_tabla_cargas():
-    """Crea la tabla para registrar las cargas de archivos CSV"""
-    try:
-        engine = get_engine()
-        if engine is None:
-            return False
-        if isinstance(engine, dict) and engine.get('type') == 'api_rest':
-            # Para API REST, las tablas se crean manualmente en Supabase
-            return True
-        with engine.connect() as conn:
-            # Crear esquema si no existe
-            conn.execute(text("""
-                CREATE SCHEMA IF NOT EXISTS oxigeno;
-            """))
-            
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS oxigeno.archivos_cargados (
-                    id SERIAL PRIMARY KEY,
-                    nombre_archivo VARCHAR(255) NOT NULL,
-                    esquema VARCHAR(100) NOT NULL,
-                    fecha_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    usuario_id INTEGER NOT NULL,
-                    ubicacion_fisica VARCHAR(500),
-                    estado VARCHAR(50) DEFAULT 'Activo',
-                    FOREIGN KEY (usuario_id) REFERENCES oxigeno.usuarios(id)
-                );
-            """))
-            
-            return True
-    except Exception as e:
-        print(f"Error configurando tabla de archivos: {e}")
-        return False
+    """Crea la tabla para registrar las cargas de archivos CSV (migraciones versionadas de licitaciones)"""
+    resultado = asegurar_esquema_licitaciones('cargas')
+    return resultado is not None and resultado['error'] is None
 
 # Crear tabla para almacenar órdenes de compra
 def configurar_tabla_ordenes_compra():
-    """Crea la tabla de órdenes de compra si no existe y ejecuta migraciones automáticas"""
-    try:
-        engine = get_engine()
-        if engine is None:
-            return False
-        if isinstance(engine, dict) and engine.get('type') == 'api_rest':
-            # Para API REST, las tablas se crean manualmente en Supabase
-            return True
-        with engine.connect() as conn:
-            # Crear esquema si no existe
-            conn.execute(text("""
-                CREATE SCHEMA IF NOT EXISTS oxigeno;
-            """))
-            conn.commit()
-            
-            # Crear tabla ordenes_compra con estructura completa
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS oxigeno.ordenes_compra (
-                    id SERIAL PRIMARY KEY,
-                    numero_orden VARCHAR(50) UNIQUE NOT NULL,
-                    fecha_emision TIMESTAMP NOT NULL,
-                    esquema VARCHAR(100) NOT NULL,
-                    servicio_beneficiario VARCHAR(200),
-                    simese VARCHAR(50),
-                    usuario_id INTEGER NOT NULL,
-                    estado VARCHAR(50) NOT NULL DEFAULT 'Emitida',
-                    fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (usuario_id) REFERENCES oxigeno.usuarios(id)
-                );
-            """))
-            conn.commit()
-            
-            # Crear tabla items_orden_compra con estructura completa
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS oxigeno.items_orden_compra (
-                    id SERIAL PRIMARY KEY,
-                    orden_compra_id INTEGER NOT NULL,
-                    lote VARCHAR(50),
-                    item VARCHAR(50),
-                    codigo_insumo VARCHAR(100),
-                    codigo_servicio VARCHAR(100),
-                    descripcion TEXT,
-                    cantidad NUMERIC(15, 2) NOT NULL,
-                    unidad_medida VARCHAR(50),
-                    precio_unitario NUMERIC(15, 2),
-                    monto_total NUMERIC(15, 2),
-                    observaciones TEXT,
-                    FOREIGN KEY (orden_compra_id) REFERENCES oxigeno.ordenes_compra(id) ON DELETE CASCADE
-                );
-            """))
-            conn.commit()
-            
-            # ========================================
-            # MIGRACIÓN AUTOMÁTICA DE COLUMNAS
-            # ========================================
-            
-            # Columnas necesarias en ordenes_compra
-            columnas_ordenes_compra = {
-                'esquema': 'VARCHAR(100)',
-                'servicio_beneficiario': 'VARCHAR(200)',
-                'simese': 'VARCHAR(50)',
-                'estado': "VARCHAR(50) DEFAULT 'Emitida'",
-            }
-            
-            for columna, tipo in columnas_ordenes_compra.items():
-                try:
-                    # Verificar si existe
-                    check = conn.execute(text(f"""
-                        SELECT column_name 
-                        FROM information_schema.columns 
-                        WHERE table_schema = 'oxigeno' 
-                        AND table_name = 'ordenes_compra' 
-                        AND column_name = '{columna}'
-                    """))
-                    
-                    if not check.fetchone():
-                        # Agregar columna
-                        conn.execute(text(f"""
-                            ALTER TABLE oxigeno.ordenes_compra 
-                            ADD COLUMN {columna} {tipo}
-                        """))
-                        conn.commit()
-                        print(f"✅ Columna '{columna}' agregada a ordenes_compra")
-                except Exception as e:
-                    print(f"⚠️ Error al agregar columna '{columna}' a ordenes_compra: {e}")
-            
-            # Columnas necesarias en items_orden_compra
-            columnas_items = {
-                'lote': 'VARCHAR(50)',
-                'item': 'VARCHAR(50)',
-                'codigo_insumo': 'VARCHAR(100)',
-                'codigo_servicio': 'VARCHAR(100)',
-                'descripcion': 'TEXT',
-                'cantidad': 'NUMERIC(15, 2)',
-                'unidad_medida': 'VARCHAR(50)',
-                'precio_unitario': 'NUMERIC(15, 2)',
-                'monto_total': 'NUMERIC(15, 2)',
-                'observaciones': 'TEXT',
-            }
-            
-            for columna, tipo in columnas_items.items():
-                try:
-                    # Verificar si existe
-                    check = conn.execute(text(f"""
-                        SELECT column_name 
-                        FROM information_schema.columns 
-                        WHERE table_schema = 'oxigeno' 
-                        AND table_name = 'items_orden_compra' 
-                        AND column_name = '{columna}'
-                    """))
-                    
-                    if not check.fetchone():
-                        # Agregar columna
-                        conn.execute(text(f"""
-                            ALTER TABLE oxigeno.items_orden_compra 
-                            ADD COLUMN {columna} {tipo}
-                        """))
-                        conn.commit()
-                        print(f"✅ Columna '{columna}' agregada a items_orden_compra")
-                except Exception as e:
-                    print(f"⚠️ Error al agregar columna '{columna}' a items_orden_compra: {e}")
-            
-            return True
-    except Exception as e:
-        print(f"Error configurando tablas de órdenes de compra: {e}")
-        return False
+    """Crea las tablas de órdenes de compra e ítems con sus columnas (migraciones versionadas de licitaciones)"""
+    resultado = asegurar_esquema_licitaciones('ordenes')
+    return resultado is not None and resultado['error'] is None
 
 def configurar_tabla_proveedores():
-    """Crea la tabla de proveedores si no existe"""
-    try:
-        engine = get_engine()
-        if engine is None:
-            return False
-        if isinstance(engine, dict) and engine.get('type') == 'api_rest':
-            # Para API REST, las tablas se crean manualmente en Supabase
-            return True
-        with engine.connect() as conn:
-            conn.execute(text("""
-                CREATE SCHEMA IF NOT EXISTS oxigeno;
-            """))
-            
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS oxigeno.proveedores (
-                    id SERIAL PRIMARY KEY,
-                    ruc VARCHAR(50) UNIQUE NOT NULL,
-                    razon_social VARCHAR(200) NOT NULL,
-                    direccion TEXT,
-                    correo_electronico VARCHAR(100),
-                    telefono VARCHAR(50),
-                    contacto_nombre VARCHAR(100),
-                    observaciones TEXT,
-                    activo BOOLEAN DEFAULT TRUE,
-                    fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """))
-            
-            return True
-    except Exception as e:
-        print(f"Error configurando tabla de proveedores: {e}")
-        return False
+    """Crea la tabla de proveedores si no existe (migraciones versionadas de licitaciones)"""
+    resultado = asegurar_esquema_licitaciones('proveedores')
+    return resultado is not None and resultado['error'] is None
 
 def configurar_tabla_auditoria():
-   """Crea la tabla de auditoría para registrar todas las actividades del sistema"""
-   try:
-       engine = get_engine()
-       if engine is None:
-           return
-       # Si es API REST, solo verificar que existe (las tablas ya están creadas)
-       if isinstance(engine, dict) and engine.get('type') == 'api_rest':
-           # Las tablas ya están creadas en Supabase, no hacer nada
-           return
-       # Usar conexión directa para crear tabla si no existe
-       engine = safe_get_engine()
-       if engine is None:
-           return
-       with engine.connect() as conn:
-           conn.execute(text("""
-               CREATE SCHEMA IF NOT EXISTS oxigeno;
-           """))
-           
-           conn.execute(text("""
-               CREATE TABLE IF NOT EXISTS oxigeno.auditoria (
-                   id SERIAL PRIMARY KEY,
-                   usuario_id INTEGER NOT NULL,
-                   usuario_nombre VARCHAR(100) NOT NULL,
-                   accion VARCHAR(100) NOT NULL,
-                   modulo VARCHAR(50) NOT NULL,
-                   descripcion TEXT NOT NULL,
-                   detalles JSONB,
-                   ip_address VARCHAR(45),
-                   user_agent TEXT,
-                   fecha_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                   esquema_afectado VARCHAR(100),
-                   registro_afectado_id INTEGER,
-                   valores_anteriores JSONB,
-                   valores_nuevos JSONB,
-                   FOREIGN KEY (usuario_id) REFERENCES oxigeno.usuarios(id)
-               );
-           """))
-           
-           conn.execute(text("""
-               CREATE INDEX IF NOT EXISTS idx_auditoria_usuario ON oxigeno.auditoria(usuario_id);
-               CREATE INDEX IF NOT EXISTS idx_auditoria_fecha ON oxigeno.auditoria(fecha_hora DESC);
-               CREATE INDEX IF NOT EXISTS idx_auditoria_modulo ON oxigeno.auditoria(modulo);
-               CREATE INDEX IF NOT EXISTS idx_auditoria_accion ON oxigeno.auditoria(accion);
-           """))
-           
-           return True
-   except Exception as e:
-       print(f"Error configurando tabla de auditoría: {e}")
-       return False
+    """Crea la tabla de auditoría para registrar todas las actividades del sistema (migraciones versionadas de licitaciones)"""
+    resultado = asegurar_esquema_licitaciones('auditoria')
+    return resultado is not None and resultado['error'] is None
+
+# =============================================================================
+# MIGRACIONES DE ESQUEMA
+# =============================================================================
+
+def _migracion_usuarios(conn):
+    """Esquema oxigeno, tabla public.usuarios (expuesta a la API REST) y admin por defecto"""
+    conn.execute(text("CREATE SCHEMA IF NOT EXISTS oxigeno"))
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS public.usuarios (
+            id INTEGER NOT NULL,
+            cedula VARCHAR(20) NOT NULL,
+            username VARCHAR(50) NOT NULL,
+            password VARCHAR(200) NOT NULL,
+            nombre_completo VARCHAR(100) NOT NULL,
+            role VARCHAR(20) NOT NULL DEFAULT 'user',
+            fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ultimo_cambio_password TIMESTAMP,
+            CONSTRAINT usuarios_pkey PRIMARY KEY (id),
+            CONSTRAINT usuarios_cedula_unique UNIQUE (cedula),
+            CONSTRAINT usuarios_username_unique UNIQUE (username)
+        )
+    """))
+    conn.execute(text("""
+        CREATE SEQUENCE IF NOT EXISTS usuarios_id_seq;
+        ALTER TABLE public.usuarios ALTER COLUMN id SET DEFAULT nextval('usuarios_id_seq');
+        ALTER SEQUENCE usuarios_id_seq OWNED BY public.usuarios.id;
+    """))
+    conn.execute(text("""
+        INSERT INTO public.usuarios (cedula, username, password, nombre_completo, role, ultimo_cambio_password)
+        SELECT '123456', 'admin', :password, 'Administrador del Sistema', 'admin', CURRENT_TIMESTAMP
+        WHERE NOT EXISTS (SELECT 1 FROM public.usuarios WHERE username = 'admin')
+    """), {'password': hashlib.sha256("admin".encode()).hexdigest()})
+
+# Columnas agregadas después de la primera versión de las tablas de órdenes
+COLUMNAS_ORDENES_COMPRA = {
+    'esquema': 'VARCHAR(100)',
+    'servicio_beneficiario': 'VARCHAR(200)',
+    'simese': 'VARCHAR(50)',
+    'estado': "VARCHAR(50) DEFAULT 'Emitida'",
+}
+
+COLUMNAS_ITEMS_ORDEN_COMPRA = {
+    'lote': 'VARCHAR(50)',
+    'item': 'VARCHAR(50)',
+    'codigo_insumo': 'VARCHAR(100)',
+    'codigo_servicio': 'VARCHAR(100)',
+    'descripcion': 'TEXT',
+    'cantidad': 'NUMERIC(15, 2)',
+    'unidad_medida': 'VARCHAR(50)',
+    'precio_unitario': 'NUMERIC(15, 2)',
+    'monto_total': 'NUMERIC(15, 2)',
+    'observaciones': 'TEXT',
+}
+
+CREAR_ESQUEMA_OXIGENO = "CREATE SCHEMA IF NOT EXISTS oxigeno"
+
+# Pasos versionados por grupo: nunca se modifica uno ya publicado, se agrega uno
+# nuevo al grupo que corresponde. Cada grupo es una cadena independiente en
+# public.schema_version (aplicación 'licitaciones' para usuarios y
+# 'licitaciones_<grupo>' para el resto): un paso que falla solo detiene a su
+# grupo, como antes cada configurar_* era independiente. Los números de versión
+# se conservan de la cadena única anterior; al separarse, los pasos (todos
+# idempotentes) se vuelven a verificar una vez en cada base.
+MIGRACIONES_LICITACIONES = {
+    'usuarios': [
+        (1, "Esquema oxigeno, usuarios y admin por defecto", _migracion_usuarios),
+    ],
+    'proveedores': [
+        (2, "Tabla de proveedores", [
+            CREAR_ESQUEMA_OXIGENO,
+            """
+            CREATE TABLE IF NOT EXISTS oxigeno.proveedores (
+                id SERIAL PRIMARY KEY,
+                ruc VARCHAR(50) UNIQUE NOT NULL,
+                razon_social VARCHAR(200) NOT NULL,
+                direccion TEXT,
+                correo_electronico VARCHAR(100),
+                telefono VARCHAR(50),
+                contacto_nombre VARCHAR(100),
+                observaciones TEXT,
+                activo BOOLEAN DEFAULT TRUE,
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+        ]),
+    ],
+    'ordenes': [
+        (3, "Órdenes de compra e ítems", [
+            CREAR_ESQUEMA_OXIGENO,
+            """
+            CREATE TABLE IF NOT EXISTS oxigeno.ordenes_compra (
+                id SERIAL PRIMARY KEY,
+                numero_orden VARCHAR(50) UNIQUE NOT NULL,
+                fecha_emision TIMESTAMP NOT NULL,
+                esquema VARCHAR(100) NOT NULL,
+                servicio_beneficiario VARCHAR(200),
+                simese VARCHAR(50),
+                usuario_id INTEGER NOT NULL,
+                estado VARCHAR(50) NOT NULL DEFAULT 'Emitida',
+                fecha_creacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (usuario_id) REFERENCES public.usuarios(id)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS oxigeno.items_orden_compra (
+                id SERIAL PRIMARY KEY,
+                orden_compra_id INTEGER NOT NULL,
+                lote VARCHAR(50),
+                item VARCHAR(50),
+                codigo_insumo VARCHAR(100),
+                codigo_servicio VARCHAR(100),
+                descripcion TEXT,
+                cantidad NUMERIC(15, 2) NOT NULL,
+                unidad_medida VARCHAR(50),
+                precio_unitario NUMERIC(15, 2),
+                monto_total NUMERIC(15, 2),
+                observaciones TEXT,
+                FOREIGN KEY (orden_compra_id) REFERENCES oxigeno.ordenes_compra(id) ON DELETE CASCADE
+            )
+            """,
+        ]),
+        # Antes: una consulta a information_schema por columna en cada rerun
+        (4, "Columnas agregadas a órdenes de compra e ítems",
+            [f"ALTER TABLE oxigeno.ordenes_compra ADD COLUMN IF NOT EXISTS {col} {tipo}"
+             for col, tipo in COLUMNAS_ORDENES_COMPRA.items()] +
+            [f"ALTER TABLE oxigeno.items_orden_compra ADD COLUMN IF NOT EXISTS {col} {tipo}"
+             for col, tipo in COLUMNAS_ITEMS_ORDEN_COMPRA.items()]),
+    ],
+    'cargas': [
+        (5, "Registro de archivos cargados", [
+            CREAR_ESQUEMA_OXIGENO,
+            """
+            CREATE TABLE IF NOT EXISTS oxigeno.archivos_cargados (
+                id SERIAL PRIMARY KEY,
+                nombre_archivo VARCHAR(255) NOT NULL,
+                esquema VARCHAR(100) NOT NULL,
+                fecha_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                usuario_id INTEGER NOT NULL,
+                ubicacion_fisica VARCHAR(500),
+                estado VARCHAR(50) DEFAULT 'Activo',
+                FOREIGN KEY (usuario_id) REFERENCES public.usuarios(id)
+            )
+            """,
+        ]),
+        (6, "Control de re-cargas en archivos cargados", lambda conn: asegurar_control_cargas(conn)),
+    ],
+    'auditoria': [
+        (7, "Auditoría e índices", [
+            CREAR_ESQUEMA_OXIGENO,
+            """
+            CREATE TABLE IF NOT EXISTS oxigeno.auditoria (
+                id SERIAL PRIMARY KEY,
+                usuario_id INTEGER NOT NULL,
+                usuario_nombre VARCHAR(100) NOT NULL,
+                accion VARCHAR(100) NOT NULL,
+                modulo VARCHAR(50) NOT NULL,
+                descripcion TEXT NOT NULL,
+                detalles JSONB,
+                ip_address VARCHAR(45),
+                user_agent TEXT,
+                fecha_hora TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                esquema_afectado VARCHAR(100),
+                registro_afectado_id INTEGER,
+                valores_anteriores JSONB,
+                valores_nuevos JSONB,
+                FOREIGN KEY (usuario_id) REFERENCES public.usuarios(id)
+            )
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_auditoria_usuario ON oxigeno.auditoria(usuario_id)",
+            "CREATE INDEX IF NOT EXISTS idx_auditoria_fecha ON oxigeno.auditoria(fecha_hora DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_auditoria_modulo ON oxigeno.auditoria(modulo)",
+            "CREATE INDEX IF NOT EXISTS idx_auditoria_accion ON oxigeno.auditoria(accion)",
+        ]),
+        # Historial: índices compuestos para filtrar y paginar por (fecha_hora, id)
+        # sin ordenar en memoria; reemplazan a los de una sola columna
+        (9, "Auditoría en JSONB e índices compuestos del historial", [
+            """
+            DO $$
+            DECLARE
+                columna TEXT;
+            BEGIN
+                FOREACH columna IN ARRAY ARRAY['detalles', 'valores_anteriores', 'valores_nuevos'] LOOP
+                    IF EXISTS (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = 'oxigeno' AND table_name = 'auditoria'
+                          AND column_name = columna AND data_type <> 'jsonb'
+                    ) THEN
+                        EXECUTE format(
+                            'ALTER TABLE oxigeno.auditoria ALTER COLUMN %I TYPE JSONB USING %I::text::jsonb',
+                            columna, columna
+                        );
+                    END IF;
+                END LOOP;
+            END $$
+            """,
+            "CREATE INDEX IF NOT EXISTS idx_auditoria_fecha_id ON oxigeno.auditoria(fecha_hora DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_auditoria_usuario_fecha ON oxigeno.auditoria(usuario_id, fecha_hora DESC, id DESC)",
+            "CREATE INDEX IF NOT EXISTS idx_auditoria_modulo_accion_fecha ON oxigeno.auditoria(modulo, accion, fecha_hora DESC, id DESC)",
+            "DROP INDEX IF EXISTS oxigeno.idx_auditoria_usuario",
+            "DROP INDEX IF EXISTS oxigeno.idx_auditoria_fecha",
+            "DROP INDEX IF EXISTS oxigeno.idx_auditoria_modulo",
+        ]),
+    ],
+    'usuario_servicio': [
+        (8, "Relación usuario-servicio", [
+            CREAR_ESQUEMA_OXIGENO,
+            """
+            CREATE TABLE IF NOT EXISTS oxigeno.usuario_servicio (
+                id SERIAL PRIMARY KEY,
+                usuario_id INTEGER NOT NULL,
+                servicio VARCHAR(200) NOT NULL,
+                puede_crear_oc BOOLEAN DEFAULT TRUE,
+                puede_crear_acta BOOLEAN DEFAULT TRUE,
+                fecha_asignacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (usuario_id) REFERENCES public.usuarios(id) ON DELETE CASCADE,
+                UNIQUE(usuario_id, servicio)
+            )
+            """,
+        ]),
+    ],
+    # Sin dependencias: la numeración de órdenes y actas no espera a otros grupos
+    'contadores': [
+        (10, "Contadores de numeración de órdenes y actas", [
+            CREAR_ESQUEMA_OXIGENO,
+            """
+            CREATE TABLE IF NOT EXISTS oxigeno.contadores (
+                ambito VARCHAR(50) NOT NULL,
+                clave VARCHAR(100) NOT NULL,
+                ultimo BIGINT NOT NULL DEFAULT 0,
+                actualizado TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (ambito, clave)
+            )
+            """,
+        ]),
+    ],
+}
+
+# Pasos que se reintentan en cada arranque del proceso, por grupo: sus tablas
+# aparecen con la primera carga de datos y no en una migración
+MIGRACIONES_LICITACIONES_REPETIBLES = {
+    'ordenes': [
+        ("Índices de oxigeno.orden_de_compra", lambda conn: _migracion_indices_orden_compra(conn)),
+    ],
+}
+
+def _app_migraciones(grupo):
+    """Nombre de la cadena de versiones de un grupo en public.schema_version"""
+    return 'licitaciones' if grupo == 'usuarios' else f'licitaciones_{grupo}'
+
+def asegurar_esquema_licitaciones(grupo=None):
+    """
+    Aplica las migraciones pendientes de todos los grupos (una vez por proceso;
+    después es solo una consulta en memoria). Sin conexión directa (solo API
+    REST) las tablas se crean manualmente en Supabase y no se migra nada.
+
+    Args:
+        grupo: Grupo cuyo resultado interesa ('usuarios', 'cargas', ...); None = todos
+
+    Returns:
+        dict de migraciones.aplicar del grupo (con grupo=None: error con los
+        errores de todos los grupos), o None sin conexión directa
+    """
+    engine = safe_get_engine()
+    if engine is None:
+        return None
+
+    # Todos los grupos en orden: usuarios primero (los demás la referencian);
+    # cada uno se aplica aunque otro haya fallado
+    resultados = {
+        nombre: migraciones.aplicar(
+            engine, _app_migraciones(nombre), pasos, MIGRACIONES_LICITACIONES_REPETIBLES.get(nombre, ())
+        )
+        for nombre, pasos in MIGRACIONES_LICITACIONES.items()
+    }
+    if grupo is not None:
+        return resultados[grupo]
+
+    errores = [f"{nombre}: {r['error']}" for nombre, r in resultados.items() if r['error']]
+    return {'grupos': resultados, 'error': '; '.join(errores) or None}
 
 def registrar_actividad(accion, modulo, descripcion, detalles=None, esquema_afectado=None, 
                       registro_afectado_id=None, valores_anteriores=None, valores_nuevos=None):
-   """Registra una actividad en el sistema de auditoría"""
+   """
+   Registra una actividad en el sistema de auditoría.
+   
+   El evento se encola y lo escribe en lote un hilo de fondo (ver auditoria.py):
+   la request no espera al INSERT.
+   """
    try:
        if 'user_id' not in st.session_state or 'user_name' not in st.session_state:
            return False
        
-       engine = get_engine()
-       if engine is None:
-           return False
+       auditoria.registrar({
+           'usuario_id': st.session_state.user_id,
+           'usuario_nombre': st.session_state.user_name,
+           'accion': accion,
+           'modulo': modulo,
+           'descripcion': descripcion,
+           'detalles': detalles,
+           'esquema_afectado': esquema_afectado,
+           'registro_afectado_id': registro_afectado_id,
+           'valores_anteriores': valores_anteriores,
+           'valores_nuevos': valores_nuevos
+       }, obtener_engine=safe_get_engine)
        
-       # Para API REST, la auditoría se puede implementar más adelante
-       if isinstance(engine, dict) and engine.get('type') == 'api_rest':
-           # Por ahora, solo registrar en logs
-           print(f"Auditoría (API REST): {accion} - {modulo} - {descripcion}")
-           return True
-           
-       with engine.connect() as conn:
-           query = text("""
-               INSERT INTO oxigeno.auditoria 
-               (usuario_id, usuario_nombre, accion, modulo, descripcion, detalles, 
-                esquema_afectado, registro_afectado_id, valores_anteriores, valores_nuevos)
-               VALUES (:usuario_id, :usuario_nombre, :accion, :modulo, :descripcion, :detalles,
-                       :esquema_afectado, :registro_afectado_id, :valores_anteriores, :valores_nuevos)
-           """)
-           
-           conn.execute(query, {
-               'usuario_id': st.session_state.user_id,
-               'usuario_nombre': st.session_state.user_name,
-               'accion': accion,
-               'modulo': modulo,
-               'descripcion': descripcion,
-               'detalles': json.dumps(detalles) if detalles else None,
-               'esquema_afectado': esquema_afectado,
-               'registro_afectado_id': registro_afectado_id,
-               'valores_anteriores': json.dumps(valores_anteriores) if valores_anteriores else None,
-               'valores_nuevos': json.dumps(valores_nuevos) if valores_nuevos else None
-           })
-           
-           return True
+       return True
    except Exception as e:
        print(f"Error registrando actividad en auditoría: {e}")
        return False
 
-def obtener_historial_actividades(limite=100, usuario_id=None, modulo=None, accion=None, fecha_desde=None, fecha_hasta=None):
-    """Obtiene el historial de actividades con filtros opcionales"""
+HISTORIAL_POR_PAGINA_MAX = 1000
+HISTORIAL_CSV_LOTE = 5000
+# CSV exportados del historial: en disco, la sesión solo guarda la ruta
+HISTORIAL_CSV_DIR = os.path.join(tempfile.gettempdir(), "sistema_mspbs_historial_csv")
+# Los CSV de sesiones que no los descargaron se borran pasado este tiempo
+HISTORIAL_CSV_MAX_SEGUNDOS = 3600
+
+def _filtros_historial(usuario_id=None, modulo=None, accion=None, fecha_desde=None, fecha_hasta=None):
+    """Condiciones y parámetros comunes al historial y a su exportación"""
+    filtros = []
+    params = {}
+
+    if usuario_id:
+        filtros.append("a.usuario_id = :usuario_id")
+        params['usuario_id'] = usuario_id
+
+    if modulo:
+        filtros.append("a.modulo = :modulo")
+        params['modulo'] = modulo
+
+    if accion:
+        filtros.append("a.accion = :accion")
+        params['accion'] = accion
+
+    if fecha_desde:
+        filtros.append("a.fecha_hora >= :fecha_desde")
+        params['fecha_desde'] = fecha_desde
+
+    if fecha_hasta:
+        # Día completo: antes se comparaba con la medianoche del día elegido
+        if isinstance(fecha_hasta, date) and not isinstance(fecha_hasta, datetime):
+            filtros.append("a.fecha_hora < :fecha_hasta")
+            params['fecha_hasta'] = fecha_hasta + timedelta(days=1)
+        else:
+            filtros.append("a.fecha_hora <= :fecha_hasta")
+            params['fecha_hasta'] = fecha_hasta
+
+    return filtros, params
+
+def _valor_jsonb(valor):
+    """JSONB llega decodificado; el texto solo aparece en tablas aún sin migrar"""
+    if isinstance(valor, str):
+        try:
+            return json.loads(valor)
+        except ValueError:
+            return valor
+    return valor
+
+def obtener_historial_actividades(limite=100, usuario_id=None, modulo=None, accion=None, fecha_desde=None, fecha_hasta=None, despues_de=None):
+    """
+    Obtiene el historial de actividades con filtros opcionales, del más reciente
+    al más antiguo.
+
+    Args:
+        limite: Cantidad máxima de actividades a devolver
+        despues_de: Cursor de paginación por clave: el valor 'cursor' de la
+            última actividad de la página anterior
+
+    Returns:
+        list: Actividades (detalles y valores ya decodificados) con la clave 'cursor'
+    """
     try:
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
-        if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-            return []
-        
-        # Para API REST, la auditoría se puede implementar más adelante
-        if isinstance(engine, dict) and engine.get('type') == 'api_rest':
-            # Por ahora, retornar lista vacía
-            return []
+        # Que las actividades recién registradas (aún en la cola) aparezcan
+        auditoria.vaciar(timeout=2)
         
-        # Usar conexión directa para auditoría
+        # La auditoría solo se escribe con conexión directa
         engine = safe_get_engine()
         if engine is None:
             return []
         
+        filtros, params = _filtros_historial(usuario_id, modulo, accion, fecha_desde, fecha_hasta)
+        
+        if despues_de:
+            filtros.append("(a.fecha_hora, a.id) < (:cursor_fecha, :cursor_id)")
+            params['cursor_fecha'], params['cursor_id'] = despues_de
+        
+        where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+        params['limite'] = int(min(limite, HISTORIAL_POR_PAGINA_MAX + 1))
+        
         with engine.connect() as conn:
-            query_base = """
+            result = conn.execute(text(f"""
                 SELECT a.id, a.usuario_nombre, a.accion, a.modulo, a.descripcion, 
                        a.fecha_hora, a.esquema_afectado, a.detalles,
                        a.valores_anteriores, a.valores_nuevos
                 FROM oxigeno.auditoria a
-                WHERE 1=1
-            """
-            params = {}
-            
-            if usuario_id:
-                query_base += " AND a.usuario_id = :usuario_id"
-                params['usuario_id'] = usuario_id
-            
-            if modulo:
-                query_base += " AND a.modulo = :modulo"
-                params['modulo'] = modulo
-            
-            if accion:
-                query_base += " AND a.accion = :accion"
-                params['accion'] = accion
-            
-            if fecha_desde:
-                query_base += " AND a.fecha_hora >= :fecha_desde"
-                params['fecha_desde'] = fecha_desde
-            
-            if fecha_hasta:
-                query_base += " AND a.fecha_hora <= :fecha_hasta"
-                params['fecha_hasta'] = fecha_hasta
-            
-            query_base += " ORDER BY a.fecha_hora DESC LIMIT :limite"
-            params['limite'] = limite
-            
-            query = text(query_base)
-            result = conn.execute(query, params)
+                {where}
+                ORDER BY a.fecha_hora DESC, a.id DESC
+                LIMIT :limite
+            """), params)
             
             actividades = []
             for row in result:
@@ -1209,9 +1244,10 @@ def obtener_historial_actividades(limite=100, usuario_id=None, modulo=None, acci
                     'descripcion': row[4],
                     'fecha_hora': row[5],
                     'esquema_afectado': row[6],
-                    'detalles': json.loads(row[7]) if row[7] else None,
-                    'valores_anteriores': json.loads(row[8]) if row[8] else None,
-                    'valores_nuevos': json.loads(row[9]) if row[9] else None
+                    'detalles': _valor_jsonb(row[7]),
+                    'valores_anteriores': _valor_jsonb(row[8]),
+                    'valores_nuevos': _valor_jsonb(row[9]),
+                    'cursor': (row[5], row[0])
                 })
             
             return actividades
@@ -1219,6 +1255,70 @@ def obtener_historial_actividades(limite=100, usuario_id=None, modulo=None, acci
         st.error(f"Error obteniendo historial de actividades: {e}")
         return []
 
+def exportar_historial_csv(usuario_id=None, modulo=None, accion=None, fecha_desde=None, fecha_hasta=None):
+    """
+    Exporta el historial filtrado completo como CSV, en bloques.
+
+    Las filas se leen con un cursor del servidor (HISTORIAL_CSV_LOTE por vez) y
+    se convierten a CSV bloque por bloque, sin armar un DataFrame del historial.
+
+    Yields:
+        bytes: Fragmentos del CSV (UTF-8 con BOM para Excel), el primero con el encabezado
+    """
+    engine = safe_get_engine()
+    if engine is None:
+        return
+    
+    filtros, params = _filtros_historial(usuario_id, modulo, accion, fecha_desde, fecha_hasta)
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow([
+        'Fecha/Hora', 'Usuario', 'Módulo', 'Acción', 'Descripción', 'Esquema Afectado',
+        'Detalles', 'Valores Anteriores', 'Valores Nuevos'
+    ])
+    yield ('\ufeff' + buffer.getvalue()).encode('utf-8')
+    
+    with engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=HISTORIAL_CSV_LOTE).execute(text(f"""
+            SELECT a.fecha_hora, a.usuario_nombre, a.modulo, a.accion, a.descripcion,
+                   a.esquema_afectado, a.detalles::text, a.valores_anteriores::text,
+                   a.valores_nuevos::text
+            FROM oxigeno.auditoria a
+            {where}
+            ORDER BY a.fecha_hora DESC, a.id DESC
+        """), params)
+        
+        for filas in result.partitions():
+            buffer.seek(0)
+            buffer.truncate()
+            escritor.writerows(
+                [fila[0].strftime('%Y-%m-%d %H:%M:%S') if fila[0] else ''] + list(fila[1:])
+                for fila in filas
+            )
+            yield buffer.getvalue().encode('utf-8')
+
+def _descartar_historial_csv():
+    """Borra el CSV del historial generado en la sesión (tras descargarlo o al cambiar los filtros)"""
+    historial_csv = st.session_state.pop('historial_csv', None)
+    if historial_csv:
+        try:
+            os.remove(historial_csv['ruta'])
+        except OSError:
+            pass
+
+def _podar_historial_csv():
+    """Elimina los CSV del historial abandonados (sesiones cerradas sin descargar)"""
+    limite = time.time() - HISTORIAL_CSV_MAX_SEGUNDOS
+    try:
+        for nombre in os.listdir(HISTORIAL_CSV_DIR):
+            ruta = os.path.join(HISTORIAL_CSV_DIR, nombre)
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+    except OSError:
+        pass
+
 def numero_a_letras(numero):
     """Convierte un número a su representación en letras (simplificada)"""
     millones = int(numero / 1000000)
@@ -1311,18 +1411,58 @@ def obtener_esquemas_postgres():
 import openpyxl
 import pandas as pd
 
+def generar_codigo_licitacion(esquema):
+    """
+    Código de licitación único con formato {MODALIDAD}_{NUMERO}/{AÑO} (ej: LPN_100/2023).
+    Si el esquema ya viene en formato de código se usa tal cual; si viene como
+    "lpn 100/2023" se convierte a "LPN_100/2023".
+    """
+    if '/' in esquema or '_' in esquema:
+        return esquema.strip().upper()
+    return esquema.strip().upper().replace(' ', '_')
+
+def asegurar_control_cargas(conn):
+    """Columnas de oxigeno.archivos_cargados que usa el control de re-cargas"""
+    conn.execute(text('ALTER TABLE oxigeno.archivos_cargados ADD COLUMN IF NOT EXISTS codigo_licitacion VARCHAR(100)'))
+    conn.execute(text('ALTER TABLE oxigeno.archivos_cargados ADD COLUMN IF NOT EXISTS huella_carga VARCHAR(64)'))
+    conn.execute(text(
+        'CREATE INDEX IF NOT EXISTS idx_archivos_cargados_codigo '
+        'ON oxigeno.archivos_cargados (codigo_licitacion, id DESC)'
+    ))
+
+def obtener_carga_identica(codigo_licitacion, huella):
+    """
+    Devuelve (id, fecha_carga) si la última carga activa de la licitación fue
+    exactamente esta (mismo contenido y configuración), o None.
+    """
+    try:
+        engine = safe_get_engine()
+        if engine is None:
+            return None
+        with engine.connect() as conn:
+            row = conn.execute(text("""
+                SELECT id, fecha_carga, huella_carga, estado
+                FROM oxigeno.archivos_cargados
+                WHERE codigo_licitacion = :codigo
+                ORDER BY id DESC
+                LIMIT 1
+            """), {'codigo': codigo_licitacion}).fetchone()
+        if row and row[2] == huella and row[3] == 'Activo':
+            return row[0], row[1]
+    except Exception:
+        # Sin columnas de control todavía: la carga sigue normalmente
+        pass
+    return None
+
 def cargar_archivo_con_configuracion(archivo_excel, nombre_archivo, esquema, configuracion_mapeo, limpiar_datos, validar_estructura, datos_formulario=None):
     """
     Carga archivo Excel con configuración personalizada basada en el pre-análisis
     """
     try:
-        # Leer el contenido del archivo Excel
-        archivo_excel.seek(0)
-        excel_data = pd.read_excel(archivo_excel, sheet_name=None, engine='openpyxl')
-        
-        # Filtrar solo las hojas incluidas en la configuración
-        hojas_a_procesar = {hoja: df for hoja, df in excel_data.items() 
-                          if hoja in configuracion_mapeo and configuracion_mapeo[hoja]['incluir']}
+        # Leer solo las hojas incluidas en la configuración (reutiliza el parseo del pre-análisis)
+        hojas_a_procesar = excel_stream.leer_libro(archivo_excel, hojas=[
+            hoja for hoja, config in configuracion_mapeo.items() if config['incluir']
+        ])
         
         if not hojas_a_procesar:
             return False, "No se seleccionaron hojas para procesar"
@@ -1335,13 +1475,18 @@ def cargar_archivo_con_configuracion(archivo_excel, nombre_archivo, esquema, con
             return False, f"Faltan hojas requeridas: {', '.join(hojas_faltantes)}"
         
         # Generar código de licitación único
-        # Formato: {MODALIDAD}_{NUMERO}/{AÑO} (ej: LPN_100/2023)
-        # Si el esquema ya viene en formato de código, usarlo; si no, generarlo
-        if '/' in esquema or '_' in esquema:
-            codigo_licitacion = esquema.strip().upper()
-        else:
-            # Si viene como "lpn 100/2023", convertir a "LPN_100/2023"
-            codigo_licitacion = esquema.strip().upper().replace(' ', '_')
+        codigo_licitacion = generar_codigo_licitacion(esquema)
+        
+        # Una re-subida idéntica (mismo archivo y mismo mapeo) no se recarga
+        huella = excel_stream.huella_carga(archivo_excel, {
+            'codigo_licitacion': codigo_licitacion,
+            'configuracion_mapeo': configuracion_mapeo,
+            'limpiar_datos': limpiar_datos
+        })
+        carga_previa = obtener_carga_identica(codigo_licitacion, huella)
+        if carga_previa:
+            return True, (f"ℹ️ Este archivo ya fue cargado con la misma configuración "
+                          f"(ID {carga_previa[0]}, {carga_previa[1]}); no se recargó")
         
         # Registrar actividad de carga
         registrar_actividad(
@@ -1383,18 +1528,16 @@ def cargar_archivo_con_configuracion(archivo_excel, nombre_archivo, esquema, con
             try:
                 password_escaped = quote_plus(password)
                 conn_str = f"postgresql://{user}:{password_escaped}@{host}:{port}/{dbname}?sslmode=require"
-                engine = create_engine(
+                engine = db_registry.obtener_engine(
+                    'licitaciones',
                     conn_str,
                     connect_args={
                         "client_encoding": "utf8",
                         "connect_timeout": 10,
                         "sslmode": "require"
                     },
-                    pool_pre_ping=True
+                    probar=True
                 )
-                # Probar conexión
-                with engine.connect() as test_conn:
-                    test_conn.execute(text("SELECT 1"))
             except Exception as e:
                 st.error(f"La carga de archivos Excel requiere conexión directa. Error: {e}")
                 return False, f"No se pudo establecer conexión directa: {e}"
@@ -1489,10 +1632,12 @@ def cargar_archivo_con_configuracion(archivo_excel, nombre_archivo, esquema, con
                 archivo_excel.seek(0)
                 contenido_bytes = archivo_excel.read()
                 
+                asegurar_control_cargas(conn)
                 query = text("""
                     INSERT INTO oxigeno.archivos_cargados 
-                    (nombre_archivo, esquema, usuario_id, contenido_original)
-                    VALUES (:nombre, :esquema, :usuario_id, :contenido)
+                    (nombre_archivo, esquema, usuario_id, contenido_original,
+                     codigo_licitacion, huella_carga)
+                    VALUES (:nombre, :esquema, :usuario_id, :contenido, :codigo, :huella)
                     RETURNING id
                 """)
                 
@@ -1500,7 +1645,9 @@ def cargar_archivo_con_configuracion(archivo_excel, nombre_archivo, esquema, con
                     'nombre': nombre_archivo,
                     'esquema': esquema_formateado,
                     'usuario_id': st.session_state.user_id,
-                    'contenido': contenido_bytes
+                    'contenido': contenido_bytes,
+                    'codigo': codigo_licitacion,
+                    'huella': huella
                 })
                 
                 archivo_id = result.scalar()
@@ -1569,6 +1716,17 @@ def cargar_archivo_a_postgres(archivo_excel, nombre_archivo, esquema, empresa_pa
         
         st.info(f"📊 Tamaño del archivo: {tamaño_mb:.2f} MB")
         
+        # Huella de la carga: una re-subida idéntica no se recarga
+        codigo_licitacion = generar_codigo_licitacion(esquema)
+        huella = excel_stream.huella_carga(contenido_bytes, {
+            'codigo_licitacion': codigo_licitacion,
+            'empresa': empresa_para_tablas
+        })
+        carga_previa = obtener_carga_identica(codigo_licitacion, huella)
+        if carga_previa:
+            return True, (f"ℹ️ Este archivo ya fue cargado para {codigo_licitacion} "
+                          f"(ID {carga_previa[0]}, {carga_previa[1]}); no se recargó")
+        
         # Advertencia para archivos grandes
         if tamaño_mb > 5:
             st.warning(f"⚠️ Archivo grande ({tamaño_mb:.1f} MB) - Esto puede tardar varios minutos")
@@ -1578,21 +1736,23 @@ def cargar_archivo_a_postgres(archivo_excel, nombre_archivo, esquema, empresa_pa
         # =====================================================
         # PASO 2: LEER EXCEL CON FEEDBACK
         # =====================================================
-        archivo_excel.seek(0)  # Reiniciar puntero
-        
-        with st.spinner("📖 Leyendo archivo Excel..."):
-            # Leer todas las hojas del Excel
-            excel_data = pd.read_excel(archivo_excel, sheet_name=None, engine='openpyxl')
+        # Si un intento anterior falló en la base de datos, las hojas ya
+        # parseadas se toman de la caché Parquet
+        hojas_requeridas = ['llamado', 'ejecucion_general', 'orden_de_compra']
+        excel_data = excel_stream.leer_parquet(huella)
+        if excel_data is None:
+            with st.spinner("📖 Leyendo archivo Excel..."):
+                # Solo se parsean las hojas que se cargan
+                excel_data = excel_stream.leer_libro(contenido_bytes, hojas=hojas_requeridas)
+            if all(hoja in excel_data for hoja in hojas_requeridas):
+                excel_stream.guardar_parquet(huella, excel_data)
         
         st.success("✅ Archivo Excel leído correctamente")
         
-        # Verificar que existan las hojas necesarias
-        hojas_requeridas = ['llamado', 'ejecucion_general', 'orden_de_compra']
-        hojas_encontradas = list(excel_data.keys())
-        
         # Validar hojas
         for hoja in hojas_requeridas:
-            if hoja not in hojas_encontradas:
+            if hoja not in excel_data:
+                hojas_encontradas = excel_stream.nombres_hojas(contenido_bytes)
                 return False, f"Error: Falta la hoja '{hoja}' en el archivo Excel. Hojas encontradas: {hojas_encontradas}"
         
         # Mostrar información de las hojas
@@ -1636,18 +1796,16 @@ def cargar_archivo_a_postgres(archivo_excel, nombre_archivo, esquema, empresa_pa
             try:
                 password_escaped = quote_plus(password)
                 conn_str = f"postgresql://{user}:{password_escaped}@{host}:{port}/{dbname}?sslmode=require"
-                engine = create_engine(
+                engine = db_registry.obtener_engine(
+                    'licitaciones',
                     conn_str,
                     connect_args={
                         "client_encoding": "utf8",
                         "connect_timeout": 10,
                         "sslmode": "require"
                     },
-                    pool_pre_ping=True
+                    probar=True
                 )
-                # Probar conexión
-                with engine.connect() as test_conn:
-                    test_conn.execute(text("SELECT 1"))
             except Exception as e:
                 st.error(f"La carga de archivos Excel requiere conexión directa. Error: {e}")
                 return False, f"No se pudo establecer conexión directa: {e}"
@@ -1694,10 +1852,11 @@ def cargar_archivo_a_postgres(archivo_excel, nombre_archivo, esquema, empresa_pa
                 
                 # 5. Guardar registro del archivo en la tabla de control (95%)
                 status_text.text("💾 Guardando registro del archivo...")
+                asegurar_control_cargas(conn)
                 query = text("""
                     INSERT INTO oxigeno.archivos_cargados 
-                    (nombre_archivo, esquema, codigo_licitacion, usuario_id)
-                    VALUES (:nombre, :esquema, :codigo, :usuario_id)
+                    (nombre_archivo, esquema, codigo_licitacion, usuario_id, huella_carga)
+                    VALUES (:nombre, :esquema, :codigo, :usuario_id, :huella)
                     RETURNING id
                 """)
                 
@@ -1705,7 +1864,8 @@ def cargar_archivo_a_postgres(archivo_excel, nombre_archivo, esquema, empresa_pa
                     'nombre': nombre_archivo,
                     'esquema': 'oxigeno',  # Siempre oxigeno ahora
                     'codigo': codigo_licitacion,
-                    'usuario_id': st.session_state.user_id
+                    'usuario_id': st.session_state.user_id,
+                    'huella': huella
                 })
                 
                 archivo_id = result.scalar()
@@ -1715,6 +1875,8 @@ def cargar_archivo_a_postgres(archivo_excel, nombre_archivo, esquema, empresa_pa
                 status_text.text("✅ Confirmando cambios...")
                 trans.commit()
                 progress_bar.progress(1.0)
+                excel_stream.descartar_parquet(huella)
+                excel_stream.liberar_cache(contenido_bytes)
                 
                 # Limpiar elementos de progreso
                 time.sleep(0.5)
@@ -1944,7 +2106,6 @@ def crear_tabla_ejecucion_general(conn, esquema, df, codigo_licitacion):
         df_clean.to_sql('ejecucion_general', conn, schema=esquema, 
                         if_exists='append', index=False, method=None)
 
-
 def crear_tabla_orden_compra(conn, esquema, df, codigo_licitacion):
     """Crea la tabla orden_de_compra con su estructura específica
     OPTIMIZADO: Carga en chunks para no congelar el navegador
@@ -1984,6 +2145,12 @@ def crear_tabla_orden_compra(conn, esquema, df, codigo_licitacion):
     '''
     conn.execute(text(create_sql))
     
+    # Índices del listado paginado y del detalle de órdenes
+    try:
+        asegurar_indices_orden_compra(conn, esquema)
+    except:
+        pass  # Si el índice ya existe, continuar
+    
     # NORMALIZAR nombres de columnas
     df_clean = df.copy()
     
@@ -2095,7 +2262,9 @@ def crear_tabla_orden_compra(conn, esquema, df, codigo_licitacion):
         chunk.to_sql('orden_de_compra', conn, schema=esquema, if_exists='append', index=False, method=None)
     
     progress_container.empty()
-
+    
+    # Las órdenes cargadas pueden superar al contador de numeración
+    reiniciar_contador(conn, 'orden_compra', codigo_licitacion)
 
 def obtener_archivos_cargados():
     """Obtiene la lista de archivos cargados con su estado actual - SOLO ACTIVOS Y ÚNICOS"""
@@ -2117,7 +2286,7 @@ def obtener_archivos_cargados():
                        ac.id, ac.nombre_archivo, ac.esquema, ac.fecha_carga, 
                        u.username as usuario, ac.estado
                 FROM oxigeno.archivos_cargados ac
-                JOIN oxigeno.usuarios u ON ac.usuario_id = u.id
+                JOIN public.usuarios u ON ac.usuario_id = u.id
                 WHERE ac.estado = 'Activo'
                 ORDER BY ac.esquema, ac.fecha_carga DESC
             """)
@@ -2169,18 +2338,16 @@ def eliminar_esquema_postgres(esquema):
             try:
                 password_escaped = quote_plus(password)
                 conn_str = f"postgresql://{user}:{password_escaped}@{host}:{port}/{dbname}?sslmode=require"
-                engine = create_engine(
+                engine = db_registry.obtener_engine(
+                    'licitaciones',
                     conn_str,
                     connect_args={
                         "client_encoding": "utf8",
                         "connect_timeout": 10,
                         "sslmode": "require"
                     },
-                    pool_pre_ping=True
+                    probar=True
                 )
-                # Probar conexión
-                with engine.connect() as test_conn:
-                    test_conn.execute(text("SELECT 1"))
             except Exception as e:
                 st.warning(f"⚠️ La eliminación de esquemas requiere conexión directa a Supabase. Error: {e}")
                 st.info("💡 Para eliminar esquemas, necesitas configurar la conexión directa en secrets (db_config).")
@@ -2432,18 +2599,18 @@ def obtener_proveedores():
                     
                     if extension in ['xlsx', 'xls']:
                         # Análisis para archivos Excel
-                        xls = pd.ExcelFile(archivo)
+                        hojas_libro = excel_stream.nombres_hojas(archivo)
                         
                         st.write(f"**📁 Archivo:** {archivo.name}")
                         st.write(f"**📄 Tipo:** Excel ({extension.upper()})")
-                        st.write(f"**📋 Hojas encontradas:** {len(xls.sheet_names)}")
+                        st.write(f"**📋 Hojas encontradas:** {len(list(hojas_libro))}")
                         
                         # Mostrar hojas disponibles
                         col1, col2 = st.columns(2)
                         
                         with col1:
                             st.write("**Hojas en el archivo:**")
-                            for i, sheet in enumerate(xls.sheet_names, 1):
+                            for i, sheet in enumerate(list(hojas_libro), 1):
                                 st.write(f"{i}. {sheet}")
                         
                         with col2:
@@ -2453,7 +2620,7 @@ def obtener_proveedores():
                             found_sheets = []
                             
                             for req_sheet in required_sheets:
-                                found = any(req_sheet.lower() == sheet.lower() for sheet in xls.sheet_names)
+                                found = any(req_sheet.lower() == sheet.lower() for sheet in list(hojas_libro))
                                 if found:
                                     found_sheets.append(req_sheet)
                                 else:
@@ -2468,12 +2635,13 @@ def obtener_proveedores():
                         # Análisis detallado de cada hoja
                         hoja_analisis = st.selectbox(
                             "Seleccionar hoja para análisis detallado:",
-                            options=xls.sheet_names
+                            options=list(hojas_libro)
                         )
                         
                         if hoja_analisis:
-                            # Leer una muestra de la hoja seleccionada
-                            df_sample = pd.read_excel(xls, sheet_name=hoja_analisis, nrows=10)
+                            # Leer solo la hoja seleccionada
+                            hoja_seleccionada = excel_stream.leer_libro(archivo, hojas=[hoja_analisis])[hoja_analisis]
+                            df_sample = hoja_seleccionada.head(10)
                             
                             st.write(f"**📊 Análisis de la hoja '{hoja_analisis}':**")
                             
@@ -2484,7 +2652,7 @@ def obtener_proveedores():
                             with col2:
                                 # Leer toda la hoja para contar filas (puede ser lento para archivos grandes)
                                 try:
-                                    df_full = pd.read_excel(xls, sheet_name=hoja_analisis)
+                                    df_full = hoja_seleccionada
                                     st.metric("Total Filas", len(df_full))
                                 except:
                                     st.metric("Total Filas", "Error al contar")
@@ -2951,18 +3119,18 @@ def pagina_cargar_archivo():
                         
                         else:
                             # Análisis básico si falla el pre-análisis completo
-                            xls = pd.ExcelFile(archivo)
+                            hojas_libro = excel_stream.nombres_hojas(archivo)
                             
                             st.write(f"**📄 Archivo:** {archivo.name}")
                             st.write(f"**📁 Tipo:** Excel ({extension.upper()})")
-                            st.write(f"**📋 Hojas encontradas:** {len(xls.sheet_names)}")
+                            st.write(f"**📋 Hojas encontradas:** {len(list(hojas_libro))}")
                             
                             # Mostrar hojas disponibles
                             col1, col2 = st.columns(2)
                             
                             with col1:
                                 st.write("**Hojas en el archivo:**")
-                                for i, sheet in enumerate(xls.sheet_names, 1):
+                                for i, sheet in enumerate(list(hojas_libro), 1):
                                     st.write(f"{i}. {sheet}")
                             
                             with col2:
@@ -2972,7 +3140,7 @@ def pagina_cargar_archivo():
                                 found_sheets = []
                                 
                                 for req_sheet in required_sheets:
-                                    found = any(req_sheet.lower() == sheet.lower() for sheet in xls.sheet_names)
+                                    found = any(req_sheet.lower() == sheet.lower() for sheet in list(hojas_libro))
                                     if found:
                                         found_sheets.append(req_sheet)
                                     else:
@@ -2987,13 +3155,14 @@ def pagina_cargar_archivo():
                             # Análisis detallado de cada hoja
                             hoja_analisis = st.selectbox(
                                 "Seleccionar hoja para análisis detallado:",
-                                options=xls.sheet_names,
+                                options=list(hojas_libro),
                                 key="hoja_analisis_select"
                             )
                             
                             if hoja_analisis:
-                                # Leer una muestra de la hoja seleccionada
-                                df_sample = pd.read_excel(xls, sheet_name=hoja_analisis, nrows=10)
+                                # Leer solo la hoja seleccionada
+                                hoja_seleccionada = excel_stream.leer_libro(archivo, hojas=[hoja_analisis])[hoja_analisis]
+                                df_sample = hoja_seleccionada.head(10)
                                 
                                 st.write(f"**📊 Análisis de la hoja '{hoja_analisis}':**")
                                 
@@ -3004,7 +3173,7 @@ def pagina_cargar_archivo():
                                 with col2:
                                     # Leer toda la hoja para contar filas
                                     try:
-                                        df_full = pd.read_excel(xls, sheet_name=hoja_analisis)
+                                        df_full = hoja_seleccionada
                                         st.metric("Total Filas", len(df_full))
                                     except:
                                         st.metric("Total Filas", "Error al contar")
@@ -3299,29 +3468,248 @@ def pagina_eliminar_esquemas():
     else:
         st.info("No hay licitaciones para eliminar.")
 
-def pagina_gestionar_proveedores():
-    """Página para gestionar proveedores"""
-    st.header("Gestión de Proveedores")
-    if 'last_page' not in st.session_state:
-        st.session_state.last_page = None
-    
-    # Pestañas para diferentes funciones
-    tab1, tab2, tab3 = st.tabs(["Lista de Proveedores", "Nuevo Proveedor", "Importar CSV"])
-    
-    with tab1:
-        st.subheader("Proveedores Registrados")
-        
-        # Filtros
-        col1, col2, col3 = st.columns(3)
-        with col1:
-            filtro_ruc = st.text_input("🔍 Filtrar por RUC:", placeholder="Ej: 80026564")
-        with col2:
-            filtro_nombre = st.text_input("🔍 Filtrar por Razón Social:", placeholder="Ej: CHACO")
-        with col3:
-            mostrar_inactivos = st.checkbox("Mostrar inactivos", value=False)
-        
-        # Obtener proveedores con filtros
-        try:
+# Importación masiva de proveedores
+LOTE_PROVEEDORES = 1000
+_RUC_VALIDO = r'^[0-9A-Z]+(?:-[0-9A-Z]+)?$'
+
+def normalizar_proveedores_csv(df, col_ruc, col_razon, col_direccion=None, col_correo=None):
+    """
+    Valida y normaliza un DataFrame de proveedores con operaciones vectorizadas.
+
+    El RUC se pasa a mayúsculas y se le quitan espacios y puntos
+    ('80.026.564-5' -> '80026564-5'); la razón social se recorta y se colapsan
+    los espacios. Un RUC repetido dentro del archivo se importa una sola vez
+    (primera aparición).
+
+    Args:
+        df: DataFrame leído del CSV
+        col_ruc, col_razon: Columnas de RUC y razón social
+        col_direccion, col_correo: Columnas opcionales (None = no mapear)
+
+    Returns:
+        tuple: (DataFrame válido con ruc, razon_social, direccion, correo_electronico, fila;
+                DataFrame de rechazos con fila, ruc, razon_social, motivo)
+    """
+    def _texto(columna):
+        # Un RUC numérico con alguna celda vacía llega como float (80026564.0):
+        # sin el '.0' antes de quitar puntos quedaría '800265640'
+        serie = df[columna].map(
+            lambda v: format(v, '.0f') if isinstance(v, float) and v.is_integer() else v
+        )
+        serie = serie.astype('string').str.strip()
+        return serie.mask(serie.str.lower().isin(['', 'nan', 'none', 'null']))
+
+    datos = pd.DataFrame({
+        'fila': df.index.to_series().astype(int) + 1,
+        'ruc': _texto(col_ruc).str.upper().str.replace(r'[\s.]', '', regex=True),
+        'razon_social': _texto(col_razon).str.replace(r'\s+', ' ', regex=True),
+        'direccion': _texto(col_direccion) if col_direccion else pd.NA,
+        'correo_electronico': _texto(col_correo).str.lower() if col_correo else pd.NA,
+    })
+
+    motivo = pd.Series(pd.NA, index=datos.index, dtype='string')
+    reglas = [
+        (datos['ruc'].isna(), "RUC vacío"),
+        (~datos['ruc'].fillna('').str.match(_RUC_VALIDO), "RUC con formato inválido"),
+        (datos['ruc'].str.len() > 50, "RUC de más de 50 caracteres"),
+        (datos['razon_social'].isna(), "Razón Social vacía"),
+        (datos['razon_social'].str.len() > 200, "Razón Social de más de 200 caracteres"),
+        (datos['correo_electronico'].str.len() > 100, "Correo de más de 100 caracteres"),
+    ]
+    # El primer motivo que aplique es el que se informa
+    for condicion, descripcion in reversed(reglas):
+        motivo = motivo.mask(condicion.fillna(False).astype(bool), descripcion)
+
+    invalidos = motivo.notna()
+    duplicados = ~invalidos & datos['ruc'].duplicated(keep='first')
+    motivo = motivo.mask(duplicados, "RUC repetido en el archivo")
+
+    rechazos = datos.loc[motivo.notna(), ['fila', 'ruc', 'razon_social']].assign(motivo=motivo[motivo.notna()])
+    validos = datos.loc[motivo.isna()]
+    validos = validos.astype(object).where(validos.notna(), None)
+    return validos, rechazos.reset_index(drop=True)
+
+def _insertar_lote_proveedores(conn, lote, actualizar):
+    """INSERT ... ON CONFLICT (ruc) de un lote completo; devuelve {ruc: True si fue insertado}"""
+    conflicto = """
+        DO UPDATE SET
+            razon_social = EXCLUDED.razon_social,
+            direccion = COALESCE(EXCLUDED.direccion, proveedores.direccion),
+            correo_electronico = COALESCE(EXCLUDED.correo_electronico, proveedores.correo_electronico),
+            fecha_actualizacion = CURRENT_TIMESTAMP
+    """ if actualizar else "DO NOTHING"
+    query = text(f"""
+        INSERT INTO oxigeno.proveedores AS proveedores (ruc, razon_social, direccion, correo_electronico)
+        SELECT * FROM unnest(
+            CAST(:rucs AS text[]), CAST(:razones AS text[]),
+            CAST(:direcciones AS text[]), CAST(:correos AS text[])
+        )
+        ON CONFLICT (ruc) {conflicto}
+        RETURNING ruc, (xmax = 0) AS insertado
+    """)
+    result = conn.execute(query, {
+        'rucs': lote['ruc'].tolist(),
+        'razones': lote['razon_social'].tolist(),
+        'direcciones': lote['direccion'].tolist(),
+        'correos': lote['correo_electronico'].tolist()
+    })
+    return {row[0]: bool(row[1]) for row in result}
+
+def importar_proveedores(engine, validos, actualizar=False, tamano_lote=LOTE_PROVEEDORES, progreso=None):
+    """
+    Inserta los proveedores validados con una sentencia por lote.
+
+    Si un lote falla por un error de datos, las filas con error se aíslan por
+    bisección con SAVEPOINTs (biseccion.py, igual que los importadores de SICIAP)
+    sin perder el resto; un error de esquema, permisos o conexión aborta la
+    importación.
+
+    Args:
+        engine: Engine directo de PostgreSQL
+        validos: DataFrame devuelto por normalizar_proveedores_csv
+        actualizar: Si True, un RUC existente actualiza sus datos; si no, se omite
+        tamano_lote: Filas por sentencia
+        progreso: Callback opcional progreso(filas_procesadas, total)
+
+    Returns:
+        dict: insertados, actualizados, duplicados y DataFrame 'errores' (fila, ruc, razon_social, motivo)
+    """
+    insertados = actualizados = duplicados = 0
+    errores = []
+    total = len(validos)
+
+    for inicio in range(0, total, tamano_lote):
+        jobs.verificar_cancelacion()
+        lote = validos.iloc[inicio:inicio + tamano_lote]
+        errores_previos = len(errores)
+        resultado = {}
+        rechazos = []
+        with engine.begin() as conn:
+            def insertar(etiquetas):
+                resultado.update(_insertar_lote_proveedores(conn, lote.loc[etiquetas], actualizar))
+
+            etiquetas = lote.index.tolist()
+            biseccion.insertar_con_biseccion(
+                insertar, etiquetas, etiquetas, rechazos,
+                savepoint=lambda nivel: conn.begin_nested()
+            )
+        if rechazos:
+            print(f"⚠️ Lote de proveedores {inicio + 1}-{inicio + len(lote)}: {len(rechazos)} filas con error aisladas")
+        for etiqueta, motivo in rechazos:
+            fila = lote.loc[etiqueta]
+            errores.append({
+                'fila': fila['fila'], 'ruc': fila['ruc'],
+                'razon_social': fila['razon_social'], 'motivo': motivo
+            })
+
+        nuevos = sum(resultado.values())
+        insertados += nuevos
+        if actualizar:
+            actualizados += len(resultado) - nuevos
+        else:
+            duplicados += len(lote) - len(resultado) - (len(errores) - errores_previos)
+        if progreso:
+            progreso(min(inicio + tamano_lote, total), total)
+
+    return {
+        'insertados': insertados,
+        'actualizados': actualizados,
+        'duplicados': duplicados,
+        'errores': pd.DataFrame(errores, columns=['fila', 'ruc', 'razon_social', 'motivo'])
+    }
+
+def importar_proveedores_trabajo(engine, validos, rechazos, actualizar, usuario_id, usuario_nombre):
+    """
+    Cuerpo del trabajo en segundo plano de 'Importar CSV' (oxigeno.proveedores).
+
+    Dentro del trabajo no hay sesión de Streamlit: el usuario se recibe como
+    argumento y la auditoría se encola directamente. El reporte de filas no
+    importadas queda en un CSV junto al estado de los trabajos.
+
+    Returns:
+        dict: insertados, actualizados, duplicados, errores y ruta del reporte (o None)
+    """
+    jobs.reportar_progreso(filas=0, total=len(validos), mensaje="Importando en oxigeno.proveedores por lotes")
+    resultado = importar_proveedores(
+        engine, validos,
+        actualizar=actualizar,
+        progreso=lambda procesadas, total: jobs.reportar_progreso(filas=procesadas)
+    )
+
+    repetidos = rechazos['motivo'].eq("RUC repetido en el archivo")
+    duplicados = resultado['duplicados'] + int(repetidos.sum())
+    errores_df = pd.concat([rechazos[~repetidos], resultado['errores']], ignore_index=True)
+    reporte = pd.concat([errores_df, rechazos[repetidos]], ignore_index=True).sort_values('fila')
+
+    ruta_reporte = None
+    if not reporte.empty:
+        trabajo = jobs.trabajo_actual()
+        os.makedirs(jobs.JOBS_DIR, exist_ok=True)
+        ruta_reporte = os.path.join(
+            jobs.JOBS_DIR, f"errores_proveedores_{trabajo.id if trabajo else int(time.time())}.csv"
+        )
+        reporte.to_csv(ruta_reporte, index=False, encoding='utf-8-sig')
+
+    resumen = {
+        'insertados': resultado['insertados'],
+        'actualizados': resultado['actualizados'],
+        'duplicados': duplicados,
+        'errores': len(errores_df),
+        'filas_no_importadas': len(reporte),
+        'reporte': ruta_reporte
+    }
+    if resumen['insertados'] > 0 or resumen['actualizados'] > 0:
+        auditoria.registrar({
+            'usuario_id': usuario_id,
+            'usuario_nombre': usuario_nombre,
+            'accion': "IMPORT",
+            'modulo': "PROVEEDORES",
+            'descripcion': (
+                f"Importación CSV: {resumen['insertados']} insertados, {resumen['actualizados']} actualizados, "
+                f"{duplicados} duplicados, {resumen['errores']} errores"
+            )
+        }, obtener_engine=safe_get_engine)
+    return resumen
+
+def mostrar_reportes_proveedores():
+    """Descarga del reporte de filas no importadas de las últimas importaciones de proveedores"""
+    for trabajo in jobs.listar(app='licitaciones', usuario=st.session_state.get('username'))[:5]:
+        resultado = trabajo.resultado if isinstance(trabajo.resultado, dict) else {}
+        ruta = resultado.get('reporte')
+        if trabajo.estado != 'completado' or not ruta or not os.path.exists(ruta):
+            continue
+        with open(ruta, 'rb') as f:
+            st.download_button(
+                label=f"📥 Reporte de errores: {trabajo.nombre} ({resultado['filas_no_importadas']:,} filas)",
+                data=f.read(),
+                file_name=os.path.basename(ruta),
+                mime="text/csv",
+                key=f"reporte_proveedores_{trabajo.id}"
+            )
+
+def pagina_gestionar_proveedores():
+    """Página para gestionar proveedores"""
+    st.header("Gestión de Proveedores")
+    if 'last_page' not in st.session_state:
+        st.session_state.last_page = None
+    
+    # Pestañas para diferentes funciones
+    tab1, tab2, tab3 = st.tabs(["Lista de Proveedores", "Nuevo Proveedor", "Importar CSV"])
+    
+    with tab1:
+        st.subheader("Proveedores Registrados")
+        
+        # Filtros
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            filtro_ruc = st.text_input("🔍 Filtrar por RUC:", placeholder="Ej: 80026564")
+        with col2:
+            filtro_nombre = st.text_input("🔍 Filtrar por Razón Social:", placeholder="Ej: CHACO")
+        with col3:
+            mostrar_inactivos = st.checkbox("Mostrar inactivos", value=False)
+        
+        # Obtener proveedores con filtros
+        try:
             api_config = get_supabase_api_config()
             engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
             if engine is None:
@@ -3777,6 +4165,7 @@ def pagina_gestionar_proveedores():
                                         archivo, 
                                         delimiter=delimiter,
                                         encoding=encoding,
+                                        dtype=str,  # RUC y demás como texto, sin pasar por float
                                         quotechar='"',
                                         skipinitialspace=True,
                                         on_bad_lines='skip',
@@ -3900,92 +4289,43 @@ def pagina_gestionar_proveedores():
                     help="Esta acción insertará todos los registros válidos en la base de datos"
                 )
                 
+                modo_existentes = st.radio(
+                    "Si el RUC ya existe en la base:",
+                    ["Omitir (no modificar)", "Actualizar razón social, dirección y correo"],
+                    horizontal=True
+                )
+                
                 # Importación
                 if confirmar_importacion:
                     if st.button("🚀 Importar Proveedores", type="primary"):
                         try:
-                            insertados = 0
-                            duplicados = 0
-                            errores = 0
-                            errores_detalle = []
-                            
-                            progress_bar = st.progress(0)
-                            status_text = st.empty()
-                            
-                            total_filas = len(df)
-                            
-                            for index, row in df.iterrows():
-                                try:
-                                    progress = (index + 1) / total_filas
-                                    progress_bar.progress(progress)
-                                    status_text.text(f'Procesando fila {index + 1} de {total_filas}...')
-                                    
-                                    ruc = str(row[col_ruc]).strip()
-                                    razon_social = str(row[col_razon]).strip()
-                                    direccion = str(row[col_direccion]).strip() if col_direccion != "No mapear" and pd.notna(row[col_direccion]) else None
-                                    correo = str(row[col_correo]).strip() if col_correo != "No mapear" and pd.notna(row[col_correo]) else None
-                                    
-                                    if not ruc or not razon_social or ruc.lower() == "nan" or razon_social.lower() == "nan":
-                                        errores += 1
-                                        errores_detalle.append(f"Fila {index + 1}: RUC o Razón Social vacíos")
-                                        continue
-                                    
-                                    engine = safe_get_engine()
-                                    if engine is None:
-                                        st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-                                        return
-                                    with engine.connect() as conn:
-                                        trans = conn.begin()
-                                        try:
-                                            query = text("""
-                                                INSERT INTO oxigeno.proveedores (ruc, razon_social, direccion, correo_electronico)
-                                                VALUES (:ruc, :razon_social, :direccion, :correo)
-                                                ON CONFLICT (ruc) DO NOTHING
-                                                RETURNING id
-                                            """)
-                                            
-                                            result = conn.execute(query, {
-                                                'ruc': ruc,
-                                                'razon_social': razon_social,
-                                                'direccion': direccion,
-                                                'correo': correo
-                                            })
-                                            
-                                            if result.rowcount > 0:
-                                                trans.commit()
-                                                insertados += 1
-                                            else:
-                                                trans.rollback()
-                                                duplicados += 1
-                                                errores_detalle.append(f"Fila {index + 1}: RUC {ruc} ya existe")
-                                            
-                                        except Exception as e:
-                                            trans.rollback()
-                                            errores += 1
-                                            errores_detalle.append(f"Fila {index + 1}: Error - {str(e)}")
-                                
-                                except Exception as e:
-                                    errores += 1
-                                    errores_detalle.append(f"Fila {index + 1}: Error general - {str(e)}")
-                            
-                            progress_bar.empty()
-                            status_text.empty()
-                            
-                            col1, col2, col3 = st.columns(3)
-                            with col1:
-                                st.metric("✅ Insertados", insertados)
-                            with col2:
-                                st.metric("⚠️ Duplicados", duplicados)
-                            with col3:
-                                st.metric("❌ Errores", errores)
+                            engine = safe_get_engine()
+                            if engine is None:
+                                st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
+                                return
                             
-                            if insertados > 0:
-                                st.success(f"✅ Importación completada: {insertados} nuevos registros")
-                                registrar_actividad(
-                                    accion="IMPORT",
-                                    modulo="PROVEEDORES",
-                                    descripcion=f"Importación CSV: {insertados} insertados, {duplicados} duplicados, {errores} errores"
-                                )
+                            # Validación, normalización y deduplicación vectorizadas
+                            validos, rechazos = normalizar_proveedores_csv(
+                                df, col_ruc, col_razon,
+                                col_direccion if col_direccion != "No mapear" else None,
+                                col_correo if col_correo != "No mapear" else None
+                            )
+                            # La inserción corre en segundo plano: el usuario puede navegar
+                            # y volver a ver el resultado aquí o en '🧵 Trabajos'
+                            id_trabajo = jobs.enviar(
+                                f"Importar proveedores: {len(validos):,} filas válidas",
+                                importar_proveedores_trabajo,
+                                engine, validos, rechazos,
+                                modo_existentes.startswith("Actualizar"),
+                                st.session_state.get('user_id'), st.session_state.get('user_name'),
+                                app='licitaciones',
+                                usuario=st.session_state.get('username'),
+                                filas_totales=len(validos)
+                            )
+                            st.success(
+                                f"🧵 Importación enviada en segundo plano (trabajo {id_trabajo}). "
+                                "Insertados, actualizados, duplicados y errores se ven abajo."
+                            )
                             
                             if 'df_importar' in st.session_state:
                                 del st.session_state.df_importar
@@ -3994,6 +4334,11 @@ def pagina_gestionar_proveedores():
                                 
                         except Exception as e:
                             st.error(f"Error durante la importación: {e}")
+        
+        # Estado de las importaciones en segundo plano (también tras navegar y volver)
+        with st.expander("🧵 Importaciones en segundo plano", expanded=True):
+            jobs.mostrar_trabajos(app='licitaciones', usuario=jobs.usuario_de_sesion(), limite=5, clave="proveedores_trabajos")
+            mostrar_reportes_proveedores()
 
 def eliminar_proveedor_bulk():
     """Función para eliminar múltiples proveedores (admin only)"""
@@ -4427,9 +4772,9 @@ def pagina_historial_actividades():
         
         with col1:
             try:
-                engine = get_engine()
+                engine = safe_get_engine()
                 if engine is None:
-                    st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
+                    st.warning("⚠️ El historial de actividades requiere conexión directa a la base de datos.")
                     return
                 with engine.connect() as conn:
                     query = text("SELECT id, username, nombre_completo FROM public.usuarios ORDER BY username")
@@ -4466,22 +4811,46 @@ def pagina_historial_actividades():
         with col5:
             fecha_hasta = st.date_input("Fecha hasta:", value=None)
         with col6:
-            limite = st.number_input("Máximo registros:", min_value=10, max_value=1000, value=100, step=10)
+            limite = st.number_input("Registros por página:", min_value=10, max_value=HISTORIAL_POR_PAGINA_MAX, value=100, step=10)
     
     if st.button("🔍 Aplicar Filtros"):
         st.rerun()
     
-    actividades = obtener_historial_actividades(
-        limite=limite,
-        usuario_id=usuario_filtro,
-        modulo=modulo_filtro,
-        accion=accion_filtro,
-        fecha_desde=fecha_desde,
-        fecha_hasta=fecha_hasta
-    )
+    filtros = {
+        'usuario_id': usuario_filtro,
+        'modulo': modulo_filtro,
+        'accion': accion_filtro,
+        'fecha_desde': fecha_desde,
+        'fecha_hasta': fecha_hasta
+    }
+    
+    # Paginación por clave (fecha_hora, id): se guarda el cursor de inicio de
+    # cada página visitada y se reinicia cuando cambian los filtros
+    firma_filtros = (usuario_filtro, modulo_filtro, accion_filtro, fecha_desde, fecha_hasta, limite)
+    if st.session_state.get('historial_filtros') != firma_filtros:
+        st.session_state.historial_filtros = firma_filtros
+        st.session_state.historial_cursores = [None]
+        _descartar_historial_csv()
+    cursores = st.session_state.historial_cursores
+    
+    actividades = obtener_historial_actividades(limite=limite + 1, despues_de=cursores[-1], **filtros)
+    hay_siguiente = len(actividades) > limite
+    actividades = actividades[:limite]
     
     if actividades:
-        st.subheader(f"📊 Mostrando {len(actividades)} actividades")
+        col_total, col_anterior, col_siguiente = st.columns([3, 1, 1])
+        with col_total:
+            st.subheader(f"📊 Página {len(cursores)}: {len(actividades)} actividades")
+        with col_anterior:
+            if st.button("⬅️ Anterior", key="historial_pagina_anterior",
+                         disabled=len(cursores) == 1, use_container_width=True):
+                cursores.pop()
+                st.rerun()
+        with col_siguiente:
+            if st.button("Siguiente ➡️", key="historial_pagina_siguiente",
+                         disabled=not hay_siguiente, use_container_width=True):
+                cursores.append(actividades[-1]['cursor'])
+                st.rerun()
         
         df_actividades = pd.DataFrame(actividades)
         df_actividades['fecha_hora'] = pd.to_datetime(df_actividades['fecha_hora']).dt.strftime('%Y-%m-%d %H:%M:%S')
@@ -4554,23 +4923,51 @@ def pagina_historial_actividades():
                         st.json(actividad['valores_nuevos'])
         
         st.subheader("📤 Exportar Historial")
-        if st.button("Descargar Historial como CSV"):
-            csv = df_display.to_csv(index=False)
-            st.download_button(
-                label="📥 Descargar CSV",
-                data=csv.encode('utf-8'),
-                file_name=f"historial_actividades_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                mime="text/csv"
-            )
+        st.caption("Exporta todas las actividades que cumplen los filtros, no solo la página actual.")
+        historial_csv = st.session_state.get('historial_csv')
+        if historial_csv and not os.path.exists(historial_csv['ruta']):
+            _descartar_historial_csv()
+        if st.button("Generar CSV del Historial"):
+            _descartar_historial_csv()
+            with st.spinner("Exportando historial..."):
+                os.makedirs(HISTORIAL_CSV_DIR, exist_ok=True)
+                _podar_historial_csv()
+                # Los bloques se escriben a disco a medida que llegan del cursor
+                with tempfile.NamedTemporaryFile(dir=HISTORIAL_CSV_DIR, suffix='.csv', delete=False) as destino:
+                    try:
+                        for bloque in exportar_historial_csv(**filtros):
+                            destino.write(bloque)
+                        exportado = True
+                    except Exception as e:
+                        exportado = False
+                        st.error(f"Error exportando historial: {e}")
+                if exportado:
+                    st.session_state.historial_csv = {
+                        'ruta': destino.name,
+                        'nombre': f"historial_actividades_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+                    }
+                else:
+                    os.remove(destino.name)
+        historial_csv = st.session_state.get('historial_csv')
+        if historial_csv:
+            # El contenido se lee del disco solo para servirlo; al descargarlo se borra
+            with open(historial_csv['ruta'], 'rb') as f:
+                st.download_button(
+                    label="📥 Descargar CSV",
+                    data=f.read(),
+                    file_name=historial_csv['nombre'],
+                    mime="text/csv",
+                    on_click=_descartar_historial_csv
+                )
     else:
         st.info("No se encontraron actividades con los filtros aplicados.")
     
     # Estadísticas del sistema
     with st.expander("📊 Estadísticas del Sistema"):
         try:
-            engine = get_engine()
+            engine = safe_get_engine()
             if engine is None:
-                st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
+                st.warning("⚠️ Las estadísticas requieren conexión directa a la base de datos.")
                 return
             with engine.connect() as conn:
                 # Actividades por usuario
@@ -4877,193 +5274,491 @@ def obtener_servicios_beneficiarios(esquema):
         st.error(f"Error obteniendo servicios beneficiarios: {e}")
         return []
 
+# =============================================================================
+# NUMERACIÓN CORRELATIVA (órdenes de compra y actas de recepción)
+# =============================================================================
+
+# Último número entregado por ámbito y clave: (orden_compra, codigo_licitacion)
+# y (acta_recepcion, año). Antes cada pantalla buscaba el máximo recorriendo la
+# tabla completa y dos usuarios podían recibir el mismo número.
+TABLA_CONTADORES = "oxigeno.contadores"
+
+# Valor inicial de cada contador: el mayor número ya emitido para esa clave.
+# Se calcula una sola vez, cuando el contador todavía no existe
+SEMILLAS_CONTADORES = {
+    'orden_compra': """
+        SELECT COALESCE(MAX(CAST(NULLIF(
+            REGEXP_REPLACE(split_part("NUMERO_ORDEN_DE_COMPRA", '/', 1), '[^0-9]', '', 'g'), ''
+        ) AS BIGINT)), 0)
+        FROM oxigeno.orden_de_compra
+        WHERE codigo_licitacion = CAST(:clave AS TEXT)
+    """,
+    'acta_recepcion': """
+        SELECT COALESCE(MAX(CAST(NULLIF(
+            REGEXP_REPLACE(split_part(numero_acta, '/', 1), '[^0-9]', '', 'g'), ''
+        ) AS BIGINT)), 0)
+        FROM public.actas_recepcion
+        WHERE anio = CAST(CAST(:clave AS TEXT) AS INTEGER)
+    """,
+}
+
+def _sembrar_contador(conn, ambito, clave):
+    """Crea el contador de una clave con el mayor número ya emitido (si no existe)"""
+    conn.execute(text(f"""
+        INSERT INTO {TABLA_CONTADORES} (ambito, clave, ultimo)
+        SELECT :ambito, CAST(:clave AS TEXT), ({SEMILLAS_CONTADORES[ambito]})
+        ON CONFLICT (ambito, clave) DO NOTHING
+    """), {'ambito': ambito, 'clave': clave})
+
+def siguiente_numero(conn, ambito, clave):
+    """Número que se entregaría ahora (solo para sugerirlo; no lo reserva)"""
+    query = text(f"SELECT ultimo FROM {TABLA_CONTADORES} WHERE ambito = :ambito AND clave = :clave")
+    params = {'ambito': ambito, 'clave': clave}
+    ultimo = conn.execute(query, params).scalar()
+    if ultimo is None:
+        _sembrar_contador(conn, ambito, clave)
+        ultimo = conn.execute(query, params).scalar()
+    return int(ultimo) + 1
+
+def reservar_numero(conn, ambito, clave, solicitado=None):
+    """
+    Entrega el próximo número de un contador con un único UPDATE ... RETURNING:
+    la fila queda bloqueada hasta el fin de la transacción, así dos usuarios
+    nunca reciben el mismo número.
+
+    Args:
+        conn: Conexión dentro de una transacción
+        ambito: 'orden_compra' o 'acta_recepcion'
+        clave: codigo_licitacion o año (texto)
+        solicitado: Número pedido por el usuario; si es mayor que el siguiente
+            se salta hasta él, si ya fue entregado se asigna el siguiente libre
+
+    Returns:
+        int: Número asignado
+    """
+    query = text(f"""
+        UPDATE {TABLA_CONTADORES}
+        SET ultimo = GREATEST(ultimo + 1, :solicitado),
+            actualizado = CURRENT_TIMESTAMP
+        WHERE ambito = :ambito AND clave = :clave
+        RETURNING ultimo
+    """)
+    params = {'ambito': ambito, 'clave': clave, 'solicitado': int(solicitado or 0)}
+    numero = conn.execute(query, params).scalar()
+    if numero is None:
+        _sembrar_contador(conn, ambito, clave)
+        numero = conn.execute(query, params).scalar()
+    return int(numero)
+
+def reiniciar_contador(conn, ambito, clave):
+    """
+    Descarta un contador para que se vuelva a sembrar con los datos actuales
+    (p. ej. al recargar el Excel de una licitación con órdenes ya emitidas).
+    """
+    try:
+        with conn.begin_nested():
+            conn.execute(
+                text(f"DELETE FROM {TABLA_CONTADORES} WHERE ambito = :ambito AND clave = :clave"),
+                {'ambito': ambito, 'clave': clave}
+            )
+    except Exception as e:
+        print(f"No se pudo reiniciar el contador {ambito}/{clave}: {e}")
+
 def obtener_proximo_numero_oc(codigo_licitacion, year=None):
     """
     Obtiene el próximo número de orden de compra secuencial simple
     Formato: 1, 2, 3, ... 100, 101 (sin año, sin barras)
-    El parámetro 'year' se mantiene por compatibilidad pero no se usa
+    El parámetro 'year' se mantiene por compatibilidad pero no se usa.
+    Es solo una sugerencia: el número definitivo se reserva al emitir la orden.
     """
     try:
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
+        engine = safe_get_engine()
         if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-            return
-        with engine.connect() as conn:
-            # Buscar el número máximo actual (extrae solo dígitos)
-            query = text("""
-                SELECT MAX(
-                    CAST(
-                        REGEXP_REPLACE(COALESCE("NUMERO_ORDEN_DE_COMPRA", '0'), '[^0-9]', '', 'g') 
-                        AS INTEGER
-                    )
-                ) as max_num
-                FROM oxigeno.orden_de_compra
-                WHERE codigo_licitacion = :codigo
-                AND "NUMERO_ORDEN_DE_COMPRA" IS NOT NULL 
-                  AND "NUMERO_ORDEN_DE_COMPRA" != ''
-                  AND "NUMERO_ORDEN_DE_COMPRA" != '-'
-            """)
+            return "1"
+        with engine.begin() as conn:
+            return str(siguiente_numero(conn, 'orden_compra', codigo_licitacion))
             
-            result = conn.execute(query)
-            max_num = result.scalar()
+    except Exception as e:
+        # Si hay error, devolver "1"
+        return "1"
+
+def _bloquear_ejecucion(conn, codigo_licitacion, servicios, lotes, items):
+    """
+    Bloquea con SELECT ... FOR UPDATE las filas de oxigeno.ejecucion_general de
+    los (servicio, lote, ítem) dados, siempre en orden (LOTE, ITEM): todas las
+    escrituras sobre los saldos (emisión, modificación y anulación de órdenes)
+    toman los bloqueos en el mismo orden y no se interbloquean.
+
+    Args:
+        servicios, lotes, items: listas paralelas, una posición por línea
+
+    Returns:
+        list: filas (LOTE, ITEM, disponible, EMPRESA_ADJUDICADA, I_D, MODALIDAD, SERVICIO_BENEFICIARIO)
+    """
+    return conn.execute(text("""
+        SELECT e."LOTE", e."ITEM",
+               COALESCE(e."CANTIDAD_MAXIMA", 0) - COALESCE(e."CANTIDAD_EMITIDA", 0) AS disponible,
+               e."EMPRESA_ADJUDICADA", e."I_D", e."MODALIDAD", e."SERVICIO_BENEFICIARIO"
+        FROM oxigeno.ejecucion_general e
+        JOIN unnest(
+            CAST(:servicios AS text[]), CAST(:lotes AS numeric[]), CAST(:items AS numeric[])
+        ) AS v(servicio, lote, item)
+          ON e."SERVICIO_BENEFICIARIO" = v.servicio AND e."LOTE" = v.lote AND e."ITEM" = v.item
+        WHERE e.codigo_licitacion = :codigo
+        ORDER BY e."LOTE", e."ITEM", e.ctid
+        FOR UPDATE OF e
+    """), {
+        'servicios': servicios, 'lotes': lotes, 'items': items, 'codigo': codigo_licitacion
+    }).fetchall()
+
+def _sumar_emitido(conn, codigo_licitacion, servicios, lotes, items, cantidades):
+    """Suma cantidades (negativas para devolver saldo) a lo emitido de cada (servicio, lote, ítem), en una sola sentencia"""
+    conn.execute(text("""
+        UPDATE oxigeno.ejecucion_general e
+        SET "CANTIDAD_EMITIDA" = COALESCE(e."CANTIDAD_EMITIDA", 0) + v.cantidad,
+            "SALDO_A_EMITIR" = e."CANTIDAD_MAXIMA" - (COALESCE(e."CANTIDAD_EMITIDA", 0) + v.cantidad),
+            "PORCENTAJE_EMITIDO" = CASE
+                WHEN e."CANTIDAD_MAXIMA" > 0
+                THEN ((COALESCE(e."CANTIDAD_EMITIDA", 0) + v.cantidad) / e."CANTIDAD_MAXIMA") * 100
+                ELSE 0
+            END
+        FROM unnest(
+            CAST(:servicios AS text[]), CAST(:lotes AS numeric[]),
+            CAST(:items AS numeric[]), CAST(:cantidades AS numeric[])
+        ) AS v(servicio, lote, item, cantidad)
+        WHERE e.codigo_licitacion = :codigo
+          AND e."SERVICIO_BENEFICIARIO" = v.servicio
+          AND e."LOTE" = v.lote AND e."ITEM" = v.item
+    """), {
+        'servicios': servicios, 'lotes': lotes, 'items': items, 'cantidades': cantidades,
+        'codigo': codigo_licitacion
+    })
+
+def _bloquear_lineas_orden(conn, codigo_licitacion, numero_orden):
+    """
+    Bloquea todas las líneas de una orden de oxigeno.orden_de_compra (de todos
+    sus servicios beneficiarios) y devuelve la cantidad por (servicio, lote,
+    ítem). Se toma antes que el bloqueo de ejecución: dos modificaciones o
+    anulaciones de la misma orden se serializan y la segunda ve las cantidades
+    ya confirmadas (o ninguna línea si la orden se anuló).
+
+    Returns:
+        dict: (servicio, lote, ítem) con lote e ítem numéricos -> cantidad solicitada
+    """
+    filas = conn.execute(text("""
+        SELECT o."SERVICIO_BENEFICIARIO", CAST(o."LOTE" AS numeric), CAST(o."ITEM" AS numeric),
+               o."CANTIDAD_SOLICITADA"
+        FROM oxigeno.orden_de_compra o
+        WHERE o.codigo_licitacion = :codigo
+          AND o."NUMERO_ORDEN_DE_COMPRA"::text = :numero
+        ORDER BY o.ctid
+        FOR UPDATE
+    """), {'codigo': codigo_licitacion, 'numero': str(numero_orden)}).fetchall()
+    lineas = {}
+    for servicio, lote, item, cantidad in filas:
+        clave = (servicio, lote, item)
+        lineas[clave] = lineas.get(clave, Decimal(0)) + Decimal(str(cantidad or 0))
+    return lineas
+
+def modificar_orden_compra(codigo_licitacion, numero_orden, servicio_beneficiario, lote, item,
+                           nueva_cantidad, nueva_fecha):
+    """
+    Cambia la cantidad de una línea (servicio, lote, ítem) y la fecha de
+    emisión de toda la orden en oxigeno.orden_de_compra y ajusta
+    oxigeno.ejecucion_general del servicio de esa línea en la misma
+    transacción. La cantidad actual y el saldo se leen con las filas ya
+    bloqueadas (ver _bloquear_lineas_orden y _bloquear_ejecucion), no de lo
+    que mostraba la pantalla.
+
+    Returns:
+        tuple: (success, message)
+    """
+    try:
+        engine = safe_get_engine()
+        if engine is None:
+            return False, "La modificación de órdenes requiere conexión directa a la base de datos"
+        
+        clave = (servicio_beneficiario, Decimal(str(lote)), Decimal(str(item)))
+        with engine.begin() as conn:
+            lineas = _bloquear_lineas_orden(conn, codigo_licitacion, numero_orden)
+            if clave not in lineas:
+                return False, "La orden ya no existe o fue modificada por otro usuario"
+            
+            diferencia = Decimal(str(nueva_cantidad)) - lineas[clave]
+            if diferencia != 0:
+                bloqueadas = _bloquear_ejecucion(conn, codigo_licitacion, [clave[0]], [clave[1]], [clave[2]])
+                if not bloqueadas:
+                    raise ValueError(f"Ítem inexistente para {servicio_beneficiario}: LOTE {lote} ITEM {item}")
+                if diferencia > bloqueadas[0][2]:
+                    raise ValueError(
+                        f"Saldo insuficiente en LOTE {lote} ITEM {item}: "
+                        f"disponible {bloqueadas[0][2]:,.0f}, adicional solicitado {diferencia:,.0f}"
+                    )
+                _sumar_emitido(conn, codigo_licitacion, [clave[0]], [clave[1]], [clave[2]], [diferencia])
             
-            if max_num and max_num > 0:
-                next_num = max_num + 1
-            else:
-                next_num = 1
+            conn.execute(text("""
+                UPDATE oxigeno.orden_de_compra o
+                SET "CANTIDAD_SOLICITADA" = CASE
+                        WHEN o."SERVICIO_BENEFICIARIO" = :servicio
+                         AND CAST(o."LOTE" AS numeric) = :lote AND CAST(o."ITEM" AS numeric) = :item
+                        THEN :cantidad ELSE o."CANTIDAD_SOLICITADA"
+                    END,
+                    "FECHA_DE_EMISION" = :fecha
+                WHERE o.codigo_licitacion = :codigo
+                  AND o."NUMERO_ORDEN_DE_COMPRA"::text = :numero
+            """), {
+                'servicio': clave[0], 'lote': clave[1], 'item': clave[2],
+                'cantidad': nueva_cantidad, 'fecha': nueva_fecha,
+                'codigo': codigo_licitacion, 'numero': str(numero_orden)
+            })
+        
+        registrar_actividad(
+            accion="UPDATE",
+            modulo="ORDENES_COMPRA",
+            descripcion=f"Orden de compra {numero_orden} modificada",
+            detalles={'lote': str(lote), 'item': str(item), 'diferencia': float(diferencia),
+                      'servicio': servicio_beneficiario},
+            esquema_afectado=codigo_licitacion
+        )
+        return True, "Orden modificada"
+    
+    except Exception as e:
+        return False, f"Error al modificar la orden de compra: {e}"
+
+def anular_orden_compra(codigo_licitacion, numero_orden):
+    """
+    Elimina una orden de oxigeno.orden_de_compra (todas sus líneas, de todos
+    sus servicios beneficiarios) y devuelve a oxigeno.ejecucion_general la
+    cantidad de cada línea en el servicio que la recibió, en una sola
+    transacción y con los mismos bloqueos ordenados que la emisión.
+
+    Returns:
+        tuple: (success, message)
+    """
+    try:
+        engine = safe_get_engine()
+        if engine is None:
+            return False, "La anulación de órdenes requiere conexión directa a la base de datos"
+        
+        with engine.begin() as conn:
+            lineas = _bloquear_lineas_orden(conn, codigo_licitacion, numero_orden)
+            if not lineas:
+                return False, "La orden ya no existe"
             
-            return str(next_num)
+            claves = sorted(lineas, key=lambda c: (c[1], c[2], c[0] or ''))
+            servicios = [servicio for servicio, _lote, _item in claves]
+            lotes = [lote for _servicio, lote, _item in claves]
+            numeros_item = [numero_item for _servicio, _lote, numero_item in claves]
+            _bloquear_ejecucion(conn, codigo_licitacion, servicios, lotes, numeros_item)
+            _sumar_emitido(conn, codigo_licitacion, servicios, lotes, numeros_item,
+                           [-lineas[clave] for clave in claves])
             
+            conn.execute(text("""
+                DELETE FROM oxigeno.orden_de_compra
+                WHERE codigo_licitacion = :codigo
+                  AND "NUMERO_ORDEN_DE_COMPRA"::text = :numero
+            """), {'codigo': codigo_licitacion, 'numero': str(numero_orden)})
+        
+        registrar_actividad(
+            accion="DELETE",
+            modulo="ORDENES_COMPRA",
+            descripcion=f"Orden de compra {numero_orden} eliminada",
+            detalles={'items': len(claves), 'servicios': sorted(set(servicios))},
+            esquema_afectado=codigo_licitacion
+        )
+        return True, "Orden eliminada"
+    
     except Exception as e:
-        # Si hay error, devolver "1"
-        return "1"
+        return False, f"Error al eliminar la orden de compra: {e}"
 
 def crear_orden_compra(codigo_licitacion, numero_orden, fecha_emision, servicio_beneficiario, simese, items):
     """
-    Crea una nueva orden de compra con sus items
-    
+    Emite una orden de compra en oxigeno.orden_de_compra y descuenta las
+    cantidades de oxigeno.ejecucion_general en una sola transacción.
+
+    Las filas de ejecución afectadas se bloquean con SELECT ... FOR UPDATE en
+    orden (LOTE, ITEM), así dos emisiones simultáneas sobre el mismo ítem se
+    serializan y el saldo se valida con el valor ya confirmado. Cada tabla se
+    escribe con una sola sentencia para todas las líneas (arrays + unnest):
+    tres sentencias por orden sin importar la cantidad de ítems.
+
     Args:
-        esquema (str): Esquema de la licitación
-        numero_orden (str): Número de la orden de compra
-        fecha_emision (datetime): Fecha de emisión
+        codigo_licitacion (str): Código de la licitación
+        numero_orden (str): Número pedido (se reserva con reservar_numero; None = el siguiente)
+        fecha_emision (date): Fecha de emisión
         servicio_beneficiario (str): Servicio beneficiario
-        simese (str): Número de SIMESE
-        items (list): Lista de items para la orden de compra
-    
+        simese (str): Número de SIMESE (la tabla consolidada no tiene columna propia)
+        items (list): dicts con lote, item, descripcion, cantidad, unidad_medida y precio_unitario
+
     Returns:
-        tuple: (success, message, orden_id)
+        tuple: (success, message, numero_orden) con el número efectivamente asignado
     """
     try:
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
+        if not items:
+            return False, "La orden no tiene ítems", None
+        
+        engine = safe_get_engine()
         if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-            return
-        with engine.connect() as conn:
-            # Iniciar transacción
-            trans = conn.begin()
-            try:
-                # Insertar cabecera de orden de compra
-                query = text("""
-                    INSERT INTO ordenes_compra 
-                    (numero_orden, fecha_emision, esquema, servicio_beneficiario, simese, usuario_id, estado)
-                    VALUES (:numero_orden, :fecha_emision, :esquema, :servicio_beneficiario, :simese, :usuario_id, 'Emitida')
-                    RETURNING id
-                """)
-                
-                result = conn.execute(query, {
-                    'numero_orden': numero_orden,
-                    'fecha_emision': fecha_emision,
-                    'esquema': esquema,
-                    'servicio_beneficiario': servicio_beneficiario,
-                    'simese': simese,
-                    'usuario_id': st.session_state.user_id
-                })
-                
-                orden_id = result.scalar()
-                
-                # Insertar items de la orden
-                for item in items:
-                    monto_total = item['cantidad'] * item['precio_unitario']
-                    
-                    query_item = text("""
-                        INSERT INTO items_orden_compra
-                        (orden_compra_id, lote, item, codigo_insumo, codigo_servicio, 
-                         descripcion, cantidad, unidad_medida, precio_unitario, monto_total, observaciones)
-                        VALUES
-                        (:orden_id, :lote, :item, :codigo_insumo, :codigo_servicio,
-                         :descripcion, :cantidad, :unidad_medida, :precio_unitario, :monto_total, :observaciones)
-                    """)
-                    
-                    conn.execute(query_item, {
-                        'orden_id': orden_id,
-                        'lote': item['lote'],
-                        'item': item['item'],
-                        'codigo_insumo': item['codigo_insumo'],
-                        'codigo_servicio': item['codigo_servicio'],
-                        'descripcion': item['descripcion'],
-                        'cantidad': item['cantidad'],
-                        'unidad_medida': item['unidad_medida'],
-                        'precio_unitario': item['precio_unitario'],
-                        'monto_total': monto_total,
-                        'observaciones': item.get('observaciones', '')
-                    })
-                    
-                    # Actualizar cantidad emitida en la tabla de ejecución general
-                    query_update = text(f"""
-                        UPDATE "{esquema}"."ejecucion_general"
-                        SET "CANTIDAD_EMITIDA" = "CANTIDAD_EMITIDA" + :cantidad,
-                            "SALDO_A_EMITIR" = "CANTIDAD_MAXIMA" - ("CANTIDAD_EMITIDA" + :cantidad),
-                            "PORCENTAJE_EMITIDO" = 
-                                (("CANTIDAD_EMITIDA" + :cantidad) / "CANTIDAD_MAXIMA") * 100
-                        WHERE "LOTE" = :lote 
-                        AND "ITEM" = :item
-                        AND "SERVICIO_BENEFICIARIO" = :servicio
-                    """)
-                    
-                    conn.execute(query_update, {
-                        'cantidad': item['cantidad'],
-                        'lote': item['lote'],
-                        'item': item['item'],
-                        'servicio': servicio_beneficiario
-                    })
-                
-                # Actualizar también la tabla orden_de_compra del esquema
-                for item in items:
-                    query_insert_oc = text(f"""
-                        INSERT INTO "{esquema}"."orden_de_compra"
-                        ("SIMESE_PEDIDO", "N_ORDEN_DE_COMPRA", "FECHA_DE_EMISION",
-                        "CODIGO_DE_REACTIVOS_INSUMOS_CODIGO_DE_SERVICIO_BENEFICIARIO",
-                        "CODIGO_DE_REACTIVOS_INSUMOS", "SERVICIO_BENEFICIARIO",
-                        "LOTE", "ITEM", "CANTIDAD_SOLICITADA", "UNIDAD_DE_MEDIDA",
-                        "DESCRIPCION_DEL_PRODUCTO_MARCA_PROCEDENCIA", "PRECIO_UNITARIO",
-                        "MONTO_EMITIDO", "OBSERVACIONES")
-                        VALUES
-                        (:simese, :numero_orden, :fecha_emision,
-                        :codigo_completo, :codigo_insumo, :servicio,
-                        :lote, :item, :cantidad, :unidad_medida,
-                        :descripcion, :precio_unitario,
-                        :monto_total, :observaciones)
-                    """)
-                    
-                    codigo_completo = f"{item['codigo_insumo']}{item['codigo_servicio']}" if item['codigo_servicio'] else item['codigo_insumo']
-                    
-                    conn.execute(query_insert_oc, {
-                        'simese': simese,
-                        'numero_orden': numero_orden,
-                        'fecha_emision': fecha_emision,
-                        'codigo_completo': codigo_completo,
-                        'codigo_insumo': item['codigo_insumo'],
-                        'servicio': servicio_beneficiario,
-                        'lote': item['lote'],
-                        'item': item['item'],
-                        'cantidad': item['cantidad'],
-                        'unidad_medida': item['unidad_medida'],
-                        'descripcion': item['descripcion'],
-                        'precio_unitario': item['precio_unitario'],
-                        'monto_total': item['cantidad'] * item['precio_unitario'],
-                        'observaciones': item.get('observaciones', '')
-                    })
-                
-                # Confirmar transacción
-                trans.commit()
-                registrar_actividad(
-                    accion="CREATE",
-                    modulo="ORDENES_COMPRA",
-                    descripcion=f"Orden de compra {numero_orden} creada",
-                    esquema_afectado=esquema
-                )
-                return True, "Orden de compra creada exitosamente", orden_id
-                
-            except Exception as e:
-                # Revertir transacción en caso de error
-                trans.rollback()
-                raise e
+            return False, "La emisión de órdenes requiere conexión directa a la base de datos", None
+        
+        # Una línea por (lote, ítem): cantidades repetidas se suman
+        lineas = {}
+        for item in items:
+            clave = (item['lote'], item['item'])
+            if clave in lineas:
+                lineas[clave]['cantidad'] += item['cantidad']
+            else:
+                lineas[clave] = dict(item)
+        claves = sorted(lineas)
+        lotes = [lote for lote, _item in claves]
+        numeros_item = [numero_item for _lote, numero_item in claves]
+        cantidades = [lineas[clave]['cantidad'] for clave in claves]
+        
+        if numero_orden is not None and not str(numero_orden).strip().isdigit():
+            return False, "El N° de orden debe ser un número entero", None
+        
+        with engine.begin() as conn:
+            # Número reservado en la misma transacción: si la orden falla no se consume
+            numero_orden = str(reservar_numero(
+                conn, 'orden_compra', codigo_licitacion,
+                solicitado=int(numero_orden) if numero_orden is not None else None
+            ))
+            
+            # Bloqueo en orden determinista: sin interbloqueos entre emisiones concurrentes
+            servicios = [servicio_beneficiario] * len(claves)
+            bloqueadas = _bloquear_ejecucion(conn, codigo_licitacion, servicios, lotes, numeros_item)
+            
+            datos_fila = {}
+            for row in bloqueadas:
+                clave = (row[0], row[1])
+                datos_fila.setdefault(clave, row)
+                if row[2] < lineas[clave]['cantidad']:
+                    raise ValueError(
+                        f"Saldo insuficiente en LOTE {clave[0]} ITEM {clave[1]}: "
+                        f"disponible {row[2]:,.0f}, solicitado {lineas[clave]['cantidad']:,.0f}"
+                    )
+            faltantes = [clave for clave in claves if clave not in datos_fila]
+            if faltantes:
+                raise ValueError(
+                    f"Ítems inexistentes para {servicio_beneficiario}: "
+                    + ", ".join(f"LOTE {lote} ITEM {numero_item}" for lote, numero_item in faltantes)
+                )
+            
+            _sumar_emitido(conn, codigo_licitacion, servicios, lotes, numeros_item, cantidades)
+            
+            conn.execute(text("""
+                INSERT INTO oxigeno.orden_de_compra (
+                    codigo_licitacion, "NUMERO_ORDEN_DE_COMPRA", "FECHA_DE_EMISION",
+                    "SERVICIO_BENEFICIARIO", "LOTE", "ITEM", "CANTIDAD_SOLICITADA",
+                    "UNIDAD_DE_MEDIDA", "DESCRIPCION_DEL_PRODUCTO_MARCA_PROCEDENCIA",
+                    "EMPRESA_ADJUDICADA", "PRECIO_UNITARIO", "I_D", "MODALIDAD"
+                )
+                SELECT :codigo, :numero_orden, :fecha_emision, :servicio,
+                       v.lote::text, v.item::text, v.cantidad, v.unidad, v.descripcion,
+                       v.empresa, v.precio, v.id_llamado::text, v.modalidad
+                FROM unnest(
+                    CAST(:lotes AS numeric[]), CAST(:items AS numeric[]), CAST(:cantidades AS numeric[]),
+                    CAST(:unidades AS text[]), CAST(:descripciones AS text[]), CAST(:empresas AS text[]),
+                    CAST(:precios AS numeric[]), CAST(:ids_llamado AS text[]), CAST(:modalidades AS text[])
+                ) AS v(lote, item, cantidad, unidad, descripcion, empresa, precio, id_llamado, modalidad)
+            """), {
+                'codigo': codigo_licitacion,
+                'numero_orden': numero_orden,
+                'fecha_emision': fecha_emision,
+                'servicio': servicio_beneficiario,
+                'lotes': lotes,
+                'items': numeros_item,
+                'cantidades': cantidades,
+                'unidades': [lineas[clave].get('unidad_medida') for clave in claves],
+                'descripciones': [lineas[clave].get('descripcion') for clave in claves],
+                'empresas': [datos_fila[clave][3] for clave in claves],
+                'precios': [lineas[clave]['precio_unitario'] for clave in claves],
+                'ids_llamado': [
+                    str(datos_fila[clave][4]) if datos_fila[clave][4] is not None else None
+                    for clave in claves
+                ],
+                'modalidades': [datos_fila[clave][5] for clave in claves]
+            })
+        
+        registrar_actividad(
+            accion="CREATE",
+            modulo="ORDENES_COMPRA",
+            descripcion=f"Orden de compra {numero_orden} creada",
+            detalles={'items': len(claves), 'servicio': servicio_beneficiario, 'simese': simese},
+            esquema_afectado=codigo_licitacion
+        )
+        return True, "Orden de compra creada exitosamente", numero_orden
                 
     except Exception as e:
         return False, f"Error al crear orden de compra: {e}", None
 
+# =============================================================================
+# CONSULTAS CONSOLIDADAS DEL DASHBOARD (una consulta agrupada por métrica)
+# =============================================================================
+
+# Tablas cuyo contenido alimenta el dashboard consolidado
+TABLAS_DASHBOARD = ('llamado', 'ejecucion_general')
+
+def obtener_version_datos_dashboard(engine):
+    """
+    Devuelve una huella barata del contenido de oxigeno.llamado y
+    oxigeno.ejecucion_general (contadores de pg_stat_user_tables). Cambia con
+    cualquier INSERT/UPDATE/DELETE, por lo que sirve como clave de cache.
+    """
+    query = text("""
+        SELECT relname, n_tup_ins, n_tup_upd, n_tup_del, n_live_tup
+        FROM pg_stat_user_tables
+        WHERE schemaname = 'oxigeno' AND relname = ANY(:tablas)
+        ORDER BY relname
+    """)
+    with engine.connect() as conn:
+        return tuple(tuple(row) for row in conn.execute(query, {'tablas': list(TABLAS_DASHBOARD)}))
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cargar_cabeceras_licitaciones(_engine, version):
+    """
+    Cabecera (primera fila de llamado) de todas las licitaciones en una sola consulta.
+    'version' solo participa en la clave de cache.
+    """
+    query = text("""
+        SELECT DISTINCT ON (codigo_licitacion)
+            codigo_licitacion,
+            "EMPRESA_ADJUDICADA",
+            "NOMBRE_DEL_LLAMADO",
+            "NUMERO_DE_LLAMADO",
+            "AÑO_DEL_LLAMADO",
+            "MODALIDAD"
+        FROM oxigeno.llamado
+        WHERE codigo_licitacion IS NOT NULL
+        ORDER BY codigo_licitacion
+    """)
+    with _engine.connect() as conn:
+        return pd.read_sql(query, conn)
+
+@st.cache_data(ttl=3600, show_spinner=False)
+def cargar_ejecucion_por_servicio(_engine, version):
+    """
+    Totales de ejecución (cantidades y montos) por licitación y servicio
+    beneficiario en una sola consulta agrupada.
+    """
+    query = text("""
+        SELECT 
+            codigo_licitacion,
+            "SERVICIO_BENEFICIARIO" as servicio,
+            SUM("CANTIDAD_EMITIDA") as cantidad_emitida,
+            SUM("TOTAL_ADJUDICADO") as cantidad_maxima,
+            SUM("CANTIDAD_EMITIDA" * "PRECIO_UNITARIO") as monto_emitido,
+            SUM("TOTAL_ADJUDICADO" * "PRECIO_UNITARIO") as monto_adjudicado,
+            AVG("PORCENTAJE_EMITIDO") as porcentaje
+        FROM oxigeno.ejecucion_general
+        WHERE codigo_licitacion IS NOT NULL
+        AND "SERVICIO_BENEFICIARIO" IS NOT NULL
+        AND "SERVICIO_BENEFICIARIO" != ''
+        GROUP BY codigo_licitacion, "SERVICIO_BENEFICIARIO"
+    """)
+    with _engine.connect() as conn:
+        return pd.read_sql(query, conn)
+
 def pagina_dashboard():
     """Página de dashboard con análisis consolidado de múltiples licitaciones"""
     st.header("📊 Dashboard - Análisis Consolidado de Licitaciones")
@@ -5087,47 +5782,42 @@ def pagina_dashboard():
         return nombre
     
     try:
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
-        if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
+        # Consultas agregadas sobre conexión directa, cacheadas por versión de datos
+        engine_dashboard = safe_get_engine()
+        if engine_dashboard is None:
+            st.error("⚠️ El dashboard consolidado requiere conexión directa. Verifica [db_config] en secrets.")
             return
-        with engine.connect() as conn:
-            for esquema in esquemas:
-                try:
-                    query = text(f"""
-                        SELECT "EMPRESA_ADJUDICADA", "NOMBRE_DEL_LLAMADO", 
-                               "NUMERO_DE_LLAMADO", "AÑO_DEL_LLAMADO", "MODALIDAD"
-                        FROM "{esquema}"."llamado"
-                        LIMIT 1
-                    """)
-                    result = conn.execute(query)
-                    datos = result.fetchone()
-                    
-                    if datos:
-                        empresa = datos[0] if datos[0] else "Sin Empresa"
-                        numero = datos[2] if datos[2] else ""
-                        anio = datos[3] if datos[3] else ""
-                        modalidad = datos[4] if datos[4] else ""
-                        
-                        # Crear nombre formateado
-                        if modalidad and numero and anio:
-                            nombre_bonito = f"{modalidad} {numero}/{anio}"
-                        else:
-                            nombre_bonito = formatear_nombre_esquema(esquema)
-                        
-                        display_name = f"{nombre_bonito} ({empresa})"
-                        
-                        licitaciones_info[display_name] = {
-                            'esquema': esquema,
-                            'empresa': empresa,
-                            'numero': numero,
-                            'anio': anio,
-                            'nombre': datos[1] if datos[1] else "",
-                            'nombre_bonito': nombre_bonito
-                        }
-                except Exception:
-                    continue
+        version_datos = obtener_version_datos_dashboard(engine_dashboard)
+        df_cabeceras = cargar_cabeceras_licitaciones(engine_dashboard, version_datos)
+        
+        esquemas_set = set(esquemas)
+        for datos in df_cabeceras.itertuples(index=False):
+            esquema = datos[0]
+            if esquema not in esquemas_set:
+                continue
+            empresa = datos[1] if datos[1] else "Sin Empresa"
+            numero = datos[3] if datos[3] else ""
+            anio = datos[4] if datos[4] else ""
+            modalidad = datos[5] if datos[5] else ""
+            
+            # Crear nombre formateado
+            if modalidad and numero and anio:
+                nombre_bonito = f"{modalidad} {numero}/{anio}"
+            else:
+                nombre_bonito = formatear_nombre_esquema(esquema)
+            
+            display_name = f"{nombre_bonito} ({empresa})"
+            
+            licitaciones_info[display_name] = {
+                'esquema': esquema,
+                'codigo_licitacion': esquema,
+                'empresa': empresa,
+                'numero': numero,
+                'anio': anio,
+                'modalidad': modalidad,
+                'nombre': datos[2] if datos[2] else "",
+                'nombre_bonito': nombre_bonito
+            }
     
     except Exception as e:
         st.error(f"Error: {e}")
@@ -5167,260 +5857,227 @@ def pagina_dashboard():
     
     # Obtener datos consolidados CON MONTOS
     try:
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
-        if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
+        df_ejecucion = cargar_ejecucion_por_servicio(engine_dashboard, version_datos)
+        datos_consolidados = []
+        ejecucion_por_codigo = {
+            codigo: grupo for codigo, grupo in df_ejecucion.groupby('codigo_licitacion', sort=False)
+        }
+        
+        for lic_display in licitaciones_seleccionadas:
+            lic_info = licitaciones_info[lic_display]
+            codigo_licitacion = lic_info['codigo_licitacion']
+            empresa = lic_info['empresa']
+            numero = lic_info['numero']
+            anio = lic_info['anio']
+            modalidad = lic_info['modalidad']
+            llamado = f"{modalidad} {numero}/{anio}".strip() if modalidad else f"{numero}/{anio}"
+            
+            # ⭐ Totales de ejecucion_general ya agrupados por servicio
+            grupo = ejecucion_por_codigo.get(codigo_licitacion)
+            if grupo is None:
+                continue
+            
+            for row in grupo.itertuples(index=False):
+                datos_consolidados.append({
+                    'Llamado': llamado,
+                    'Servicio': row.servicio,
+                    'Emitido': float(row.cantidad_emitida) if pd.notna(row.cantidad_emitida) else 0,
+                    'Máximo': float(row.cantidad_maxima) if pd.notna(row.cantidad_maxima) else 0,
+                    'Monto_Emitido': float(row.monto_emitido) if pd.notna(row.monto_emitido) else 0,
+                    'Monto_Adjudicado': float(row.monto_adjudicado) if pd.notna(row.monto_adjudicado) else 0,
+                    'Porcentaje': float(row.porcentaje) if pd.notna(row.porcentaje) else 0,
+                    'Empresa': empresa,
+                    'Codigo_Licitacion': codigo_licitacion
+                })
+        
+        if not datos_consolidados:
+            st.error("No se encontraron datos.")
             return
-        with engine.connect() as conn:
-            datos_consolidados = []
-            
-            for lic_display in licitaciones_seleccionadas:
-                lic_info = licitaciones_info[lic_display]
-                codigo_licitacion = lic_info['codigo_licitacion']
-                empresa = lic_info['empresa']
-                numero = lic_info['numero']
-                anio = lic_info['anio']
-                
-                # Obtener modalidad del código de licitación
-                try:
-                    query_llamado = text("""
-                        SELECT "MODALIDAD"
-                        FROM oxigeno.llamado
-                        WHERE codigo_licitacion = :codigo
-                        LIMIT 1
-                    """)
-                    result_llamado = conn.execute(query_llamado, {'codigo': codigo_licitacion})
-                    row_llamado = result_llamado.fetchone()
-                    modalidad = row_llamado[0] if row_llamado else ""
-                    llamado = f"{modalidad} {numero}/{anio}".strip() if modalidad else f"{numero}/{anio}"
-                except:
-                    llamado = f"{numero}/{anio}"
-                
-                try:
-                    # ⭐ LEER DE ejecucion_general CON CÁLCULO DE MONTOS
-                    query_servicios = text("""
-                        SELECT 
-                            "SERVICIO_BENEFICIARIO" as servicio,
-                            SUM("CANTIDAD_EMITIDA") as cantidad_emitida,
-                            SUM("TOTAL_ADJUDICADO") as cantidad_maxima,
-                            SUM("CANTIDAD_EMITIDA" * "PRECIO_UNITARIO") as monto_emitido,
-                            SUM("TOTAL_ADJUDICADO" * "PRECIO_UNITARIO") as monto_adjudicado,
-                            AVG("PORCENTAJE_EMITIDO") as porcentaje
-                        FROM oxigeno.ejecucion_general
-                        WHERE codigo_licitacion = :codigo
-                        AND "SERVICIO_BENEFICIARIO" IS NOT NULL
-                        AND "SERVICIO_BENEFICIARIO" != ''
-                        GROUP BY "SERVICIO_BENEFICIARIO"
-                    """)
-                    
-                    result = conn.execute(query_servicios, {'codigo': codigo_licitacion})
+        
+        # Crear DataFrame
+        df_consolidado = pd.DataFrame(datos_consolidados)
+        
+        # Contar número de empresas únicas
+        num_empresas = df_consolidado['Empresa'].nunique()
+        
+        # Solo mostrar gráfico de barras si hay más de una empresa
+        if num_empresas > 1:
+            # Gráfico de barras agrupadas
+            st.subheader("📊 Consumo por Servicio - Comparativa por Empresa")
+            
+            # Top 15 servicios
+            top_servicios = df_consolidado.groupby('Servicio')['Emitido'].sum().nlargest(15).index
+            df_grafico = df_consolidado[df_consolidado['Servicio'].isin(top_servicios)]
+            
+            # Acortar nombres
+            df_grafico['Servicio_Corto'] = df_grafico['Servicio'].apply(
+                lambda x: x[:35] + '...' if len(x) > 35 else x
+            )
+            
+            # Crear gráfico
+            import plotly.express as px
+            
+            fig = px.bar(
+                df_grafico,
+                x='Servicio_Corto',
+                y='Emitido',
+                color='Empresa',
+                barmode='group',
+                title='Cantidad Emitida por Servicio y Empresa',
+                labels={
+                    'Servicio_Corto': 'Servicio de Salud',
+                    'Emitido': 'Cantidad Emitida (m³)',
+                    'Empresa': 'Empresa Proveedora'
+                },
+                height=600,
+                text='Emitido'
+            )
+            
+            fig.update_traces(texttemplate='%{text:.1f}', textposition='outside')
+            fig.update_layout(
+                xaxis={'tickangle': -45},
+                showlegend=True,
+                legend=dict(
+                    orientation="h",
+                    yanchor="bottom",
+                    y=1.02,
+                    xanchor="right",
+                    x=1
+                )
+            )
+            
+            st.plotly_chart(fig, use_container_width=True)
+        
+        # Tabla comparativa con ejecución en montos (Guaraníes)
+        st.subheader("📋 Detalle Comparativo - Ejecución en Montos (Gs.)")
+        
+        # Crear tabla con cálculos por servicio y empresa EN MONTOS
+        resumen_servicios = []
+        
+        for llamado in df_consolidado['Llamado'].unique():
+            for servicio in df_consolidado['Servicio'].unique():
+                for empresa in df_consolidado['Empresa'].unique():
+                    datos_servicio = df_consolidado[
+                        (df_consolidado['Llamado'] == llamado) &
+                        (df_consolidado['Servicio'] == servicio) & 
+                        (df_consolidado['Empresa'] == empresa)
+                    ]
                     
-                    for row in result:
-                        datos_consolidados.append({
+                    if not datos_servicio.empty:
+                        # ⭐ USAR MONTOS (cantidad × precio)
+                        monto_adjudicado = datos_servicio['Monto_Adjudicado'].sum()
+                        monto_emitido = datos_servicio['Monto_Emitido'].sum()
+                        saldo_monto = monto_adjudicado - monto_emitido
+                        porcentaje = (monto_emitido / monto_adjudicado * 100) if monto_adjudicado > 0 else 0
+                        
+                        resumen_servicios.append({
                             'Llamado': llamado,
-                            'Servicio': row[0],
-                            'Emitido': float(row[1]) if row[1] else 0,
-                            'Máximo': float(row[2]) if row[2] else 0,
-                            'Monto_Emitido': float(row[3]) if row[3] else 0,
-                            'Monto_Adjudicado': float(row[4]) if row[4] else 0,
-                            'Porcentaje': float(row[5]) if row[5] else 0,
                             'Empresa': empresa,
-                            'Codigo_Licitacion': codigo_licitacion
+                            'Servicio': servicio,
+                            'Total Adjudicado (Gs.)': monto_adjudicado,
+                            'Total Emitido (Gs.)': monto_emitido,
+                            'Saldo (Gs.)': saldo_monto,
+                            '% Ejecución': porcentaje
                         })
-                
-                except Exception as e:
-                    st.warning(f"⚠️ Error en {lic_display}: {str(e)}")
-                    continue
+        
+        if resumen_servicios:
+            df_resumen = pd.DataFrame(resumen_servicios)
             
-            if not datos_consolidados:
-                st.error("No se encontraron datos.")
-                return
+            # Formatear columnas numéricas con separador de miles (punto)
+            df_resumen['Total Adjudicado (Gs.)'] = df_resumen['Total Adjudicado (Gs.)'].apply(lambda x: f"Gs. {int(x):,}".replace(',', '.'))
+            df_resumen['Total Emitido (Gs.)'] = df_resumen['Total Emitido (Gs.)'].apply(lambda x: f"Gs. {int(x):,}".replace(',', '.'))
+            df_resumen['Saldo (Gs.)'] = df_resumen['Saldo (Gs.)'].apply(lambda x: f"Gs. {int(x):,}".replace(',', '.'))
+            df_resumen['% Ejecución'] = df_resumen['% Ejecución'].apply(lambda x: f"{x:.1f}%")
             
-            # Crear DataFrame
-            df_consolidado = pd.DataFrame(datos_consolidados)
+            st.dataframe(df_resumen, use_container_width=True)
             
-            # Contar número de empresas únicas
-            num_empresas = df_consolidado['Empresa'].nunique()
+            # Mostrar total general
+            total_general_adjudicado = sum([r['Total Adjudicado (Gs.)'] for r in resumen_servicios])
+            total_general_emitido = sum([r['Total Emitido (Gs.)'] for r in resumen_servicios])
+            total_general_saldo = total_general_adjudicado - total_general_emitido
+            porcentaje_general = (total_general_emitido / total_general_adjudicado * 100) if total_general_adjudicado > 0 else 0
             
-            # Solo mostrar gráfico de barras si hay más de una empresa
-            if num_empresas > 1:
-                # Gráfico de barras agrupadas
-                st.subheader("📊 Consumo por Servicio - Comparativa por Empresa")
-                
-                # Top 15 servicios
-                top_servicios = df_consolidado.groupby('Servicio')['Emitido'].sum().nlargest(15).index
-                df_grafico = df_consolidado[df_consolidado['Servicio'].isin(top_servicios)]
-                
-                # Acortar nombres
-                df_grafico['Servicio_Corto'] = df_grafico['Servicio'].apply(
-                    lambda x: x[:35] + '...' if len(x) > 35 else x
-                )
-                
-                # Crear gráfico
-                import plotly.express as px
-                
-                fig = px.bar(
-                    df_grafico,
-                    x='Servicio_Corto',
-                    y='Emitido',
-                    color='Empresa',
-                    barmode='group',
-                    title='Cantidad Emitida por Servicio y Empresa',
-                    labels={
-                        'Servicio_Corto': 'Servicio de Salud',
-                        'Emitido': 'Cantidad Emitida (m³)',
-                        'Empresa': 'Empresa Proveedora'
-                    },
-                    height=600,
-                    text='Emitido'
-                )
-                
-                fig.update_traces(texttemplate='%{text:.1f}', textposition='outside')
-                fig.update_layout(
-                    xaxis={'tickangle': -45},
-                    showlegend=True,
-                    legend=dict(
-                        orientation="h",
-                        yanchor="bottom",
-                        y=1.02,
-                        xanchor="right",
-                        x=1
-                    )
-                )
-                
-                st.plotly_chart(fig, use_container_width=True)
-            
-            # Tabla comparativa con ejecución en montos (Guaraníes)
-            st.subheader("📋 Detalle Comparativo - Ejecución en Montos (Gs.)")
-            
-            # Crear tabla con cálculos por servicio y empresa EN MONTOS
-            resumen_servicios = []
-            
-            for llamado in df_consolidado['Llamado'].unique():
-                for servicio in df_consolidado['Servicio'].unique():
-                    for empresa in df_consolidado['Empresa'].unique():
-                        datos_servicio = df_consolidado[
-                            (df_consolidado['Llamado'] == llamado) &
-                            (df_consolidado['Servicio'] == servicio) & 
-                            (df_consolidado['Empresa'] == empresa)
-                        ]
-                        
-                        if not datos_servicio.empty:
-                            # ⭐ USAR MONTOS (cantidad × precio)
-                            monto_adjudicado = datos_servicio['Monto_Adjudicado'].sum()
-                            monto_emitido = datos_servicio['Monto_Emitido'].sum()
-                            saldo_monto = monto_adjudicado - monto_emitido
-                            porcentaje = (monto_emitido / monto_adjudicado * 100) if monto_adjudicado > 0 else 0
-                            
-                            resumen_servicios.append({
-                                'Llamado': llamado,
-                                'Empresa': empresa,
-                                'Servicio': servicio,
-                                'Total Adjudicado (Gs.)': monto_adjudicado,
-                                'Total Emitido (Gs.)': monto_emitido,
-                                'Saldo (Gs.)': saldo_monto,
-                                '% Ejecución': porcentaje
-                            })
+            st.divider()
+            col_tot1, col_tot2, col_tot3, col_tot4 = st.columns(4)
             
-            if resumen_servicios:
-                df_resumen = pd.DataFrame(resumen_servicios)
-                
-                # Formatear columnas numéricas con separador de miles (punto)
-                df_resumen['Total Adjudicado (Gs.)'] = df_resumen['Total Adjudicado (Gs.)'].apply(lambda x: f"Gs. {int(x):,}".replace(',', '.'))
-                df_resumen['Total Emitido (Gs.)'] = df_resumen['Total Emitido (Gs.)'].apply(lambda x: f"Gs. {int(x):,}".replace(',', '.'))
-                df_resumen['Saldo (Gs.)'] = df_resumen['Saldo (Gs.)'].apply(lambda x: f"Gs. {int(x):,}".replace(',', '.'))
-                df_resumen['% Ejecución'] = df_resumen['% Ejecución'].apply(lambda x: f"{x:.1f}%")
-                
-                st.dataframe(df_resumen, use_container_width=True)
-                
-                # Mostrar total general
-                total_general_adjudicado = sum([r['Total Adjudicado (Gs.)'] for r in resumen_servicios])
-                total_general_emitido = sum([r['Total Emitido (Gs.)'] for r in resumen_servicios])
-                total_general_saldo = total_general_adjudicado - total_general_emitido
-                porcentaje_general = (total_general_emitido / total_general_adjudicado * 100) if total_general_adjudicado > 0 else 0
-                
-                st.divider()
-                col_tot1, col_tot2, col_tot3, col_tot4 = st.columns(4)
-                
-                with col_tot1:
-                    st.metric("💰 Total Adjudicado", f"₲ {int(total_general_adjudicado):,}")
-                
-                with col_tot2:
-                    st.metric("✅ Total Emitido", f"₲ {int(total_general_emitido):,}")
-                
-                with col_tot3:
-                    st.metric("📊 Saldo", f"₲ {int(total_general_saldo):,}")
-                
-                with col_tot4:
-                    st.metric("📈 % Ejecución", f"{porcentaje_general:.1f}%")
+            with col_tot1:
+                st.metric("💰 Total Adjudicado", f"₲ {int(total_general_adjudicado):,}")
             
-            # Métricas por empresa - Solo mostrar si hay más de una empresa
-            if num_empresas > 1:
-                st.divider()
-                st.subheader("📈 Resumen por Empresa")
-                
-                resumen_empresas = df_consolidado.groupby('Empresa').agg({
-                    'Emitido': 'sum',
-                    'Máximo': 'sum'
-                }).round(2)
-                
-                resumen_empresas['Porcentaje'] = (
-                    resumen_empresas['Emitido'] / resumen_empresas['Máximo'] * 100
-                ).round(1)
-                
-                cols = st.columns(len(resumen_empresas))
-                
-                for idx, (empresa, row) in enumerate(resumen_empresas.iterrows()):
-                    with cols[idx]:
-                        st.metric(
-                            label=f"🏢 {empresa}",
-                            value=f"{row['Emitido']:,.0f} m³",
-                            delta=f"{row['Porcentaje']:.1f}% ejecutado"
-                        )
-                        st.caption(f"Total licitado: {row['Máximo']:,.0f} m³")
-                
-                # Gráfico de porcentajes
-                st.divider()
-                st.subheader("📊 Porcentaje de Ejecución por Empresa")
-                
-                fig_pct = px.bar(
-                    resumen_empresas.reset_index(),
-                    x='Empresa',
-                    y='Porcentaje',
-                    text='Porcentaje',
-                    color='Porcentaje',
-                    color_continuous_scale='RdYlGn',
-                    labels={
-                        'Empresa': 'Empresa Proveedora',
-                        'Porcentaje': '% de Ejecución'
-                    },
-                    height=400
-                )
-                
-                fig_pct.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
-                fig_pct.update_layout(showlegend=False)
-                
-                st.plotly_chart(fig_pct, use_container_width=True)
+            with col_tot2:
+                st.metric("✅ Total Emitido", f"₲ {int(total_general_emitido):,}")
+            
+            with col_tot3:
+                st.metric("📊 Saldo", f"₲ {int(total_general_saldo):,}")
+            
+            with col_tot4:
+                st.metric("📈 % Ejecución", f"{porcentaje_general:.1f}%")
+        
+        # Métricas por empresa - Solo mostrar si hay más de una empresa
+        if num_empresas > 1:
+            st.divider()
+            st.subheader("📈 Resumen por Empresa")
+            
+            resumen_empresas = df_consolidado.groupby('Empresa').agg({
+                'Emitido': 'sum',
+                'Máximo': 'sum'
+            }).round(2)
+            
+            resumen_empresas['Porcentaje'] = (
+                resumen_empresas['Emitido'] / resumen_empresas['Máximo'] * 100
+            ).round(1)
+            
+            cols = st.columns(len(resumen_empresas))
+            
+            for idx, (empresa, row) in enumerate(resumen_empresas.iterrows()):
+                with cols[idx]:
+                    st.metric(
+                        label=f"🏢 {empresa}",
+                        value=f"{row['Emitido']:,.0f} m³",
+                        delta=f"{row['Porcentaje']:.1f}% ejecutado"
+                    )
+                    st.caption(f"Total licitado: {row['Máximo']:,.0f} m³")
             
-            # Exportar
+            # Gráfico de porcentajes
             st.divider()
-            if st.button("📥 Exportar a Excel"):
-                output = io.BytesIO()
-                with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                    df_consolidado.to_excel(writer, sheet_name='Datos', index=False)
-                    tabla_pivot.to_excel(writer, sheet_name='Comparativa')
-                    resumen_empresas.to_excel(writer, sheet_name='Resumen')
-                
-                output.seek(0)
-                
-                st.download_button(
-                    label="⬇️ Descargar",
-                    data=output,
-                    file_name=f"consolidado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
+            st.subheader("📊 Porcentaje de Ejecución por Empresa")
+            
+            fig_pct = px.bar(
+                resumen_empresas.reset_index(),
+                x='Empresa',
+                y='Porcentaje',
+                text='Porcentaje',
+                color='Porcentaje',
+                color_continuous_scale='RdYlGn',
+                labels={
+                    'Empresa': 'Empresa Proveedora',
+                    'Porcentaje': '% de Ejecución'
+                },
+                height=400
+            )
+            
+            fig_pct.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
+            fig_pct.update_layout(showlegend=False)
             
+            st.plotly_chart(fig_pct, use_container_width=True)
+        
+        # Exportar
+        st.divider()
+        if st.button("📥 Exportar a Excel"):
+            output = io.BytesIO()
+            with pd.ExcelWriter(output, engine='openpyxl') as writer:
+                df_consolidado.to_excel(writer, sheet_name='Datos', index=False)
+                tabla_pivot.to_excel(writer, sheet_name='Comparativa')
+                resumen_empresas.to_excel(writer, sheet_name='Resumen')
+            
+            output.seek(0)
+            
+            st.download_button(
+                label="⬇️ Descargar",
+                data=output,
+                file_name=f"consolidado_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        
     except Exception as e:
         st.error(f"Error: {e}")
         import traceback
@@ -5490,18 +6147,16 @@ def pagina_dashboard():
             try:
                 password_escaped = quote_plus(password)
                 conn_str = f"postgresql://{user}:{password_escaped}@{host}:{port}/{dbname}?sslmode=require"
-                engine = create_engine(
+                engine = db_registry.obtener_engine(
+                    'licitaciones',
                     conn_str,
                     connect_args={
                         "client_encoding": "utf8",
                         "connect_timeout": 10,
                         "sslmode": "require"
                     },
-                    pool_pre_ping=True
+                    probar=True
                 )
-                # Probar conexión
-                with engine.connect() as test_conn:
-                    test_conn.execute(text("SELECT 1"))
             except Exception as e:
                 st.warning(f"El dashboard completo requiere conexión directa. Error: {e}. Algunas funcionalidades pueden estar limitadas.")
                 return
@@ -5830,8 +6485,8 @@ def pagina_configurar_logos():
     
     st.info("📌 Los logos que cargues aquí aparecerán en todas las Órdenes de Compra en formato PDF.")
     
-    # Directorio para guardar logos
-    logos_dir = "/home/claude/logos_gobierno"
+    # Directorio para guardar logos (el mismo que lee pdf_render)
+    logos_dir = pdf_render.LOGOS_DIR
     os.makedirs(logos_dir, exist_ok=True)
     
     # Tabs para diferentes logos
@@ -5851,6 +6506,7 @@ def pagina_configurar_logos():
                 st.success("✅ Logo principal cargado")
                 if st.button("🗑️ Eliminar Logo Principal", key="btn_delete_principal"):
                     os.remove(logo_principal_path)
+                    pdf_render.invalidar_logos()
                     st.success("Logo principal eliminado")
                     time.sleep(1)
                     st.rerun()
@@ -5874,6 +6530,7 @@ def pagina_configurar_logos():
             if st.button("💾 Guardar Logo Principal", key="btn_save_principal"):
                 with open(logo_principal_path, "wb") as f:
                     f.write(logo_principal.getbuffer())
+                pdf_render.invalidar_logos()
                 st.success("✅ Logo principal guardado exitosamente!")
                 st.balloons()
                 time.sleep(2)
@@ -5893,6 +6550,7 @@ def pagina_configurar_logos():
                 st.success("✅ Logo secundario cargado")
                 if st.button("🗑️ Eliminar Logo Secundario", key="btn_delete_secundario"):
                     os.remove(logo_secundario_path)
+                    pdf_render.invalidar_logos()
                     st.success("Logo secundario eliminado")
                     time.sleep(1)
                     st.rerun()
@@ -5916,6 +6574,7 @@ def pagina_configurar_logos():
             if st.button("💾 Guardar Logo Secundario", key="btn_save_secundario"):
                 with open(logo_secundario_path, "wb") as f:
                     f.write(logo_secundario.getbuffer())
+                pdf_render.invalidar_logos()
                 st.success("✅ Logo secundario guardado exitosamente!")
                 st.balloons()
                 time.sleep(2)
@@ -5977,19 +6636,23 @@ def pagina_configurar_logos():
         """)
 
 def main():
+    """Ejecución directa (streamlit run licitaciones_app.py)"""
     st.set_page_config(
         page_title="Gestión de Licitaciones",
         page_icon="📊",
         layout="wide"
     )
-    
-    # Configurar tablas si no existen
-    configurar_tabla_usuarios()
-    configurar_tabla_ordenes_compra()
-    configurar_tabla_cargas()
-    configurar_tabla_proveedores()
-    configurar_tabla_auditoria()
-    crear_tabla_usuario_servicio()  # Nueva tabla para servicios de usuarios
+    render()
+
+def render():
+    """Punto de entrada de la aplicación (main_app.py o streamlit run)"""
+    # Estructura de la base: migraciones versionadas, verificadas una vez por
+    # sesión (y aplicadas una vez por proceso)
+    if not st.session_state.get('esquema_licitaciones_verificado'):
+        if asegurar_esquema_licitaciones() is None:
+            # Solo API REST: verificar que exista la tabla de usuarios
+            configurar_tabla_usuarios()
+        st.session_state.esquema_licitaciones_verificado = True
     
     # Inicializar el estado de sesión si es necesario
     if 'logged_in' not in st.session_state:
@@ -6104,160 +6767,301 @@ def main():
         time.sleep(1)
         st.rerun()
 
-def obtener_ordenes_compra(esquema=None):
-    """Obtiene órdenes de compra leyendo DIRECTAMENTE de las tablas de cada esquema
-    NO usa tabla central - lee de lpn_xxx.orden_de_compra"""
-    
+# Caracteres acentuados que la búsqueda de órdenes ignora (mismo criterio que
+# normalizar_texto_busqueda, pero aplicado en SQL)
+_ACENTOS_BUSQUEDA = ('áàäâãéèëêíìïîóòöôõúùüûñç', 'aaaaaeeeeiiiiooooouuuunc')
+
+def normalizar_texto_busqueda(texto):
+    """Remueve acentos y convierte a minúsculas para búsqueda flexible"""
+    import unicodedata
+    if not texto:
+        return ""
+    texto = str(texto).lower()
+    # Remover acentos
+    texto = ''.join(
+        c for c in unicodedata.normalize('NFD', texto)
+        if unicodedata.category(c) != 'Mn'
+    )
+    return texto
+
+def asegurar_indices_orden_compra(conn, esquema='oxigeno'):
+    """Crea los índices que usan el listado y el detalle de órdenes de compra"""
+    indices = [
+        f'CREATE INDEX IF NOT EXISTS idx_orden_compra_codigo_numero '
+        f'ON {esquema}.orden_de_compra (codigo_licitacion, "NUMERO_ORDEN_DE_COMPRA")',
+        f'CREATE INDEX IF NOT EXISTS idx_orden_compra_fecha_keyset '
+        f'ON {esquema}.orden_de_compra ((COALESCE("FECHA_DE_EMISION", DATE \'0001-01-01\')) DESC, '
+        f'codigo_licitacion DESC, "NUMERO_ORDEN_DE_COMPRA" DESC)',
+    ]
+    for sql in indices:
+        conn.execute(text(sql))
+
+def _migracion_indices_orden_compra(conn):
+    """Índices de oxigeno.orden_de_compra (paso repetible: la tabla se crea con la primera carga)"""
+    if conn.execute(text("SELECT to_regclass('oxigeno.orden_de_compra')")).scalar() is None:
+        return
+    asegurar_indices_orden_compra(conn)
+
+def obtener_ordenes_compra(esquema=None, busqueda=None, limite=None, despues_de=None):
+    """
+    Obtiene órdenes de compra de la tabla consolidada oxigeno.orden_de_compra
+    con una sola consulta agrupada, ordenadas por fecha de emisión descendente.
+
+    Cada orden es una fila (codigo_licitacion, número): si sus líneas tienen
+    varios servicios o fechas (datos importados), los servicios se listan
+    juntos y la fecha es la más reciente. Así el id y el cursor de paginación
+    son únicos y ninguna orden se repite ni se salta entre páginas.
+
+    Args:
+        esquema: Código de licitación para filtrar (None = todas)
+        busqueda: Texto a buscar (sin acentos) en número, servicio y empresa
+        limite: Cantidad máxima de órdenes a devolver (None = todas)
+        despues_de: Cursor de paginación por clave: el valor 'cursor' de la
+            última orden de la página anterior
+
+    Returns:
+        list: Órdenes con el mismo formato de siempre más la clave 'cursor'
+    """
     try:
-        ordenes = []
-        
-        # Obtener esquemas activos
-        esquemas = obtener_esquemas_postgres()
-        
-        # Si se especificó un esquema, usar solo ese
-        if esquema:
-            esquemas = [esquema]
-        
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
+        engine = safe_get_engine()
         if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-            return
+            st.error("⚠️ No se pudo establecer conexión directa con la base de datos.")
+            return []
+
+        query, params = consulta_ordenes_compra(esquema, busqueda, limite, despues_de)
         with engine.connect() as conn:
-            for esq in esquemas:
-                try:
-                    # Leer órdenes del esquema
-                    query = text(f"""
-                        SELECT DISTINCT
-                            "NUMERO_ORDEN_DE_COMPRA",
-                            "FECHA_DE_EMISION",
-                            "SERVICIO_BENEFICIARIO",
-                            COUNT(*) as cantidad_items,
-                            SUM("CANTIDAD_SOLICITADA" * "PRECIO_UNITARIO") as monto_total
-                        FROM "{esq}"."orden_de_compra"
-                        GROUP BY "NUMERO_ORDEN_DE_COMPRA", "FECHA_DE_EMISION", "SERVICIO_BENEFICIARIO"
-                        ORDER BY "FECHA_DE_EMISION" DESC
-                    """)
-                    
-                    result = conn.execute(query)
-                    
-                    for row in result:
-                        ordenes.append({
-                            'id': f"{esq}_{row[0]}",  # ID único: esquema_numero
-                            'numero_orden': row[0],
-                            'fecha_emision': row[1],
-                            'esquema': esq,
-                            'servicio_beneficiario': row[2],
-                            'simese': None,
-                            'estado': 'Emitida',
-                            'usuario': 'Sistema',
-                            'fecha_creacion': row[1],
-                            'cantidad_items': row[3],
-                            'monto_total': row[4] if row[4] else 0
-                        })
-                except Exception as e:
-                    # Si el esquema no tiene tabla orden_de_compra, continuar
-                    continue
-        
-        return ordenes
-        
+            return [fila_orden_compra(row) for row in conn.execute(text(query), params)]
+
     except Exception as e:
         st.error(f"Error obteniendo órdenes: {e}")
         return []
-        return []
 
-def obtener_detalles_orden_compra(orden_id):
+def consulta_ordenes_compra(esquema=None, busqueda=None, limite=None, despues_de=None):
     """
-    Obtiene los detalles completos de una orden de compra desde el esquema
-    orden_id formato: esquema_numero (ej: lpn_100/2023_1)
+    Arma la consulta del listado de órdenes (ver obtener_ordenes_compra).
+
+    Todos los filtros que dependen de la orden (búsqueda y cursor) van en el
+    HAVING, sobre los agregados de todas sus líneas: un filtro por línea antes
+    del GROUP BY dejaría pasar otra vez, con solo parte de sus líneas, a una
+    orden ya mostrada que tenga líneas más antiguas que el cursor.
+
+    Returns:
+        tuple: (sql, parámetros)
     """
+    filtros = ['"NUMERO_ORDEN_DE_COMPRA" IS NOT NULL']
+    params = {}
+
+    if esquema:
+        filtros.append('codigo_licitacion = :codigo')
+        params['codigo'] = esquema
+
+    # Condiciones sobre la orden completa (no sobre líneas sueltas)
+    condiciones_orden = []
+
+    if busqueda and busqueda.strip():
+        # Si alguna línea coincide se muestra la orden con todas sus líneas
+        condiciones_orden.append("""
+            bool_or(translate(lower(
+                COALESCE("NUMERO_ORDEN_DE_COMPRA", '') || ' ' ||
+                COALESCE("SERVICIO_BENEFICIARIO", '') || ' ' ||
+                COALESCE("EMPRESA_ADJUDICADA", '')
+            ), :acentos, :sin_acentos) LIKE :busqueda)
+        """)
+        params['acentos'], params['sin_acentos'] = _ACENTOS_BUSQUEDA
+        params['busqueda'] = f"%{normalizar_texto_busqueda(busqueda.strip())}%"
+
+    if despues_de:
+        condiciones_orden.append("""
+            (COALESCE(MAX("FECHA_DE_EMISION"), DATE '0001-01-01'), codigo_licitacion, "NUMERO_ORDEN_DE_COMPRA")
+                < (:cursor_fecha, :cursor_codigo, :cursor_numero)
+        """)
+        params['cursor_fecha'], params['cursor_codigo'], params['cursor_numero'] = despues_de
+
+    having = f"HAVING {' AND '.join(condiciones_orden)}" if condiciones_orden else ""
+    query = f"""
+        SELECT
+            codigo_licitacion,
+            "NUMERO_ORDEN_DE_COMPRA",
+            MAX("FECHA_DE_EMISION") as fecha_emision,
+            string_agg(DISTINCT "SERVICIO_BENEFICIARIO", ' / ' ORDER BY "SERVICIO_BENEFICIARIO") as servicios,
+            COUNT(*) as cantidad_items,
+            SUM("CANTIDAD_SOLICITADA" * "PRECIO_UNITARIO") as monto_total,
+            MIN("EMPRESA_ADJUDICADA") as empresa,
+            COALESCE(MAX("FECHA_DE_EMISION"), DATE '0001-01-01') as fecha_clave
+        FROM oxigeno.orden_de_compra
+        WHERE {' AND '.join(filtros)}
+        GROUP BY codigo_licitacion, "NUMERO_ORDEN_DE_COMPRA"
+        {having}
+        ORDER BY fecha_clave DESC, codigo_licitacion DESC, "NUMERO_ORDEN_DE_COMPRA" DESC
+    """
+    if limite:
+        query += " LIMIT :limite"
+        params['limite'] = int(limite)
+    return query, params
+
+def fila_orden_compra(row):
+    """Convierte una fila de consulta_ordenes_compra al formato del listado"""
+    return {
+        'id': f"{row[0]}_{row[1]}",  # ID único: esquema_numero
+        'numero_orden': row[1],
+        'fecha_emision': row[2],
+        'esquema': row[0],
+        'servicio_beneficiario': row[3],
+        'simese': None,
+        'estado': 'Emitida',
+        'usuario': 'Sistema',
+        'fecha_creacion': row[2],
+        'cantidad_items': row[4],
+        'monto_total': row[5] if row[5] else 0,
+        'empresa': row[6],
+        'cursor': (row[7], row[0], row[1])
+    }
+
+# Órdenes mostradas por página en la lista de órdenes de compra
+ORDENES_POR_PAGINA = 20
+
+def obtener_empresas_licitaciones(codigos):
+    """
+    Obtiene la empresa adjudicada de varias licitaciones en una sola consulta
+
+    Args:
+        codigos: Lista de códigos de licitación
+
+    Returns:
+        dict: codigo_licitacion -> empresa adjudicada
+    """
+    codigos = sorted({c for c in codigos if c})
+    if not codigos:
+        return {}
     try:
-        # Separar esquema y número de orden
+        engine = safe_get_engine()
+        if engine is None:
+            return {}
+        with engine.connect() as conn:
+            result = conn.execute(text("""
+                SELECT DISTINCT ON (codigo_licitacion)
+                    codigo_licitacion,
+                    "EMPRESA_ADJUDICADA"
+                FROM oxigeno.llamado
+                WHERE codigo_licitacion = ANY(:codigos)
+                  AND "EMPRESA_ADJUDICADA" IS NOT NULL
+                ORDER BY codigo_licitacion
+            """), {'codigos': codigos})
+            return {row[0]: row[1] for row in result}
+    except Exception as e:
+        st.warning(f"No se pudieron obtener las empresas adjudicadas: {e}")
+        return {}
+
+def obtener_detalles_ordenes_compra(orden_ids):
+    """
+    Obtiene los detalles de varias órdenes de compra en una sola consulta
+    sobre oxigeno.orden_de_compra (en lugar de una consulta por orden).
+
+    Args:
+        orden_ids: Lista de ids con formato esquema_numero (ej: lpn_100/2023_1)
+
+    Returns:
+        dict: orden_id -> detalle (mismo formato que obtener_detalles_orden_compra)
+    """
+    claves = {}
+    for orden_id in orden_ids:
         partes = orden_id.rsplit('_', 1)
-        if len(partes) != 2:
-            return None
-        
-        esquema = partes[0]
-        numero_orden = partes[1]
-        
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
+        if len(partes) == 2:
+            claves[(partes[0], partes[1])] = orden_id
+    if not claves:
+        return {}
+
+    try:
+        engine = safe_get_engine()
         if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-            return
+            st.error("⚠️ No se pudo establecer conexión directa con la base de datos.")
+            return {}
         with engine.connect() as conn:
-            # Obtener todas las líneas de la orden
-            query_items = text(f"""
+            query_items = text("""
                 SELECT 
-                    "NUMERO_ORDEN_DE_COMPRA",
-                    "FECHA_DE_EMISION",
-                    "SERVICIO_BENEFICIARIO",
-                    "LOTE",
-                    "ITEM",
-                    "CANTIDAD_SOLICITADA",
-                    "UNIDAD_DE_MEDIDA",
-                    "DESCRIPCION_DEL_PRODUCTO_MARCA_PROCEDENCIA",
-                    "PRECIO_UNITARIO",
-                    "EMPRESA_ADJUDICADA",
-                    "I_D",
-                    "MODALIDAD"
-                FROM "{esquema}"."orden_de_compra"
-                WHERE "NUMERO_ORDEN_DE_COMPRA" = :numero_orden
-                ORDER BY "LOTE", "ITEM"
+                    o.codigo_licitacion,
+                    o."NUMERO_ORDEN_DE_COMPRA",
+                    o."FECHA_DE_EMISION",
+                    o."SERVICIO_BENEFICIARIO",
+                    o."LOTE",
+                    o."ITEM",
+                    o."CANTIDAD_SOLICITADA",
+                    o."UNIDAD_DE_MEDIDA",
+                    o."DESCRIPCION_DEL_PRODUCTO_MARCA_PROCEDENCIA",
+                    o."PRECIO_UNITARIO",
+                    o."EMPRESA_ADJUDICADA",
+                    o."I_D",
+                    o."MODALIDAD"
+                FROM oxigeno.orden_de_compra o
+                JOIN unnest(CAST(:codigos AS text[]), CAST(:numeros AS text[])) AS k(codigo, numero)
+                  ON o.codigo_licitacion = k.codigo
+                 AND o."NUMERO_ORDEN_DE_COMPRA"::text = k.numero
+                ORDER BY o.codigo_licitacion, o."NUMERO_ORDEN_DE_COMPRA", o."LOTE", o."ITEM"
             """)
-            
-            result = conn.execute(query_items, {'numero_orden': numero_orden})
+            result = conn.execute(query_items, {
+                'codigos': [c for c, _ in claves],
+                'numeros': [n for _, n in claves]
+            })
             rows = result.fetchall()
-            
-            if not rows:
-                return None
-            
-            # Primer row tiene info general
-            primera_fila = rows[0]
-            
-            # Formatear esquema bonito
-            esquema_bonito = esquema.replace('lpn_', 'LPN ').replace('_', ' ').upper()
-            
-            # Armar items
-            items = []
-            monto_total = 0
-            for row in rows:
-                item_monto = float(row[5] or 0) * float(row[8] or 0)
-                monto_total += item_monto
-                
-                items.append({
-                    'lote': row[3],
-                    'item': row[4],
-                    'descripcion': row[7],
-                    'cantidad': row[5],
-                    'unidad_medida': row[6] or 'UNIDAD',
-                    'precio_unitario': row[8],
-                    'monto_total': item_monto
-                })
-            
-            # Armar respuesta
-            orden = {
-                'id': orden_id,
-                'numero_orden': primera_fila[0],
-                'fecha_emision': primera_fila[1],
-                'esquema': esquema,
-                'esquema_bonito': esquema_bonito,
-                'servicio_beneficiario': primera_fila[2],
-                'empresa_adjudicada': primera_fila[9],
-                'id_licitacion': primera_fila[10],
-                'modalidad': primera_fila[11],
-                'estado': 'Emitida',
-                'usuario': 'Sistema',
-                'items': items,
-                'monto_total': monto_total,
-                'cantidad_items': len(items)
-            }
-            
-            return orden
-            
+
+        ordenes = {}
+        for row in rows:
+            orden_id = claves.get((row[0], str(row[1])))
+            if orden_id is None:
+                continue
+
+            orden = ordenes.get(orden_id)
+            if orden is None:
+                # Primera fila de cada orden tiene la info general
+                esquema = row[0]
+                orden = ordenes[orden_id] = {
+                    'id': orden_id,
+                    'numero_orden': row[1],
+                    'fecha_emision': row[2],
+                    'esquema': esquema,
+                    'esquema_bonito': esquema.replace('lpn_', 'LPN ').replace('_', ' ').upper(),
+                    'servicio_beneficiario': row[3],
+                    'servicios': [],
+                    'empresa_adjudicada': row[10],
+                    'id_licitacion': row[11],
+                    'modalidad': row[12],
+                    'estado': 'Emitida',
+                    'usuario': 'Sistema',
+                    'items': [],
+                    'monto_total': 0,
+                    'cantidad_items': 0
+                }
+
+            # Una orden puede abarcar varios servicios: cada línea lleva el suyo
+            if row[3] not in orden['servicios']:
+                orden['servicios'].append(row[3])
+                orden['servicio_beneficiario'] = ' / '.join(sorted(str(s) for s in orden['servicios']))
+            item_monto = float(row[6] or 0) * float(row[9] or 0)
+            orden['monto_total'] += item_monto
+            orden['cantidad_items'] += 1
+            orden['items'].append({
+                'servicio_beneficiario': row[3],
+                'lote': row[4],
+                'item': row[5],
+                'descripcion': row[8],
+                'cantidad': row[6],
+                'unidad_medida': row[7] or 'UNIDAD',
+                'precio_unitario': row[9],
+                'monto_total': item_monto
+            })
+
+        return ordenes
+
     except Exception as e:
-        st.error(f"Error obteniendo detalles de orden: {e}")
-        return None
+        st.error(f"Error obteniendo detalles de órdenes: {e}")
+        return {}
+
+def obtener_detalles_orden_compra(orden_id):
+    """
+    Obtiene los detalles completos de una orden de compra
+    orden_id formato: esquema_numero (ej: lpn_100/2023_1)
+    """
+    return obtener_detalles_ordenes_compra([orden_id]).get(orden_id)
 
 def cambiar_estado_orden_compra(orden_id, nuevo_estado):
     """Cambia el estado de una orden de compra"""
@@ -6285,488 +7089,83 @@ def cambiar_estado_orden_compra(orden_id, nuevo_estado):
     except Exception as e:
         return False, f"Error al cambiar estado: {e}"
 
-def numero_a_letras(numero):
-    """Convierte un número a letras en guaraníes"""
-    unidades = ["", "UN", "DOS", "TRES", "CUATRO", "CINCO", "SEIS", "SIETE", "OCHO", "NUEVE"]
-    decenas = ["", "DIEZ", "VEINTE", "TREINTA", "CUARENTA", "CINCUENTA", "SESENTA", "SETENTA", "OCHENTA", "NOVENTA"]
-    especiales = ["DIEZ", "ONCE", "DOCE", "TRECE", "CATORCE", "QUINCE", "DIECISEIS", "DIECISIETE", "DIECIOCHO", "DIECINUEVE"]
-    centenas = ["", "CIENTO", "DOSCIENTOS", "TRESCIENTOS", "CUATROCIENTOS", "QUINIENTOS", "SEISCIENTOS", "SETECIENTOS", "OCHOCIENTOS", "NOVECIENTOS"]
-    
-    if numero == 0:
-        return "CERO GUARANIES"
-    
-    def convertir_grupo(n):
-        if n == 0:
-            return ""
-        elif n < 10:
-            return unidades[n]
-        elif n < 20:
-            return especiales[n - 10]
-        elif n < 100:
-            d = n // 10
-            u = n % 10
-            if u == 0:
-                return decenas[d]
-            else:
-                return decenas[d] + " Y " + unidades[u]
-        else:
-            c = n // 100
-            resto = n % 100
-            if c == 1 and resto == 0:
-                return "CIEN"
-            elif resto == 0:
-                return centenas[c]
-            else:
-                return centenas[c] + " " + convertir_grupo(resto)
-    
-    # Convertir número
-    if numero < 1000:
-        texto = convertir_grupo(numero)
-    elif numero < 1000000:
-        miles = numero // 1000
-        resto = numero % 1000
-        if miles == 1:
-            texto = "MIL"
-        else:
-            texto = convertir_grupo(miles) + " MIL"
-        if resto > 0:
-            texto += " " + convertir_grupo(resto)
-    elif numero < 1000000000:
-        millones = numero // 1000000
-        resto = numero % 1000000
-        if millones == 1:
-            texto = "UN MILLON"
-        else:
-            texto = convertir_grupo(millones) + " MILLONES"
-        if resto >= 1000:
-            miles = resto // 1000
-            resto_final = resto % 1000
-            if miles > 0:
-                if miles == 1:
-                    texto += " MIL"
-                else:
-                    texto += " " + convertir_grupo(miles) + " MIL"
-            if resto_final > 0:
-                texto += " " + convertir_grupo(resto_final)
-        elif resto > 0:
-            texto += " " + convertir_grupo(resto)
-    else:
-        return "MONTO DEMASIADO GRANDE"
-    
-    return texto + " GUARANIES"
+# Versión completa en guaraníes (la usan los PDFs, también en procesos aparte)
+numero_a_letras = pdf_render.numero_a_letras
+
+def obtener_datos_llamado(codigos):
+    """
+    Datos del llamado que imprimen los PDFs, para varias licitaciones en una consulta.
+
+    Returns:
+        dict: codigo_licitacion -> (NUMERO_DE_LLAMADO, AÑO_DEL_LLAMADO,
+        NOMBRE_DEL_LLAMADO, I_D, EMPRESA_ADJUDICADA, RUC)
+    """
+    engine = safe_get_engine()
+    if engine is None or not codigos:
+        return {}
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT DISTINCT ON (codigo_licitacion)
+                   codigo_licitacion, "NUMERO_DE_LLAMADO", "AÑO_DEL_LLAMADO", "NOMBRE_DEL_LLAMADO",
+                   "I_D", "EMPRESA_ADJUDICADA", "RUC"
+            FROM oxigeno.llamado
+            WHERE codigo_licitacion = ANY(:codigos)
+            ORDER BY codigo_licitacion
+        """), {'codigos': list(codigos)})
+        return {row[0]: tuple(row[1:]) for row in result}
 
 def generar_pdf_orden_compra(esquema, numero_oc, anio_oc, fecha_emision, servicio, items, usuario):
-    """Genera PDF de orden de compra con diseño profesional"""
+    """Genera PDF de orden de compra con diseño profesional (ver pdf_render.pdf_orden_compra)"""
     try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import inch, cm
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT, TA_JUSTIFY
-        
-        # Crear buffer
-        buffer = io.BytesIO()
-        
-        # Configurar documento A4
-        doc = SimpleDocTemplate(
-            buffer, 
-            pagesize=A4,
-            rightMargin=1.5*cm,
-            leftMargin=1.5*cm,
-            topMargin=1*cm,
-            bottomMargin=1.5*cm
-        )
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        
-        style_title = ParagraphStyle(
-            'Title',
-            parent=styles['Heading1'],
-            fontSize=12,
-            textColor=colors.black,
-            spaceAfter=4,
-            spaceBefore=4,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        style_subtitle = ParagraphStyle(
-            'Subtitle',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.black,
-            spaceAfter=2,
-            spaceBefore=2,
-            alignment=TA_CENTER,
-            fontName='Helvetica'
-        )
-        
-        style_section_title = ParagraphStyle(
-            'SectionTitle',
-            parent=styles['Heading2'],
-            fontSize=10,
-            textColor=colors.white,
-            spaceAfter=0,
-            spaceBefore=0,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold',
-            backColor=colors.grey
-        )
-        
-        style_normal = ParagraphStyle(
-            'Normal',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.black,
-            alignment=TA_LEFT,
-            fontName='Helvetica'
-        )
-        
-        style_bold = ParagraphStyle(
-            'Bold',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.black,
-            alignment=TA_LEFT,
-            fontName='Helvetica-Bold'
-        )
-        
-        # Contenido
-        story = []
-        
-        # ========== SECCIÓN 1: LOGOS Y ENCABEZADO ==========
-        logos_dir = "/home/claude/logos_gobierno"
-        logo_principal_path = os.path.join(logos_dir, "logo_principal.png")
-        
-        # Logo ANCHO (no alto)
-        if os.path.exists(logo_principal_path):
-            logo = RLImage(logo_principal_path, width=12*cm, height=2*cm)
-            header_data = [[logo]]
-            header_widths = [18*cm]
-            
-            tabla_header = Table(header_data, colWidths=header_widths)
-            tabla_header.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('BOX', (0, 0), (-1, -1), 1, colors.black),
-                ('TOPPADDING', (0, 0), (-1, -1), 5),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ]))
-            story.append(tabla_header)
-            story.append(Spacer(1, 0.2*cm))
-        
-        # Título ORDEN DE COMPRA con formato Nº/AÑO
-        numero_completo = f"{numero_oc}/{anio_oc}"
-        titulo_oc = Table([[Paragraph(f"<b>ORDEN DE COMPRA N° {numero_completo}</b>", style_title)]], colWidths=[18*cm])
-        titulo_oc.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BOX', (0, 0), (-1, -1), 1.5, colors.black),
-            ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]))
-        story.append(titulo_oc)
-        story.append(Spacer(1, 0.15*cm))
-        
-        # Obtener datos de licitación
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
-        if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-            return
-        with engine.connect() as conn:
-            query = text(f"""
-                SELECT "NUMERO_DE_LLAMADO", "AÑO_DEL_LLAMADO", "NOMBRE_DEL_LLAMADO", 
-                       "I_D", "EMPRESA_ADJUDICADA", "RUC"
-                FROM "{esquema}"."llamado"
-                LIMIT 1
-            """)
-            result = conn.execute(query)
-            licitacion = result.fetchone()
-        
-        # ========== SECCIÓN 2: DATOS GENERALES ==========
-        datos_generales_header = [[Paragraph("<b>DATOS GENERALES</b>", style_section_title)]]
-        tabla_dg_header = Table(datos_generales_header, colWidths=[18*cm])
-        tabla_dg_header.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('BACKGROUND', (0, 0), (-1, -1), colors.grey),
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]))
-        story.append(tabla_dg_header)
-        
-        # Fecha: manejar tanto string como datetime
-        if isinstance(fecha_emision, str):
-            fecha_texto = fecha_emision
-        else:
-            fecha_texto = fecha_emision.strftime("%d/%m/%Y")
-        
-        # Formatear ID con punto de miles
-        id_llamado = licitacion[3]
-        id_formateado = f"{id_llamado:,}".replace(",", ".") if id_llamado else "N/A"
-        
-        datos_generales = [
-            [Paragraph("<b>Fecha de Emisión:</b>", style_bold), Paragraph(fecha_texto, style_normal)],
-            [Paragraph("<b>Servicio Beneficiario:</b>", style_bold), Paragraph(servicio, style_normal)],
-            [Paragraph("<b>Usuario Responsable de Emisión de OC:</b>", style_bold), Paragraph(usuario, style_normal)],
-            [Paragraph("<b>Licitación:</b>", style_bold), 
-             Paragraph(f"LPN {licitacion[0]}/{licitacion[1]} - {licitacion[2]}", style_normal)],
-            [Paragraph("<b>I.D. del Llamado:</b>", style_bold), 
-             Paragraph(id_formateado, style_normal)]
-        ]
-        
-        tabla_dg = Table(datos_generales, colWidths=[4.5*cm, 13.5*cm])
-        tabla_dg.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 4),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        story.append(tabla_dg)
-        story.append(Spacer(1, 0.15*cm))
-        
-        # ========== SECCIÓN 3: PROVEEDOR ==========
-        proveedor_header = [[Paragraph("<b>DATOS DEL PROVEEDOR</b>", style_section_title)]]
-        tabla_prov_header = Table(proveedor_header, colWidths=[18*cm])
-        tabla_prov_header.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('BACKGROUND', (0, 0), (-1, -1), colors.grey),
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]))
-        story.append(tabla_prov_header)
-        
-        proveedor_data = [
-            [Paragraph("<b>Empresa:</b>", style_bold), 
-             Paragraph(licitacion[4] if licitacion[4] else "N/A", style_normal)],
-            [Paragraph("<b>RUC:</b>", style_bold), 
-             Paragraph(licitacion[5] if licitacion[5] else "N/A", style_normal)]
-        ]
-        
-        tabla_prov = Table(proveedor_data, colWidths=[4.5*cm, 13.5*cm])
-        tabla_prov.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 4),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        story.append(tabla_prov)
-        story.append(Spacer(1, 0.15*cm))
-        
-        # ========== SECCIÓN 4: DETALLE DE ITEMS ==========
-        items_header = [[Paragraph("<b>DETALLES DE ORDEN DE COMPRA</b>", style_section_title)]]
-        tabla_items_header = Table(items_header, colWidths=[18*cm])
-        tabla_items_header.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('BACKGROUND', (0, 0), (-1, -1), colors.grey),
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]))
-        story.append(tabla_items_header)
-        
-        # Encabezado de tabla de items con UNIDAD DE MEDIDA
-        items_table_data = [[
-            Paragraph("<b>LOTE</b>", style_bold),
-            Paragraph("<b>ITEM</b>", style_bold),
-            Paragraph("<b>CANT.</b>", style_bold),
-            Paragraph("<b>U.M.</b>", style_bold),
-            Paragraph("<b>DESCRIPCIÓN // PRESENTACIÓN // MARCA // PROCEDENCIA</b>", style_bold),
-            Paragraph("<b>PRECIO UNIT.</b>", style_bold),
-            Paragraph("<b>SUBTOTAL</b>", style_bold)
-        ]]
-        
-        monto_total = 0
-        for item in items:
-            # Convertir lote e item manejando decimales
-            try:
-                lote_int = int(float(item['lote'])) if item['lote'] else 0
-            except:
-                lote_int = 0
-            
-            try:
-                item_int = int(float(item['item'])) if item['item'] else 0
-            except:
-                item_int = 0
-            
-            try:
-                cantidad_val = int(float(item['cantidad'])) if item['cantidad'] else 0
-            except:
-                cantidad_val = 0
-            
-            subtotal = cantidad_val * float(item['precio_unitario'])
-            monto_total += subtotal
-            
-            # Descripción completa sin cortar
-            descripcion_completa = item['descripcion']
-            
-            # Unidad de medida (si no existe en item, usar "UNIDAD")
-            unidad_medida = item.get('unidad_medida', 'UNIDAD')
-            
-            items_table_data.append([
-                Paragraph(str(lote_int), style_normal),
-                Paragraph(str(item_int), style_normal),
-                Paragraph(f"{cantidad_val:,}".replace(",", "."), style_normal),
-                Paragraph(unidad_medida, style_normal),
-                Paragraph(descripcion_completa, style_normal),
-                Paragraph(f"Gs. {float(item['precio_unitario']):,.0f}".replace(",", "."), style_normal),
-                Paragraph(f"Gs. {subtotal:,.0f}".replace(",", "."), style_normal)
-            ])
-        
-        tabla_items = Table(items_table_data, colWidths=[1.2*cm, 1.2*cm, 1.2*cm, 1.5*cm, 7*cm, 2.5*cm, 2.5*cm])
-        tabla_items.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
-            ('ALIGN', (0, 0), (3, -1), 'CENTER'),
-            ('ALIGN', (5, 1), (6, -1), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 7),
-            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        story.append(tabla_items)
-        story.append(Spacer(1, 0.1*cm))
-        
-        # ========== SECCIÓN 5: MONTO TOTAL ==========
-        monto_letras = numero_a_letras(int(monto_total))
-        
-        total_data = [
-            [Paragraph("<b>MONTO TOTAL:</b>", style_bold), 
-             Paragraph(f"<b>Gs. {monto_total:,.0f}</b>".replace(",", "."), style_bold)],
-            [Paragraph("<b>MONTO EN LETRAS:</b>", style_bold), 
-             Paragraph(monto_letras, style_normal)]
-        ]
-        
-        tabla_total = Table(total_data, colWidths=[4.5*cm, 13.5*cm])
-        tabla_total.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 4),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 4),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        story.append(tabla_total)
-        story.append(Spacer(1, 0.15*cm))
-        
-        # ========== SECCIÓN 6: FIRMAS ==========
-        firmas_header = [[Paragraph("<b>FIRMAS Y AUTORIZACIONES</b>", style_section_title)]]
-        tabla_firmas_header = Table(firmas_header, colWidths=[18*cm])
-        tabla_firmas_header.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('BACKGROUND', (0, 0), (-1, -1), colors.grey),
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 4),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
-        ]))
-        story.append(tabla_firmas_header)
-        
-        # 2 cuadros grandes para firmar y sellar
-        firmas_data = [
-            [Paragraph("", style_normal), Paragraph("", style_normal)],
-            [Paragraph("<b>DIRECTOR ADMINISTRATIVO</b>", style_bold), 
-             Paragraph("<b>DIRECTOR GENERAL Y/O REGIONAL</b>", style_bold)]
-        ]
-        
-        tabla_firmas = Table(firmas_data, colWidths=[9*cm, 9*cm], rowHeights=[2.5*cm, 0.6*cm])
-        tabla_firmas.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 1, colors.black),
-            ('BOX', (0, 0), (0, -1), 1, colors.black),  # Cuadro izquierdo
-            ('BOX', (1, 0), (1, -1), 1, colors.black),  # Cuadro derecho
-            ('LINEABOVE', (0, 1), (-1, 1), 0.5, colors.black),  # Línea arriba de nombres
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
-            ('VALIGN', (0, 1), (-1, 1), 'MIDDLE'),
-            ('BACKGROUND', (0, 1), (-1, 1), colors.lightgrey),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        story.append(tabla_firmas)
-        story.append(Spacer(1, 0.15*cm))
-        
-        # ========== PIE DE PÁGINA: Recepción ==========
-        recepcion_data = [
-            [Paragraph("<b>RECEPCIÓN DE ORDEN DE COMPRA</b>", style_section_title)],
-            [Paragraph(f"<b>Empresa:</b> {licitacion[4] if licitacion[4] else 'N/A'}", style_normal)],
-            [Paragraph(f"<b>RUC:</b> {licitacion[5] if licitacion[5] else 'N/A'}", style_normal)],
-            [Paragraph("<b>Fecha de Recepción:</b> _____ / _____ / __________", style_normal)]
-        ]
-        
-        tabla_recepcion = Table(recepcion_data, colWidths=[18*cm])
-        tabla_recepcion.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('BACKGROUND', (0, 0), (0, 0), colors.grey),
-            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        story.append(tabla_recepcion)
-        
-        # Construir PDF
-        doc.build(story)
-        
-        # Retornar bytes
-        pdf_bytes = buffer.getvalue()
-        buffer.close()
-        
-        return pdf_bytes, None
+        licitacion = obtener_datos_llamado([esquema]).get(esquema)
+        return pdf_render.pdf_orden_compra(
+            licitacion, numero_oc, anio_oc, fecha_emision, servicio, items, usuario
+        ), None
         
     except Exception as e:
         return None, f"Error generando PDF: {e}"
 
 def generar_numero_acta():
-    """Genera el siguiente número de acta correlativo del año actual"""
+    """Sugiere el siguiente número de acta correlativo del año actual (no lo reserva)"""
     try:
         anio_actual = datetime.now().year
         
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
+        engine = safe_get_engine()
         if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-            return
-        with engine.connect() as conn:
-            # Obtener el último número del año
-            query = text("""
-                SELECT numero_acta 
-                FROM public.actas_recepcion 
-                WHERE anio = :anio 
-                ORDER BY numero_acta DESC 
-                LIMIT 1
-            """)
-            result = conn.execute(query, {"anio": anio_actual})
-            ultimo = result.fetchone()
-            
-            if ultimo:
-                # Extraer número (001/2025 -> 001)
-                num = int(ultimo[0].split('/')[0])
-                siguiente = num + 1
-            else:
-                siguiente = 1
-            
-            # Formatear como 001/2025
-            numero_acta = f"{siguiente:03d}/{anio_actual}"
-            return numero_acta
+            st.error("⚠️ La numeración de actas requiere conexión directa a la base de datos.")
+            return None
+        with engine.begin() as conn:
+            siguiente = siguiente_numero(conn, 'acta_recepcion', str(anio_actual))
+        
+        # Formatear como 001/2025
+        return f"{siguiente:03d}/{anio_actual}"
             
     except Exception as e:
         st.error(f"Error generando número de acta: {e}")
         return None
 
+def reservar_numero_acta(anio, numero_solicitado=None):
+    """
+    Reserva un número de acta del año con el contador (sin duplicados entre
+    usuarios concurrentes).
+
+    Args:
+        anio: Año del acta
+        numero_solicitado: Número elegido en el formulario (None = el siguiente)
+
+    Returns:
+        str: Número con formato 001/2025
+    """
+    engine = safe_get_engine()
+    if engine is None:
+        raise RuntimeError("La numeración de actas requiere conexión directa a la base de datos")
+    with engine.begin() as conn:
+        numero = reservar_numero(
+            conn, 'acta_recepcion', str(int(anio)),
+            solicitado=int(numero_solicitado) if numero_solicitado else None
+        )
+    return f"{numero:03d}/{int(anio)}"
+
 def guardar_acta_recepcion(esquema, numero_orden, numero_acta, fecha_recepcion, 
                            fecha_emision_remision, fecha_emision_factura,
                            numero_remision, numero_factura, fiscalizador, 
@@ -6956,501 +7355,260 @@ def modificar_acta_recepcion(acta_id, numero_acta, fecha_recepcion, fecha_emisio
 def generar_pdf_acta_recepcion(esquema, numero_oc, fecha_recepcion, servicio, empresa, 
                                 items, lugar_entrega, numero_remision, numero_factura, receptor_nombre, 
                                 observaciones, usuario, fecha_remision=None, fecha_factura=None, numero_acta=None):
-    """
-    Genera PDF HORIZONTAL de Acta de Recepción - VERSIÓN ACTUALIZADA BRUNO
-    
-    CAMBIOS IMPLEMENTADOS:
-    - Logo institucional ancho en lugar de texto
-    - Nombre del llamado en el texto intro
-    - I.D. del llamado formateado
-    - Fechas de emisión para remisión y factura
-    - Número de acta (001/2025)
-    - 5 cuadros con firmas
-    """
+    """Genera PDF HORIZONTAL de Acta de Recepción (ver pdf_render.pdf_acta_recepcion)"""
     try:
-        from reportlab.lib import colors
-        from reportlab.lib.pagesizes import A4, landscape
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.units import cm
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
-        import os
-        
-        # Crear buffer
-        buffer = io.BytesIO()
-        
-        # Configurar documento A4 HORIZONTAL (landscape) - Márgenes reducidos
-        doc = SimpleDocTemplate(
-            buffer, 
-            pagesize=landscape(A4),
-            rightMargin=2*cm,
-            leftMargin=2*cm,
-            topMargin=0.8*cm,   # Reducido
-            bottomMargin=0.9*cm  # Reducido
-        )
-        
-        # Definir colores
-        GRIS_TABLA = colors.Color(0.80, 0.80, 0.80)       # #CCCCCC
-        GRIS_SUAVE = colors.Color(0.93, 0.93, 0.93)       # #EDEDED
-        
-        # Estilos
-        styles = getSampleStyleSheet()
-        
-        style_titulo_acta = ParagraphStyle(
-            'TituloActa',
-            parent=styles['Heading1'],
-            fontSize=14,
-            textColor=colors.black,
-            spaceAfter=0,
-            spaceBefore=0,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        style_normal = ParagraphStyle(
-            'Normal',
-            parent=styles['Normal'],
-            fontSize=9,
-            textColor=colors.black,
-            alignment=TA_JUSTIFY,
-            fontName='Helvetica',
-            leading=11
-        )
-        
-        style_bold = ParagraphStyle(
-            'Bold',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.black,
-            alignment=TA_LEFT,
-            fontName='Helvetica-Bold'
+        licitacion = obtener_datos_llamado([esquema]).get(esquema)
+        return pdf_render.pdf_acta_recepcion(
+            licitacion, numero_oc, fecha_recepcion, servicio, empresa,
+            items, lugar_entrega, numero_remision, numero_factura, receptor_nombre,
+            observaciones, usuario,
+            fecha_remision=fecha_remision, fecha_factura=fecha_factura, numero_acta=numero_acta
         )
         
-        style_campo = ParagraphStyle(
-            'Campo',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.black,
-            alignment=TA_LEFT,
-            fontName='Helvetica'
-        )
-        
-        style_tabla_header = ParagraphStyle(
-            'TablaHeader',
-            parent=styles['Normal'],
-            fontSize=7,
-            textColor=colors.black,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        style_tabla_cell = ParagraphStyle(
-            'TablaCell',
-            parent=styles['Normal'],
-            fontSize=7,
-            textColor=colors.black,
-            alignment=TA_CENTER,
-            fontName='Helvetica'
-        )
-        
-        style_firma = ParagraphStyle(
-            'Firma',
-            parent=styles['Normal'],
-            fontSize=8,
-            textColor=colors.black,
-            alignment=TA_CENTER,
-            fontName='Helvetica-Bold'
-        )
-        
-        style_pie = ParagraphStyle(
-            'Pie',
-            parent=styles['Normal'],
-            fontSize=6,
-            textColor=colors.black,
-            alignment=TA_CENTER,
-            fontName='Helvetica'
-        )
-        
-        # Contenido
-        story = []
-        
-        # Obtener datos de licitación
-        api_config = get_supabase_api_config()
-        engine = get_engine(_api_url=api_config['url'], _api_key=api_config['key'])
-        if engine is None:
-            st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-            return
-        with engine.connect() as conn:
-            query = text(f"""
-                SELECT "NUMERO_DE_LLAMADO", "AÑO_DEL_LLAMADO", "NOMBRE_DEL_LLAMADO", 
-                       "I_D", "EMPRESA_ADJUDICADA", "RUC"
-                FROM "{esquema}"."llamado"
-                LIMIT 1
-            """)
-            result = conn.execute(query)
-            licitacion = result.fetchone()
-        
-        # Extraer datos
-        llamado_numero = licitacion[0] if licitacion else "N/A"
-        llamado_anio = licitacion[1] if licitacion else "N/A"
-        llamado_nombre = licitacion[2] if licitacion else "N/A"
-        id_llamado = licitacion[3] if licitacion else 0
-        empresa_adjudicada = licitacion[4] if licitacion and licitacion[4] else empresa
-        ruc_empresa = licitacion[5] if licitacion and licitacion[5] else "N/A"
-        
-        # Formatear I.D. con puntos (123456 → 123.456)
-        id_formateado = f"{id_llamado:,}".replace(",", ".") if id_llamado else "N/A"
-        
-        # Formatear fecha de recepción
-        if isinstance(fecha_recepcion, str):
-            try:
-                from datetime import datetime
-                fecha_obj = datetime.strptime(fecha_recepcion, "%Y-%m-%d")
-                dia = fecha_obj.day
-                mes = fecha_obj.strftime("%B")
-                anio = fecha_obj.year
-                fecha_mostrar = fecha_obj.strftime("%d/%m/%Y")
-            except:
-                dia = "___"
-                mes = "___________"
-                anio = "____"
-                fecha_mostrar = fecha_recepcion
-        else:
-            dia = fecha_recepcion.day
-            meses_es = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", 
-                       "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
-            mes = meses_es[fecha_recepcion.month - 1]
-            anio = fecha_recepcion.year
-            fecha_mostrar = fecha_recepcion.strftime("%d/%m/%Y")
-        
-        # Fechas de remisión y factura (usar fecha_recepcion si no se proporcionan)
-        if fecha_remision:
-            if isinstance(fecha_remision, str):
-                fecha_remision_mostrar = fecha_remision
-            else:
-                fecha_remision_mostrar = fecha_remision.strftime("%d/%m/%Y")
-        else:
-            fecha_remision_mostrar = fecha_mostrar
-        
-        if fecha_factura:
-            if isinstance(fecha_factura, str):
-                fecha_factura_mostrar = fecha_factura
+    except Exception as e:
+        st.error(f"Error generando PDF del Acta: {e}")
+        import traceback
+        st.error(traceback.format_exc())
+        return None
+
+def tareas_pdf_ordenes(codigo=None, fecha_desde=None, fecha_hasta=None):
+    """
+    Tareas de pdf_render.generar_zip para todas las órdenes de una licitación
+    y/o rango de fechas de emisión: dos consultas en total (ítems y llamados).
+    """
+    engine = safe_get_engine()
+    if engine is None:
+        return []
+    
+    filtros = ['"NUMERO_ORDEN_DE_COMPRA" IS NOT NULL', '"NUMERO_ORDEN_DE_COMPRA" <> \'\'']
+    params = {}
+    if codigo:
+        filtros.append('codigo_licitacion = :codigo')
+        params['codigo'] = codigo
+    if fecha_desde:
+        filtros.append('"FECHA_DE_EMISION" >= :desde')
+        params['desde'] = fecha_desde
+    if fecha_hasta:
+        filtros.append('"FECHA_DE_EMISION" <= :hasta')
+        params['hasta'] = fecha_hasta
+    
+    with engine.connect() as conn:
+        filas = conn.execute(text(f"""
+            SELECT codigo_licitacion, "NUMERO_ORDEN_DE_COMPRA", "FECHA_DE_EMISION",
+                   "SERVICIO_BENEFICIARIO", "LOTE", "ITEM", "CANTIDAD_SOLICITADA",
+                   "UNIDAD_DE_MEDIDA", "DESCRIPCION_DEL_PRODUCTO_MARCA_PROCEDENCIA", "PRECIO_UNITARIO"
+            FROM oxigeno.orden_de_compra
+            WHERE {' AND '.join(filtros)}
+            ORDER BY codigo_licitacion, "NUMERO_ORDEN_DE_COMPRA", "LOTE", "ITEM"
+        """), params).fetchall()
+    
+    ordenes = {}
+    for fila in filas:
+        orden = ordenes.setdefault((fila[0], fila[1]), {
+            'fecha_emision': fila[2], 'servicio': fila[3] or '', 'items': []
+        })
+        orden['items'].append({
+            'lote': fila[4],
+            'item': fila[5],
+            'cantidad': float(fila[6] or 0),
+            'unidad_medida': fila[7] or 'UNIDAD',
+            'descripcion': fila[8] or '',
+            'precio_unitario': float(fila[9] or 0)
+        })
+    
+    llamados = obtener_datos_llamado({codigo_oc for codigo_oc, _numero in ordenes})
+    tareas = []
+    for (codigo_oc, numero), orden in ordenes.items():
+        fecha = orden['fecha_emision']
+        anio = fecha.year if fecha else datetime.now().year
+        tareas.append((
+            f"{codigo_oc.replace('/', '-')}/OC_{numero.replace('/', '_')}.pdf",
+            'orden_compra',
+            {
+                'licitacion': llamados.get(codigo_oc),
+                'numero_oc': numero,
+                'anio_oc': anio,
+                'fecha_emision': fecha.strftime('%d/%m/%Y') if fecha else '',
+                'servicio': orden['servicio'],
+                'items': orden['items'],
+                'usuario': 'Sistema'
+            }
+        ))
+    return tareas
+
+def tareas_pdf_actas(codigo=None, fecha_desde=None, fecha_hasta=None):
+    """
+    Tareas de pdf_render.generar_zip para las actas de recepción de una
+    licitación y/o rango de fechas de recepción.
+    """
+    engine = safe_get_engine()
+    if engine is None:
+        return []
+    
+    filtros = []
+    params = {}
+    if codigo:
+        filtros.append('a.esquema = :codigo')
+        params['codigo'] = codigo
+    if fecha_desde:
+        filtros.append('a.fecha_recepcion >= :desde')
+        params['desde'] = fecha_desde
+    if fecha_hasta:
+        filtros.append('a.fecha_recepcion <= :hasta')
+        params['hasta'] = fecha_hasta
+    where = f"WHERE {' AND '.join(filtros)}" if filtros else ""
+    
+    with engine.connect() as conn:
+        # Servicio de cada acta desde su orden (una sola consulta, no una por acta)
+        actas = conn.execute(text(f"""
+            SELECT a.numero_acta, a.esquema, a.numero_orden, a.fecha_recepcion,
+                   a.fecha_emision_remision, a.fecha_emision_factura,
+                   a.numero_remision, a.numero_factura, a.fiscalizador, a.observaciones,
+                   a.items_recibidos, a.usuario_creacion,
+                   (SELECT o."SERVICIO_BENEFICIARIO" FROM oxigeno.orden_de_compra o
+                    WHERE o.codigo_licitacion = a.esquema
+                      AND o."NUMERO_ORDEN_DE_COMPRA" = a.numero_orden
+                    LIMIT 1) AS servicio
+            FROM public.actas_recepcion a
+            {where}
+            ORDER BY a.esquema, a.anio, a.numero_acta
+        """), params).fetchall()
+    
+    llamados = obtener_datos_llamado({acta[1] for acta in actas})
+    tareas = []
+    for acta in actas:
+        items = acta[10]
+        if isinstance(items, str):
+            items = json.loads(items)
+        servicio = acta[12] or "DGGIES"
+        tareas.append((
+            f"{acta[1].replace('/', '-')}/Acta_{acta[0].replace('/', '-')}.pdf",
+            'acta_recepcion',
+            {
+                'licitacion': llamados.get(acta[1]),
+                'numero_oc': acta[2],
+                'fecha_recepcion': acta[3],
+                'servicio': servicio,
+                'empresa': "N/A",
+                'items': items or [],
+                'lugar_entrega': servicio,
+                'numero_remision': acta[6],
+                'numero_factura': acta[7],
+                'receptor_nombre': acta[8],
+                'observaciones': acta[9],
+                'usuario': acta[11],
+                'fecha_remision': acta[4],
+                'fecha_factura': acta[5],
+                'numero_acta': acta[0]
+            }
+        ))
+    return tareas
+
+# ZIPs de descarga masiva: en disco, la sesión solo guarda la ruta
+ZIP_LOTE_DIR = os.path.join(tempfile.gettempdir(), "sistema_mspbs_zip_pdfs")
+# Los ZIPs de sesiones que no los descargaron se borran pasado este tiempo
+ZIP_LOTE_MAX_SEGUNDOS = 3600
+
+def _descartar_zip_lote():
+    """Borra el ZIP generado de la sesión (tras descargarlo o al cambiar los filtros)"""
+    zip_lote = st.session_state.pop('pdf_lote_zip', None)
+    if zip_lote:
+        try:
+            os.remove(zip_lote['ruta'])
+        except OSError:
+            pass
+
+def _podar_zips_lote():
+    """Elimina los ZIPs abandonados (sesiones cerradas sin descargar)"""
+    limite = time.time() - ZIP_LOTE_MAX_SEGUNDOS
+    try:
+        for nombre in os.listdir(ZIP_LOTE_DIR):
+            ruta = os.path.join(ZIP_LOTE_DIR, nombre)
+            if os.path.getmtime(ruta) < limite:
+                os.remove(ruta)
+    except OSError:
+        pass
+
+def mostrar_descarga_masiva_pdfs(esquemas):
+    """Expander para descargar en un ZIP los PDFs de una licitación o rango de fechas"""
+    with st.expander("📦 Descarga masiva de PDFs"):
+        col1, col2 = st.columns(2)
+        with col1:
+            tipo = st.radio(
+                "Documentos:",
+                options=['orden_compra', 'acta_recepcion'],
+                format_func=lambda x: "Órdenes de compra" if x == 'orden_compra' else "Actas de recepción",
+                key="pdf_lote_tipo",
+                horizontal=True
+            )
+            codigo = st.selectbox(
+                "Licitación:",
+                options=[None] + list(esquemas),
+                format_func=lambda x: "Todas las licitaciones" if x is None else x,
+                key="pdf_lote_codigo"
+            )
+        with col2:
+            fecha_desde = st.date_input("Fecha desde:", value=None, key="pdf_lote_desde")
+            fecha_hasta = st.date_input("Fecha hasta:", value=None, key="pdf_lote_hasta")
+        
+        # Un ZIP generado con otros filtros ya no corresponde: se descarta
+        firma_filtros = (tipo, codigo, fecha_desde, fecha_hasta)
+        zip_lote = st.session_state.get('pdf_lote_zip')
+        if zip_lote and (zip_lote['filtros'] != firma_filtros or not os.path.exists(zip_lote['ruta'])):
+            _descartar_zip_lote()
+        
+        if st.button("🗜️ Generar ZIP", key="pdf_lote_generar"):
+            _descartar_zip_lote()
+            if tipo == 'orden_compra':
+                tareas = tareas_pdf_ordenes(codigo, fecha_desde, fecha_hasta)
             else:
-                fecha_factura_mostrar = fecha_factura.strftime("%d/%m/%Y")
-        else:
-            fecha_factura_mostrar = fecha_mostrar
-        
-        # ========== ENCABEZADO CON LOGO ==========
-        # Intentar cargar logo institucional
-        logos_dir = "/home/claude/logos_gobierno"
-        logo_path = os.path.join(logos_dir, "logo_principal.png")
-        
-        if os.path.exists(logo_path):
-            # Logo existe - usarlo ANCHO y BAJO
-            logo = RLImage(logo_path, width=25.7*cm, height=1.5*cm, kind='proportional')
-            header_data = [[logo]]
-        else:
-            # No hay logo - usar texto simple
-            header_data = [[Paragraph(
-                "<b>MINISTERIO DE SALUD PÚBLICA Y BIENESTAR SOCIAL</b><br/>" +
-                "DIRECCIÓN GENERAL DE GESTIÓN DE INSUMOS ESTRATÉGICOS EN SALUD",
-                style_titulo_acta
-            )]]
-        
-        tabla_header = Table(header_data, colWidths=[25.7*cm])
-        tabla_header.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-        ]))
-        story.append(tabla_header)
-        story.append(Spacer(1, 0.2*cm))
-        
-        # Título ACTA (sin DEFINITIVA)
-        titulo_text = "<b>📋 ACTA DE RECEPCIÓN</b>"
-        if numero_acta:
-            titulo_text += f"<br/><b>N° {numero_acta}</b>"
-        
-        titulo_data = [[Paragraph(titulo_text, style_titulo_acta)]]
-        tabla_titulo = Table(titulo_data, colWidths=[25.7*cm])
-        tabla_titulo.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        story.append(tabla_titulo)
-        story.append(Spacer(1, 0.2*cm))
-        
-        # ========== TEXTO INTRODUCCIÓN (sin DEFINITIVA) ==========
-        texto_intro = f"""A los <b>{dia}</b> días del mes de <b>{mes}</b> del año <b>{anio}</b> en el <b>{servicio.upper()}</b> 
-dependiente del Ministerio de Salud Pública y Bienestar Social, se procede a la elaboración del Acta de 
-Recepción, de lo adjudicado a la empresa <b>{empresa_adjudicada}</b> correspondiente al llamado 
-<b>LPN {llamado_numero}/{llamado_anio} "{llamado_nombre}" I.D. N° {id_formateado}</b> - los cuales se describen 
-en el siguiente cuadro y firman al pie conformes los responsables por parte de la Institución y la Empresa Adjudicada."""
-        
-        intro_data = [[Paragraph(texto_intro, style_normal)]]
-        tabla_intro = Table(intro_data, colWidths=[25.7*cm])
-        tabla_intro.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ('TOPPADDING', (0, 0), (-1, -1), 6),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-        ]))
-        story.append(tabla_intro)
-        story.append(Spacer(1, 0.15*cm))
-        
-        # ========== TABLA DE ITEMS (COMPACTA) ==========
-        items_table_data = [[
-            Paragraph("<b>LOTE</b>", style_tabla_header),
-            Paragraph("<b>ITEM</b>", style_tabla_header),
-            Paragraph("<b>CANT.</b>", style_tabla_header),
-            Paragraph("<b>UNIDAD</b>", style_tabla_header),
-            Paragraph("<b>DESCRIPCIÓN // PRESENTACIÓN // MARCA // PROCEDENCIA</b>", style_tabla_header),
-            Paragraph("<b>PRECIO UNIT.</b>", style_tabla_header),
-            Paragraph("<b>TOTAL</b>", style_tabla_header)
-        ]]
-        
-        monto_total = 0
-        for item in items:
-            try:
-                lote_int = int(float(item['lote'])) if item['lote'] else 0
-            except:
-                lote_int = 0
-            
-            try:
-                item_int = int(float(item['item'])) if item['item'] else 0
-            except:
-                item_int = 0
-            
-            try:
-                cantidad_val = int(float(item['cantidad'])) if item['cantidad'] else 0
-            except:
-                cantidad_val = 0
+                tareas = tareas_pdf_actas(codigo, fecha_desde, fecha_hasta)
             
-            try:
-                precio_unit = float(item['precio_unitario']) if item['precio_unitario'] else 0
-            except:
-                precio_unit = 0
-            
-            subtotal = cantidad_val * precio_unit
-            monto_total += subtotal
-            
-            unidad_medida = item.get('unidad_medida', 'UNIDAD')
-            
-            items_table_data.append([
-                Paragraph(str(lote_int), style_tabla_cell),
-                Paragraph(str(item_int), style_tabla_cell),
-                Paragraph(f"{cantidad_val:,}".replace(",", "."), style_tabla_cell),
-                Paragraph(unidad_medida, style_tabla_cell),
-                Paragraph(item['descripcion'], style_tabla_cell),
-                Paragraph(f"Gs. {precio_unit:,.0f}".replace(",", "."), style_tabla_cell),
-                Paragraph(f"Gs. {subtotal:,.0f}".replace(",", "."), style_tabla_cell)
-            ])
-        
-        # Fila de TOTAL - combinar columnas LOTE a UNIDAD
-        items_table_data.append([
-            Paragraph("<b>TOTAL:</b>", style_tabla_header),
-            Paragraph("", style_tabla_cell),
-            Paragraph("", style_tabla_cell),
-            Paragraph("", style_tabla_cell),
-            Paragraph("", style_tabla_cell),
-            Paragraph("", style_tabla_header),
-            Paragraph(f"<b>Gs. {monto_total:,.0f}</b>".replace(",", "."), style_tabla_header)
-        ])
-        
-        tabla_items = Table(items_table_data, colWidths=[1.3*cm, 1.3*cm, 1.8*cm, 1.8*cm, 12*cm, 3.25*cm, 3.25*cm])
-        tabla_items.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), GRIS_TABLA),
-            ('ALIGN', (0, 0), (3, -1), 'CENTER'),
-            ('ALIGN', (4, 1), (4, -2), 'LEFT'),
-            ('ALIGN', (5, 0), (-1, -1), 'RIGHT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTSIZE', (0, 0), (-1, -1), 7),
-            ('LEFTPADDING', (0, 0), (-1, -1), 2),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 2),
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-            ('BACKGROUND', (0, -1), (-1, -1), GRIS_SUAVE),
-            # Combinar celdas en última fila (LOTE a UNIDAD)
-            ('SPAN', (0, -1), (4, -1)),
-        ]))
-        story.append(tabla_items)
-        story.append(Spacer(1, 0.1*cm))
-        
-        # ========== MONTO EN LETRAS (COMPACTO) ==========
-        monto_letras = numero_a_letras(int(monto_total))
-        letras_data = [[Paragraph(f"<b>Son Guaraníes:</b> {monto_letras}", style_campo)]]
-        tabla_letras = Table(letras_data, colWidths=[25.7*cm])
-        tabla_letras.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
-            ('LEFTPADDING', (0, 0), (-1, -1), 6),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        story.append(tabla_letras)
-        story.append(Spacer(1, 0.1*cm))
-        
-        # ========== OBSERVACIONES (COMPACTO) ==========
-        if observaciones:
-            obs_data = [
-                [Paragraph("<b>OBSERVACIONES</b>", style_bold)],
-                [Paragraph(observaciones, style_campo)]
-            ]
-            tabla_obs = Table(obs_data, colWidths=[25.7*cm])
-            tabla_obs.setStyle(TableStyle([
-                ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                ('BACKGROUND', (0, 0), (-1, 0), GRIS_SUAVE),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('VALIGN', (0, 0), (-1, -1), 'TOP'),
-                ('LEFTPADDING', (0, 0), (-1, -1), 6),
-                ('TOPPADDING', (0, 0), (-1, -1), 3),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ]))
-            story.append(tabla_obs)
-            story.append(Spacer(1, 0.1*cm))
-        
-        # ========== SECCIÓN DE FIRMAS - 5 CUADROS EN LÍNEA ==========
-        # Separar remisiones y facturas si vienen múltiples
-        remisiones = numero_remision.split(',') if numero_remision else []
-        facturas = numero_factura.split(',') if numero_factura else []
-        
-        # Construir filas para tabla interna
-        datos_internos = []
-        
-        # ORDEN DE COMPRA
-        datos_internos.append([
-            Paragraph("<b>N° ORDEN DE COMPRA:</b>", style_campo), 
-            Paragraph("<b>FECHA DE EMISION:</b>", style_campo)
-        ])
-        datos_internos.append([
-            Paragraph(numero_oc, style_campo), 
-            Paragraph(fecha_mostrar, style_campo)
-        ])
-        
-        # REMISIONES
-        datos_internos.append([
-            Paragraph("<b>N° DE REMISION:</b>", style_campo), 
-            Paragraph("<b>FECHA DE EMISION:</b>", style_campo)
-        ])
-        if remisiones:
-            for rem in remisiones:
-                datos_internos.append([
-                    Paragraph(rem.strip(), style_campo), 
-                    Paragraph(fecha_remision_mostrar, style_campo)
-                ])
-        else:
-            datos_internos.append([
-                Paragraph("N/A", style_campo), 
-                Paragraph(fecha_remision_mostrar, style_campo)
-            ])
-        
-        # FACTURAS
-        datos_internos.append([
-            Paragraph("<b>N° DE FACTURA:</b>", style_campo), 
-            Paragraph("<b>FECHA DE EMISION:</b>", style_campo)
-        ])
-        if facturas:
-            for fac in facturas:
-                datos_internos.append([
-                    Paragraph(f"• {fac.strip()}", style_campo), 
-                    Paragraph(fecha_factura_mostrar, style_campo)
-                ])
-        else:
-            datos_internos.append([
-                Paragraph("N/A", style_campo), 
-                Paragraph(fecha_factura_mostrar, style_campo)
-            ])
-        
-        tabla_datos_internos = Table(datos_internos, colWidths=[3*cm, 3*cm])
-        tabla_datos_internos.setStyle(TableStyle([
-            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('FONTSIZE', (0, 0), (-1, -1), 7),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('LEFTPADDING', (0, 0), (-1, -1), 3),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        
-        firmas_data = [
-            # Fila 1: Tabla interna con datos en 2 columnas
-            [tabla_datos_internos, "", "", "", ""],
-            # Fila 2: Espacio firma
-            ["", "", "", "", ""],
-            # Fila 3: Headers
-            ["", 
-             Paragraph("<b>EMPRESA ADJUDICADA</b>", style_firma),
-             Paragraph("<b>RESPONSABLE/JEFE<br/>SUMINISTROS</b>", style_firma),
-             Paragraph("<b>FISCALIZADOR</b>", style_firma),
-             Paragraph("<b>DIRECTOR GENERAL<br/>O REGIONAL</b>", style_firma)]
-        ]
-        
-        tabla_firmas = Table(firmas_data, colWidths=[6*cm, 4.92*cm, 4.92*cm, 4.93*cm, 4.93*cm])
-        tabla_firmas.setStyle(TableStyle([
-            # Bordes externos
-            ('BOX', (0, 0), (0, -1), 1, colors.black),
-            ('BOX', (1, 0), (1, -1), 1, colors.black),
-            ('BOX', (2, 0), (2, -1), 1, colors.black),
-            ('BOX', (3, 0), (3, -1), 1, colors.black),
-            ('BOX', (4, 0), (4, -1), 1, colors.black),
-            
-            # LÍNEA CONTINUA atravesando columnas 1-4 (antes de headers)
-            ('LINEABOVE', (1, -1), (4, -1), 1, colors.black),
-            
-            # Alineación
-            ('ALIGN', (0, 0), (0, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
-            ('VALIGN', (0, 0), (-1, -2), 'TOP'),
-            ('VALIGN', (0, -1), (-1, -1), 'BOTTOM'),
-            
-            # Tamaño
-            ('FONTSIZE', (0, 0), (-1, -1), 7),
-            
-            # Padding
-            ('TOPPADDING', (0, 0), (-1, -1), 2),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-            ('LEFTPADDING', (0, 0), (-1, -1), 5),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        story.append(tabla_firmas)
-        story.append(Spacer(1, 0.1*cm))
-        
-        # ========== NOTA LEGAL PIE (MUY COMPACTO) ==========
-        pie_data = [[Paragraph(
-            "La veracidad de los datos consignados en el presente documento son de expresa " +
-            "responsabilidad de los firmantes y tendrá carácter de DD.JJ., quedarán sin validez " +
-            "ante la falta de firmas o si presenta enmiendas y/o tachaduras.",
-            style_pie
-        )]]
-        tabla_pie = Table(pie_data, colWidths=[25.7*cm])
-        tabla_pie.setStyle(TableStyle([
-            ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        story.append(tabla_pie)
-        
-        # Construir PDF
-        doc.build(story)
-        
-        # Retornar bytes
-        pdf_bytes = buffer.getvalue()
-        buffer.close()
-        
-        return pdf_bytes
+            if not tareas:
+                st.info("No hay documentos con esos filtros.")
+            else:
+                barra = st.progress(0.0, text=f"Generando {len(tareas)} PDFs...")
+                
+                def progreso(procesados, total):
+                    barra.progress(procesados / total, text=f"Generando PDFs... {procesados}/{total}")
+                
+                os.makedirs(ZIP_LOTE_DIR, exist_ok=True)
+                _podar_zips_lote()
+                with tempfile.NamedTemporaryFile(dir=ZIP_LOTE_DIR, suffix='.zip', delete=False) as destino:
+                    try:
+                        resultado = pdf_render.generar_zip(tareas, destino, progreso=progreso)
+                    except BaseException:
+                        destino.close()
+                        os.remove(destino.name)
+                        raise
+                barra.empty()
+                
+                st.session_state.pdf_lote_zip = {
+                    'ruta': destino.name,
+                    'nombre': f"PDFs_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
+                    'filtros': firma_filtros
+                }
+                st.success(f"✅ {resultado['generados']} PDFs generados")
+                if resultado['errores']:
+                    st.warning(f"⚠️ {len(resultado['errores'])} documentos no se pudieron generar")
+                    st.dataframe(
+                        pd.DataFrame(resultado['errores'], columns=['Archivo', 'Error']),
+                        use_container_width=True
+                    )
         
-    except Exception as e:
-        st.error(f"Error generando PDF del Acta: {e}")
-        import traceback
-        st.error(traceback.format_exc())
-        return None
+        zip_lote = st.session_state.get('pdf_lote_zip')
+        if zip_lote:
+            # El contenido se lee del disco solo para servirlo; al descargarlo se borra
+            with open(zip_lote['ruta'], 'rb') as f:
+                st.download_button(
+                    "📥 Descargar ZIP",
+                    data=f.read(),
+                    file_name=zip_lote['nombre'],
+                    mime="application/zip",
+                    key="pdf_lote_descargar",
+                    on_click=_descartar_zip_lote
+                )
+
 def pagina_ordenes_compra():
     """Página principal de gestión de órdenes de compra"""
     st.header("Gestión de Órdenes de Compra")
@@ -7464,447 +7622,413 @@ def pagina_ordenes_compra():
     with tab1:
         st.subheader("Órdenes de Compra Emitidas")
         
-        # Obtener órdenes de compra
-        ordenes = obtener_ordenes_compra()
-        
-        if ordenes and len(ordenes) > 0:
-            # Función para remover acentos y normalizar texto
-            def normalizar_texto(texto):
-                """Remueve acentos y convierte a minúsculas para búsqueda flexible"""
-                import unicodedata
-                if not texto:
-                    return ""
-                texto = str(texto).lower()
-                # Remover acentos
-                texto = ''.join(
-                    c for c in unicodedata.normalize('NFD', texto)
-                    if unicodedata.category(c) != 'Mn'
-                )
-                return texto
+        engine = safe_get_engine()
+        
+        # PDFs de muchas órdenes o actas a la vez, en un ZIP
+        mostrar_descarga_masiva_pdfs(esquemas)
+        
+        # BUSCADOR Y FILTROS
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            busqueda = st.text_input("🔍 Buscar (sin acentos, flexible):", 
+                                    key="buscar_orden",
+                                    placeholder="Ej: hospital, oxigena, san lorenzo...")
+        with col2:
+            # Formatear esquemas para el selector
+            esquemas_formateados = {}
+            for esq in esquemas:
+                esq_bonito = esq.replace('lpn_', 'LPN ').replace('_', ' ').upper()
+                esquemas_formateados[esq_bonito] = esq
+            
+            opciones_filtro = ["Todos"] + list(esquemas_formateados.keys())
+            esquema_seleccionado = st.selectbox(
+                "Filtrar por Licitación:",
+                options=opciones_filtro,
+                key="filtro_esquema_ordenes"
+            )
+        
+        esquema_filtro = esquemas_formateados.get(esquema_seleccionado)
+        busqueda = (busqueda or '').strip()
+        
+        # Paginación por clave: se guarda el cursor de inicio de cada página
+        # visitada y se reinicia cuando cambian los filtros
+        firma_filtros = (busqueda, esquema_filtro)
+        if st.session_state.get('ordenes_filtros') != firma_filtros:
+            st.session_state.ordenes_filtros = firma_filtros
+            st.session_state.ordenes_cursores = [None]
+        cursores = st.session_state.ordenes_cursores
+        
+        # Una consulta por página (filtros aplicados en la base de datos)
+        ordenes = obtener_ordenes_compra(
+            esquema=esquema_filtro,
+            busqueda=busqueda,
+            limite=ORDENES_POR_PAGINA + 1,
+            despues_de=cursores[-1]
+        )
+        hay_siguiente = len(ordenes) > ORDENES_POR_PAGINA
+        ordenes_pagina = ordenes[:ORDENES_POR_PAGINA]
+        
+        if ordenes_pagina:
+            # Empresa desde el llamado solo para las órdenes que no la traen
+            sin_empresa = [o['esquema'] for o in ordenes_pagina if not o.get('empresa')]
+            if sin_empresa:
+                empresas = obtener_empresas_licitaciones(sin_empresa)
+                for o in ordenes_pagina:
+                    if not o.get('empresa'):
+                        o['empresa'] = empresas.get(o['esquema'], 'N/A')
+            
+            col_total, col_anterior, col_siguiente = st.columns([3, 1, 1])
+            with col_total:
+                # Mostrar contador compacto
+                st.write(f"**Página {len(cursores)}: {len(ordenes_pagina)} órdenes**")
+            with col_anterior:
+                if st.button("⬅️ Anterior", key="ordenes_pagina_anterior",
+                             disabled=len(cursores) == 1, use_container_width=True):
+                    cursores.pop()
+                    st.rerun()
+            with col_siguiente:
+                if st.button("Siguiente ➡️", key="ordenes_pagina_siguiente",
+                             disabled=not hay_siguiente, use_container_width=True):
+                    cursores.append(ordenes_pagina[-1]['cursor'])
+                    st.rerun()
             
-            # BUSCADOR Y FILTROS
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                busqueda = st.text_input("🔍 Buscar (sin acentos, flexible):", 
-                                        key="buscar_orden",
-                                        placeholder="Ej: hospital, oxigena, san lorenzo...")
-            with col2:
-                # Formatear esquemas para el selector
-                esquemas_formateados = {}
-                for esq in esquemas:
-                    esq_bonito = esq.replace('lpn_', 'LPN ').replace('_', ' ').upper()
-                    esquemas_formateados[esq_bonito] = esq
-                
-                opciones_filtro = ["Todos"] + list(esquemas_formateados.keys())
-                esquema_seleccionado = st.selectbox(
-                    "Filtrar por Licitación:",
-                    options=opciones_filtro,
-                    key="filtro_esquema_ordenes"
-                )
+            # Detalles solo de las órdenes abiertas, en una sola consulta
+            ids_detalle = [
+                o['id'] for o in ordenes_pagina
+                if st.session_state.get(f"ver_detalle_{o['id']}")
+            ]
+            detalles_pagina = obtener_detalles_ordenes_compra(ids_detalle) if ids_detalle else {}
             
-            # Filtrar órdenes
-            ordenes_filtradas = ordenes
-            
-            # Filtro por esquema
-            if esquema_seleccionado != "Todos":
-                esquema_raw = esquemas_formateados[esquema_seleccionado]
-                ordenes_filtradas = [o for o in ordenes_filtradas if o['esquema'] == esquema_raw]
-            
-            # Búsqueda flexible (sin acentos)
-            if busqueda and busqueda.strip():
-                busqueda_norm = normalizar_texto(busqueda)
-                ordenes_filtradas = [
-                    o for o in ordenes_filtradas 
-                    if busqueda_norm in normalizar_texto(o.get('numero_orden', ''))
-                    or busqueda_norm in normalizar_texto(o.get('servicio_beneficiario', ''))
-                    or busqueda_norm in normalizar_texto(o.get('empresa', ''))
-                ]
-            
-            if ordenes_filtradas:
-                # Mostrar contador compacto
-                st.write(f"**Total: {len(ordenes_filtradas)} órdenes encontradas**")
-                
-                for orden in ordenes_filtradas:
-                    # Formatear fecha (YYYY-MM-DD → DD/MM/YYYY)
-                    fecha_obj = orden.get('fecha_emision')
-                    if fecha_obj:
-                        if isinstance(fecha_obj, str):
-                            try:
-                                partes = fecha_obj.split('-')
-                                fecha_mostrar = f"{partes[2]}/{partes[1]}/{partes[0]}"
-                            except:
-                                fecha_mostrar = str(fecha_obj)
-                        else:
-                            fecha_mostrar = fecha_obj.strftime('%d/%m/%Y')
+            for orden in ordenes_pagina:
+                # Formatear fecha (YYYY-MM-DD → DD/MM/YYYY)
+                fecha_obj = orden.get('fecha_emision')
+                if fecha_obj:
+                    if isinstance(fecha_obj, str):
+                        try:
+                            partes = fecha_obj.split('-')
+                            fecha_mostrar = f"{partes[2]}/{partes[1]}/{partes[0]}"
+                        except:
+                            fecha_mostrar = str(fecha_obj)
                     else:
-                        fecha_mostrar = 'N/A'
-                    
-                    # Formatear esquema (lpn_100/2023 → LPN 100/2023)
-                    esquema_raw = orden.get('esquema', 'N/A')
-                    esquema_mostrar = esquema_raw.replace('lpn_', 'LPN ').replace('_', ' ').upper()
+                        fecha_mostrar = fecha_obj.strftime('%d/%m/%Y')
+                else:
+                    fecha_mostrar = 'N/A'
                     
-                    # Obtener empresa del esquema
-                    try:
-                        with engine.connect() as conn_empresa:
-                            query_empresa = text(f"""
-                                SELECT "EMPRESA_ADJUDICADA"
-                                FROM "{esquema_raw}"."llamado"
-                                LIMIT 1
-                            """)
-                            result_empresa = conn_empresa.execute(query_empresa)
-                            empresa = result_empresa.scalar() or 'N/A'
-                    except:
-                        empresa = 'N/A'
+                # Formatear esquema (lpn_100/2023 → LPN 100/2023)
+                esquema_raw = orden.get('esquema', 'N/A')
+                esquema_mostrar = esquema_raw.replace('lpn_', 'LPN ').replace('_', ' ').upper()
                     
-                    # Obtener detalles completos de la orden
-                    orden_completa = obtener_detalles_orden_compra(orden['id'])
+                empresa = orden.get('empresa', 'N/A')
                     
-                    # Expander con TODO adentro
-                    with st.expander(f"📋 {orden['numero_orden']} - {orden.get('servicio_beneficiario', 'N/A')}", expanded=False):
-                        if orden_completa:
-                            # === SECCIÓN 1: INFO GENERAL ===
-                            col1, col2 = st.columns(2)
-                            
-                            with col1:
-                                st.markdown(f"**📅 Fecha Emisión:** {fecha_mostrar}")
-                                st.markdown(f"**📂 Licitación:** {esquema_mostrar}")
-                                st.markdown(f"**🏢 Empresa:** {empresa}")
-                                st.markdown(f"**📋 Estado:** {orden.get('estado', 'N/A')}")
-                            
-                            with col2:
-                                st.markdown(f"**👤 Usuario:** {orden.get('usuario', 'N/A')}")
-                                st.markdown(f"**🏥 Servicio:** {orden.get('servicio_beneficiario', 'N/A')}")
-                                st.markdown(f"**📦 Items:** {orden.get('cantidad_items', 0)}")
-                                st.markdown(f"**💰 Monto Total:** ₲ {orden.get('monto_total', 0):,.0f}".replace(",", "."))
+                # Expander con TODO adentro
+                with st.expander(f"📋 {orden['numero_orden']} - {orden.get('servicio_beneficiario', 'N/A')}", expanded=False):
+                    # === SECCIÓN 1: INFO GENERAL (datos de la lista) ===
+                    col1, col2 = st.columns(2)
+                        
+                    with col1:
+                        st.markdown(f"**📅 Fecha Emisión:** {fecha_mostrar}")
+                        st.markdown(f"**📂 Licitación:** {esquema_mostrar}")
+                        st.markdown(f"**🏢 Empresa:** {empresa}")
+                        st.markdown(f"**📋 Estado:** {orden.get('estado', 'N/A')}")
+                        
+                    with col2:
+                        st.markdown(f"**👤 Usuario:** {orden.get('usuario', 'N/A')}")
+                        st.markdown(f"**🏥 Servicio:** {orden.get('servicio_beneficiario', 'N/A')}")
+                        st.markdown(f"**📦 Items:** {orden.get('cantidad_items', 0)}")
+                        st.markdown(f"**💰 Monto Total:** ₲ {orden.get('monto_total', 0):,.0f}".replace(",", "."))
+                        
+                    # Los items y acciones se cargan solo al pedirlos
+                    ver_detalle = st.checkbox("📦 Ver items y acciones", key=f"ver_detalle_{orden['id']}")
+                    orden_completa = detalles_pagina.get(orden['id']) if ver_detalle else None
+                        
+                    if orden_completa:
                             
-                            # === SECCIÓN 2: DETALLE DE ITEMS ===
-                            st.markdown("---")
-                            st.markdown("**📦 Detalle de Items:**")
+                        # === SECCIÓN 2: DETALLE DE ITEMS ===
+                        st.markdown("---")
+                        st.markdown("**📦 Detalle de Items:**")
                             
-                            # Formatear items
-                            items_display = []
-                            for item in orden_completa['items']:
-                                # Limpiar decimales
-                                try:
-                                    lote_val = int(float(item['lote']))
-                                except:
-                                    lote_val = item['lote']
+                        # Formatear items
+                        items_display = []
+                        for item in orden_completa['items']:
+                            # Limpiar decimales
+                            try:
+                                lote_val = int(float(item['lote']))
+                            except:
+                                lote_val = item['lote']
                                 
-                                try:
-                                    item_val = int(float(item['item']))
-                                except:
-                                    item_val = item['item']
+                            try:
+                                item_val = int(float(item['item']))
+                            except:
+                                item_val = item['item']
                                 
-                                try:
-                                    cantidad_val = int(float(item['cantidad']))
-                                    cantidad_fmt = f"{cantidad_val:,}".replace(',', '.')
-                                except:
-                                    cantidad_fmt = str(item['cantidad'])
+                            try:
+                                cantidad_val = int(float(item['cantidad']))
+                                cantidad_fmt = f"{cantidad_val:,}".replace(',', '.')
+                            except:
+                                cantidad_fmt = str(item['cantidad'])
                                 
-                                try:
-                                    precio_val = int(float(item['precio_unitario']))
-                                    precio_fmt = f"₲ {precio_val:,}".replace(',', '.')
-                                except:
-                                    precio_fmt = str(item['precio_unitario'])
+                            try:
+                                precio_val = int(float(item['precio_unitario']))
+                                precio_fmt = f"₲ {precio_val:,}".replace(',', '.')
+                            except:
+                                precio_fmt = str(item['precio_unitario'])
                                 
-                                try:
-                                    monto_val = int(float(item['monto_total']))
-                                    monto_fmt = f"₲ {monto_val:,}".replace(',', '.')
-                                except:
-                                    monto_fmt = str(item['monto_total'])
+                            try:
+                                monto_val = int(float(item['monto_total']))
+                                monto_fmt = f"₲ {monto_val:,}".replace(',', '.')
+                            except:
+                                monto_fmt = str(item['monto_total'])
                                 
-                                items_display.append({
-                                    'Lote': lote_val,
-                                    'Item': item_val,
-                                    'Descripción': item['descripcion'],
-                                    'Cantidad': cantidad_fmt,
-                                    'Unidad de Medida': item.get('unidad_medida', 'UNIDAD'),
-                                    'Precio Unitario': precio_fmt,
-                                    'Monto Total': monto_fmt
-                                })
+                            items_display.append({
+                                'Servicio': item['servicio_beneficiario'],
+                                'Lote': lote_val,
+                                'Item': item_val,
+                                'Descripción': item['descripcion'],
+                                'Cantidad': cantidad_fmt,
+                                'Unidad de Medida': item.get('unidad_medida', 'UNIDAD'),
+                                'Precio Unitario': precio_fmt,
+                                'Monto Total': monto_fmt
+                            })
                             
-                            df_items = pd.DataFrame(items_display)
-                            st.dataframe(df_items, use_container_width=True, height=200)
+                        df_items = pd.DataFrame(items_display)
+                        st.dataframe(df_items, use_container_width=True, height=200)
                             
-                            # === SECCIÓN 3: BOTONES ===
-                            st.markdown("---")
-                            col_btn1, col_btn2 = st.columns(2)
+                        # === SECCIÓN 3: BOTONES ===
+                        st.markdown("---")
+                        col_btn1, col_btn2 = st.columns(2)
                             
-                            with col_btn1:
-                                modificar_clicked = st.button("✏️ Modificar", key=f"modificar_{orden['id']}", use_container_width=True)
+                        with col_btn1:
+                            modificar_clicked = st.button("✏️ Modificar", key=f"modificar_{orden['id']}", use_container_width=True)
                             
-                            with col_btn2:
-                                pdf_clicked = st.button("📄 Orden Compra", key=f"pdf_{orden['id']}", use_container_width=True)
+                        with col_btn2:
+                            pdf_clicked = st.button("📄 Orden Compra", key=f"pdf_{orden['id']}", use_container_width=True)
                             
-                            # === PANEL DE MODIFICACIÓN ===
-                            # Usar session_state para mantener el panel abierto
-                            if modificar_clicked:
-                                st.session_state[f'mostrar_modificar_{orden["id"]}'] = True
+                        # === PANEL DE MODIFICACIÓN ===
+                        # Usar session_state para mantener el panel abierto
+                        if modificar_clicked:
+                            st.session_state[f'mostrar_modificar_{orden["id"]}'] = True
                             
-                            if st.session_state.get(f'mostrar_modificar_{orden["id"]}', False):
-                                st.markdown("---")
-                                st.markdown("### ✏️ Modificar Orden")
+                        if st.session_state.get(f'mostrar_modificar_{orden["id"]}', False):
+                            st.markdown("---")
+                            st.markdown("### ✏️ Modificar Orden")
                                 
-                                # Si ya hay confirmación pendiente, mostrar SOLO la confirmación
-                                if f'confirmar_mod_{orden["id"]}' in st.session_state:
-                                    st.warning("⚠️ **¿Está seguro de guardar estos cambios?**")
-                                    col_c1, col_c2 = st.columns(2)
+                            # Si ya hay confirmación pendiente, mostrar SOLO la confirmación
+                            if f'confirmar_mod_{orden["id"]}' in st.session_state:
+                                st.warning("⚠️ **¿Está seguro de guardar estos cambios?**")
+                                col_c1, col_c2 = st.columns(2)
                                     
-                                    with col_c1:
-                                        if st.button("✅ SÍ, GUARDAR", type="primary", key=f"si_{orden['id']}", use_container_width=True):
-                                            datos = st.session_state[f'confirmar_mod_{orden["id"]}']
-                                            nueva_cantidad = datos['nueva_cantidad']
-                                            nueva_fecha = datos['nueva_fecha']
-                                            cantidad_actual_orden = datos['cantidad_actual']
-                                            fecha_actual = datos['fecha_actual']
-                                            lote_real = datos['lote']
-                                            item_real = datos['item']
+                                with col_c1:
+                                    if st.button("✅ SÍ, GUARDAR", type="primary", key=f"si_{orden['id']}", use_container_width=True):
+                                        datos = st.session_state[f'confirmar_mod_{orden["id"]}']
+                                        nueva_cantidad = datos['nueva_cantidad']
+                                        nueva_fecha = datos['nueva_fecha']
+                                        cantidad_actual_orden = datos['cantidad_actual']
+                                        fecha_actual = datos['fecha_actual']
+                                        servicio_real = datos['servicio']
+                                        lote_real = datos['lote']
+                                        item_real = datos['item']
                                             
-                                            if nueva_cantidad == 0:
-                                                with engine.connect() as conn_del:
-                                                    update_ejec = text(f"""
-                                                        UPDATE "{orden_completa['esquema']}"."ejecucion_general"
-                                                        SET "CANTIDAD_EMITIDA" = "CANTIDAD_EMITIDA" - :cantidad,
-                                                            "SALDO_A_EMITIR" = "CANTIDAD_MAXIMA" - ("CANTIDAD_EMITIDA" - :cantidad)
-                                                        WHERE "LOTE" = :lote AND "ITEM" = :item AND "SERVICIO_BENEFICIARIO" = :servicio
-                                                    """)
-                                                    conn_del.execute(update_ejec, {
-                                                        'cantidad': cantidad_actual_orden,
-                                                        'lote': lote_real,
-                                                        'item': item_real,
-                                                        'servicio': orden_completa['servicio_beneficiario']
-                                                    })
-                                                    
-                                                    delete_query = text(f"""
-                                                        DELETE FROM "{orden_completa['esquema']}".orden_de_compra
-                                                        WHERE "NUMERO_ORDEN_DE_COMPRA" = :numero AND "SERVICIO_BENEFICIARIO" = :servicio
-                                                    """)
-                                                    conn_del.execute(delete_query, {
-                                                        'numero': orden_completa['numero_orden'],
-                                                        'servicio': orden_completa['servicio_beneficiario']
-                                                    })
-                                                    conn_del.commit()
-                                                
-                                                st.success("✅ Orden eliminada")
-                                                del st.session_state[f'confirmar_mod_{orden["id"]}']
+                                        # Escrituras sobre oxigeno.* con el mismo bloqueo ordenado que la emisión
+                                        if nueva_cantidad == 0:
+                                            exito, mensaje = anular_orden_compra(
+                                                orden_completa['esquema'], orden_completa['numero_orden']
+                                            )
+                                            del st.session_state[f'confirmar_mod_{orden["id"]}']
+                                            if exito:
+                                                st.success(f"✅ {mensaje}")
                                                 del st.session_state[f'mostrar_modificar_{orden["id"]}']
                                                 time.sleep(1)
                                                 st.rerun()
+                                            else:
+                                                st.error(f"❌ {mensaje}")
                                             
-                                            elif nueva_cantidad != cantidad_actual_orden or nueva_fecha != fecha_actual:
-                                                diferencia = nueva_cantidad - cantidad_actual_orden
-                                                nueva_fecha_str = nueva_fecha.strftime('%Y-%m-%d')
-                                                
-                                                with engine.connect() as conn_upd:
-                                                    update_query = text(f"""
-                                                        UPDATE "{orden_completa['esquema']}".orden_de_compra
-                                                        SET "CANTIDAD_SOLICITADA" = :cantidad, "FECHA_DE_EMISION" = :fecha
-                                                        WHERE "NUMERO_ORDEN_DE_COMPRA" = :numero AND "SERVICIO_BENEFICIARIO" = :servicio
-                                                    """)
-                                                    conn_upd.execute(update_query, {
-                                                        'cantidad': nueva_cantidad,
-                                                        'fecha': nueva_fecha_str,
-                                                        'numero': orden_completa['numero_orden'],
-                                                        'servicio': orden_completa['servicio_beneficiario']
-                                                    })
-                                                    
-                                                    if diferencia != 0:
-                                                        update_ejec = text(f"""
-                                                            UPDATE "{orden_completa['esquema']}"."ejecucion_general"
-                                                            SET "CANTIDAD_EMITIDA" = "CANTIDAD_EMITIDA" + :diferencia,
-                                                                "SALDO_A_EMITIR" = "CANTIDAD_MAXIMA" - ("CANTIDAD_EMITIDA" + :diferencia)
-                                                            WHERE "LOTE" = :lote AND "ITEM" = :item AND "SERVICIO_BENEFICIARIO" = :servicio
-                                                        """)
-                                                        conn_upd.execute(update_ejec, {
-                                                            'diferencia': diferencia,
-                                                            'lote': lote_real,
-                                                            'item': item_real,
-                                                            'servicio': orden_completa['servicio_beneficiario']
-                                                        })
-                                                    
-                                                    conn_upd.commit()
-                                                
-                                                st.success("✅ Orden modificada")
-                                                del st.session_state[f'confirmar_mod_{orden["id"]}']
+                                        elif nueva_cantidad != cantidad_actual_orden or nueva_fecha != fecha_actual:
+                                            exito, mensaje = modificar_orden_compra(
+                                                orden_completa['esquema'], orden_completa['numero_orden'],
+                                                servicio_real, lote_real, item_real,
+                                                nueva_cantidad, nueva_fecha
+                                            )
+                                            del st.session_state[f'confirmar_mod_{orden["id"]}']
+                                            if exito:
+                                                st.success(f"✅ {mensaje}")
                                                 del st.session_state[f'mostrar_modificar_{orden["id"]}']
                                                 time.sleep(1)
                                                 st.rerun()
                                             else:
-                                                st.warning("⚠️ No hay cambios")
-                                                del st.session_state[f'confirmar_mod_{orden["id"]}']
-                                    
-                                    with col_c2:
-                                        if st.button("❌ NO, CANCELAR", key=f"no_{orden['id']}", use_container_width=True):
+                                                st.error(f"❌ {mensaje}")
+                                        else:
+                                            st.warning("⚠️ No hay cambios")
                                             del st.session_state[f'confirmar_mod_{orden["id"]}']
-                                            st.rerun()
+                                    
+                                with col_c2:
+                                    if st.button("❌ NO, CANCELAR", key=f"no_{orden['id']}", use_container_width=True):
+                                        del st.session_state[f'confirmar_mod_{orden["id"]}']
+                                        st.rerun()
                                 
-                                # Si NO hay confirmación pendiente, mostrar el formulario
-                                else:
-                                    try:
-                                        with engine.connect() as conn_mod:
-                                            query_orden = text(f"""
-                                                SELECT "LOTE", "ITEM"
-                                                FROM "{orden_completa['esquema']}".orden_de_compra
-                                                WHERE "NUMERO_ORDEN_DE_COMPRA" = :numero
-                                                  AND "SERVICIO_BENEFICIARIO" = :servicio
-                                                LIMIT 1
-                                            """)
+                            # Si NO hay confirmación pendiente, mostrar el formulario
+                            else:
+                                try:
+                                    # Una orden puede abarcar varios servicios: se modifica una línea
+                                    # (servicio, lote, ítem) contra el saldo de su propio servicio
+                                    lineas_orden = orden_completa['items']
+                                    indice_linea = st.selectbox(
+                                        "Línea a modificar:",
+                                        options=range(len(lineas_orden)),
+                                        format_func=lambda i: (
+                                            f"{lineas_orden[i]['servicio_beneficiario']} - "
+                                            f"Lote {lineas_orden[i]['lote']} - Item {lineas_orden[i]['item']}"
+                                        ),
+                                        key=f"linea_mod_{orden['id']}"
+                                    )
+                                    linea_orden = lineas_orden[indice_linea]
+                                    servicio_real = linea_orden['servicio_beneficiario']
+                                    lote_real = linea_orden['lote']
+                                    item_real = linea_orden['item']
+                                    
+                                    with engine.connect() as conn_mod:
+                                        row = conn_mod.execute(text("""
+                                            SELECT 
+                                                "CANTIDAD_MAXIMA",
+                                                "CANTIDAD_EMITIDA",
+                                                "SALDO_A_EMITIR"
+                                            FROM oxigeno.ejecucion_general
+                                            WHERE codigo_licitacion = :codigo
+                                              AND "LOTE" = CAST(:lote AS numeric)
+                                              AND "ITEM" = CAST(:item AS numeric)
+                                              AND "SERVICIO_BENEFICIARIO" = :servicio
+                                            LIMIT 1
+                                        """), {
+                                            'codigo': orden_completa['esquema'],
+                                            'lote': lote_real,
+                                            'item': item_real,
+                                            'servicio': servicio_real
+                                        }).fetchone()
+                                        
+                                    if row:
+                                        cantidad_maxima = float(row[0]) if row[0] else 0
+                                        cantidad_emitida = float(row[1]) if row[1] else 0
+                                        saldo_a_emitir = float(row[2]) if row[2] else 0
+                                        porcentaje_emitido = (cantidad_emitida / cantidad_maxima * 100) if cantidad_maxima > 0 else 0
+                                        cantidad_actual_orden = float(linea_orden['cantidad'])
                                             
-                                            result_orden = conn_mod.execute(query_orden, {
-                                                'numero': orden_completa['numero_orden'],
-                                                'servicio': orden_completa['servicio_beneficiario']
-                                            })
+                                        col_info1, col_info2, col_info3 = st.columns(3)
+                                        with col_info1:
+                                            st.metric("Máximo", f"{int(cantidad_maxima):,}".replace(',', '.'))
+                                        with col_info2:
+                                            st.metric("Emitido", f"{int(cantidad_emitida):,}".replace(',', '.'))
+                                        with col_info3:
+                                            st.metric("Disponible", f"{int(saldo_a_emitir):,}".replace(',', '.'))
                                             
-                                            row_orden = result_orden.fetchone()
+                                        st.info(f"📊 Porcentaje emitido: {porcentaje_emitido:.1f}%")
                                             
-                                            if row_orden:
-                                                lote_real = row_orden[0]
-                                                item_real = row_orden[1]
-                                                
-                                                query_disponible = text(f"""
-                                                    SELECT 
-                                                        "CANTIDAD_MAXIMA",
-                                                        "CANTIDAD_EMITIDA",
-                                                        "SALDO_A_EMITIR"
-                                                    FROM "{orden_completa['esquema']}"."ejecucion_general"
-                                                    WHERE "LOTE" = :lote
-                                                      AND "ITEM" = :item
-                                                      AND "SERVICIO_BENEFICIARIO" = :servicio
-                                                    LIMIT 1
-                                                """)
-                                                
-                                                result = conn_mod.execute(query_disponible, {
-                                                    'lote': lote_real,
-                                                    'item': item_real,
-                                                    'servicio': orden_completa['servicio_beneficiario']
-                                                })
-                                                
-                                                row = result.fetchone()
-                                                
-                                                if row:
-                                                    cantidad_maxima = float(row[0]) if row[0] else 0
-                                                    cantidad_emitida = float(row[1]) if row[1] else 0
-                                                    saldo_a_emitir = float(row[2]) if row[2] else 0
-                                                    porcentaje_emitido = (cantidad_emitida / cantidad_maxima * 100) if cantidad_maxima > 0 else 0
-                                                    cantidad_actual_orden = float(orden_completa['items'][0]['cantidad'])
-                                                    
-                                                    col_info1, col_info2, col_info3 = st.columns(3)
-                                                    with col_info1:
-                                                        st.metric("Máximo", f"{int(cantidad_maxima):,}".replace(',', '.'))
-                                                    with col_info2:
-                                                        st.metric("Emitido", f"{int(cantidad_emitida):,}".replace(',', '.'))
-                                                    with col_info3:
-                                                        st.metric("Disponible", f"{int(saldo_a_emitir):,}".replace(',', '.'))
+                                        if porcentaje_emitido >= 100:
+                                            st.error("⚠️ Item al 100%. No se puede modificar.")
+                                        else:
+                                            with st.form(key=f"form_modificar_{orden['id']}"):
+                                                col_mod1, col_mod2 = st.columns(2)
                                                     
-                                                    st.info(f"📊 Porcentaje emitido: {porcentaje_emitido:.1f}%")
+                                                with col_mod1:
+                                                    st.write("**Cantidad Actual:**", f"{int(cantidad_actual_orden):,}".replace(',', '.'))
+                                                    nueva_cantidad = st.number_input(
+                                                        "Nueva Cantidad:",
+                                                        min_value=0,
+                                                        max_value=int(saldo_a_emitir + cantidad_actual_orden),
+                                                        value=int(cantidad_actual_orden),
+                                                        step=1,
+                                                        key=f"cant_{orden['id']}_{indice_linea}"
+                                                    )
                                                     
-                                                    if porcentaje_emitido >= 100:
-                                                        st.error("⚠️ Item al 100%. No se puede modificar.")
-                                                    else:
-                                                        with st.form(key=f"form_modificar_{orden['id']}"):
-                                                            col_mod1, col_mod2 = st.columns(2)
-                                                            
-                                                            with col_mod1:
-                                                                st.write("**Cantidad Actual:**", f"{int(cantidad_actual_orden):,}".replace(',', '.'))
-                                                                nueva_cantidad = st.number_input(
-                                                                    "Nueva Cantidad:",
-                                                                    min_value=0,
-                                                                    max_value=int(saldo_a_emitir + cantidad_actual_orden),
-                                                                    value=int(cantidad_actual_orden),
-                                                                    step=1,
-                                                                    key=f"cant_{orden['id']}"
-                                                                )
-                                                            
-                                                            with col_mod2:
-                                                                st.write("**Fecha Actual:**", fecha_mostrar)
-                                                                try:
-                                                                    partes = fecha_mostrar.split('/')
-                                                                    fecha_actual = date(int(partes[2]), int(partes[1]), int(partes[0]))
-                                                                except:
-                                                                    fecha_actual = date.today()
-                                                                
-                                                                nueva_fecha = st.date_input("Nueva Fecha:", value=fecha_actual, key=f"fecha_{orden['id']}")
-                                                            
-                                                            submit_mod = st.form_submit_button("📝 Confirmar Cambios", type="primary", use_container_width=True)
+                                                with col_mod2:
+                                                    st.write("**Fecha Actual:**", fecha_mostrar)
+                                                    try:
+                                                        partes = fecha_mostrar.split('/')
+                                                        fecha_actual = date(int(partes[2]), int(partes[1]), int(partes[0]))
+                                                    except:
+                                                        fecha_actual = date.today()
                                                         
-                                                        if submit_mod:
-                                                            st.session_state[f'confirmar_mod_{orden["id"]}'] = {
-                                                                'nueva_cantidad': nueva_cantidad,
-                                                                'nueva_fecha': nueva_fecha,
-                                                                'cantidad_actual': cantidad_actual_orden,
-                                                                'fecha_actual': fecha_actual,
-                                                                'lote': lote_real,
-                                                                'item': item_real
-                                                            }
-                                                            st.rerun()
-                                    except Exception as e:
-                                        st.error(f"Error: {e}")
+                                                    nueva_fecha = st.date_input("Nueva Fecha:", value=fecha_actual, key=f"fecha_{orden['id']}")
+                                                    
+                                                submit_mod = st.form_submit_button("📝 Confirmar Cambios", type="primary", use_container_width=True)
+                                                
+                                            if submit_mod:
+                                                st.session_state[f'confirmar_mod_{orden["id"]}'] = {
+                                                    'nueva_cantidad': nueva_cantidad,
+                                                    'nueva_fecha': nueva_fecha,
+                                                    'cantidad_actual': cantidad_actual_orden,
+                                                    'fecha_actual': fecha_actual,
+                                                    'servicio': servicio_real,
+                                                    'lote': lote_real,
+                                                    'item': item_real
+                                                }
+                                                st.rerun()
+                                except Exception as e:
+                                    st.error(f"Error: {e}")
                                 
-                                # Botón para cerrar el panel
-                                if st.button("🔙 Cerrar", key=f"cerrar_mod_{orden['id']}", use_container_width=True):
-                                    if f'mostrar_modificar_{orden["id"]}' in st.session_state:
-                                        del st.session_state[f'mostrar_modificar_{orden["id"]}']
-                                    if f'confirmar_mod_{orden["id"]}' in st.session_state:
-                                        del st.session_state[f'confirmar_mod_{orden["id"]}']
-                                    st.rerun()
+                            # Botón para cerrar el panel
+                            if st.button("🔙 Cerrar", key=f"cerrar_mod_{orden['id']}", use_container_width=True):
+                                if f'mostrar_modificar_{orden["id"]}' in st.session_state:
+                                    del st.session_state[f'mostrar_modificar_{orden["id"]}']
+                                if f'confirmar_mod_{orden["id"]}' in st.session_state:
+                                    del st.session_state[f'confirmar_mod_{orden["id"]}']
+                                st.rerun()
                             
-                            # === PANEL DE PDF ===
-                            if pdf_clicked:
-                                try:
-                                    items_pdf = []
-                                    for item in orden_completa['items']:
-                                        try:
-                                            lote_clean = int(float(item['lote']))
-                                        except:
-                                            lote_clean = item['lote']
+                        # === PANEL DE PDF ===
+                        if pdf_clicked:
+                            try:
+                                items_pdf = []
+                                for item in orden_completa['items']:
+                                    try:
+                                        lote_clean = int(float(item['lote']))
+                                    except:
+                                        lote_clean = item['lote']
                                         
-                                        try:
-                                            item_clean = int(float(item['item']))
-                                        except:
-                                            item_clean = item['item']
+                                    try:
+                                        item_clean = int(float(item['item']))
+                                    except:
+                                        item_clean = item['item']
                                         
-                                        try:
-                                            cantidad_clean = int(float(item['cantidad']))
-                                        except:
-                                            cantidad_clean = item['cantidad']
+                                    try:
+                                        cantidad_clean = int(float(item['cantidad']))
+                                    except:
+                                        cantidad_clean = item['cantidad']
                                         
-                                        items_pdf.append({
-                                            'lote': lote_clean,
-                                            'item': item_clean,
-                                            'descripcion': item['descripcion'],
-                                            'cantidad': cantidad_clean,
-                                            'unidad_medida': item.get('unidad_medida', 'UNIDAD'),
-                                            'precio_unitario': float(item['precio_unitario'])
-                                        })
+                                    items_pdf.append({
+                                        'lote': lote_clean,
+                                        'item': item_clean,
+                                        'descripcion': item['descripcion'],
+                                        'cantidad': cantidad_clean,
+                                        'unidad_medida': item.get('unidad_medida', 'UNIDAD'),
+                                        'precio_unitario': float(item['precio_unitario'])
+                                    })
                                     
-                                    pdf_bytes, error_pdf = generar_pdf_orden_compra(
-                                        orden_completa['esquema'],
-                                        orden_completa['numero_orden'].split('/')[0] if '/' in orden_completa['numero_orden'] else orden_completa['numero_orden'],
-                                        orden_completa['numero_orden'].split('/')[1] if '/' in orden_completa['numero_orden'] else str(datetime.now().year),
-                                        fecha_mostrar,
-                                        orden_completa['servicio_beneficiario'],
-                                        items_pdf,
-                                        orden_completa.get('usuario', 'Sistema')
-                                    )
+                                pdf_bytes, error_pdf = generar_pdf_orden_compra(
+                                    orden_completa['esquema'],
+                                    orden_completa['numero_orden'].split('/')[0] if '/' in orden_completa['numero_orden'] else orden_completa['numero_orden'],
+                                    orden_completa['numero_orden'].split('/')[1] if '/' in orden_completa['numero_orden'] else str(datetime.now().year),
+                                    fecha_mostrar,
+                                    orden_completa['servicio_beneficiario'],
+                                    items_pdf,
+                                    orden_completa.get('usuario', 'Sistema')
+                                )
                                     
-                                    if pdf_bytes:
-                                        st.download_button(
-                                            label="💾 Descargar Orden de Compra PDF",
-                                            data=pdf_bytes,
-                                            file_name=f"OC_{orden['numero_orden']}.pdf",
-                                            mime="application/pdf",
-                                            key=f"download_{orden['id']}",
-                                            use_container_width=True
-                                        )
-                                    else:
-                                        st.error(f"Error: {error_pdf}")
-                                except Exception as e:
-                                    st.error(f"Error: {e}")
+                                if pdf_bytes:
+                                    st.download_button(
+                                        label="💾 Descargar Orden de Compra PDF",
+                                        data=pdf_bytes,
+                                        file_name=f"OC_{orden['numero_orden']}.pdf",
+                                        mime="application/pdf",
+                                        key=f"download_{orden['id']}",
+                                        use_container_width=True
+                                    )
+                                else:
+                                    st.error(f"Error: {error_pdf}")
+                            except Exception as e:
+                                st.error(f"Error: {e}")
                             
-                        else:
-                            st.error("No se pudieron cargar los detalles")
-            else:
-                st.warning("📭 No se encontraron órdenes de compra con esos filtros")
+                    elif ver_detalle:
+                        st.error("No se pudieron cargar los detalles")
+        elif busqueda or esquema_filtro:
+            st.warning("📭 No se encontraron órdenes de compra con esos filtros")
         else:
             st.info("📭 No se encontraron órdenes de compra")
         
@@ -7985,9 +8109,9 @@ def pagina_ordenes_compra():
                 st.markdown("---")
                 
                 # Obtener productos disponibles para este servicio
-                engine = get_engine()
+                engine = safe_get_engine()
                 if engine is None:
-                    st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
+                    st.warning("⚠️ Esta operación requiere conexión directa. No disponible en este momento.")
                     return
                 with engine.connect() as conn:
                     try:
@@ -8001,12 +8125,13 @@ def pagina_ordenes_compra():
                                 "PRECIO_UNITARIO",
                                 ROUND(("CANTIDAD_EMITIDA" / NULLIF("CANTIDAD_MAXIMA", 0)) * 100, 2) as PORCENTAJE_EJECUCION,
                                 "UNIDAD_DE_MEDIDA"
-                            FROM "{esquema_seleccionado}"."ejecucion_general"
-                            WHERE "SERVICIO_BENEFICIARIO" = :servicio
+                            FROM oxigeno.ejecucion_general
+                            WHERE codigo_licitacion = :codigo
+                              AND "SERVICIO_BENEFICIARIO" = :servicio
                               AND ("CANTIDAD_MAXIMA" - COALESCE("CANTIDAD_EMITIDA", 0)) > 0
                             ORDER BY "LOTE", "ITEM"
                         """)
-                        result = conn.execute(query, {"servicio": servicio_seleccionado})
+                        result = conn.execute(query, {"codigo": esquema_seleccionado, "servicio": servicio_seleccionado})
                         productos = result.fetchall()
                         
                         if productos:
@@ -8106,122 +8231,48 @@ def pagina_ordenes_compra():
                                 if not items_seleccionados:
                                     st.error("Debe ingresar cantidad mayor a 0 en al menos un item")
                                 else:
-                                    # Crear la orden de compra
-                                    engine = get_engine()
-                                    if engine is None:
-                                        st.error("⚠️ No se pudo conectar a Supabase API REST. Verifica la configuración en secrets.")
-                                        return
-                                    with engine.connect() as conn:
-                                        try:
-                                            # Iniciar transacción
-                                            trans = conn.begin()
-                                            
-                                            # GUARDAR SOLO EN TABLA DEL ESQUEMA (NO en tabla central)
-                                            # Si eliminas el esquema, las OC se eliminan automáticamente
-                                            
-                                            # Insertar en tabla orden_de_compra del esquema
-                                            for item in items_seleccionados:
-                                                insert_query = text(f"""
-                                                    INSERT INTO "{esquema_seleccionado}"."orden_de_compra" (
-                                                        "NUMERO_ORDEN_DE_COMPRA", 
-                                                        "FECHA_DE_EMISION",
-                                                        "SERVICIO_BENEFICIARIO",
-                                                        "LOTE",
-                                                        "ITEM",
-                                                        "CANTIDAD_SOLICITADA",
-                                                        "UNIDAD_DE_MEDIDA",
-                                                        "DESCRIPCION_DEL_PRODUCTO_MARCA_PROCEDENCIA",
-                                                        "EMPRESA_ADJUDICADA",
-                                                        "PRECIO_UNITARIO",
-                                                        "I_D",
-                                                        "MODALIDAD"
-                                                    ) VALUES (
-                                                        :numero_oc,
-                                                        :fecha_emision,
-                                                        :servicio,
-                                                        :lote,
-                                                        :item,
-                                                        :cantidad,
-                                                        :unidad_medida,
-                                                        :descripcion,
-                                                        (SELECT "EMPRESA_ADJUDICADA" FROM "{esquema_seleccionado}"."ejecucion_general" 
-                                                         WHERE "LOTE" = :lote AND "ITEM" = :item AND "SERVICIO_BENEFICIARIO" = :servicio LIMIT 1),
-                                                        :precio_unitario,
-                                                        (SELECT "I_D" FROM "{esquema_seleccionado}"."ejecucion_general" 
-                                                         WHERE "LOTE" = :lote AND "ITEM" = :item AND "SERVICIO_BENEFICIARIO" = :servicio LIMIT 1),
-                                                        (SELECT "MODALIDAD" FROM "{esquema_seleccionado}"."ejecucion_general" 
-                                                         WHERE "LOTE" = :lote AND "ITEM" = :item AND "SERVICIO_BENEFICIARIO" = :servicio LIMIT 1)
-                                                    )
-                                                """)
-                                                
-                                                conn.execute(insert_query, {
-                                                    'numero_oc': numero_oc,
-                                                    'fecha_emision': fecha_emision,
-                                                    'servicio': servicio_seleccionado,
-                                                    'lote': item['lote'],
-                                                    'item': item['item'],
-                                                    'cantidad': item['cantidad'],
-                                                    'unidad_medida': item['unidad_medida'],
-                                                    'descripcion': item['descripcion'],
-                                                    'precio_unitario': item['precio_unitario']
-                                                })
-                                            
-                                            # Actualizar cantidades emitidas en ejecucion_general
-                                            for item in items_seleccionados:
-                                                update_query = text(f"""
-                                                    UPDATE "{esquema_seleccionado}"."ejecucion_general"
-                                                    SET 
-                                                        "CANTIDAD_EMITIDA" = COALESCE("CANTIDAD_EMITIDA", 0) + :cantidad,
-                                                        "PORCENTAJE_EMITIDO" = CASE 
-                                                            WHEN "CANTIDAD_MAXIMA" > 0 
-                                                            THEN ((COALESCE("CANTIDAD_EMITIDA", 0) + :cantidad) / "CANTIDAD_MAXIMA") * 100
-                                                            ELSE 0 
-                                                        END
-                                                    WHERE "SERVICIO_BENEFICIARIO" = :servicio
-                                                      AND "LOTE" = :lote
-                                                      AND "ITEM" = :item
-                                                """)
-                                                
-                                                conn.execute(update_query, {
-                                                    'cantidad': item['cantidad'],
-                                                    'servicio': servicio_seleccionado,
-                                                    'lote': item['lote'],
-                                                    'item': item['item']
-                                                })
-                                            
-                                            # Confirmar transacción
-                                            trans.commit()
-                                            
-                                            st.success(f"✅ Orden de Compra {numero_oc}/{anio_oc} emitida exitosamente por {st.session_state.usuario_actual}!")
-                                            
-                                            # Generar PDF automáticamente
-                                            pdf_bytes, error_pdf = generar_pdf_orden_compra(
-                                                esquema_seleccionado,
-                                                numero_oc,
-                                                anio_oc,
-                                                fecha_emision,
-                                                servicio_seleccionado,
-                                                items_seleccionados,
-                                                st.session_state.usuario_actual
+                                    # Crear la orden de compra (bloquea y descuenta saldos en una transacción)
+                                    numero_pedido = numero_oc
+                                    exito, mensaje, numero_asignado = crear_orden_compra(
+                                        esquema_seleccionado,
+                                        numero_oc,
+                                        fecha_emision,
+                                        servicio_seleccionado,
+                                        None,
+                                        items_seleccionados
+                                    )
+                                    if not exito:
+                                        st.error(mensaje)
+                                    else:
+                                        numero_oc = numero_asignado
+                                        if numero_oc != numero_pedido.strip():
+                                            st.info(f"ℹ️ El N° {numero_pedido} ya fue asignado; la orden se emitió con el N° {numero_oc}.")
+                                        st.success(f"✅ Orden de Compra {numero_oc}/{anio_oc} emitida exitosamente por {st.session_state.usuario_actual}!")
+                                        
+                                        # Generar PDF automáticamente
+                                        pdf_bytes, error_pdf = generar_pdf_orden_compra(
+                                            esquema_seleccionado,
+                                            numero_oc,
+                                            anio_oc,
+                                            fecha_emision,
+                                            servicio_seleccionado,
+                                            items_seleccionados,
+                                            st.session_state.usuario_actual
+                                        )
+                                        
+                                        if pdf_bytes:
+                                            st.download_button(
+                                                label="📥 Descargar PDF de Orden de Compra",
+                                                data=pdf_bytes,
+                                                file_name=f"OC_{numero_oc.replace('/', '_')}.pdf",
+                                                mime="application/pdf",
+                                                key="btn_download_pdf"
                                             )
-                                            
-                                            if pdf_bytes:
-                                                st.download_button(
-                                                    label="📥 Descargar PDF de Orden de Compra",
-                                                    data=pdf_bytes,
-                                                    file_name=f"OC_{numero_oc.replace('/', '_')}.pdf",
-                                                    mime="application/pdf",
-                                                    key="btn_download_pdf"
-                                                )
-                                            else:
-                                                st.warning(f"Orden emitida pero error en PDF: {error_pdf}")
-                                            
-                                            st.balloons()
-                                            time.sleep(3)
-                                            
-                                        except Exception as e:
-                                            trans.rollback()
-                                            st.error(f"Error al emitir orden de compra: {e}")
+                                        else:
+                                            st.warning(f"Orden emitida pero error en PDF: {error_pdf}")
+                                        
+                                        st.balloons()
+                                        time.sleep(3)
                         else:
                             st.warning(f"No hay productos disponibles para {servicio_seleccionado} en esta licitación.")
                     
@@ -8788,7 +8839,10 @@ def pagina_ordenes_compra():
                                         st.error("⚠️ Ingrese al menos un número de factura")
                                     else:
                                         try:
-                                            numero_acta_completo = f"{numero_acta_num}/{anio_acta}"
+                                            # Número reservado antes del PDF, que lo lleva impreso
+                                            numero_acta_completo = reservar_numero_acta(anio_acta, numero_acta_num)
+                                            if numero_acta_completo != f"{int(numero_acta_num):03d}/{int(anio_acta)}":
+                                                st.info(f"ℹ️ El N° {numero_acta_num}/{anio_acta} ya fue asignado; se usa el N° {numero_acta_completo}.")
                                             
                                             # Consolidar remisiones y facturas
                                             numero_remision = ", ".join([r['numero'] for r in remisiones_data])
@@ -8896,32 +8950,10 @@ def pagina_ordenes_compra():
 # =============================================================================
 
 def crear_tabla_usuario_servicio():
-    """Crea la tabla de relación usuario-servicio si no existe"""
-    try:
-        engine = get_engine()
-        if engine is None:
-            return False
-        if isinstance(engine, dict) and engine.get('type') == 'api_rest':
-            # Para API REST, las tablas se crean manualmente en Supabase
-            return True
-        with engine.connect() as conn:
-            conn.execute(text("""
-                CREATE TABLE IF NOT EXISTS oxigeno.usuario_servicio (
-                    id SERIAL PRIMARY KEY,
-                    usuario_id INTEGER NOT NULL,
-                    servicio VARCHAR(200) NOT NULL,
-                    puede_crear_oc BOOLEAN DEFAULT TRUE,
-                    puede_crear_acta BOOLEAN DEFAULT TRUE,
-                    fecha_asignacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (usuario_id) REFERENCES oxigeno.usuarios(id) ON DELETE CASCADE,
-                    UNIQUE(usuario_id, servicio)
-                );
-            """))
-            conn.commit()
-            return True
-    except Exception as e:
-        print(f"Error creando tabla usuario_servicio: {e}")
-        return False
+    """Crea la tabla de relación usuario-servicio si no existe (migraciones versionadas de licitaciones)"""
+    resultado = asegurar_esquema_licitaciones('usuario_servicio')
+    return resultado is not None and resultado['error'] is None
+
 
 def obtener_servicios_disponibles():
     """Obtiene lista de servicios únicos de todas las licitaciones"""
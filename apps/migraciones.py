@@ -0,0 +1,186 @@
+"""
+Migraciones de esquema versionadas, aplicadas una vez por proceso.
+
+Las aplicaciones verificaban su estructura (CREATE SCHEMA/TABLE/INDEX IF NOT
+EXISTS, consultas a information_schema) en cada rerun de Streamlit: una docena
+de round trips antes de empezar a dibujar la página. Aquí cada aplicación
+declara una lista ordenada de pasos versionados; la versión aplicada se guarda
+en public.schema_version y, al arrancar el proceso, solo se ejecutan los pasos
+con versión mayor. Después de la primera verificación, las siguientes llamadas
+del mismo proceso no tocan la base.
+
+Los pasos "repetibles" (p. ej. índices sobre tablas que se crean con la primera
+importación) se intentan en cada arranque del proceso: son idempotentes y un
+fallo solo se registra en el log.
+
+Una verificación con error no queda recordada para siempre: se vuelve a
+intentar pasados MIGRACIONES_REINTENTO segundos (sin martillar la base en cada
+rerun mientras tanto).
+
+Varias réplicas que arrancan a la vez se serializan con un advisory lock por
+aplicación. Como db_registry, el módulo queda en sys.modules y el estado
+sobrevive a los reruns.
+"""
+
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+TABLA_VERSIONES = "public.schema_version"
+REINTENTO_FALLIDAS = float(os.getenv("MIGRACIONES_REINTENTO", 300))
+
+# (app, url) -> resultado de la última verificación en este proceso
+_VERIFICADAS = {}
+# (app, url) -> momento (monotonic) de la última verificación con error
+_FALLIDAS = {}
+_LOCK = threading.Lock()
+
+
+def _ejecutar_paso(conn, paso):
+    """Un paso es una sentencia SQL, una lista de sentencias o una función(conn)"""
+    if callable(paso):
+        paso(conn)
+    elif isinstance(paso, str):
+        conn.execute(text(paso))
+    else:
+        for sentencia in paso:
+            conn.execute(text(sentencia))
+
+
+def _asegurar_tabla_versiones(conn):
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {TABLA_VERSIONES} (
+            app VARCHAR(50) NOT NULL,
+            version INTEGER NOT NULL,
+            descripcion TEXT,
+            aplicada TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duracion_ms INTEGER,
+            PRIMARY KEY (app, version)
+        )
+    """))
+    conn.commit()
+
+
+def version_actual(conn, app):
+    """Última versión aplicada de una aplicación (0 si nunca se migró)"""
+    return conn.execute(
+        text(f"SELECT COALESCE(MAX(version), 0) FROM {TABLA_VERSIONES} WHERE app = :app"),
+        {'app': app}
+    ).scalar()
+
+
+def _vigente(clave):
+    """Resultado recordado, salvo que sea un error con más de REINTENTO_FALLIDAS segundos"""
+    resultado = _VERIFICADAS.get(clave)
+    fallida = _FALLIDAS.get(clave)
+    if fallida is not None and time.monotonic() - fallida >= REINTENTO_FALLIDAS:
+        return None
+    return resultado
+
+
+def aplicar(engine, app, migraciones, repetibles=()):
+    """
+    Aplica las migraciones pendientes de una aplicación, una vez por proceso.
+
+    Args:
+        engine: Engine de SQLAlchemy (conexión directa)
+        app: Nombre de la aplicación ('licitaciones', 'siciap')
+        migraciones: Lista de (version, descripcion, paso) con versiones crecientes
+        repetibles: Lista de (descripcion, paso) que se intentan en cada arranque
+
+    Returns:
+        dict: version (aplicada al terminar), aplicadas (versiones nuevas),
+        error (mensaje o None). Si un paso versionado falla, sus cambios se
+        revierten, los siguientes no se aplican y se reintenta pasados
+        REINTENTO_FALLIDAS segundos. Si no hay conexión, se reintenta en la
+        próxima llamada.
+    """
+    clave = (app, str(engine.url))
+    resultado = _vigente(clave)
+    if resultado is not None:
+        return resultado
+
+    with _LOCK:
+        resultado = _vigente(clave)
+        if resultado is not None:
+            return resultado
+
+        resultado = {'version': 0, 'aplicadas': [], 'error': None}
+        try:
+            with engine.connect() as conn:
+                # Serializa réplicas que arrancan a la vez (lock de sesión)
+                conn.execute(text("SELECT pg_advisory_lock(hashtext(:clave))"), {'clave': f"schema_version:{app}"})
+                conn.commit()
+                try:
+                    _asegurar_tabla_versiones(conn)
+                    actual = version_actual(conn, app)
+
+                    for version, descripcion, paso in sorted(migraciones, key=lambda m: m[0]):
+                        if version <= actual:
+                            continue
+                        inicio = time.perf_counter()
+                        try:
+                            _ejecutar_paso(conn, paso)
+                            conn.execute(text(f"""
+                                INSERT INTO {TABLA_VERSIONES} (app, version, descripcion, duracion_ms)
+                                VALUES (:app, :version, :descripcion, :duracion)
+                            """), {
+                                'app': app, 'version': version, 'descripcion': descripcion,
+                                'duracion': int((time.perf_counter() - inicio) * 1000)
+                            })
+                            conn.commit()
+                        except Exception as e:
+                            conn.rollback()
+                            resultado['error'] = f"v{version} ({descripcion}): {e}"
+                            logger.error(f"Migración {app} v{version} falló: {e}")
+                            break
+                        actual = version
+                        resultado['aplicadas'].append(version)
+                        logger.info(f"Migración {app} v{version} aplicada: {descripcion}")
+
+                    resultado['version'] = actual
+
+                    for descripcion, paso in repetibles:
+                        try:
+                            _ejecutar_paso(conn, paso)
+                            conn.commit()
+                        except Exception as e:
+                            conn.rollback()
+                            logger.warning(f"Paso repetible de {app} omitido ({descripcion}): {e}")
+                finally:
+                    conn.rollback()
+                    conn.execute(text("SELECT pg_advisory_unlock(hashtext(:clave))"), {'clave': f"schema_version:{app}"})
+                    conn.commit()
+        except Exception as e:
+            # Sin conexión o sin permisos: no se recuerda, se reintenta en la próxima llamada
+            resultado['error'] = str(e)
+            logger.error(f"No se pudieron verificar las migraciones de {app}: {e}")
+            return resultado
+
+        _VERIFICADAS[clave] = resultado
+        if resultado['error']:
+            _FALLIDAS[clave] = time.monotonic()
+        else:
+            _FALLIDAS.pop(clave, None)
+        return resultado
+
+
+def estado():
+    """Resultado de la verificación de cada aplicación en este proceso"""
+    return [
+        {'app': app, **resultado} for (app, _url), resultado in list(_VERIFICADAS.items())
+    ]
+
+
+def reiniciar(app=None):
+    """Olvida las verificaciones hechas para volver a comprobar en la próxima llamada"""
+    with _LOCK:
+        for clave in list(_VERIFICADAS):
+            if app is None or clave[0] == app:
+                _VERIFICADAS.pop(clave)
+                _FALLIDAS.pop(clave, None)
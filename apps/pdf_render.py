@@ -0,0 +1,1115 @@
+"""
+Generación de PDFs de órdenes de compra y actas de recepción.
+
+generar_pdf_orden_compra y generar_pdf_acta_recepcion armaban en cada llamada
+todos los ParagraphStyle y volvían a leer del disco el logo institucional. Aquí
+los estilos se compilan una sola vez por proceso y los logos se guardan en
+memoria: se invalidan al cambiar el archivo (fecha de modificación) o con
+invalidar_logos() cuando pagina_configurar_logos guarda o elimina uno.
+
+Las funciones de dibujo no consultan la base de datos ni usan Streamlit: reciben
+los datos del llamado ya leídos, de modo que se pueden ejecutar en procesos
+aparte. generar_zip renderiza muchos documentos en un pool de procesos y escribe
+cada PDF en un ZIP a medida que está listo.
+
+Como db_registry, el módulo se importa por nombre y la caché sobrevive a los
+reruns. reportlab se importa recién al generar el primer PDF.
+
+Configuración (variables de entorno):
+    PDF_LOGOS_DIR   directorio de los logos institucionales
+    PDF_PROCESOS    procesos del pool de la generación por lotes
+"""
+
+import io
+import logging
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+
+LOGOS_DIR = os.getenv("PDF_LOGOS_DIR", "/home/claude/logos_gobierno")
+LOGO_PRINCIPAL = "logo_principal.png"
+PROCESOS = int(os.getenv("PDF_PROCESOS", min(4, os.cpu_count() or 1)))
+
+logger = logging.getLogger(__name__)
+
+_LOCK = threading.Lock()
+_ESTILOS = {}
+# nombre de archivo -> (mtime, tamaño, bytes)
+_LOGOS = {}
+_POOL = None
+
+
+# =============================================================================
+# ESTILOS Y LOGOS EN CACHÉ
+# =============================================================================
+
+def _compilar_estilos_orden_compra():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT
+
+    styles = getSampleStyleSheet()
+    return {
+        'title': ParagraphStyle(
+            'Title',
+            parent=styles['Heading1'],
+            fontSize=12,
+            textColor=colors.black,
+            spaceAfter=4,
+            spaceBefore=4,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'section_title': ParagraphStyle(
+            'SectionTitle',
+            parent=styles['Heading2'],
+            fontSize=10,
+            textColor=colors.white,
+            spaceAfter=0,
+            spaceBefore=0,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold',
+            backColor=colors.grey
+        ),
+        'normal': ParagraphStyle(
+            'Normal',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.black,
+            alignment=TA_LEFT,
+            fontName='Helvetica'
+        ),
+        'bold': ParagraphStyle(
+            'Bold',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.black,
+            alignment=TA_LEFT,
+            fontName='Helvetica-Bold'
+        ),
+    }
+
+
+def _compilar_estilos_acta_recepcion():
+    from reportlab.lib import colors
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_JUSTIFY
+
+    styles = getSampleStyleSheet()
+    return {
+        'titulo_acta': ParagraphStyle(
+            'TituloActa',
+            parent=styles['Heading1'],
+            fontSize=14,
+            textColor=colors.black,
+            spaceAfter=0,
+            spaceBefore=0,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'normal': ParagraphStyle(
+            'Normal',
+            parent=styles['Normal'],
+            fontSize=9,
+            textColor=colors.black,
+            alignment=TA_JUSTIFY,
+            fontName='Helvetica',
+            leading=11
+        ),
+        'bold': ParagraphStyle(
+            'Bold',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.black,
+            alignment=TA_LEFT,
+            fontName='Helvetica-Bold'
+        ),
+        'campo': ParagraphStyle(
+            'Campo',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.black,
+            alignment=TA_LEFT,
+            fontName='Helvetica'
+        ),
+        'tabla_header': ParagraphStyle(
+            'TablaHeader',
+            parent=styles['Normal'],
+            fontSize=7,
+            textColor=colors.black,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'tabla_cell': ParagraphStyle(
+            'TablaCell',
+            parent=styles['Normal'],
+            fontSize=7,
+            textColor=colors.black,
+            alignment=TA_CENTER,
+            fontName='Helvetica'
+        ),
+        'firma': ParagraphStyle(
+            'Firma',
+            parent=styles['Normal'],
+            fontSize=8,
+            textColor=colors.black,
+            alignment=TA_CENTER,
+            fontName='Helvetica-Bold'
+        ),
+        'pie': ParagraphStyle(
+            'Pie',
+            parent=styles['Normal'],
+            fontSize=6,
+            textColor=colors.black,
+            alignment=TA_CENTER,
+            fontName='Helvetica'
+        ),
+    }
+
+
+def _estilos(tipo, compilar):
+    estilos = _ESTILOS.get(tipo)
+    if estilos is None:
+        with _LOCK:
+            estilos = _ESTILOS.get(tipo)
+            if estilos is None:
+                estilos = _ESTILOS[tipo] = compilar()
+    return estilos
+
+
+def estilos_orden_compra():
+    """ParagraphStyle de la orden de compra, compilados una vez por proceso"""
+    return _estilos('orden_compra', _compilar_estilos_orden_compra)
+
+
+def estilos_acta_recepcion():
+    """ParagraphStyle del acta de recepción, compilados una vez por proceso"""
+    return _estilos('acta_recepcion', _compilar_estilos_acta_recepcion)
+
+
+def logo(nombre):
+    """
+    Contenido del logo en memoria, o None si no está cargado.
+
+    Solo vuelve a leer el archivo si cambió su fecha de modificación o tamaño
+    (p. ej. lo reemplazó otra réplica) o si se llamó a invalidar_logos().
+    """
+    ruta = os.path.join(LOGOS_DIR, nombre)
+    try:
+        info = os.stat(ruta)
+    except OSError:
+        _LOGOS.pop(nombre, None)
+        return None
+
+    entrada = _LOGOS.get(nombre)
+    if entrada is not None and entrada[0] == info.st_mtime and entrada[1] == info.st_size:
+        return entrada[2]
+
+    with open(ruta, 'rb') as f:
+        contenido = f.read()
+    _LOGOS[nombre] = (info.st_mtime, info.st_size, contenido)
+    return contenido
+
+
+def invalidar_logos():
+    """Descarta los logos en memoria (se llama al guardar o eliminar un logo)"""
+    _LOGOS.clear()
+
+
+def numero_a_letras(numero):
+    """Convierte un número a letras en guaraníes"""
+    unidades = ["", "UN", "DOS", "TRES", "CUATRO", "CINCO", "SEIS", "SIETE", "OCHO", "NUEVE"]
+    decenas = ["", "DIEZ", "VEINTE", "TREINTA", "CUARENTA", "CINCUENTA", "SESENTA", "SETENTA", "OCHENTA", "NOVENTA"]
+    especiales = ["DIEZ", "ONCE", "DOCE", "TRECE", "CATORCE", "QUINCE", "DIECISEIS", "DIECISIETE", "DIECIOCHO", "DIECINUEVE"]
+    centenas = ["", "CIENTO", "DOSCIENTOS", "TRESCIENTOS", "CUATROCIENTOS", "QUINIENTOS", "SEISCIENTOS", "SETECIENTOS", "OCHOCIENTOS", "NOVECIENTOS"]
+    
+    if numero == 0:
+        return "CERO GUARANIES"
+    
+    def convertir_grupo(n):
+        if n == 0:
+            return ""
+        elif n < 10:
+            return unidades[n]
+        elif n < 20:
+            return especiales[n - 10]
+        elif n < 100:
+            d = n // 10
+            u = n % 10
+            if u == 0:
+                return decenas[d]
+            else:
+                return decenas[d] + " Y " + unidades[u]
+        else:
+            c = n // 100
+            resto = n % 100
+            if c == 1 and resto == 0:
+                return "CIEN"
+            elif resto == 0:
+                return centenas[c]
+            else:
+                return centenas[c] + " " + convertir_grupo(resto)
+    
+    # Convertir número
+    if numero < 1000:
+        texto = convertir_grupo(numero)
+    elif numero < 1000000:
+        miles = numero // 1000
+        resto = numero % 1000
+        if miles == 1:
+            texto = "MIL"
+        else:
+            texto = convertir_grupo(miles) + " MIL"
+        if resto > 0:
+            texto += " " + convertir_grupo(resto)
+    elif numero < 1000000000:
+        millones = numero // 1000000
+        resto = numero % 1000000
+        if millones == 1:
+            texto = "UN MILLON"
+        else:
+            texto = convertir_grupo(millones) + " MILLONES"
+        if resto >= 1000:
+            miles = resto // 1000
+            resto_final = resto % 1000
+            if miles > 0:
+                if miles == 1:
+                    texto += " MIL"
+                else:
+                    texto += " " + convertir_grupo(miles) + " MIL"
+            if resto_final > 0:
+                texto += " " + convertir_grupo(resto_final)
+        elif resto > 0:
+            texto += " " + convertir_grupo(resto)
+    else:
+        return "MONTO DEMASIADO GRANDE"
+    
+    return texto + " GUARANIES"
+
+
+# =============================================================================
+# DIBUJO DE LOS DOCUMENTOS
+# =============================================================================
+
+def pdf_orden_compra(licitacion, numero_oc, anio_oc, fecha_emision, servicio, items, usuario):
+    """
+    Dibuja el PDF de una orden de compra.
+
+    Args:
+        licitacion: Fila del llamado (NUMERO_DE_LLAMADO, AÑO_DEL_LLAMADO,
+            NOMBRE_DEL_LLAMADO, I_D, EMPRESA_ADJUDICADA, RUC)
+        numero_oc, anio_oc, fecha_emision, servicio, items, usuario: Como en
+            generar_pdf_orden_compra
+
+    Returns:
+        bytes del PDF
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage
+    from reportlab.lib.units import cm
+
+    # Crear buffer
+    buffer = io.BytesIO()
+
+    # Configurar documento A4
+    doc = SimpleDocTemplate(
+        buffer, 
+        pagesize=A4,
+        rightMargin=1.5*cm,
+        leftMargin=1.5*cm,
+        topMargin=1*cm,
+        bottomMargin=1.5*cm
+    )
+
+    # Estilos compilados una vez por proceso
+    estilos = estilos_orden_compra()
+    style_title = estilos['title']
+    style_section_title = estilos['section_title']
+    style_normal = estilos['normal']
+    style_bold = estilos['bold']
+
+    # Contenido
+    story = []
+
+    # ========== SECCIÓN 1: LOGOS Y ENCABEZADO ==========
+    logo_principal = logo(LOGO_PRINCIPAL)
+
+    # Logo ANCHO (no alto)
+    if logo_principal:
+        logo_img = RLImage(io.BytesIO(logo_principal), width=12*cm, height=2*cm)
+        header_data = [[logo_img]]
+        header_widths = [18*cm]
+
+        tabla_header = Table(header_data, colWidths=header_widths)
+        tabla_header.setStyle(TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+            ('BOX', (0, 0), (-1, -1), 1, colors.black),
+            ('TOPPADDING', (0, 0), (-1, -1), 5),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ]))
+        story.append(tabla_header)
+        story.append(Spacer(1, 0.2*cm))
+
+    # Título ORDEN DE COMPRA con formato Nº/AÑO
+    numero_completo = f"{numero_oc}/{anio_oc}"
+    titulo_oc = Table([[Paragraph(f"<b>ORDEN DE COMPRA N° {numero_completo}</b>", style_title)]], colWidths=[18*cm])
+    titulo_oc.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BOX', (0, 0), (-1, -1), 1.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, -1), colors.lightgrey),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]))
+    story.append(titulo_oc)
+    story.append(Spacer(1, 0.15*cm))
+
+    # ========== SECCIÓN 2: DATOS GENERALES ==========
+    datos_generales_header = [[Paragraph("<b>DATOS GENERALES</b>", style_section_title)]]
+    tabla_dg_header = Table(datos_generales_header, colWidths=[18*cm])
+    tabla_dg_header.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('BACKGROUND', (0, 0), (-1, -1), colors.grey),
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]))
+    story.append(tabla_dg_header)
+
+    # Fecha: manejar tanto string como datetime
+    if isinstance(fecha_emision, str):
+        fecha_texto = fecha_emision
+    else:
+        fecha_texto = fecha_emision.strftime("%d/%m/%Y")
+
+    # Formatear ID con punto de miles
+    id_llamado = licitacion[3]
+    id_formateado = f"{id_llamado:,}".replace(",", ".") if id_llamado else "N/A"
+
+    datos_generales = [
+        [Paragraph("<b>Fecha de Emisión:</b>", style_bold), Paragraph(fecha_texto, style_normal)],
+        [Paragraph("<b>Servicio Beneficiario:</b>", style_bold), Paragraph(servicio, style_normal)],
+        [Paragraph("<b>Usuario Responsable de Emisión de OC:</b>", style_bold), Paragraph(usuario, style_normal)],
+        [Paragraph("<b>Licitación:</b>", style_bold), 
+         Paragraph(f"LPN {licitacion[0]}/{licitacion[1]} - {licitacion[2]}", style_normal)],
+        [Paragraph("<b>I.D. del Llamado:</b>", style_bold), 
+         Paragraph(id_formateado, style_normal)]
+    ]
+
+    tabla_dg = Table(datos_generales, colWidths=[4.5*cm, 13.5*cm])
+    tabla_dg.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 4),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+    story.append(tabla_dg)
+    story.append(Spacer(1, 0.15*cm))
+
+    # ========== SECCIÓN 3: PROVEEDOR ==========
+    proveedor_header = [[Paragraph("<b>DATOS DEL PROVEEDOR</b>", style_section_title)]]
+    tabla_prov_header = Table(proveedor_header, colWidths=[18*cm])
+    tabla_prov_header.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('BACKGROUND', (0, 0), (-1, -1), colors.grey),
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]))
+    story.append(tabla_prov_header)
+
+    proveedor_data = [
+        [Paragraph("<b>Empresa:</b>", style_bold), 
+         Paragraph(licitacion[4] if licitacion[4] else "N/A", style_normal)],
+        [Paragraph("<b>RUC:</b>", style_bold), 
+         Paragraph(licitacion[5] if licitacion[5] else "N/A", style_normal)]
+    ]
+
+    tabla_prov = Table(proveedor_data, colWidths=[4.5*cm, 13.5*cm])
+    tabla_prov.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 4),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+    story.append(tabla_prov)
+    story.append(Spacer(1, 0.15*cm))
+
+    # ========== SECCIÓN 4: DETALLE DE ITEMS ==========
+    items_header = [[Paragraph("<b>DETALLES DE ORDEN DE COMPRA</b>", style_section_title)]]
+    tabla_items_header = Table(items_header, colWidths=[18*cm])
+    tabla_items_header.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('BACKGROUND', (0, 0), (-1, -1), colors.grey),
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]))
+    story.append(tabla_items_header)
+
+    # Encabezado de tabla de items con UNIDAD DE MEDIDA
+    items_table_data = [[
+        Paragraph("<b>LOTE</b>", style_bold),
+        Paragraph("<b>ITEM</b>", style_bold),
+        Paragraph("<b>CANT.</b>", style_bold),
+        Paragraph("<b>U.M.</b>", style_bold),
+        Paragraph("<b>DESCRIPCIÓN // PRESENTACIÓN // MARCA // PROCEDENCIA</b>", style_bold),
+        Paragraph("<b>PRECIO UNIT.</b>", style_bold),
+        Paragraph("<b>SUBTOTAL</b>", style_bold)
+    ]]
+
+    monto_total = 0
+    for item in items:
+        # Convertir lote e item manejando decimales
+        try:
+            lote_int = int(float(item['lote'])) if item['lote'] else 0
+        except:
+            lote_int = 0
+
+        try:
+            item_int = int(float(item['item'])) if item['item'] else 0
+        except:
+            item_int = 0
+
+        try:
+            cantidad_val = int(float(item['cantidad'])) if item['cantidad'] else 0
+        except:
+            cantidad_val = 0
+
+        subtotal = cantidad_val * float(item['precio_unitario'])
+        monto_total += subtotal
+
+        # Descripción completa sin cortar
+        descripcion_completa = item['descripcion']
+
+        # Unidad de medida (si no existe en item, usar "UNIDAD")
+        unidad_medida = item.get('unidad_medida', 'UNIDAD')
+
+        items_table_data.append([
+            Paragraph(str(lote_int), style_normal),
+            Paragraph(str(item_int), style_normal),
+            Paragraph(f"{cantidad_val:,}".replace(",", "."), style_normal),
+            Paragraph(unidad_medida, style_normal),
+            Paragraph(descripcion_completa, style_normal),
+            Paragraph(f"Gs. {float(item['precio_unitario']):,.0f}".replace(",", "."), style_normal),
+            Paragraph(f"Gs. {subtotal:,.0f}".replace(",", "."), style_normal)
+        ])
+
+    tabla_items = Table(items_table_data, colWidths=[1.2*cm, 1.2*cm, 1.2*cm, 1.5*cm, 7*cm, 2.5*cm, 2.5*cm])
+    tabla_items.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+        ('ALIGN', (0, 0), (3, -1), 'CENTER'),
+        ('ALIGN', (5, 1), (6, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('LEFTPADDING', (0, 0), (-1, -1), 2),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+    story.append(tabla_items)
+    story.append(Spacer(1, 0.1*cm))
+
+    # ========== SECCIÓN 5: MONTO TOTAL ==========
+    monto_letras = numero_a_letras(int(monto_total))
+
+    total_data = [
+        [Paragraph("<b>MONTO TOTAL:</b>", style_bold), 
+         Paragraph(f"<b>Gs. {monto_total:,.0f}</b>".replace(",", "."), style_bold)],
+        [Paragraph("<b>MONTO EN LETRAS:</b>", style_bold), 
+         Paragraph(monto_letras, style_normal)]
+    ]
+
+    tabla_total = Table(total_data, colWidths=[4.5*cm, 13.5*cm])
+    tabla_total.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (0, -1), colors.lightgrey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 4),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 4),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+    story.append(tabla_total)
+    story.append(Spacer(1, 0.15*cm))
+
+    # ========== SECCIÓN 6: FIRMAS ==========
+    firmas_header = [[Paragraph("<b>FIRMAS Y AUTORIZACIONES</b>", style_section_title)]]
+    tabla_firmas_header = Table(firmas_header, colWidths=[18*cm])
+    tabla_firmas_header.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('BACKGROUND', (0, 0), (-1, -1), colors.grey),
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('TOPPADDING', (0, 0), (-1, -1), 4),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 4),
+    ]))
+    story.append(tabla_firmas_header)
+
+    # 2 cuadros grandes para firmar y sellar
+    firmas_data = [
+        [Paragraph("", style_normal), Paragraph("", style_normal)],
+        [Paragraph("<b>DIRECTOR ADMINISTRATIVO</b>", style_bold), 
+         Paragraph("<b>DIRECTOR GENERAL Y/O REGIONAL</b>", style_bold)]
+    ]
+
+    tabla_firmas = Table(firmas_data, colWidths=[9*cm, 9*cm], rowHeights=[2.5*cm, 0.6*cm])
+    tabla_firmas.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 1, colors.black),
+        ('BOX', (0, 0), (0, -1), 1, colors.black),  # Cuadro izquierdo
+        ('BOX', (1, 0), (1, -1), 1, colors.black),  # Cuadro derecho
+        ('LINEABOVE', (0, 1), (-1, 1), 0.5, colors.black),  # Línea arriba de nombres
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, 0), 'MIDDLE'),
+        ('VALIGN', (0, 1), (-1, 1), 'MIDDLE'),
+        ('BACKGROUND', (0, 1), (-1, 1), colors.lightgrey),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+    story.append(tabla_firmas)
+    story.append(Spacer(1, 0.15*cm))
+
+    # ========== PIE DE PÁGINA: Recepción ==========
+    recepcion_data = [
+        [Paragraph("<b>RECEPCIÓN DE ORDEN DE COMPRA</b>", style_section_title)],
+        [Paragraph(f"<b>Empresa:</b> {licitacion[4] if licitacion[4] else 'N/A'}", style_normal)],
+        [Paragraph(f"<b>RUC:</b> {licitacion[5] if licitacion[5] else 'N/A'}", style_normal)],
+        [Paragraph("<b>Fecha de Recepción:</b> _____ / _____ / __________", style_normal)]
+    ]
+
+    tabla_recepcion = Table(recepcion_data, colWidths=[18*cm])
+    tabla_recepcion.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (0, 0), colors.grey),
+        ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+        ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 5),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ]))
+    story.append(tabla_recepcion)
+
+    # Construir PDF
+    doc.build(story)
+
+    # Retornar bytes
+    pdf_bytes = buffer.getvalue()
+    buffer.close()
+
+    return pdf_bytes
+
+
+def pdf_acta_recepcion(licitacion, numero_oc, fecha_recepcion, servicio, empresa,
+                       items, lugar_entrega, numero_remision, numero_factura, receptor_nombre,
+                       observaciones, usuario, fecha_remision=None, fecha_factura=None, numero_acta=None):
+    """
+    Dibuja el PDF horizontal de un acta de recepción.
+
+    Args:
+        licitacion: Fila del llamado (como en pdf_orden_compra) o None
+        Resto: Como en generar_pdf_acta_recepcion
+
+    Returns:
+        bytes del PDF
+    """
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4, landscape
+    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image as RLImage
+    from reportlab.lib.units import cm
+
+    # Crear buffer
+    buffer = io.BytesIO()
+    
+    # Configurar documento A4 HORIZONTAL (landscape) - Márgenes reducidos
+    doc = SimpleDocTemplate(
+        buffer, 
+        pagesize=landscape(A4),
+        rightMargin=2*cm,
+        leftMargin=2*cm,
+        topMargin=0.8*cm,   # Reducido
+        bottomMargin=0.9*cm  # Reducido
+    )
+    
+    # Definir colores
+    GRIS_TABLA = colors.Color(0.80, 0.80, 0.80)       # #CCCCCC
+    GRIS_SUAVE = colors.Color(0.93, 0.93, 0.93)       # #EDEDED
+    
+    # Estilos compilados una vez por proceso
+    estilos = estilos_acta_recepcion()
+    style_titulo_acta = estilos['titulo_acta']
+    style_normal = estilos['normal']
+    style_bold = estilos['bold']
+    style_campo = estilos['campo']
+    style_tabla_header = estilos['tabla_header']
+    style_tabla_cell = estilos['tabla_cell']
+    style_firma = estilos['firma']
+    style_pie = estilos['pie']
+    
+    # Contenido
+    story = []
+    
+    # Extraer datos
+    llamado_numero = licitacion[0] if licitacion else "N/A"
+    llamado_anio = licitacion[1] if licitacion else "N/A"
+    llamado_nombre = licitacion[2] if licitacion else "N/A"
+    id_llamado = licitacion[3] if licitacion else 0
+    empresa_adjudicada = licitacion[4] if licitacion and licitacion[4] else empresa
+    ruc_empresa = licitacion[5] if licitacion and licitacion[5] else "N/A"
+    
+    # Formatear I.D. con puntos (123456 → 123.456)
+    id_formateado = f"{id_llamado:,}".replace(",", ".") if id_llamado else "N/A"
+    
+    # Formatear fecha de recepción
+    if isinstance(fecha_recepcion, str):
+        try:
+            fecha_obj = datetime.strptime(fecha_recepcion, "%Y-%m-%d")
+            dia = fecha_obj.day
+            mes = fecha_obj.strftime("%B")
+            anio = fecha_obj.year
+            fecha_mostrar = fecha_obj.strftime("%d/%m/%Y")
+        except:
+            dia = "___"
+            mes = "___________"
+            anio = "____"
+            fecha_mostrar = fecha_recepcion
+    else:
+        dia = fecha_recepcion.day
+        meses_es = ["Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", 
+                   "Julio", "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre"]
+        mes = meses_es[fecha_recepcion.month - 1]
+        anio = fecha_recepcion.year
+        fecha_mostrar = fecha_recepcion.strftime("%d/%m/%Y")
+    
+    # Fechas de remisión y factura (usar fecha_recepcion si no se proporcionan)
+    if fecha_remision:
+        if isinstance(fecha_remision, str):
+            fecha_remision_mostrar = fecha_remision
+        else:
+            fecha_remision_mostrar = fecha_remision.strftime("%d/%m/%Y")
+    else:
+        fecha_remision_mostrar = fecha_mostrar
+    
+    if fecha_factura:
+        if isinstance(fecha_factura, str):
+            fecha_factura_mostrar = fecha_factura
+        else:
+            fecha_factura_mostrar = fecha_factura.strftime("%d/%m/%Y")
+    else:
+        fecha_factura_mostrar = fecha_mostrar
+    
+    # ========== ENCABEZADO CON LOGO ==========
+    # Intentar cargar logo institucional
+    logo_principal = logo(LOGO_PRINCIPAL)
+    
+    if logo_principal:
+        # Logo existe - usarlo ANCHO y BAJO
+        logo_img = RLImage(io.BytesIO(logo_principal), width=25.7*cm, height=1.5*cm, kind='proportional')
+        header_data = [[logo_img]]
+    else:
+        # No hay logo - usar texto simple
+        header_data = [[Paragraph(
+            "<b>MINISTERIO DE SALUD PÚBLICA Y BIENESTAR SOCIAL</b><br/>" +
+            "DIRECCIÓN GENERAL DE GESTIÓN DE INSUMOS ESTRATÉGICOS EN SALUD",
+            style_titulo_acta
+        )]]
+    
+    tabla_header = Table(header_data, colWidths=[25.7*cm])
+    tabla_header.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+    ]))
+    story.append(tabla_header)
+    story.append(Spacer(1, 0.2*cm))
+    
+    # Título ACTA (sin DEFINITIVA)
+    titulo_text = "<b>📋 ACTA DE RECEPCIÓN</b>"
+    if numero_acta:
+        titulo_text += f"<br/><b>N° {numero_acta}</b>"
+    
+    titulo_data = [[Paragraph(titulo_text, style_titulo_acta)]]
+    tabla_titulo = Table(titulo_data, colWidths=[25.7*cm])
+    tabla_titulo.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ]))
+    story.append(tabla_titulo)
+    story.append(Spacer(1, 0.2*cm))
+    
+    # ========== TEXTO INTRODUCCIÓN (sin DEFINITIVA) ==========
+    texto_intro = f"""A los <b>{dia}</b> días del mes de <b>{mes}</b> del año <b>{anio}</b> en el <b>{servicio.upper()}</b> 
+dependiente del Ministerio de Salud Pública y Bienestar Social, se procede a la elaboración del Acta de 
+Recepción, de lo adjudicado a la empresa <b>{empresa_adjudicada}</b> correspondiente al llamado 
+<b>LPN {llamado_numero}/{llamado_anio} "{llamado_nombre}" I.D. N° {id_formateado}</b> - los cuales se describen 
+en el siguiente cuadro y firman al pie conformes los responsables por parte de la Institución y la Empresa Adjudicada."""
+    
+    intro_data = [[Paragraph(texto_intro, style_normal)]]
+    tabla_intro = Table(intro_data, colWidths=[25.7*cm])
+    tabla_intro.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+        ('LEFTPADDING', (0, 0), (-1, -1), 8),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+        ('TOPPADDING', (0, 0), (-1, -1), 6),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
+    ]))
+    story.append(tabla_intro)
+    story.append(Spacer(1, 0.15*cm))
+    
+    # ========== TABLA DE ITEMS (COMPACTA) ==========
+    items_table_data = [[
+        Paragraph("<b>LOTE</b>", style_tabla_header),
+        Paragraph("<b>ITEM</b>", style_tabla_header),
+        Paragraph("<b>CANT.</b>", style_tabla_header),
+        Paragraph("<b>UNIDAD</b>", style_tabla_header),
+        Paragraph("<b>DESCRIPCIÓN // PRESENTACIÓN // MARCA // PROCEDENCIA</b>", style_tabla_header),
+        Paragraph("<b>PRECIO UNIT.</b>", style_tabla_header),
+        Paragraph("<b>TOTAL</b>", style_tabla_header)
+    ]]
+    
+    monto_total = 0
+    for item in items:
+        try:
+            lote_int = int(float(item['lote'])) if item['lote'] else 0
+        except:
+            lote_int = 0
+        
+        try:
+            item_int = int(float(item['item'])) if item['item'] else 0
+        except:
+            item_int = 0
+        
+        try:
+            cantidad_val = int(float(item['cantidad'])) if item['cantidad'] else 0
+        except:
+            cantidad_val = 0
+        
+        try:
+            precio_unit = float(item['precio_unitario']) if item['precio_unitario'] else 0
+        except:
+            precio_unit = 0
+        
+        subtotal = cantidad_val * precio_unit
+        monto_total += subtotal
+        
+        unidad_medida = item.get('unidad_medida', 'UNIDAD')
+        
+        items_table_data.append([
+            Paragraph(str(lote_int), style_tabla_cell),
+            Paragraph(str(item_int), style_tabla_cell),
+            Paragraph(f"{cantidad_val:,}".replace(",", "."), style_tabla_cell),
+            Paragraph(unidad_medida, style_tabla_cell),
+            Paragraph(item['descripcion'], style_tabla_cell),
+            Paragraph(f"Gs. {precio_unit:,.0f}".replace(",", "."), style_tabla_cell),
+            Paragraph(f"Gs. {subtotal:,.0f}".replace(",", "."), style_tabla_cell)
+        ])
+    
+    # Fila de TOTAL - combinar columnas LOTE a UNIDAD
+    items_table_data.append([
+        Paragraph("<b>TOTAL:</b>", style_tabla_header),
+        Paragraph("", style_tabla_cell),
+        Paragraph("", style_tabla_cell),
+        Paragraph("", style_tabla_cell),
+        Paragraph("", style_tabla_cell),
+        Paragraph("", style_tabla_header),
+        Paragraph(f"<b>Gs. {monto_total:,.0f}</b>".replace(",", "."), style_tabla_header)
+    ])
+    
+    tabla_items = Table(items_table_data, colWidths=[1.3*cm, 1.3*cm, 1.8*cm, 1.8*cm, 12*cm, 3.25*cm, 3.25*cm])
+    tabla_items.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), GRIS_TABLA),
+        ('ALIGN', (0, 0), (3, -1), 'CENTER'),
+        ('ALIGN', (4, 1), (4, -2), 'LEFT'),
+        ('ALIGN', (5, 0), (-1, -1), 'RIGHT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('LEFTPADDING', (0, 0), (-1, -1), 2),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 2),
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ('BACKGROUND', (0, -1), (-1, -1), GRIS_SUAVE),
+        # Combinar celdas en última fila (LOTE a UNIDAD)
+        ('SPAN', (0, -1), (4, -1)),
+    ]))
+    story.append(tabla_items)
+    story.append(Spacer(1, 0.1*cm))
+    
+    # ========== MONTO EN LETRAS (COMPACTO) ==========
+    monto_letras = numero_a_letras(int(monto_total))
+    letras_data = [[Paragraph(f"<b>Son Guaraníes:</b> {monto_letras}", style_campo)]]
+    tabla_letras = Table(letras_data, colWidths=[25.7*cm])
+    tabla_letras.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+        ('LEFTPADDING', (0, 0), (-1, -1), 6),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ]))
+    story.append(tabla_letras)
+    story.append(Spacer(1, 0.1*cm))
+    
+    # ========== OBSERVACIONES (COMPACTO) ==========
+    if observaciones:
+        obs_data = [
+            [Paragraph("<b>OBSERVACIONES</b>", style_bold)],
+            [Paragraph(observaciones, style_campo)]
+        ]
+        tabla_obs = Table(obs_data, colWidths=[25.7*cm])
+        tabla_obs.setStyle(TableStyle([
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+            ('BACKGROUND', (0, 0), (-1, 0), GRIS_SUAVE),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+            ('LEFTPADDING', (0, 0), (-1, -1), 6),
+            ('TOPPADDING', (0, 0), (-1, -1), 3),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ]))
+        story.append(tabla_obs)
+        story.append(Spacer(1, 0.1*cm))
+    
+    # ========== SECCIÓN DE FIRMAS - 5 CUADROS EN LÍNEA ==========
+    # Separar remisiones y facturas si vienen múltiples
+    remisiones = numero_remision.split(',') if numero_remision else []
+    facturas = numero_factura.split(',') if numero_factura else []
+    
+    # Construir filas para tabla interna
+    datos_internos = []
+    
+    # ORDEN DE COMPRA
+    datos_internos.append([
+        Paragraph("<b>N° ORDEN DE COMPRA:</b>", style_campo), 
+        Paragraph("<b>FECHA DE EMISION:</b>", style_campo)
+    ])
+    datos_internos.append([
+        Paragraph(numero_oc, style_campo), 
+        Paragraph(fecha_mostrar, style_campo)
+    ])
+    
+    # REMISIONES
+    datos_internos.append([
+        Paragraph("<b>N° DE REMISION:</b>", style_campo), 
+        Paragraph("<b>FECHA DE EMISION:</b>", style_campo)
+    ])
+    if remisiones:
+        for rem in remisiones:
+            datos_internos.append([
+                Paragraph(rem.strip(), style_campo), 
+                Paragraph(fecha_remision_mostrar, style_campo)
+            ])
+    else:
+        datos_internos.append([
+            Paragraph("N/A", style_campo), 
+            Paragraph(fecha_remision_mostrar, style_campo)
+        ])
+    
+    # FACTURAS
+    datos_internos.append([
+        Paragraph("<b>N° DE FACTURA:</b>", style_campo), 
+        Paragraph("<b>FECHA DE EMISION:</b>", style_campo)
+    ])
+    if facturas:
+        for fac in facturas:
+            datos_internos.append([
+                Paragraph(f"• {fac.strip()}", style_campo), 
+                Paragraph(fecha_factura_mostrar, style_campo)
+            ])
+    else:
+        datos_internos.append([
+            Paragraph("N/A", style_campo), 
+            Paragraph(fecha_factura_mostrar, style_campo)
+        ])
+    
+    tabla_datos_internos = Table(datos_internos, colWidths=[3*cm, 3*cm])
+    tabla_datos_internos.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ('LEFTPADDING', (0, 0), (-1, -1), 3),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 3),
+    ]))
+    
+    firmas_data = [
+        # Fila 1: Tabla interna con datos en 2 columnas
+        [tabla_datos_internos, "", "", "", ""],
+        # Fila 2: Espacio firma
+        ["", "", "", "", ""],
+        # Fila 3: Headers
+        ["", 
+         Paragraph("<b>EMPRESA ADJUDICADA</b>", style_firma),
+         Paragraph("<b>RESPONSABLE/JEFE<br/>SUMINISTROS</b>", style_firma),
+         Paragraph("<b>FISCALIZADOR</b>", style_firma),
+         Paragraph("<b>DIRECTOR GENERAL<br/>O REGIONAL</b>", style_firma)]
+    ]
+    
+    tabla_firmas = Table(firmas_data, colWidths=[6*cm, 4.92*cm, 4.92*cm, 4.93*cm, 4.93*cm])
+    tabla_firmas.setStyle(TableStyle([
+        # Bordes externos
+        ('BOX', (0, 0), (0, -1), 1, colors.black),
+        ('BOX', (1, 0), (1, -1), 1, colors.black),
+        ('BOX', (2, 0), (2, -1), 1, colors.black),
+        ('BOX', (3, 0), (3, -1), 1, colors.black),
+        ('BOX', (4, 0), (4, -1), 1, colors.black),
+        
+        # LÍNEA CONTINUA atravesando columnas 1-4 (antes de headers)
+        ('LINEABOVE', (1, -1), (4, -1), 1, colors.black),
+        
+        # Alineación
+        ('ALIGN', (0, 0), (0, -1), 'CENTER'),
+        ('ALIGN', (1, 0), (-1, -1), 'CENTER'),
+        ('VALIGN', (0, 0), (-1, -2), 'TOP'),
+        ('VALIGN', (0, -1), (-1, -1), 'BOTTOM'),
+        
+        # Tamaño
+        ('FONTSIZE', (0, 0), (-1, -1), 7),
+        
+        # Padding
+        ('TOPPADDING', (0, 0), (-1, -1), 2),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+        ('LEFTPADDING', (0, 0), (-1, -1), 5),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 5),
+    ]))
+    story.append(tabla_firmas)
+    story.append(Spacer(1, 0.1*cm))
+    
+    # ========== NOTA LEGAL PIE (MUY COMPACTO) ==========
+    pie_data = [[Paragraph(
+        "La veracidad de los datos consignados en el presente documento son de expresa " +
+        "responsabilidad de los firmantes y tendrá carácter de DD.JJ., quedarán sin validez " +
+        "ante la falta de firmas o si presenta enmiendas y/o tachaduras.",
+        style_pie
+    )]]
+    tabla_pie = Table(pie_data, colWidths=[25.7*cm])
+    tabla_pie.setStyle(TableStyle([
+        ('BOX', (0, 0), (-1, -1), 0.5, colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+    ]))
+    story.append(tabla_pie)
+    
+    # Construir PDF
+    doc.build(story)
+    
+    # Retornar bytes
+    pdf_bytes = buffer.getvalue()
+    buffer.close()
+    
+    return pdf_bytes
+
+
+RENDERIZADORES = {
+    'orden_compra': pdf_orden_compra,
+    'acta_recepcion': pdf_acta_recepcion,
+}
+
+
+# =============================================================================
+# GENERACIÓN POR LOTES
+# =============================================================================
+
+def _renderizar(tarea):
+    """Proceso trabajador: (nombre, tipo, kwargs) -> (nombre, bytes o None, error o None)"""
+    nombre, tipo, kwargs = tarea
+    try:
+        return nombre, RENDERIZADORES[tipo](**kwargs), None
+    except Exception as e:
+        return nombre, None, str(e)
+
+
+def _precalentar():
+    """Inicializador de cada proceso: reportlab, estilos y logo listos antes del primer PDF"""
+    try:
+        estilos_orden_compra()
+        estilos_acta_recepcion()
+        logo(LOGO_PRINCIPAL)
+    except Exception as e:
+        logger.warning(f"No se pudo precalentar el proceso de PDFs: {e}")
+
+
+def _obtener_pool():
+    """Pool de procesos compartido; 'spawn' porque el proceso de Streamlit tiene hilos"""
+    global _POOL
+    with _LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(
+                max_workers=PROCESOS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_precalentar
+            )
+        return _POOL
+
+
+def _descartar_pool():
+    global _POOL
+    with _LOCK:
+        if _POOL is not None:
+            _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
+
+
+def generar_zip(tareas, destino, progreso=None):
+    """
+    Renderiza muchos PDFs en el pool de procesos y los escribe en un ZIP a
+    medida que están listos.
+
+    Args:
+        tareas: Lista de (nombre_archivo, tipo, kwargs) con tipo 'orden_compra'
+            o 'acta_recepcion' y kwargs los argumentos de pdf_orden_compra /
+            pdf_acta_recepcion (deben poder serializarse con pickle)
+        destino: Archivo binario abierto (p. ej. SpooledTemporaryFile) donde se escribe el ZIP
+        progreso: Callback opcional progreso(procesados, total)
+
+    Returns:
+        dict: generados (cantidad) y errores (lista de (nombre_archivo, mensaje))
+    """
+    total = len(tareas)
+    generados = 0
+    errores = []
+    pendientes = list(tareas)
+
+    def escribir(zip_file, resultados):
+        nonlocal generados
+        for nombre, contenido, error in resultados:
+            if contenido:
+                zip_file.writestr(nombre, contenido)
+                generados += 1
+            else:
+                errores.append((nombre, error))
+            if progreso:
+                progreso(generados + len(errores), total)
+
+    with zipfile.ZipFile(destino, 'w', compression=zipfile.ZIP_DEFLATED) as zip_file:
+        if PROCESOS > 1 and len(pendientes) > 1:
+            try:
+                pool = _obtener_pool()
+                # map conserva el orden y entrega cada PDF apenas está listo
+                for resultado in pool.map(_renderizar, pendientes, chunksize=4):
+                    escribir(zip_file, [resultado])
+                pendientes = []
+            except (BrokenProcessPool, OSError) as e:
+                # Sin procesos (límite del contenedor, proceso caído): seguir en este proceso
+                logger.warning(f"Pool de PDFs no disponible, se continúa en línea: {e}")
+                _descartar_pool()
+                pendientes = pendientes[generados + len(errores):]
+
+        escribir(zip_file, (_renderizar(tarea) for tarea in pendientes))
+
+    return {'generados': generados, 'errores': errores}
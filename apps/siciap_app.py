@@ -20,27 +20,73 @@ except ImportError:
             USE_PG8000 = False
 import os
 import re
+import json
 import logging
 import sys
 from datetime import datetime, timedelta
-from io import BytesIO
-from sqlalchemy import create_engine, text
+from io import BytesIO, StringIO
+from sqlalchemy import text
 import plotly.express as px
 import plotly.graph_objects as go
 import traceback
 import time
-
-st.set_page_config(
-    page_title="SICIAP Dashboard",
-    layout="wide",
-    initial_sidebar_state="expanded"
-)
+import itertools
+
+import biseccion
+import db_registry
+import excel_stream
+import jobs
+import migraciones
+
+# Solo al ejecutarse directamente (streamlit run); dentro de main_app la
+# página ya está configurada
+if __name__ == "__main__":
+    st.set_page_config(
+        page_title="SICIAP Dashboard",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
 # PASO 1: Agregar esta función al INICIO del archivo, después de todos los imports
 # Busca la línea donde terminen los imports (después de "import time") y agrega esto:
 
-def safe_date_conversion(date_series, format_hint=None):
+# Formatos candidatos para inferir el formato dominante de una columna de fechas
+FORMATOS_FECHA_CANDIDATOS = [
+    '%d/%m/%Y',
+    '%d/%m/%Y %H:%M:%S',
+    '%d-%m-%Y',
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M:%S',
+    '%d/%m/%y',
+    '%d.%m.%Y',
+]
+
+# Valores de muestra usados para inferir el formato
+MUESTRA_INFERENCIA_FECHAS = 200
+
+@st.cache_resource
+def _formatos_fecha_inferidos():
+    """Formato inferido por (tabla, columna), compartido por el proceso entre reruns"""
+    return {}
+
+def _inferir_formato_fecha(muestra):
+    """Devuelve el formato candidato que parsea más valores de la muestra, o None"""
+    mejor_formato, mejor_aciertos = None, 0
+    for formato in FORMATOS_FECHA_CANDIDATOS:
+        aciertos = pd.to_datetime(muestra, format=formato, errors='coerce').notna().sum()
+        if aciertos > mejor_aciertos:
+            mejor_formato, mejor_aciertos = formato, aciertos
+            if aciertos == len(muestra):
+                break
+    return mejor_formato
+
+def safe_date_conversion(date_series, format_hint=None, cache_key=None):
     """
-    Convierte fechas de forma segura sin warnings, con soporte mejorado para formatos españoles
+    Convierte fechas de forma segura sin warnings, con soporte mejorado para formatos españoles.
+
+    Para una Serie se hace una sola pasada vectorizada con el formato dominante
+    (format_hint, el recordado para cache_key=(tabla, columna) o el inferido sobre
+    una muestra). Solo el residuo que no coincide se intenta con los demás formatos
+    y, por último, valor a valor con dayfirst.
     """
     if date_series is None or (isinstance(date_series, pd.Series) and len(date_series) == 0):
         return date_series
@@ -52,35 +98,48 @@ def safe_date_conversion(date_series, format_hint=None):
         
         # Si date_series es una serie, procesar toda la serie
         if isinstance(date_series, pd.Series):
+            if pd.api.types.is_datetime64_any_dtype(date_series):
+                return date_series
+
             # Limpiar valores problemáticos
-            date_series = date_series.astype(str).replace(['nan', 'NaT', 'None', '', 'NaN'], None)
-            
-            # Métodos por orden de preferencia
-            methods = [
-                # 1. Intentar con dayfirst=True para formato español DD/MM/YYYY
-                lambda: pd.to_datetime(date_series, dayfirst=True, errors='coerce'),
-                # 2. Formato específico DD/MM/YYYY
-                lambda: pd.to_datetime(date_series, format='%d/%m/%Y', errors='coerce'),
-                # 3. Formato específico DD-MM-YYYY
-                lambda: pd.to_datetime(date_series, format='%d-%m-%Y', errors='coerce'),
-                # 4. Formato con horas DD/MM/YYYY HH:MM:SS
-                lambda: pd.to_datetime(date_series, format='%d/%m/%Y %H:%M:%S', errors='coerce'),
-                # 5. Último recurso: pd.to_datetime genérico
-                lambda: pd.to_datetime(date_series, errors='coerce')
-            ]
-            
-            # Intentar cada método
-            for method in methods:
-                try:
-                    result = method()
-                    # Si tenemos al menos una fecha válida, usar este método
-                    if not result.isna().all():
-                        return result
-                except Exception:
+            textos = date_series.astype(str).str.strip()
+            textos = textos.where(~textos.isin(['nan', 'NaT', 'None', '', 'NaN']) & date_series.notna())
+            validos = textos.dropna()
+            if validos.empty:
+                return pd.to_datetime(textos, errors='coerce')
+
+            formatos = _formatos_fecha_inferidos()
+            formato = format_hint or (formatos.get(cache_key) if cache_key else None)
+            resultado = pd.to_datetime(textos, format=formato, errors='coerce') if formato else None
+
+            # Inferir si no hay formato o si el recordado ya no sirve para la mayoría
+            if resultado is None or resultado.notna().sum() * 2 < len(validos):
+                muestra = validos.drop_duplicates().head(MUESTRA_INFERENCIA_FECHAS)
+                formato = _inferir_formato_fecha(muestra)
+                resultado = (
+                    pd.to_datetime(textos, format=formato, errors='coerce')
+                    if formato else pd.Series(pd.NaT, index=textos.index)
+                )
+                if cache_key and formato:
+                    formatos[cache_key] = formato
+
+            # Residuo: otros formatos sobre las filas pendientes, luego valor a valor
+            pendientes = resultado.isna() & textos.notna()
+            for alternativo in FORMATOS_FECHA_CANDIDATOS:
+                if not pendientes.any():
+                    break
+                if alternativo == formato:
                     continue
-            
-            # Si todo falla, usar el método más genérico
-            return pd.to_datetime(date_series, errors='coerce')
+                resultado.loc[pendientes] = pd.to_datetime(textos[pendientes], format=alternativo, errors='coerce')
+                pendientes = resultado.isna() & textos.notna()
+            if pendientes.any():
+                restantes = textos[pendientes]
+                por_valor = {
+                    valor: pd.to_datetime(valor, dayfirst=True, errors='coerce')
+                    for valor in restantes.unique()
+                }
+                resultado.loc[pendientes] = pd.to_datetime(restantes.map(por_valor), errors='coerce')
+            return resultado
         else:
             # Si es un valor único, convertirlo a string y procesarlo
             if pd.isna(date_series) or date_series is None:
@@ -244,6 +303,16 @@ def get_db_config():
         'password': os.getenv('DB_PASSWORD', 'Dggies12345')
     }
 
+def get_siciap_engine():
+    """Engine con pool compartido (db_registry) para la configuración actual de BD"""
+    from urllib.parse import quote_plus
+    db_config = get_db_config()
+    engine_string = (
+        f"postgresql://{db_config['user']}:{quote_plus(db_config['password'])}"
+        f"@{db_config['host']}:{db_config['port']}/{db_config['dbname']}?sslmode=require"
+    )
+    return db_registry.obtener_engine('siciap', engine_string)
+
 # Clase para manejar la conexión a PostgreSQL
 class PostgresConnection:
     def __init__(self, host, port, dbname, user, password):
@@ -253,13 +322,23 @@ class PostgresConnection:
         self.user = user
         self.password = password
         self.conn = None
+        self._pooled_conn = None
         self.engine = None
 
     def connect(self):
-        """Conectar usando múltiples drivers hasta encontrar uno que funcione"""
+        """
+        Conectar usando múltiples drivers hasta encontrar uno que funcione.
+        
+        El driver ganador se recuerda por proceso (db_registry) para este destino, de
+        modo que las siguientes conexiones lo prueban primero y reutilizan su pool
+        sin repetir los intentos fallidos ni la conexión de prueba.
+        """
         from urllib.parse import quote_plus
         import ssl
         
+        if self.conn is not None:
+            return True
+        
         password_escaped = quote_plus(self.password)
         
         # Lista de drivers a probar en orden
@@ -284,22 +363,29 @@ class PostgresConnection:
             }
         ]
         
+        destino = (self.host, str(self.port), self.dbname, self.user)
+        driver_conocido = db_registry.driver_detectado(destino)
+        if driver_conocido:
+            drivers_to_try.sort(key=lambda d: d['name'] != driver_conocido)
+        
         last_error = None
         for driver in drivers_to_try:
             try:
                 connection_string = f"{driver['dialect']}://{self.user}:{password_escaped}@{self.host}:{self.port}/{self.dbname}"
-                self.engine = create_engine(
+                # Pool compartido del proceso; se prueba solo al crearse
+                self.engine = db_registry.obtener_engine(
+                    'siciap',
                     connection_string,
-                    connect_args=driver['connect_args']
+                    connect_args=driver['connect_args'],
+                    probar=True
                 )
                 
-                # Probar conexión
-                with self.engine.connect() as conn:
-                    from sqlalchemy import text
-                    conn.execute(text("SELECT 1"))
-                
-                # Si llegamos aquí, funcionó
-                self.conn = self.engine.connect()
+                # Si llegamos aquí, funcionó. La conexión DBAPI sale del pool
+                # (cursor/commit/rollback como usa el resto del módulo).
+                self._pooled_conn = self.engine.raw_connection()
+                self.conn = self._pooled_conn.driver_connection
+                if driver['name'] != driver_conocido:
+                    db_registry.recordar_driver(destino, driver['name'])
                 logger.info(f"Conexión establecida usando: {driver['name']}")
                 return True
                 
@@ -326,10 +412,17 @@ class PostgresConnection:
             return False
 
     def close(self):
+        # Devuelve la conexión al pool; el engine es compartido y no se descarta
         if self.conn is not None:
-            self.conn.close()
-        if self.engine is not None:
-            self.engine.dispose()
+            try:
+                # Algunas rutas activan autocommit; no devolverla así al pool
+                if getattr(self.conn, 'autocommit', False):
+                    self.conn.autocommit = False
+            except Exception:
+                pass
+            self._pooled_conn.close()
+            self._pooled_conn = None
+            self.conn = None
         logger.info("Conexión a PostgreSQL cerrada")
 
     def get_cursor(self):
@@ -538,21 +631,16 @@ def read_excel_robust(file_content, file_name):
             logger.error(f"Error al convertir contenido a BytesIO: {str(e)}")
             return None
     
-    # Métodos priorizados para archivos Excel
+    # Métodos priorizados para archivos Excel. El primero parsea el libro una
+    # sola vez (openpyxl en streaming, data_only) y queda en caché por huella
+    # del contenido; repetir pd.read_excel con variantes solo volvía a parsear
+    # el mismo archivo.
     methods = [
-        # Método 1: openpyxl con data_only=True (mejor para fórmulas)
-        lambda: pd.read_excel(buffer, engine='openpyxl', engine_kwargs={'data_only': True}),
-        # Método 2: pandas estándar (más simple)
-        lambda: pd.read_excel(buffer),
-        # Método 3: openpyxl normal
-        lambda: pd.read_excel(buffer, engine='openpyxl'),
-        # Método 4: Intentar con xlrd para .xls
+        # Método 1: primera hoja con datos (streaming, omite filas vacías al inicio)
+        lambda: excel_stream.leer_primera_hoja_con_datos(buffer),
+        # Método 2: Intentar con xlrd para .xls
         lambda: pd.read_excel(buffer, engine='xlrd') if file_name.lower().endswith('.xls') else None,
-        # Método 5: Ignorar filas vacías al inicio
-        lambda: pd.read_excel(buffer, skiprows=range(1, 10)),
-        # Método 6: Buscar hojas con datos
-        lambda: find_sheet_with_data(buffer),
-        # Método 7: CSV fallback
+        # Método 3: CSV fallback
         lambda: try_read_as_csv(buffer, file_name)
     ]
 
@@ -630,19 +718,53 @@ def find_sheet_with_data(file_content):
         if hasattr(file_content, 'seek'):
             file_content.seek(0)
 
-        # Leer todas las hojas
-        all_sheets = pd.read_excel(file_content, sheet_name=None, engine='openpyxl')
-        for sheet_name, df in all_sheets.items():
-            # Buscar hoja con datos reales
-            if not df.empty and df.dropna(how='all').shape[0] > 0:
-                logger.info(f"Encontrados datos en la hoja: {sheet_name}")
-                return df
-        
-        return None
+        # Solo se parsea hasta la primera hoja con datos (parseo compartido por huella)
+        return excel_stream.leer_primera_hoja_con_datos(file_content)
     except Exception as e:
         logger.warning(f"Error al buscar hojas con datos: {str(e)}")
         return None
 
+# Valores de celda que las descargas web usan para "sin dato"
+VALORES_VACIOS_EXCEL = ['', ' ', 'NULL', 'null', 'None', '#N/A', '#REF!']
+
+def _limpiar_nombres_columnas(columnas):
+    """Nombres de columna sin saltos de línea ni espacios repetidos; los vacíos pasan a columna_N"""
+    new_columns = []
+    for col in columnas:
+        if pd.isna(col) or str(col).strip() == '':
+            # Generar nombre para columna sin nombre
+            new_columns.append(f"columna_{len(new_columns) + 1}")
+        else:
+            # Limpiar el nombre de la columna
+            clean_col = str(col).strip()
+            # Remover caracteres problemáticos comunes en descargas
+            clean_col = clean_col.replace('\n', ' ').replace('\r', ' ')
+            clean_col = ' '.join(clean_col.split())  # Normalizar espacios
+            new_columns.append(clean_col)
+    return new_columns
+
+def _quitar_encabezado_repetido(df):
+    """Si la primera fila repite los headers (común en descargas web), la elimina"""
+    first_row_as_str = [str(x).strip().lower() for x in df.iloc[0].values]
+    headers_as_str = [str(x).strip().lower() for x in df.columns]
+    if first_row_as_str == headers_as_str:
+        logger.info("Eliminada fila de headers duplicados")
+        return df.iloc[1:].reset_index(drop=True)
+    return df
+
+def limpiar_bloque_excel(df, primer_bloque):
+    """
+    Versión por bloques de clean_downloaded_excel para las cargas en streaming.
+    Solo aplica los pasos que no dependen del resto de la hoja; las columnas
+    vacías se conservan (un bloque no sabe si lo están en toda la hoja) y el
+    mapeo las completa con NULL igual que a las ausentes.
+    """
+    df = df.dropna(how='all')
+    df.columns = _limpiar_nombres_columnas(df.columns)
+    if primer_bloque and len(df) > 0:
+        df = _quitar_encabezado_repetido(df)
+    return df.replace(VALORES_VACIOS_EXCEL, pd.NA).reset_index(drop=True)
+
 def clean_downloaded_excel(df):
     """Limpia DataFrames de archivos Excel descargados que suelen tener problemas"""
     try:
@@ -653,33 +775,14 @@ def clean_downloaded_excel(df):
         df = df.dropna(axis=1, how='all')
         
         # 3. Limpiar nombres de columnas problemáticos
-        new_columns = []
-        for col in df.columns:
-            if pd.isna(col) or str(col).strip() == '':
-                # Generar nombre para columna sin nombre
-                new_columns.append(f"columna_{len(new_columns) + 1}")
-            else:
-                # Limpiar el nombre de la columna
-                clean_col = str(col).strip()
-                # Remover caracteres problemáticos comunes en descargas
-                clean_col = clean_col.replace('\n', ' ').replace('\r', ' ')
-                clean_col = ' '.join(clean_col.split())  # Normalizar espacios
-                new_columns.append(clean_col)
-        
-        df.columns = new_columns
+        df.columns = _limpiar_nombres_columnas(df.columns)
         
         # 4. Eliminar filas que son headers repetidos (común en descargas web)
         if len(df) > 1:
-            # Si la primera fila es igual a los headers, eliminarla
-            first_row_as_str = [str(x).strip().lower() for x in df.iloc[0].values]
-            headers_as_str = [str(x).strip().lower() for x in df.columns]
-            
-            if first_row_as_str == headers_as_str:
-                df = df.iloc[1:].reset_index(drop=True)
-                logger.info("Eliminada fila de headers duplicados")
+            df = _quitar_encabezado_repetido(df)
         
         # 5. Limpiar celdas con valores problemáticos
-        df = df.replace(['', ' ', 'NULL', 'null', 'None', '#N/A', '#REF!'], pd.NA)
+        df = df.replace(VALORES_VACIOS_EXCEL, pd.NA)
         
         # 6. Reset index
         df = df.reset_index(drop=True)
@@ -743,9 +846,14 @@ ORDENES_REQUIRED_COLUMNS = [
     "cant_recep", "monto_saldo", "dias_de_atraso", "estado", "stock",
     "referencia", "proveedor", "lugar_entrega_oc", "fec_ult_recep",
     "fecha_recibido_proveedor", "fecha_oc", "saldo", "plazo_entrega",
-    "tipo_vigencia", "vigencia", "det_recep"
+    "tipo_vigencia", "vigencia", "det_recep",
+    "fec_ult_recep_texto", "fecha_oc_texto"
 ]
 
+# Columnas de fecha tipadas en ordenes; el texto original se conserva en
+# <columna>_texto solo cuando no es una fecha (p. ej. "cumplimiento total de las obligaciones")
+ORDENES_DATE_COLUMNS = ["fecha_oc", "fec_ult_recep"]
+
 ORDENES_COLUMN_TYPES = {
     "id_llamado": "BIGINT",
     "oc": "VARCHAR(500)",
@@ -756,8 +864,10 @@ ORDENES_COLUMN_TYPES = {
     "monto_recepcion": "NUMERIC(18,6)",
     "monto_saldo": "NUMERIC(18,6)",
     "fec_contrato": "VARCHAR(1000)",
-    "fec_ult_recep": "VARCHAR(1000)",
-    "fecha_oc": "VARCHAR(1000)",
+    "fec_ult_recep": "DATE",
+    "fecha_oc": "DATE",
+    "fec_ult_recep_texto": "VARCHAR(1000)",
+    "fecha_oc_texto": "VARCHAR(1000)",
     "fecha_recibido_proveedor": "VARCHAR(1000)",
     "dias_de_atraso": "BIGINT",
     "item": "VARCHAR(500)",
@@ -1077,6 +1187,11 @@ def dashboard_page():
         st.error("❌ No se pudo conectar a PostgreSQL.")
         return
 
+    # Con fechas DATE el orden y el formato se resuelven en SQL (índice en fecha_oc).
+    # La conversión corre en las migraciones y en la carga; aquí solo se consulta
+    # el tipo, una vez por proceso
+    fechas_tipadas = fechas_ordenes_tipadas(conn)
+
     try:
         # Filtros superiores con mejor distribución para pantallas grandes
         col1, col2, col3, col4 = st.columns([3, 2, 2, 3])
@@ -1087,13 +1202,8 @@ def dashboard_page():
         with col2:
             # Obtener estados únicos para filtrar
             try:
-                estados_query = """
-                SELECT DISTINCT estado FROM siciap.ordenes
-                WHERE estado IS NOT NULL
-                ORDER BY estado
-                """
-                estados_df = pd.read_sql_query(text(estados_query), conn.engine)
-                estados = ["Todos"] + estados_df['estado'].tolist()
+                estados_df = leer_resumen_o_consulta(conn.engine, 'siciap.mv_ordenes_estado', orden="estado")
+                estados = ["Todos"] + estados_df['estado'].dropna().tolist()
             except Exception as e:
                 st.error(f"Error al obtener estados: {str(e)}")
                 estados = ["Todos"]
@@ -1126,27 +1236,11 @@ def dashboard_page():
                 filtro_base = " AND (CAST(codigo AS TEXT) ILIKE :search_value OR CAST(producto AS TEXT) ILIKE :search_value)"
                 params["search_value"] = search_value
             
-            # Obtener conteos filtrados por estado
-            estados_conteo_query = f"""
-            SELECT 
-                estado, 
-                COUNT(*) as cantidad
-            FROM 
-                siciap.ordenes
-            WHERE 
-                estado IS NOT NULL
-                {filtro_base}
-            GROUP BY 
-                estado
-            ORDER BY 
-                estado
-            """
-            
-            estados_conteo_df = pd.read_sql_query(
-                sql=text(estados_conteo_query), 
-                con=conn.engine, 
-                params=params
+            # Obtener conteos por estado (resumen materializado si no hay búsqueda)
+            estados_totales_df = leer_resumen_o_consulta(
+                conn.engine, 'siciap.mv_ordenes_estado', filtro_base, dict(params), orden="estado"
             )
+            estados_conteo_df = estados_totales_df[estados_totales_df['estado'].notna()].reset_index(drop=True)
             
             # Mostrar conteos por estado como métricas
             if not estados_conteo_df.empty:
@@ -1208,6 +1302,12 @@ def dashboard_page():
                 )
                 
                 # Construir la consulta para el estado seleccionado o todos los estados
+                if fechas_tipadas:
+                    fecha_oc_sql = "COALESCE(TO_CHAR(fecha_oc, 'DD/MM/YYYY'), fecha_oc_texto)"
+                    fec_ult_recep_sql = "COALESCE(TO_CHAR(fec_ult_recep, 'DD/MM/YYYY'), fec_ult_recep_texto)"
+                else:
+                    fecha_oc_sql = "fecha_oc"
+                    fec_ult_recep_sql = "fec_ult_recep"
                 ordenes_query = f"""
                 SELECT
                     oc as "N° OC",
@@ -1215,7 +1315,7 @@ def dashboard_page():
                     producto as "PRODUCTO",
                     proveedor as "PROVEEDOR",
                     llamado as "LLAMADO",
-                    fecha_oc as "FECHA OC",
+                    {fecha_oc_sql} as "FECHA OC",
                     cant_oc as "CANTIDAD",
                     cant_recep as "RECEPCIONADO",
                     saldo as "SALDO",
@@ -1223,7 +1323,7 @@ def dashboard_page():
                     p_unit as "PRECIO UNIT.",
                     dias_de_atraso as "DÍAS ATRASO",
                     plazo_entrega as "PLAZO ENTREGA",
-                    fec_ult_recep as "ÚLT. RECEPCIÓN",
+                    {fec_ult_recep_sql} as "ÚLT. RECEPCIÓN",
                     lugar_entrega_oc as "LUGAR ENTREGA",
                     estado as "ESTADO"
                 FROM 
@@ -1238,8 +1338,11 @@ def dashboard_page():
                     ordenes_query += f" AND estado = :estado"
                     params["estado"] = selected_estado
                 
-                # Para fechas almacenadas como texto en formato DD/MM/YYYY
-                ordenes_query += " ORDER BY TO_DATE(fecha_oc, 'DD/MM/YYYY') DESC"
+                if fechas_tipadas:
+                    ordenes_query += " ORDER BY fecha_oc DESC NULLS LAST"
+                else:
+                    # Para fechas almacenadas como texto en formato DD/MM/YYYY
+                    ordenes_query += " ORDER BY TO_DATE(fecha_oc, 'DD/MM/YYYY') DESC"
                 
                 # Ejecutar consulta con parámetros
                 ordenes_df = pd.read_sql_query(
@@ -1249,8 +1352,8 @@ def dashboard_page():
                 )
                 
                 if not ordenes_df.empty:
-                    # Formatear fechas
-                    for fecha_col in ['FECHA OC', 'ÚLT. RECEPCIÓN']:
+                    # Formatear fechas (solo si siguen guardadas como texto)
+                    for fecha_col in ([] if fechas_tipadas else ['FECHA OC', 'ÚLT. RECEPCIÓN']):
                         if fecha_col in ordenes_df.columns:
                             ordenes_df[fecha_col] = safe_date_conversion(ordenes_df[fecha_col]).dt.strftime('%d/%m/%Y')
                     
@@ -1289,15 +1392,10 @@ def dashboard_page():
                 else:
                     st.info(f"No se encontraron órdenes que coincidan con los criterios de búsqueda")
             
-            # Mostrar totales generales
-            total_query = """
-            SELECT COUNT(*) as total, 
-                   COALESCE(SUM(monto_oc), 0) as total_monto 
-            FROM siciap.ordenes
-            """
-            total_df = pd.read_sql_query(text(total_query), conn.engine)
-            total_oc = total_df['total'].iloc[0] if not total_df.empty else 0
-            total_monto = total_df['total_monto'].iloc[0] if not total_df.empty else 0
+            # Mostrar totales generales (sin filtro de búsqueda)
+            total_df = leer_resumen_o_consulta(conn.engine, 'siciap.mv_ordenes_estado')
+            total_oc = int(total_df['cantidad'].sum()) if not total_df.empty else 0
+            total_monto = float(total_df['monto_total'].sum()) if not total_df.empty else 0
             
             st.info(f"📊 **Resumen General:** {total_oc:,} órdenes totales | Monto total: ${total_monto:,.2f}")
             
@@ -1319,31 +1417,9 @@ def dashboard_page():
                     filtro_stock_base = " AND (CAST(codigo AS TEXT) ILIKE :search_value OR CAST(producto AS TEXT) ILIKE :search_value)"
                     params_stock["search_value"] = search_value
                 
-                # Consulta para obtener conteos por nivel de criticidad
-                stock_conteo_query = f"""
-                SELECT
-                    CASE 
-                        WHEN dmp IS NULL OR dmp = 0 THEN 'Sin DMP'
-                        WHEN stock_disponible IS NULL THEN 'Sin Stock'
-                        WHEN stock_disponible < dmp * 0.3 THEN 'Atención'
-                        WHEN stock_disponible < dmp * 0.7 THEN 'Precaución'
-                        ELSE 'Óptimo'
-                    END AS nivel_stock,
-                    COUNT(*) as cantidad
-                FROM 
-                    siciap.stock_critico
-                WHERE 1=1
-                    {filtro_stock_base}
-                GROUP BY 
-                    nivel_stock
-                ORDER BY 
-                    nivel_stock
-                """
-                
-                stock_conteo_df = pd.read_sql_query(
-                    sql=text(stock_conteo_query),
-                    con=conn.engine,
-                    params=params_stock
+                # Conteos por nivel de criticidad (resumen materializado si no hay búsqueda)
+                stock_conteo_df = leer_resumen_o_consulta(
+                    conn.engine, 'siciap.mv_stock_niveles', filtro_stock_base, params_stock, orden="nivel_stock"
                 )
                 
                 # Crear tarjetas para niveles de stock usando métricas de Streamlit
@@ -1420,25 +1496,9 @@ def dashboard_page():
                         filtro_ejecucion_base = " AND (CAST(e.codigo AS TEXT) ILIKE :search_value OR CAST(e.medicamento AS TEXT) ILIKE :search_value)"
                         params_ejecucion["search_value"] = search_value
 
-                    # Consulta para obtener métricas generales de ejecución
-                    ejecucion_metricas_query = f"""
-                    SELECT
-                        COUNT(DISTINCT id_llamado) as total_llamados,
-                        COUNT(*) as total_items,
-                        COALESCE(SUM(COALESCE(cantidad_maxima, 0)), 0) as total_cantidad_maxima,
-                        COALESCE(SUM(COALESCE(cantidad_emitida, 0)), 0) as total_cantidad_emitida,
-                        COALESCE(SUM(COALESCE(cantidad_maxima, 0) - COALESCE(cantidad_emitida, 0)), 0) as total_saldo_pendiente,
-                        COALESCE(AVG(COALESCE(porcentaje_emitido, 0)), 0) as promedio_ejecucion
-                    FROM 
-                        siciap.ejecucion e
-                    WHERE 1=1
-                        {filtro_ejecucion_base}
-                    """
-                    
-                    ejecucion_metricas_df = pd.read_sql_query(
-                        sql=text(ejecucion_metricas_query),
-                        con=conn.engine,
-                        params=params_ejecucion
+                    # Métricas generales de ejecución (resumen materializado si no hay búsqueda)
+                    ejecucion_metricas_df = leer_resumen_o_consulta(
+                        conn.engine, 'siciap.mv_ejecucion_metricas', filtro_ejecucion_base, params_ejecucion
                     )
                     
                     # Métricas principales de ejecución
@@ -1474,42 +1534,9 @@ def dashboard_page():
                             st.metric("⏳ Saldo", total_saldo_str, delta="Pendiente", delta_color="inverse")
 
                     # Obtener llamados para agrupar - AHORA INCLUYE dirigido_a, lugares y datos de vigencia
-                    llamados_ejecucion_query = f"""
-                    SELECT DISTINCT
-                        e.id_llamado,
-                        e.licitacion,
-                        COUNT(*) as cantidad_items,
-                        ROUND(AVG(COALESCE(e.porcentaje_emitido, 0)), 1) as porcentaje_promedio,
-                        TRUNC(SUM(COALESCE(e.cantidad_maxima, 0) - COALESCE(e.cantidad_emitida, 0))) as saldo_total_llamado,
-                        COALESCE(d.descripcion_llamado, 'Sin descripción') as descripcion_llamado,
-                        d.dirigido_a,
-                        d.lugares,
-                        d.numero_contrato,
-                        d.fecha_inicio,
-                        d.fecha_fin,
-                        CASE 
-                            WHEN d.fecha_fin IS NULL THEN 'Indeterminado'
-                            WHEN UPPER(CAST(d.fecha_fin AS TEXT)) LIKE '%CUMPLIMIENTO TOTAL%' THEN 'Sí'
-                            WHEN d.fecha_fin = 'CUMPLIMIENTO TOTAL DE LAS OBLIGACIONES' THEN 'Sí'
-                            WHEN d.fecha_fin = 'cumplimiento total de las obligaciones' THEN 'Sí'
-                            ELSE 'Sí'
-                        END as vigente
-                    FROM 
-                        siciap.ejecucion e
-                    LEFT JOIN siciap.datosejecucion d ON e.id_llamado = d.id_llamado
-                    WHERE 1=1
-                        {filtro_ejecucion_base}
-                    GROUP BY
-                        e.id_llamado, e.licitacion, d.descripcion_llamado, d.dirigido_a, d.lugares, d.numero_contrato,
-                        d.fecha_inicio, d.fecha_fin
-                    ORDER BY
-                        porcentaje_promedio ASC, saldo_total_llamado DESC
-                    """
-                    
-                    llamados_ejecucion_df = pd.read_sql_query(
-                        sql=text(llamados_ejecucion_query),
-                        con=conn.engine,
-                        params=params_ejecucion
+                    llamados_ejecucion_df = leer_resumen_o_consulta(
+                        conn.engine, 'siciap.mv_llamados_ejecucion', filtro_ejecucion_base, params_ejecucion,
+                        orden="porcentaje_promedio ASC, saldo_total_llamado DESC"
                     )
                     
                     # En lugar de usar expansores anidados, usar selectbox para elegir el llamado
@@ -2217,6 +2244,974 @@ def diagnostico_dashboard():
        - Prueba versiones más simples de las consultas para aislar el problema
     """)
 
+# =============================================================================
+# CARGA MASIVA: COPY FROM STDIN A TABLA STAGING + REEMPLAZO ATÓMICO
+# =============================================================================
+
+# Filas por bloque al serializar el DataFrame para COPY
+COPY_CHUNK_ROWS = 10000
+# Filas por sentencia INSERT multi-fila cuando el driver no soporta COPY (pg8000)
+VALUES_BATCH_ROWS = 500
+# Marcador de NULL en el CSV enviado por COPY
+COPY_NULL_MARKER = '\\N'
+
+def _preparar_df_para_copy(df):
+    """
+    Ajusta un DataFrame para enviarlo por COPY/VALUES:
+    - columnas float que solo contienen enteros pasan a Int64 (BIGINT/INTEGER no aceptan '123.0')
+    - se eliminan caracteres nulos de los textos (PostgreSQL los rechaza)
+    """
+    df = df.copy()
+    for col in df.columns:
+        serie = df[col]
+        try:
+            if pd.api.types.is_float_dtype(serie):
+                valores = serie.dropna()
+                if (not valores.empty and np.isfinite(valores).all()
+                        and (valores.abs() < 2**63).all() and (valores == valores.round()).all()):
+                    df[col] = serie.astype('Int64')
+            elif serie.dtype == object:
+                df[col] = serie.map(lambda v: v.replace('\x00', '') if isinstance(v, str) else v)
+        except Exception as e:
+            logger.warning(f"No se pudo preparar la columna {col} para COPY: {str(e)}")
+    return df
+
+def _iter_csv_chunks(df, chunk_rows=COPY_CHUNK_ROWS):
+    """Serializa el DataFrame a CSV por bloques para no materializar todo el archivo en memoria"""
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows].to_csv(
+            index=False, header=False, na_rep=COPY_NULL_MARKER
+        )
+
+def _insertar_por_values(cursor, tabla, columns_sql, df, batch_rows=VALUES_BATCH_ROWS):
+    """Fallback para drivers sin COPY (pg8000): INSERT con VALUES de múltiples filas"""
+    n_cols = len(df.columns)
+    # PostgreSQL admite hasta 65535 parámetros por sentencia
+    batch_rows = max(1, min(batch_rows, 60000 // max(n_cols, 1)))
+    row_placeholder = "(" + ", ".join(["%s"] * n_cols) + ")"
+    rows = df.astype(object).where(df.notna(), None).values.tolist()
+    for start in range(0, len(rows), batch_rows):
+        batch = rows[start:start + batch_rows]
+        insert_sql = f"INSERT INTO {tabla} ({columns_sql}) VALUES " + ", ".join([row_placeholder] * len(batch))
+        cursor.execute(insert_sql, [val for row in batch for val in row])
+
+def _cargar_staging(cursor, driver, staging, columns_sql, df, chunk_rows=COPY_CHUNK_ROWS, filas_previas=0):
+    """
+    Transmite el DataFrame a la tabla staging con el mecanismo más rápido disponible en el driver.
+    filas_previas: filas ya enviadas en bloques anteriores de la misma carga (para el progreso)
+    """
+    copy_sql = f"COPY {staging} ({columns_sql}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL_MARKER}')"
+    total_rows = len(df)
+    if driver == 'psycopg':
+        with cursor.copy(copy_sql) as copy:
+            for i, chunk in enumerate(_iter_csv_chunks(df, chunk_rows), 1):
+                jobs.verificar_cancelacion()
+                copy.write(chunk)
+                jobs.reportar_progreso(filas=filas_previas + min(i * chunk_rows, total_rows))
+    elif driver == 'psycopg2':
+        for i, chunk in enumerate(_iter_csv_chunks(df, chunk_rows), 1):
+            jobs.verificar_cancelacion()
+            cursor.copy_expert(copy_sql, StringIO(chunk))
+            jobs.reportar_progreso(filas=filas_previas + min(i * chunk_rows, total_rows))
+    else:
+        jobs.verificar_cancelacion()
+        _insertar_por_values(cursor, staging, columns_sql, df)
+        jobs.reportar_progreso(filas=filas_previas + total_rows)
+
+def copy_bloques_replace(db_connection, bloques, schema, table, chunk_rows=COPY_CHUNK_ROWS):
+    """
+    Reemplaza el contenido de schema.table con los DataFrames de bloques usando una tabla staging.
+
+    Los bloques se consumen de a uno (p. ej. leídos del Excel en streaming) y se
+    transmiten a una tabla temporal con COPY FROM STDIN (psycopg3 cursor.copy /
+    psycopg2 copy_expert) o, con pg8000, con INSERT multi-fila: en memoria solo
+    está el bloque actual. Después se hace DELETE + INSERT ... SELECT en la misma
+    transacción, de modo que la tabla destino solo se bloquea durante el
+    reemplazo y nunca queda a medio cargar.
+
+    Args:
+        db_connection: PostgresConnection conectada
+        bloques: Iterable de DataFrames; el primero define las columnas, que
+            deben existir en la tabla destino, y los demás se alinean a ellas
+        schema (str): Esquema de la tabla destino
+        table (str): Nombre de la tabla destino
+
+    Returns:
+        int: Cantidad de filas cargadas. Si no llegó ninguna fila la tabla
+        destino no se toca y se devuelve 0.
+    """
+    if db_connection.engine is None:
+        db_connection.connect()
+
+    target = f"{schema}.{table}"
+    staging = f"stg_{table}"
+
+    driver = db_connection.engine.dialect.driver
+    raw_conn = db_connection.engine.raw_connection()
+    inicio = time.perf_counter()
+    # El total no se conoce hasta terminar de leer el archivo: progreso indeterminado
+    jobs.reportar_progreso(filas=0, total=0, mensaje=f"Cargando {target}")
+    try:
+        cursor = raw_conn.cursor()
+        columnas = None
+        columns_sql = None
+        total_rows = 0
+        for df in bloques:
+            if df is None or df.empty:
+                continue
+            if columnas is None:
+                columnas = list(df.columns)
+                columns_sql = ", ".join([f'"{col}"' for col in columnas])
+                # Tabla temporal con los mismos tipos que la destino (sin defaults: no consume la secuencia del id)
+                cursor.execute(f"DROP TABLE IF EXISTS pg_temp.{staging}")
+                cursor.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {columns_sql} FROM {target} WITH NO DATA")
+            # La conversión a Int64 se decide por bloque: cada bloque es válido por sí solo
+            prepared = _preparar_df_para_copy(df.reindex(columns=columnas))
+            _cargar_staging(cursor, driver, staging, columns_sql, prepared, chunk_rows, filas_previas=total_rows)
+            total_rows += len(prepared)
+
+        if total_rows == 0:
+            raw_conn.rollback()
+            cursor.close()
+            return 0
+
+        tiempo_carga = time.perf_counter() - inicio
+        logger.info(
+            f"Staging {staging}: {total_rows} filas en {tiempo_carga:.2f}s "
+            f"({total_rows / max(tiempo_carga, 1e-6):,.0f} filas/s) usando {driver}"
+        )
+
+        # Reemplazo atómico de la tabla destino
+        cursor.execute(f"DELETE FROM {target}")
+        cursor.execute(f"INSERT INTO {target} ({columns_sql}) SELECT {columns_sql} FROM {staging}")
+        raw_conn.commit()
+        cursor.close()
+
+        tiempo_total = time.perf_counter() - inicio
+        logger.info(
+            f"Tabla {target} reemplazada: {total_rows} filas en {tiempo_total:.2f}s "
+            f"({total_rows / max(tiempo_total, 1e-6):,.0f} filas/s)"
+        )
+        return total_rows
+    except BaseException:
+        # También ante la cancelación del trabajo: la tabla destino no se toca
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+def upsert_dataframe(db_connection, df, schema, table, key, mode='upsert'):
+    """
+    Aplica un DataFrame completo sobre schema.table con una sola sentencia de conjunto.
+
+    El DataFrame se carga a una tabla staging (ver _cargar_staging) y luego:
+    - mode='upsert': INSERT ... ON CONFLICT (key) DO UPDATE
+    - mode='insert': INSERT ... ON CONFLICT (key) DO NOTHING
+    - mode='update': UPDATE ... FROM staging (solo registros existentes)
+
+    Para 'upsert' e 'insert' la columna clave debe tener un índice único.
+    Filas sin clave se cuentan como errores; claves repetidas en el DataFrame
+    conservan la última aparición.
+
+    Returns:
+        dict: {'insertados': int, 'actualizados': int, 'omitidos': int, 'errores': int}
+    """
+    if mode not in ('upsert', 'insert', 'update'):
+        raise ValueError(f"Modo de upsert no soportado: {mode}")
+    if key not in df.columns:
+        raise ValueError(f"El DataFrame no contiene la columna clave '{key}'")
+
+    if db_connection.engine is None:
+        db_connection.connect()
+
+    total_rows = len(df)
+    df = df[df[key].notna()]
+    errores = total_rows - len(df)
+    df = df.drop_duplicates(subset=[key], keep='last')
+
+    resultado = {'insertados': 0, 'actualizados': 0, 'omitidos': 0, 'errores': errores}
+    if df.empty:
+        return resultado
+
+    target = f"{schema}.{table}"
+    staging = f"stg_{table}"
+    columns = [str(col) for col in df.columns]
+    columns_sql = ", ".join([f'"{col}"' for col in columns])
+    update_cols = [col for col in columns if col != key]
+    prepared = _preparar_df_para_copy(df)
+
+    driver = db_connection.engine.dialect.driver
+    raw_conn = db_connection.engine.raw_connection()
+    inicio = time.perf_counter()
+    try:
+        cursor = raw_conn.cursor()
+        cursor.execute(f"DROP TABLE IF EXISTS pg_temp.{staging}")
+        cursor.execute(f"CREATE TEMP TABLE {staging} ON COMMIT DROP AS SELECT {columns_sql} FROM {target} WITH NO DATA")
+        _cargar_staging(cursor, driver, staging, columns_sql, prepared)
+
+        if mode == 'update':
+            if update_cols:
+                set_sql = ", ".join([f'"{col}" = s."{col}"' for col in update_cols])
+                cursor.execute(f"""
+                    UPDATE {target} AS t
+                    SET {set_sql}
+                    FROM {staging} AS s
+                    WHERE t."{key}" = s."{key}"
+                """)
+                resultado['actualizados'] = max(cursor.rowcount, 0)
+        else:
+            if mode == 'upsert' and update_cols:
+                set_sql = ", ".join([f'"{col}" = EXCLUDED."{col}"' for col in update_cols])
+                conflict_sql = f"DO UPDATE SET {set_sql}"
+            else:
+                conflict_sql = "DO NOTHING"
+            # xmax = 0 solo en filas recién insertadas: permite separar inserciones de actualizaciones
+            cursor.execute(f"""
+                INSERT INTO {target} ({columns_sql})
+                SELECT {columns_sql} FROM {staging}
+                ON CONFLICT ("{key}") {conflict_sql}
+                RETURNING (xmax = 0) AS insertado
+            """)
+            flags = [row[0] for row in cursor.fetchall()]
+            resultado['insertados'] = sum(1 for flag in flags if flag)
+            resultado['actualizados'] = len(flags) - resultado['insertados']
+
+        raw_conn.commit()
+        cursor.close()
+    except Exception:
+        raw_conn.rollback()
+        raise
+    finally:
+        raw_conn.close()
+
+    resultado['omitidos'] = total_rows - errores - resultado['insertados'] - resultado['actualizados']
+    logger.info(
+        f"Upsert {target} ({mode}): {resultado['insertados']} insertados, "
+        f"{resultado['actualizados']} actualizados, {resultado['omitidos']} omitidos, "
+        f"{resultado['errores']} sin clave en {time.perf_counter() - inicio:.2f}s"
+    )
+    return resultado
+
+# Columnas editables de siciap.datosejecucion
+DATOSEJECUCION_COLUMNS = [
+    'id_llamado', 'licitacion', 'proveedor', 'descripcion_llamado',
+    'numero_contrato', 'fecha_inicio', 'fecha_fin', 'dirigido_a', 'lugares'
+]
+
+def upsert_datosejecucion(db_connection, df, mode='upsert'):
+    """
+    Inserta/actualiza registros de siciap.datosejecucion en bloque (ver upsert_dataframe).
+
+    Args:
+        db_connection: PostgresConnection conectada
+        df: DataFrame con id_llamado y cualquier subconjunto de DATOSEJECUCION_COLUMNS
+        mode (str): 'upsert', 'insert' o 'update'
+
+    Returns:
+        dict: {'insertados': int, 'actualizados': int, 'omitidos': int, 'errores': int}
+    """
+    columnas = [col for col in DATOSEJECUCION_COLUMNS if col in df.columns]
+    datos = df[columnas].copy()
+    datos['id_llamado'] = pd.to_numeric(datos['id_llamado'], errors='coerce')
+
+    if mode != 'update':
+        # ON CONFLICT (id_llamado) necesita el índice único de la migración 4
+        if db_connection.engine is None:
+            db_connection.connect()
+        esquema = asegurar_esquema_siciap(db_connection.engine)
+        if esquema['version'] < 4:
+            raise RuntimeError(
+                "siciap.datosejecucion no tiene el índice único sobre id_llamado "
+                f"(migración 4 pendiente: {esquema['error']}). Revise el log de migraciones "
+                "y corrija la causa antes de importar."
+            )
+    resultado = upsert_dataframe(db_connection, datos, 'siciap', 'datosejecucion', key='id_llamado', mode=mode)
+    refrescar_resumenes_dashboard(db_connection, 'datosejecucion')
+    return resultado
+
+# =============================================================================
+# IMPORTACIÓN POR LOTES CON AISLAMIENTO DE ERRORES (BISECCIÓN + CUARENTENA)
+# =============================================================================
+
+# Tamaño inicial de lote y límites para el ajuste adaptativo
+LOTE_IMPORTACION_INICIAL = 500
+LOTE_IMPORTACION_MIN = 50
+LOTE_IMPORTACION_MAX = 10000
+# Latencia objetivo por lote (segundos): lotes más rápidos crecen, más lentos se reducen
+LOTE_LATENCIA_OBJETIVO = 1.0
+
+def _obtener_conexion_dbapi(conn):
+    """
+    Devuelve (conexión DBAPI, propia) para cualquiera de las conexiones que usa el módulo:
+    PostgresConnection, Engine/Connection de SQLAlchemy o una conexión DBAPI directa.
+    Si 'propia' es True hay que cerrarla al terminar (vuelve al pool).
+    """
+    if isinstance(conn, PostgresConnection):
+        if conn.engine is None:
+            conn.connect()
+        return conn.engine.raw_connection(), True
+    if hasattr(conn, 'raw_connection'):
+        return conn.raw_connection(), True
+    if hasattr(conn, 'engine') and hasattr(conn.engine, 'raw_connection'):
+        return conn.engine.raw_connection(), True
+    return conn, False
+
+def _insertar_filas(cursor, tabla, columns_sql, rows):
+    """INSERT multi-fila respetando el límite de parámetros por sentencia de PostgreSQL"""
+    n_cols = len(rows[0])
+    filas_por_sentencia = max(1, 60000 // max(n_cols, 1))
+    row_placeholder = "(" + ", ".join(["%s"] * n_cols) + ")"
+    for start in range(0, len(rows), filas_por_sentencia):
+        batch = rows[start:start + filas_por_sentencia]
+        insert_sql = f"INSERT INTO {tabla} ({columns_sql}) VALUES " + ", ".join([row_placeholder] * len(batch))
+        cursor.execute(insert_sql, [val for row in batch for val in row])
+
+def _insertar_con_biseccion(cursor, tabla, columns_sql, rows, indices, rechazos):
+    """
+    Inserta las filas protegidas por un SAVEPOINT; si fallan por un error de datos
+    (SQLSTATE 22/23) divide el bloque hasta aislarlas (ver biseccion.py). Los
+    errores de esquema, permisos o conexión se propagan sin bisectar.
+
+    Las filas rechazadas se agregan a 'rechazos' como (índice, mensaje de error).
+
+    Returns:
+        int: Cantidad de filas insertadas
+    """
+    def insertar(filas):
+        _insertar_filas(cursor, tabla, columns_sql, filas)
+
+    return biseccion.insertar_con_biseccion(
+        insertar, rows, indices, rechazos,
+        savepoint=lambda nivel: biseccion.savepoint_dbapi(cursor, f"sp_lote_{nivel}")
+    )
+
+def _ajustar_tamano_lote(actual, segundos, objetivo=LOTE_LATENCIA_OBJETIVO):
+    """Duplica o reduce a la mitad el lote según la latencia medida frente a la objetivo"""
+    if segundos < objetivo / 2:
+        nuevo = actual * 2
+    elif segundos > objetivo * 2:
+        nuevo = actual // 2
+    else:
+        nuevo = actual
+    return max(LOTE_IMPORTACION_MIN, min(LOTE_IMPORTACION_MAX, nuevo))
+
+def registrar_filas_rechazadas(conn, tabla, rechazadas):
+    """
+    Guarda las filas rechazadas en {esquema}.importacion_rechazos (fila como JSONB + error)
+    para revisarlas y reprocesarlas más tarde.
+    """
+    schema = tabla.split('.')[0] if '.' in tabla else 'public'
+    cuarentena = f"{schema}.importacion_rechazos"
+    filas = rechazadas.drop(columns=['error'])
+    filas = filas.astype(object).where(filas.notna(), None)
+    registros = [
+        (tabla, json.dumps(fila, default=str, ensure_ascii=False), error)
+        for fila, error in zip(filas.to_dict('records'), rechazadas['error'])
+    ]
+
+    raw_conn, propia = _obtener_conexion_dbapi(conn)
+    try:
+        cursor = raw_conn.cursor()
+        cursor.execute(f"""
+            CREATE TABLE IF NOT EXISTS {cuarentena} (
+                id SERIAL PRIMARY KEY,
+                tabla_destino VARCHAR(255),
+                fila JSONB,
+                error TEXT,
+                fecha_registro TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        for start in range(0, len(registros), VALUES_BATCH_ROWS):
+            batch = registros[start:start + VALUES_BATCH_ROWS]
+            cursor.execute(
+                f"INSERT INTO {cuarentena} (tabla_destino, fila, error) VALUES "
+                + ", ".join(["(%s, CAST(%s AS JSONB), %s)"] * len(batch)),
+                [val for registro in batch for val in registro]
+            )
+        raw_conn.commit()
+        cursor.close()
+        logger.info(f"{len(registros)} filas rechazadas registradas en {cuarentena}")
+        return True
+    except Exception as e:
+        raw_conn.rollback()
+        logger.warning(f"No se pudieron registrar filas rechazadas en {cuarentena}: {str(e)}")
+        return False
+    finally:
+        if propia:
+            raw_conn.close()
+
+def importar_con_biseccion(conn, tabla, df, batch_size=LOTE_IMPORTACION_INICIAL, adaptativo=True,
+                           registrar_cuarentena=True):
+    """
+    Inserta un DataFrame por lotes sin caer a fila por fila cuando un lote falla.
+
+    Cada lote se confirma por separado; si falla, se aíslan las filas con error por
+    bisección con savepoints y el resto del lote se inserta igual. Con 'adaptativo'
+    el tamaño de lote se ajusta según la latencia medida (LOTE_LATENCIA_OBJETIVO).
+
+    Args:
+        conn: PostgresConnection, Engine/Connection de SQLAlchemy o conexión DBAPI
+        tabla (str): Tabla destino (esquema.tabla)
+        df: DataFrame con columnas de la tabla destino
+        batch_size (int): Tamaño inicial de lote
+        adaptativo (bool): Ajustar el tamaño de lote según la latencia
+        registrar_cuarentena (bool): Guardar filas rechazadas en {esquema}.importacion_rechazos
+
+    Returns:
+        dict: {'insertadas': int, 'rechazadas': DataFrame con columna 'error', 'lotes': int}
+    """
+    total_rows = len(df)
+    columns_sql = ", ".join([f'"{col}"' for col in df.columns])
+    prepared = _preparar_df_para_copy(df)
+    rows = prepared.astype(object).where(prepared.notna(), None).values.tolist()
+
+    insertadas = 0
+    lotes = 0
+    rechazos = []
+    lote = max(1, int(batch_size))
+    pos = 0
+    inicio = time.perf_counter()
+
+    jobs.reportar_progreso(filas=0, total=total_rows, mensaje=f"Importando en {tabla} por lotes")
+    raw_conn, propia = _obtener_conexion_dbapi(conn)
+    try:
+        cursor = raw_conn.cursor()
+        while pos < total_rows:
+            # Cancelación entre lotes: los ya confirmados quedan importados
+            jobs.verificar_cancelacion()
+            fin = min(pos + lote, total_rows)
+            rechazos_previos = len(rechazos)
+            t_lote = time.perf_counter()
+            try:
+                insertadas += _insertar_con_biseccion(
+                    cursor, tabla, columns_sql, rows[pos:fin], list(range(pos, fin)), rechazos
+                )
+                raw_conn.commit()
+            except Exception:
+                # Errores que no son de una fila concreta (esquema, permisos, conexión):
+                # la bisección los propaga sin partir el lote y abortan la importación
+                raw_conn.rollback()
+                raise
+            segundos = time.perf_counter() - t_lote
+            lotes += 1
+            logger.info(
+                f"Lote {lotes}: filas {pos + 1}-{fin} de {total_rows} en {segundos:.2f}s "
+                f"(tamaño {lote}, {len(rechazos) - rechazos_previos} rechazadas)"
+            )
+            pos = fin
+            jobs.reportar_progreso(filas=pos)
+            # Solo se ajusta con lotes limpios: la bisección distorsiona la latencia
+            if adaptativo and len(rechazos) == rechazos_previos:
+                lote = _ajustar_tamano_lote(lote, segundos)
+        cursor.close()
+    finally:
+        if propia:
+            raw_conn.close()
+
+    rechazadas = df.iloc[[indice for indice, _ in rechazos]].copy()
+    rechazadas['error'] = [error for _, error in rechazos]
+    if registrar_cuarentena and not rechazadas.empty:
+        registrar_filas_rechazadas(conn, tabla, rechazadas)
+
+    segundos_total = time.perf_counter() - inicio
+    logger.info(
+        f"Importación por lotes en {tabla}: {insertadas} de {total_rows} filas en {segundos_total:.2f}s "
+        f"({insertadas / max(segundos_total, 1e-6):,.0f} filas/s), {len(rechazadas)} rechazadas, {lotes} lotes"
+    )
+    return {'insertadas': insertadas, 'rechazadas': rechazadas, 'lotes': lotes}
+
+# =============================================================================
+# RESÚMENES MATERIALIZADOS DEL DASHBOARD
+# =============================================================================
+
+# Consultas de métricas del dashboard. '{filtro}' recibe el filtro de búsqueda
+# (vacío para las vistas materializadas, que guardan el resultado sin filtrar).
+# Sin '%' literales: también se ejecutan por DBAPI sin parámetros al crear la vista.
+SQL_ORDENES_POR_ESTADO = """
+    SELECT 
+        estado, 
+        COUNT(*) as cantidad,
+        COALESCE(SUM(monto_oc), 0) as monto_total
+    FROM 
+        siciap.ordenes
+    WHERE 1=1
+        {filtro}
+    GROUP BY 
+        estado
+"""
+
+SQL_STOCK_POR_NIVEL = """
+    SELECT
+        CASE 
+            WHEN dmp IS NULL OR dmp = 0 THEN 'Sin DMP'
+            WHEN stock_disponible IS NULL THEN 'Sin Stock'
+            WHEN stock_disponible < dmp * 0.3 THEN 'Atención'
+            WHEN stock_disponible < dmp * 0.7 THEN 'Precaución'
+            ELSE 'Óptimo'
+        END AS nivel_stock,
+        COUNT(*) as cantidad
+    FROM 
+        siciap.stock_critico
+    WHERE 1=1
+        {filtro}
+    GROUP BY 
+        nivel_stock
+"""
+
+SQL_EJECUCION_METRICAS = """
+    SELECT
+        COUNT(DISTINCT id_llamado) as total_llamados,
+        COUNT(*) as total_items,
+        COALESCE(SUM(COALESCE(cantidad_maxima, 0)), 0) as total_cantidad_maxima,
+        COALESCE(SUM(COALESCE(cantidad_emitida, 0)), 0) as total_cantidad_emitida,
+        COALESCE(SUM(COALESCE(cantidad_maxima, 0) - COALESCE(cantidad_emitida, 0)), 0) as total_saldo_pendiente,
+        COALESCE(AVG(COALESCE(porcentaje_emitido, 0)), 0) as promedio_ejecucion
+    FROM 
+        siciap.ejecucion e
+    WHERE 1=1
+        {filtro}
+"""
+
+SQL_LLAMADOS_EJECUCION = """
+    SELECT
+        e.id_llamado,
+        e.licitacion,
+        COUNT(*) as cantidad_items,
+        ROUND(AVG(COALESCE(e.porcentaje_emitido, 0)), 1) as porcentaje_promedio,
+        TRUNC(SUM(COALESCE(e.cantidad_maxima, 0) - COALESCE(e.cantidad_emitida, 0))) as saldo_total_llamado,
+        COALESCE(d.descripcion_llamado, 'Sin descripción') as descripcion_llamado,
+        d.dirigido_a,
+        d.lugares,
+        d.numero_contrato,
+        d.fecha_inicio,
+        d.fecha_fin,
+        CASE 
+            WHEN d.fecha_fin IS NULL THEN 'Indeterminado'
+            WHEN POSITION('CUMPLIMIENTO TOTAL' IN UPPER(CAST(d.fecha_fin AS TEXT))) > 0 THEN 'Sí'
+            WHEN d.fecha_fin = 'CUMPLIMIENTO TOTAL DE LAS OBLIGACIONES' THEN 'Sí'
+            WHEN d.fecha_fin = 'cumplimiento total de las obligaciones' THEN 'Sí'
+            ELSE 'Sí'
+        END as vigente
+    FROM 
+        siciap.ejecucion e
+    LEFT JOIN siciap.datosejecucion d ON e.id_llamado = d.id_llamado
+    WHERE 1=1
+        {filtro}
+    GROUP BY
+        e.id_llamado, e.licitacion, d.descripcion_llamado, d.dirigido_a, d.lugares, d.numero_contrato,
+        d.fecha_inicio, d.fecha_fin
+"""
+
+# Vista materializada -> (consulta, tablas base de las que depende)
+RESUMENES_DASHBOARD = {
+    'siciap.mv_ordenes_estado': (SQL_ORDENES_POR_ESTADO, ('ordenes',)),
+    'siciap.mv_stock_niveles': (SQL_STOCK_POR_NIVEL, ('stock_critico',)),
+    'siciap.mv_ejecucion_metricas': (SQL_EJECUCION_METRICAS, ('ejecucion',)),
+    'siciap.mv_llamados_ejecucion': (SQL_LLAMADOS_EJECUCION, ('ejecucion', 'datosejecucion')),
+}
+
+def refrescar_resumenes_dashboard(conn, tabla=None):
+    """
+    Crea o refresca las vistas materializadas del dashboard que dependen de 'tabla'
+    (todas si es None). Se llama al final de cada carga; un fallo se registra en el
+    log pero no invalida la importación ya confirmada.
+    """
+    raw_conn, propia = _obtener_conexion_dbapi(conn)
+    try:
+        cursor = raw_conn.cursor()
+        for vista, (consulta, tablas) in RESUMENES_DASHBOARD.items():
+            if tabla is not None and tabla not in tablas:
+                continue
+            inicio = time.perf_counter()
+            try:
+                cursor.execute("SELECT to_regclass(%s)", (vista,))
+                if cursor.fetchone()[0] is None:
+                    cursor.execute(f"CREATE MATERIALIZED VIEW {vista} AS {consulta.format(filtro='')}")
+                else:
+                    cursor.execute(f"REFRESH MATERIALIZED VIEW {vista}")
+                raw_conn.commit()
+                logger.info(f"Resumen {vista} actualizado en {time.perf_counter() - inicio:.2f}s")
+            except Exception as e:
+                raw_conn.rollback()
+                logger.warning(f"No se pudo actualizar el resumen {vista}: {str(e)}")
+        cursor.close()
+    finally:
+        if propia:
+            raw_conn.close()
+
+def leer_resumen_o_consulta(engine, vista, filtro="", params=None, orden=None):
+    """
+    Lee las métricas desde la vista materializada cuando no hay filtro de búsqueda;
+    con filtro, o si la vista aún no existe, ejecuta la consulta sobre las tablas base.
+    """
+    orden_sql = f" ORDER BY {orden}" if orden else ""
+    consulta, _tablas = RESUMENES_DASHBOARD[vista]
+    if not filtro:
+        try:
+            return pd.read_sql_query(text(f"SELECT * FROM {vista}{orden_sql}"), engine)
+        except Exception as e:
+            logger.warning(f"Resumen {vista} no disponible, consultando tablas base: {str(e)}")
+    return pd.read_sql_query(
+        sql=text(consulta.format(filtro=filtro) + orden_sql),
+        con=engine,
+        params=params or {}
+    )
+
+# =============================================================================
+# CONTROL DE ARCHIVOS IMPORTADOS
+# =============================================================================
+
+def _asegurar_tabla_archivos(cursor):
+    """Crea siciap.archivos_cargados (equivalente SICIAP de oxigeno.archivos_cargados)"""
+    cursor.execute("CREATE SCHEMA IF NOT EXISTS siciap")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS siciap.archivos_cargados (
+            id SERIAL PRIMARY KEY,
+            tabla VARCHAR(200) NOT NULL,
+            nombre_archivo VARCHAR(500),
+            huella VARCHAR(64) NOT NULL,
+            filas INTEGER,
+            fecha_carga TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_archivos_cargados_tabla "
+        "ON siciap.archivos_cargados (tabla, id DESC)"
+    )
+
+def archivo_ya_cargado(conn, tabla, huella):
+    """
+    True si la última importación confirmada en 'tabla' fue esta misma carga
+    (mismo contenido y configuración). Si después se importó otro archivo, la
+    carga se vuelve a hacer.
+    """
+    raw_conn, propia = _obtener_conexion_dbapi(conn)
+    try:
+        cursor = raw_conn.cursor()
+        try:
+            cursor.execute("SELECT to_regclass('siciap.archivos_cargados')")
+            if cursor.fetchone()[0] is None:
+                return False
+            cursor.execute(
+                "SELECT huella FROM siciap.archivos_cargados WHERE tabla = %s ORDER BY id DESC LIMIT 1",
+                (tabla,)
+            )
+            fila = cursor.fetchone()
+            return fila is not None and fila[0] == huella
+        finally:
+            cursor.close()
+            raw_conn.commit()
+    except Exception as e:
+        logger.warning(f"No se pudo verificar el historial de cargas de {tabla}: {str(e)}")
+        return False
+    finally:
+        if propia:
+            raw_conn.close()
+
+def registrar_archivo_cargado(conn, tabla, nombre_archivo, huella, filas):
+    """Registra una importación confirmada en siciap.archivos_cargados"""
+    raw_conn, propia = _obtener_conexion_dbapi(conn)
+    try:
+        cursor = raw_conn.cursor()
+        try:
+            _asegurar_tabla_archivos(cursor)
+            cursor.execute(
+                "INSERT INTO siciap.archivos_cargados (tabla, nombre_archivo, huella, filas) "
+                "VALUES (%s, %s, %s, %s)",
+                (tabla, nombre_archivo, huella, filas)
+            )
+            raw_conn.commit()
+        finally:
+            cursor.close()
+    except Exception as e:
+        raw_conn.rollback()
+        logger.warning(f"No se pudo registrar la carga de {nombre_archivo}: {str(e)}")
+    finally:
+        if propia:
+            raw_conn.close()
+
+def _mapear_bloques_excel(processor, file_content, file_name):
+    """
+    Lee la primera hoja con datos del Excel en bloques de COPY_CHUNK_ROWS filas y
+    entrega cada bloque ya limpio y mapeado. Los formatos que no se pueden
+    recorrer en streaming (.xls, CSV con extensión .xlsx) se leen completos con
+    read_excel_robust y se entregan en un solo bloque.
+    """
+    try:
+        bloques = excel_stream.iterar_primera_hoja_con_datos(file_content, tamano_chunk=COPY_CHUNK_ROWS)
+        primero = next(bloques, None)
+    except Exception as e:
+        logger.info(f"{file_name}: no se puede leer en bloques ({str(e)}); se lee completo")
+        df = read_excel_robust(file_content, file_name)
+        if df is not None:
+            mapped_df = processor.map_excel_to_required_columns(df.dropna(how='all'), file_name)
+            if not mapped_df.empty:
+                yield mapped_df
+        return
+
+    if primero is None:
+        logger.warning(f"{file_name}: el libro no tiene hojas con datos")
+        return
+
+    logger.info(f"Columnas en el archivo original: {', '.join(map(str, primero.columns))}")
+    bloques = itertools.chain([primero], bloques)
+    for i, df in enumerate(bloques):
+        df = limpiar_bloque_excel(df, primer_bloque=(i == 0))
+        if df.empty:
+            continue
+        mapped_df = processor.map_excel_to_required_columns(df, file_name)
+        if not mapped_df.empty:
+            yield mapped_df
+
+def leer_y_mapear_en_bloques(processor, file_content, file_name, huella):
+    """
+    Devuelve un iterador de DataFrames mapeados de un archivo: desde la caché
+    Parquet si la misma carga ya se mapeó (p. ej. reintento tras un error de
+    base de datos), o leyendo y mapeando el Excel en bloques. Con la caché
+    activa, los bloques se escriben primero a Parquet (memoria acotada a un
+    bloque) y la carga los lee de ahí, así un fallo en la base no obliga a
+    volver a parsear el Excel.
+    """
+    bloques = excel_stream.iterar_parquet(huella)
+    if bloques is not None:
+        logger.info(f"{file_name}: usando datos ya mapeados de la caché ({huella[:12]})")
+        return bloques
+
+    if excel_stream.guardar_parquet_bloques(huella, _mapear_bloques_excel(processor, file_content, file_name)):
+        bloques = excel_stream.iterar_parquet(huella)
+        if bloques is not None:
+            return bloques
+
+    # Caché desactivada o no escribible: se mapea en streaming directo hacia COPY
+    return _mapear_bloques_excel(processor, file_content, file_name)
+
+# =============================================================================
+# IMPORTACIONES EN SEGUNDO PLANO
+# =============================================================================
+
+def importar_archivos_siciap(processor_cls, db_config, archivos, table_name, opciones=None):
+    """
+    Cuerpo del trabajo en segundo plano de las páginas de importación. Usa una
+    conexión propia: la del script de Streamlit no sobrevive al rerun.
+
+    Args:
+        processor_cls: OrdenesProcessor, EjecucionProcessor, StockProcessor o PedidosProcessor
+        db_config: Configuración de conexión (host, port, dbname, user, password)
+        archivos: Lista de (nombre, bytes)
+        table_name: Tabla destino (esquema.tabla)
+        opciones: Argumentos extra del constructor del procesador
+
+    Returns:
+        dict: Resultado por archivo, archivos importados y con errores, y filas
+        rechazadas (total y por archivo). Solo falla si no se importó ninguno.
+    """
+    db_conn = PostgresConnection(
+        host=db_config['host'],
+        port=int(db_config['port']),
+        dbname=db_config['dbname'],
+        user=db_config['user'],
+        password=db_config['password']
+    )
+    if not db_conn.connect():
+        raise RuntimeError("No se pudo conectar a PostgreSQL. Verifica la configuración.")
+
+    processor = processor_cls(db_conn, **(opciones or {}))
+    resultados = {}
+    rechazos = {}
+    try:
+        for i, (file_name, contenido) in enumerate(archivos, 1):
+            jobs.verificar_cancelacion()
+            jobs.reportar_progreso(mensaje=f"Archivo {i} de {len(archivos)}: {file_name}")
+            # filas_rechazadas es de la última importación: se lee después de cada archivo
+            if hasattr(processor, 'filas_rechazadas'):
+                processor.filas_rechazadas = pd.DataFrame()
+            try:
+                ok = processor.process_excel_file(BytesIO(contenido), file_name, table_name)
+                resultados[file_name] = "importado" if ok else "error (ver log)"
+            except Exception as e:
+                logger.error(f"Error al procesar {file_name}: {str(e)}")
+                resultados[file_name] = f"error: {str(e)}"
+            rechazadas = getattr(processor, 'filas_rechazadas', None)
+            if rechazadas is not None and not rechazadas.empty:
+                rechazos[file_name] = len(rechazadas)
+    finally:
+        db_conn.close()
+
+    # Cada archivo se confirma por separado: si alguno falla, los demás ya
+    # quedaron cargados y el resultado lo informa en lugar de marcar error
+    importados = sum(1 for r in resultados.values() if r == "importado")
+    if importados == 0:
+        raise RuntimeError(f"Ningún archivo se importó: {resultados}")
+
+    resumen = {
+        'tabla': table_name,
+        'archivos': resultados,
+        'importados': importados,
+        'con_errores': len(resultados) - importados
+    }
+    if rechazos:
+        resumen['filas_rechazadas'] = sum(rechazos.values())
+        resumen['filas_rechazadas_por_archivo'] = rechazos
+        resumen['detalle_rechazos'] = "siciap.importacion_rechazos"
+    if resumen['con_errores']:
+        jobs.reportar_progreso(
+            mensaje=f"Importación parcial: {importados} de {len(resultados)} archivos importados"
+        )
+    return resumen
+
+def enviar_importacion_siciap(nombre, processor_cls, db_config, uploaded_files, table_name, opciones=None):
+    """Envía la importación de los archivos subidos a la cola de trabajos"""
+    archivos = [(f.name, f.getvalue()) for f in uploaded_files]
+    id_trabajo = jobs.enviar(
+        f"{nombre}: {len(archivos)} archivo(s) → {table_name}",
+        importar_archivos_siciap,
+        processor_cls, dict(db_config), archivos, table_name, opciones,
+        app='siciap',
+        usuario=st.session_state.get('username')
+    )
+    st.success(
+        f"🧵 Importación enviada en segundo plano (trabajo {id_trabajo}). "
+        "Puedes seguir usando la aplicación; el avance se ve abajo y en la página '🧵 Trabajos'."
+    )
+    return id_trabajo
+
+def importar_datosejecucion_trabajo(db_config, mapped_df, mode):
+    """Cuerpo del trabajo en segundo plano de 'Importar Datos' (siciap.datosejecucion)"""
+    conn = PostgresConnection(**db_config)
+    if not conn.connect():
+        raise RuntimeError("No se pudo conectar a PostgreSQL.")
+    try:
+        ensure_datosejecucion_table(conn)
+        jobs.reportar_progreso(filas=0, total=len(mapped_df), mensaje="Aplicando upsert en siciap.datosejecucion")
+        resultado = upsert_datosejecucion(conn, mapped_df, mode=mode)
+        jobs.reportar_progreso(filas=len(mapped_df))
+        return {
+            'insertados': resultado['insertados'],
+            'actualizados': resultado['actualizados'],
+            'errores': resultado['errores']
+        }
+    finally:
+        conn.close()
+
+# =============================================================================
+# FECHAS TIPADAS EN ÓRDENES
+# =============================================================================
+
+# Formatos de fecha que pueden haber quedado guardados como texto en cargas anteriores
+_REGEX_FECHA_DMY = r'^\s*[0-9]{1,2}/[0-9]{1,2}/[0-9]{4}'
+_REGEX_FECHA_ISO = r'^\s*[0-9]{4}-[0-9]{2}-[0-9]{2}'
+
+# (esquema, tabla) -> True si las fechas ya son DATE; lo actualizan la migración
+# y la carga, y el dashboard solo lo lee (sin consultar el catálogo en cada rerun)
+_FECHAS_TIPADAS = {}
+
+def fechas_ordenes_tipadas(db_connection, schema='siciap', table='ordenes'):
+    """
+    True si las columnas de ORDENES_DATE_COLUMNS ya son DATE. Consulta
+    information_schema solo la primera vez en el proceso; no convierte nada.
+    """
+    clave = (schema, table)
+    if clave in _FECHAS_TIPADAS:
+        return _FECHAS_TIPADAS[clave]
+
+    raw_conn, propia = _obtener_conexion_dbapi(db_connection)
+    try:
+        cursor = raw_conn.cursor()
+        cursor.execute("""
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s
+        """, (schema, table))
+        tipos = {row[0]: row[1] for row in cursor.fetchall()}
+        raw_conn.commit()
+        cursor.close()
+    except Exception as e:
+        raw_conn.rollback()
+        logger.warning(f"No se pudo verificar el tipo de las fechas de {schema}.{table}: {str(e)}")
+        return False
+    finally:
+        if propia:
+            raw_conn.close()
+
+    tipadas = bool(tipos) and all(tipos.get(col, 'date') == 'date' for col in ORDENES_DATE_COLUMNS)
+    # Tabla todavía inexistente: no se recuerda, la primera carga la crea
+    if tipos:
+        _FECHAS_TIPADAS[clave] = tipadas
+    return tipadas
+
+def asegurar_fechas_ordenes(db_connection, schema='siciap', table='ordenes', crear_indices=False):
+    """
+    Garantiza que las columnas de ORDENES_DATE_COLUMNS sean DATE.
+
+    Si todavía son texto (tablas creadas antes), guarda los valores que no son
+    fecha en <columna>_texto, convierte la columna con ALTER TABLE ... TYPE DATE
+    y crea los índices. Con crear_indices=True los índices se verifican siempre.
+
+    Reescribe la tabla: se llama desde la migración versionada y desde la carga
+    de órdenes, nunca desde el render.
+
+    Returns:
+        bool: True si las columnas de fecha son DATE
+    """
+    tabla = f"{schema}.{table}"
+    raw_conn, propia = _obtener_conexion_dbapi(db_connection)
+    try:
+        cursor = raw_conn.cursor()
+        cursor.execute("""
+            SELECT column_name, data_type
+            FROM information_schema.columns
+            WHERE table_schema = %s AND table_name = %s
+        """, (schema, table))
+        tipos = {row[0]: row[1] for row in cursor.fetchall()}
+        raw_conn.commit()
+        if not tipos:
+            return False
+
+        pendientes = [col for col in ORDENES_DATE_COLUMNS if col in tipos and tipos[col] != 'date']
+        try:
+            for col in pendientes:
+                inicio = time.perf_counter()
+                cursor.execute(f'ALTER TABLE {tabla} ADD COLUMN IF NOT EXISTS "{col}_texto" VARCHAR(1000)')
+                cursor.execute(f"""
+                    UPDATE {tabla}
+                    SET "{col}_texto" = "{col}"
+                    WHERE NULLIF(BTRIM("{col}"), '') IS NOT NULL
+                    AND "{col}" !~ '{_REGEX_FECHA_DMY}'
+                    AND "{col}" !~ '{_REGEX_FECHA_ISO}'
+                """)
+                cursor.execute(f"""
+                    ALTER TABLE {tabla} ALTER COLUMN "{col}" TYPE DATE USING
+                    CASE
+                        WHEN "{col}" ~ '{_REGEX_FECHA_DMY}'
+                            THEN TO_DATE(SUBSTRING("{col}" FROM '[0-9]{{1,2}}/[0-9]{{1,2}}/[0-9]{{4}}'), 'DD/MM/YYYY')
+                        WHEN "{col}" ~ '{_REGEX_FECHA_ISO}'
+                            THEN TO_DATE(SUBSTRING("{col}" FROM '[0-9]{{4}}-[0-9]{{2}}-[0-9]{{2}}'), 'YYYY-MM-DD')
+                    END
+                """)
+                logger.info(f"Columna {tabla}.{col} convertida a DATE en {time.perf_counter() - inicio:.2f}s")
+            raw_conn.commit()
+        except Exception as e:
+            raw_conn.rollback()
+            logger.warning(f"No se pudieron convertir las fechas de {tabla} a DATE: {str(e)}")
+            return False
+
+        if pendientes or crear_indices:
+            for col in ORDENES_DATE_COLUMNS:
+                cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {tabla} ("{col}")')
+            # Filtro por estado + orden por fecha del dashboard
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_estado_fecha_oc ON {tabla} (estado, fecha_oc DESC)')
+            raw_conn.commit()
+        cursor.close()
+        _FECHAS_TIPADAS[(schema, table)] = True
+        return True
+    except Exception as e:
+        raw_conn.rollback()
+        logger.warning(f"Error al verificar fechas de {tabla}: {str(e)}")
+        return False
+    finally:
+        if propia:
+            raw_conn.close()
+
 # Clases específicas para cada funcionalidad
 class OrdenesProcessor:
     def __init__(self, db_connection):
@@ -2254,6 +3249,10 @@ class OrdenesProcessor:
                 with self.db_connection.conn.cursor() as cursor:
                     cursor.execute(create_table_sql)
                     logger.info(f"Tabla verificada/creada: {schema}.{table}")
+                self.db_connection.conn.commit()
+
+                # Tablas creadas con fechas en texto: convertirlas a DATE e indexarlas
+                asegurar_fechas_ordenes(self.db_connection, schema, table, crear_indices=True)
 
                 return True
             else:
@@ -2358,11 +3357,19 @@ class OrdenesProcessor:
                 logger.warning(f"Columna requerida '{postgres_col}' no encontrada, se usará NULL")
 
         # Convertir tipos de datos con manejo mejorado de errores
-        for col in mapped_df.columns:
+        for col in list(mapped_df.columns):
             col_type = ORDENES_COLUMN_TYPES.get(col, "VARCHAR(1000)")
             
             try:
-                if "NUMERIC" in col_type:
+                if col in ORDENES_DATE_COLUMNS:
+                    # Fecha tipada; el texto que no es fecha se conserva en <col>_texto
+                    original = mapped_df[col]
+                    fechas = safe_date_conversion(original, cache_key=('siciap.ordenes', col))
+                    texto = original.astype(str).str.strip()
+                    no_fecha = fechas.isna() & original.notna() & ~texto.isin(['', 'nan', 'NaN', 'NaT', 'None'])
+                    mapped_df[f"{col}_texto"] = texto.where(no_fecha, None)
+                    mapped_df[col] = fechas
+                elif "NUMERIC" in col_type:
                     # Limpiar primero si son strings
                     if mapped_df[col].dtype == object:
                         # Reemplazar comas por puntos en valores numéricos
@@ -2372,7 +3379,7 @@ class OrdenesProcessor:
                     mapped_df[col] = pd.to_numeric(mapped_df[col], errors='coerce')
                 elif "DATE" in col_type:
                     # Usar función segura para conversión de fechas
-                    mapped_df[col] = safe_date_conversion(mapped_df[col])
+                    mapped_df[col] = safe_date_conversion(mapped_df[col], cache_key=('siciap.ordenes', col))
             except Exception as e:
                 logger.warning(f"Error al convertir columna {col} a {col_type}: {str(e)}")
 
@@ -2381,66 +3388,44 @@ class OrdenesProcessor:
     def process_excel_file(self, file_content, file_name, table_name):
         """Procesa un archivo Excel de órdenes y lo importa a PostgreSQL"""
         try:
-            # Leer Excel
-            logger.info(f"Leyendo archivo {file_name}...")
-            df = read_excel_robust(file_content, file_name)
-            
-            if df is None:
-                st.error(f"No se pudo leer el archivo {file_name}")
-                return False
+            # Una re-subida idéntica del último archivo importado no se recarga
+            huella = excel_stream.huella_carga(file_content, {
+                'tabla': table_name, 'columnas': ORDENES_REQUIRED_COLUMNS
+            })
+            if archivo_ya_cargado(self.db_connection, table_name, huella):
+                mensaje = f"{file_name} es idéntico a la última importación en {table_name}; no se recarga"
+                st.info(f"ℹ️ {mensaje}")
+                jobs.reportar_progreso(mensaje=mensaje)
+                return True
 
-            # Eliminar filas completamente vacías
-            df = df.dropna(how='all')
-            
             # Crear tabla con el esquema requerido
             if not self.create_table_with_schema(table_name):
                 return False
-
-            # Mapear columnas del Excel a las columnas requeridas
-            mapped_df = self.map_excel_to_required_columns(df, file_name)
             
             schema, table = table_name.split('.')
-            
-            # Verificar si hay datos para importar
-            if mapped_df.empty:
-                logger.error("No hay datos para importar después del mapeo de columnas")
-                return False
 
-            # En lugar de truncar, usamos DELETE + INSERT en una transacción
-            with self.db_connection.conn.cursor() as cursor:
-                # Comenzar transacción
-                self.db_connection.conn.autocommit = False
-                try:
-                    # Modificación: Usar DELETE FROM en lugar de TRUNCATE
-                    cursor.execute(f"DELETE FROM {schema}.{table}")
-                    logger.info(f"Tabla {table_name} vaciada correctamente")
-                    
-                    # Importar los nuevos datos
-                    for i, row in mapped_df.iterrows():
-                        placeholders = ", ".join(["%s"] * len(row))
-                        columns = ", ".join([f'"{col}"' for col in mapped_df.columns])
-                        insert_sql = f"""
-                        INSERT INTO {schema}.{table} ({columns})
-                        VALUES ({placeholders})
-                        """
-                        # Convertir NaN a None
-                        values = [None if pd.isna(val) else val for val in row]
-                        cursor.execute(insert_sql, values)
-
-                    # Confirmar transacción
-                    self.db_connection.conn.commit()
-                    logger.info(f"Datos importados correctamente. {len(mapped_df)} filas.")
-                    return True
-                    
-                except Exception as e:
-                    # Revertir cambios en caso de error
-                    self.db_connection.conn.rollback()
-                    logger.error(f"Error al importar datos: {str(e)}")
-                    logger.error(traceback.format_exc())
+            # Leer y mapear el Excel en bloques (o reutilizar el mapeo en caché)
+            logger.info(f"Leyendo archivo {file_name}...")
+            bloques = leer_y_mapear_en_bloques(self, file_content, file_name, huella)
+
+            # Carga masiva: cada bloque va por COPY a una tabla staging y al final
+            # reemplazo atómico (DELETE + INSERT ... SELECT)
+            try:
+                filas = copy_bloques_replace(self.db_connection, bloques, schema, table)
+                if filas == 0:
+                    st.error(f"No se pudo leer el archivo {file_name} o no tiene datos")
+                    logger.error("No hay datos para importar después del mapeo de columnas")
                     return False
-                finally:
-                    # Restaurar autocommit
-                    self.db_connection.conn.autocommit = True
+                logger.info(f"Datos importados correctamente. {filas} filas.")
+                registrar_archivo_cargado(self.db_connection, table_name, file_name, huella, filas)
+                excel_stream.descartar_parquet(huella)
+                excel_stream.liberar_cache(file_content)
+                refrescar_resumenes_dashboard(self.db_connection, table)
+                return True
+            except Exception as e:
+                logger.error(f"Error al importar datos: {str(e)}")
+                logger.error(traceback.format_exc())
+                return False
 
         except Exception as e:
             logger.error(f"Error al procesar {file_name}: {str(e)}")
@@ -2448,13 +3433,29 @@ class OrdenesProcessor:
             return False
 
 class EjecucionProcessor:
-    def __init__(self, db_conn=None):
+    def __init__(self, db_conn=None, batch_size=LOTE_IMPORTACION_INICIAL):
         self.db_conn = db_conn
+        self.batch_size = batch_size
+        # Filas rechazadas en la última importación por lotes (con columna 'error')
+        self.filas_rechazadas = pd.DataFrame()
 
     def process_excel_file(self, file_content, file_name, table_name):
         """Procesa un archivo Excel - Este es el método que tu código actual está llamando"""
+        huella = excel_stream.huella_carga(file_content, {
+            'tabla': table_name, 'columnas': EJECUCION_REQUIRED_COLUMNS
+        })
+        if self.db_conn is not None and archivo_ya_cargado(self.db_conn, table_name, huella):
+            mensaje = f"{file_name} es idéntico a la última importación en {table_name}; no se recarga"
+            st.info(f"ℹ️ {mensaje}")
+            jobs.reportar_progreso(mensaje=mensaje)
+            return True
+
         # Simplemente delegamos al método process_file
-        return self.process_file(file_path=file_name, file_content=file_content, conn=self.db_conn)
+        resultado = self.process_file(file_path=file_name, file_content=file_content, conn=self.db_conn)
+        if resultado and self.db_conn is not None:
+            registrar_archivo_cargado(self.db_conn, table_name, file_name, huella, None)
+            refrescar_resumenes_dashboard(self.db_conn, 'ejecucion')
+        return resultado
 
     def process_file(self, file_path=None, file_content=None, conn=None):
         """Procesa un archivo de ejecución"""
@@ -2479,13 +3480,13 @@ class EjecucionProcessor:
 
             # Intentar leer el archivo Excel
             try:
-                logger.info("Intentando método 1 para leer Excel...")
-                buffer = BytesIO(file_content)
-                df = pd.read_excel(buffer)
+                df = read_excel_robust(file_content, file_path)
+                if df is None:
+                    logger.error(f"No se pudo leer el archivo {file_path}")
+                    return False
                 # Limpiar el DataFrame
                 df = self.limpiar_dataframe(df)
                 logger.info(f"Limpieza completada: {len(df)} filas, {len(df.columns)} columnas")
-                logger.info(f"EXITO con método 1. Encontradas {len(df.columns)} columnas y {len(df)} filas.")
                 
                 # Crear o verificar el esquema y la tabla
                 self.crear_esquema_y_tabla(conn, 'siciap', 'ejecucion')
@@ -2645,7 +3646,7 @@ class EjecucionProcessor:
                 buffer = BytesIO(file_content)
 
             # Leer el Excel SIN ESPECIFICAR HEADER para examinar manualmente
-            df_raw = pd.read_excel(buffer, header=None)
+            df_raw = excel_stream.leer_hoja(buffer, encabezado=False)
             
             # Buscar la fila que contiene los encabezados
             header_row = None
@@ -2987,176 +3988,39 @@ class EjecucionProcessor:
                     )
                     """)
                 conn.commit()
-                logger.info(f"Tabla verificada/creada: {schema}.{tabla}")
-            
-            cursor.close()
-            return True
-        except Exception as e:
-            logger.error(f"Error al crear esquema/tabla: {str(e)}")
-            conn.rollback()
-            return False
-
-    def importar_por_lotes_flexible(self, conn, tabla, df, batch_size=100):
-        """
-        Importa datos por lotes de manera flexible, compatibilidad con diferentes tipos de conexiones
-        """
-        total_rows = len(df)
-        total_batches = (total_rows + batch_size - 1) // batch_size
-        rows_imported = 0
-        
-        try:
-            for i in range(0, total_batches):
-                start_idx = i * batch_size
-                end_idx = min((i + 1) * batch_size, total_rows)
-                batch_df = df.iloc[start_idx:end_idx]
-                
-                try:
-                    # Intentar importar el lote con to_sql que es más flexible
-                    batch_df.to_sql(tabla.split('.')[-1], con=conn.engine if hasattr(conn, 'engine') else conn, 
-                                   schema=tabla.split('.')[0], 
-                                   if_exists='append', index=False)
-                    
-                    rows_imported += len(batch_df)
-                    logger.info(f"Insertado lote {i+1}/{total_batches} ({len(batch_df)} filas)")
-                    
-                except Exception as e:
-                    logger.error(f"Error al insertar lote: {str(e)}")
-                    
-                    # Intentar insertar fila por fila en caso de error en el lote
-                    logger.info("Intentando insertar fila por fila para el lote con error...")
-                    batch_success = 0
-                    
-                    for _, row in batch_df.iterrows():
-                        try:
-                            # Crear un DataFrame de una sola fila
-                            row_df = pd.DataFrame([row])
-                            
-                            # Usar to_sql para insertar una sola fila
-                            row_df.to_sql(tabla.split('.')[-1], con=conn.engine if hasattr(conn, 'engine') else conn, 
-                                         schema=tabla.split('.')[0], 
-                                         if_exists='append', index=False)
-                            
-                            batch_success += 1
-                            
-                        except Exception as row_error:
-                            logger.error(f"Error en fila individual: {str(row_error)}")
-                    
-                    rows_imported += batch_success
-                    logger.info(f"Procesamiento fila por fila: {batch_success} de {len(batch_df)} insertadas")
-            
-            logger.info(f"Importación por lotes completada. {rows_imported} de {total_rows} filas importadas")
-            
-            if rows_imported < total_rows:
-                logger.warning(f"{total_rows - rows_imported} de {total_rows} filas con errores")
-
-            return rows_imported > 0
-
-        except Exception as e:
-            logger.error(f"Error general en importación por lotes: {str(e)}")
-            return False
-
-    def importar_por_lotes(self, conn, tabla, df, batch_size=100):
-        """
-        Importa datos por lotes en caso de error con to_sql
-        """
-        total_rows = len(df)
-        total_batches = (total_rows + batch_size - 1) // batch_size
-        rows_imported = 0
-        
-        try:
-            for i in range(0, total_batches):
-                start_idx = i * batch_size
-                end_idx = min((i + 1) * batch_size, total_rows)
-                batch_df = df.iloc[start_idx:end_idx]
-                
-                try:
-                    # Intentar importar el lote
-                    cursor = conn.cursor()
-                    
-                    # Generar la consulta SQL INSERT DINÁMICAMENTE con las columnas que tenemos
-                    columns_list = list(batch_df.columns)
-                    columns_str = ', '.join([f'"{col}"' for col in columns_list])
-                    placeholders = ', '.join(['%s'] * len(columns_list))
-                    
-                    query = f'INSERT INTO {tabla} ({columns_str}) VALUES ({placeholders})'
-                    
-                    # Preparar los valores para la consulta
-                    batch_data = []
-                    for _, row in batch_df.iterrows():
-                        row_values = []
-                        for col in columns_list:
-                            value = row[col]
-                            # Convertir NaN a None
-                            if pd.isna(value):
-                                row_values.append(None)
-                            else:
-                                row_values.append(value)
-                        batch_data.append(tuple(row_values))
-
-                    # Ejecutar la consulta con los datos del lote
-                    cursor.executemany(query, batch_data)
-                    conn.commit()
-                    cursor.close()
-                    
-                    rows_imported += len(batch_df)
-                    logger.info(f"Insertado lote {i+1}/{total_batches} ({len(batch_df)} filas)")
-                    
-                except Exception as e:
-                    logger.error(f"Error al insertar lote: {str(e)}")
-                    conn.rollback()
-                    
-                    # Intentar insertar fila por fila en caso de error en el lote
-                    logger.info("Intentando insertar fila por fila para el lote con error...")
-                    batch_success = 0
-                    
-                    for _, row in batch_df.iterrows():
-                        try:
-                            cursor = conn.cursor()
-
-                            # Generar la consulta SQL INSERT para una sola fila DINÁMICAMENTE
-                            columns_list = list(batch_df.columns)
-                            columns_str = ', '.join([f'"{col}"' for col in columns_list])
-                            placeholders = ', '.join(['%s'] * len(columns_list))
-                            
-                            query = f'INSERT INTO {tabla} ({columns_str}) VALUES ({placeholders})'
-                            
-                            # Preparar los valores para la consulta
-                            row_values = []
-                            for col in columns_list:
-                                value = row[col]
-                                # Convertir NaN a None
-                                if pd.isna(value):
-                                    row_values.append(None)
-                                else:
-                                    row_values.append(value)
-                            
-                            # Ejecutar la consulta con los datos de la fila
-                            cursor.execute(query, tuple(row_values))
-                            conn.commit()
-                            cursor.close()
-                            
-                            batch_success += 1
-                            
-                        except Exception as row_error:
-                            logger.error(f"Error en fila individual: {str(row_error)}")
-                            logger.error(f"SQL problemático: {query}")
-                            logger.error(f"Valores problemáticos: {row_values}")
-                            conn.rollback()
-                    
-                    rows_imported += batch_success
-                    logger.info(f"Procesamiento fila por fila: {batch_success} de {len(batch_df)} insertadas")
-            
-            logger.info(f"Importación por lotes completada. {rows_imported} de {total_rows} filas importadas")
+                logger.info(f"Tabla verificada/creada: {schema}.{tabla}")
             
-            if rows_imported < total_rows:
-                logger.warning(f"{total_rows - rows_imported} de {total_rows} filas con errores")
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.error(f"Error al crear esquema/tabla: {str(e)}")
+            conn.rollback()
+            return False
 
-            return rows_imported > 0
+    def importar_por_lotes_flexible(self, conn, tabla, df, batch_size=None):
+        """
+        Importa datos por lotes de manera flexible, compatibilidad con diferentes tipos de conexiones
+        """
+        return self.importar_por_lotes(conn, tabla, df, batch_size=batch_size)
 
+    def importar_por_lotes(self, conn, tabla, df, batch_size=None):
+        """
+        Importa datos por lotes en caso de error con to_sql.
+        Las filas con error se aíslan por bisección y quedan en self.filas_rechazadas
+        (y en la tabla de cuarentena del esquema) en lugar de reintentar fila por fila.
+        """
+        try:
+            resultado = importar_con_biseccion(conn, tabla, df, batch_size=batch_size or self.batch_size)
         except Exception as e:
             logger.error(f"Error general en importación por lotes: {str(e)}")
             return False
 
+        self.filas_rechazadas = resultado['rechazadas']
+        if not self.filas_rechazadas.empty:
+            logger.warning(f"{len(self.filas_rechazadas)} de {len(df)} filas con errores")
+
+        return resultado['insertadas'] > 0
+
     def truncar_tabla(self, conn, schema, tabla):
         """
         Trunca una tabla de la base de datos
@@ -3362,74 +4226,44 @@ class StockProcessor:
     def process_excel_file(self, file_content, file_name, table_name):
         """Procesa un archivo STOCK_CRITICO y lo importa a PostgreSQL"""
         try:
-            # Leer Excel con métodos robustos
-            logger.info(f"Leyendo archivo {file_name}...")
-            df = read_excel_robust(file_content, file_name)
-            
-            if df is None:
-                st.error(f"No se pudo leer el archivo {file_name}")
-                return False
+            # Una re-subida idéntica del último archivo importado no se recarga
+            huella = excel_stream.huella_carga(file_content, {
+                'tabla': table_name, 'columnas': STOCK_REQUIRED_COLUMNS
+            })
+            if archivo_ya_cargado(self.db_connection, table_name, huella):
+                mensaje = f"{file_name} es idéntico a la última importación en {table_name}; no se recarga"
+                st.info(f"ℹ️ {mensaje}")
+                jobs.reportar_progreso(mensaje=mensaje)
+                return True
 
-            # Eliminar filas completamente vacías
-            df = df.dropna(how='all')
-            
-            # Log para depuración
-            logger.info(f"Columnas en el archivo original: {', '.join(df.columns.tolist())}")
-            logger.info(f"Primeras filas del archivo original: \n{df.head().to_string()}")
-            
             # Crear tabla con el esquema requerido
             if not self.create_table_with_schema(table_name):
                 return False
-
-            # Mapear columnas del Excel a las columnas requeridas
-            mapped_df = self.map_excel_to_required_columns(df, file_name)
-            
-            # Log para depuración
-            logger.info(f"Columnas mapeadas: {', '.join(mapped_df.columns.tolist())}")
-            logger.info(f"Muestra de datos mapeados: \n{mapped_df.head().to_string()}")
             
             schema, table = table_name.split('.')
-            
-            # Verificar si hay datos para importar
-            if mapped_df.empty:
-                logger.error("No hay datos para importar después del mapeo de columnas")
-                return False
 
-            # En lugar de truncar, usamos DELETE + INSERT en una transacción
-            with self.db_connection.conn.cursor() as cursor:
-                # Comenzar transacción
-                self.db_connection.conn.autocommit = False
-                try:
-                    # Modificación: Usar DELETE FROM en lugar de TRUNCATE
-                    cursor.execute(f"DELETE FROM {schema}.{table}")
-                    logger.info(f"Tabla {table_name} vaciada correctamente")
-                    
-                    # Importar los nuevos datos usando INSERT
-                    for i, row in mapped_df.iterrows():
-                        placeholders = ", ".join(["%s"] * len(row))
-                        columns = ", ".join([f'"{col}"' for col in mapped_df.columns])
-                        insert_sql = f"""
-                        INSERT INTO {schema}.{table} ({columns})
-                        VALUES ({placeholders})
-                        """
-                        # Convertir NaN a None
-                        values = [None if pd.isna(val) else val for val in row]
-                        cursor.execute(insert_sql, values)
-
-                    # Confirmar transacción
-                    self.db_connection.conn.commit()
-                    logger.info(f"Datos importados correctamente. {len(mapped_df)} filas.")
-                    return True
-                    
-                except Exception as e:
-                    # Revertir cambios en caso de error
-                    self.db_connection.conn.rollback()
-                    logger.error(f"Error al importar datos: {str(e)}")
-                    logger.error(traceback.format_exc())
+            # Leer y mapear el Excel en bloques (o reutilizar el mapeo en caché)
+            logger.info(f"Leyendo archivo {file_name}...")
+            bloques = leer_y_mapear_en_bloques(self, file_content, file_name, huella)
+
+            # Carga masiva: cada bloque va por COPY a una tabla staging y al final
+            # reemplazo atómico (DELETE + INSERT ... SELECT)
+            try:
+                filas = copy_bloques_replace(self.db_connection, bloques, schema, table)
+                if filas == 0:
+                    st.error(f"No se pudo leer el archivo {file_name} o no tiene datos")
+                    logger.error("No hay datos para importar después del mapeo de columnas")
                     return False
-                finally:
-                    # Restaurar autocommit
-                    self.db_connection.conn.autocommit = True
+                logger.info(f"Datos importados correctamente. {filas} filas.")
+                registrar_archivo_cargado(self.db_connection, table_name, file_name, huella, filas)
+                excel_stream.descartar_parquet(huella)
+                excel_stream.liberar_cache(file_content)
+                refrescar_resumenes_dashboard(self.db_connection, table)
+                return True
+            except Exception as e:
+                logger.error(f"Error al importar datos: {str(e)}")
+                logger.error(traceback.format_exc())
+                return False
 
         except Exception as e:
             logger.error(f"Error al procesar {file_name}: {str(e)}")
@@ -3608,7 +4442,7 @@ class PedidosProcessor:
                     mapped_df[col] = pd.to_numeric(mapped_df[col], errors='coerce').astype('Int64')
                 elif "DATE" in col_type:
                     # Usar función segura para conversión de fechas
-                    mapped_df[col] = safe_date_conversion(mapped_df[col])
+                    mapped_df[col] = safe_date_conversion(mapped_df[col], cache_key=('siciap.pedidos', col))
                 # Para VARCHAR y TEXT, dejar como strings
             except Exception as e:
                 logger.warning(f"Error al convertir columna {col} a {col_type}: {str(e)}")
@@ -3618,114 +4452,88 @@ class PedidosProcessor:
     def process_excel_file(self, file_content, file_name, table_name):
         """Procesa un archivo Excel de pedidos y lo importa a PostgreSQL"""
         try:
-            # Leer Excel con métodos robustos
-            logger.info(f"Leyendo archivo {file_name}...")
-            df = read_excel_robust(file_content, file_name)
-            
-            if df is None:
-                st.error(f"No se pudo leer el archivo {file_name}")
-                return False
+            # Una re-subida idéntica del último archivo importado no se recarga
+            huella = excel_stream.huella_carga(file_content, {
+                'tabla': table_name, 'columnas': PEDIDOS_REQUIRED_COLUMNS
+            })
+            if archivo_ya_cargado(self.db_connection, table_name, huella):
+                mensaje = f"{file_name} es idéntico a la última importación en {table_name}; no se recarga"
+                st.info(f"ℹ️ {mensaje}")
+                jobs.reportar_progreso(mensaje=mensaje)
+                return True
 
-            # Eliminar filas completamente vacías
-            df = df.dropna(how='all')
-            
-            # Log para depuración
-            logger.info(f"Columnas en el archivo original: {', '.join(df.columns.tolist())}")
-            logger.info(f"Primeras filas del archivo original: \n{df.head().to_string()}")
-            
             # Crear tabla con el esquema requerido
             if not self.create_table_with_schema(table_name):
                 return False
-
-            # Mapear columnas del Excel a las columnas requeridas
-            mapped_df = self.map_excel_to_required_columns(df, file_name)
-            
-            # Log para depuración
-            logger.info(f"Columnas mapeadas: {', '.join(mapped_df.columns.tolist())}")
-            logger.info(f"Muestra de datos mapeados: \n{mapped_df.head().to_string()}")
             
             schema, table = table_name.split('.')
-            
-            # Verificar si hay datos para importar
-            if mapped_df.empty:
-                logger.error("No hay datos para importar después del mapeo de columnas")
-                return False
 
-            # En lugar de truncar, usamos DELETE + INSERT en una transacción
-            with self.db_connection.conn.cursor() as cursor:
-                # Comenzar transacción
-                self.db_connection.conn.autocommit = False
-                try:
-                    # Modificación: Usar DELETE FROM en lugar de TRUNCATE
-                    cursor.execute(f"DELETE FROM {schema}.{table}")
-                    logger.info(f"Tabla {table_name} vaciada correctamente")
-                    
-                    # Importar los nuevos datos
-                    for i, row in mapped_df.iterrows():
-                        placeholders = ", ".join(["%s"] * len(row))
-                        columns = ", ".join([f'"{col}"' for col in mapped_df.columns])
-                        insert_sql = f"""
-                        INSERT INTO {schema}.{table} ({columns})
-                        VALUES ({placeholders})
-                        """
-                        # Convertir NaN a None
-                        values = [None if pd.isna(val) else val for val in row]
-                        cursor.execute(insert_sql, values)
-
-                    # Confirmar transacción
-                    self.db_connection.conn.commit()
-                    logger.info(f"Datos importados correctamente. {len(mapped_df)} filas.")
-                    return True
-                    
-                except Exception as e:
-                    # Revertir cambios en caso de error
-                    self.db_connection.conn.rollback()
-                    logger.error(f"Error al importar datos: {str(e)}")
-                    logger.error(traceback.format_exc())
+            # Leer y mapear el Excel en bloques (o reutilizar el mapeo en caché)
+            logger.info(f"Leyendo archivo {file_name}...")
+            bloques = leer_y_mapear_en_bloques(self, file_content, file_name, huella)
+
+            # Carga masiva: cada bloque va por COPY a una tabla staging y al final
+            # reemplazo atómico (DELETE + INSERT ... SELECT)
+            try:
+                filas = copy_bloques_replace(self.db_connection, bloques, schema, table)
+                if filas == 0:
+                    st.error(f"No se pudo leer el archivo {file_name} o no tiene datos")
+                    logger.error("No hay datos para importar después del mapeo de columnas")
                     return False
-                finally:
-                    # Restaurar autocommit
-                    self.db_connection.conn.autocommit = True
+                logger.info(f"Datos importados correctamente. {filas} filas.")
+                registrar_archivo_cargado(self.db_connection, table_name, file_name, huella, filas)
+                excel_stream.descartar_parquet(huella)
+                excel_stream.liberar_cache(file_content)
+                refrescar_resumenes_dashboard(self.db_connection, table)
+                return True
+            except Exception as e:
+                logger.error(f"Error al importar datos: {str(e)}")
+                logger.error(traceback.format_exc())
+                return False
                     
         except Exception as e:
             logger.error(f"Error al procesar {file_name}: {str(e)}")
             logger.error(traceback.format_exc())
             return False
 
-# Inicializar el estado de sesión para la navegación si no existe
-if 'nav_option' not in st.session_state:
-    st.session_state.nav_option = "Órdenes"
-
-# Diseño de la página con la navegación en el sidebar
-# Navegación en el sidebar
-st.sidebar.title("SICIAP")
-st.sidebar.markdown("---")
-
-# Navegación directa sin usar session_state
-selected_option = st.sidebar.selectbox(
-    "Selecciona una opción:",
-    ["📋 Órdenes", "📊 Ejecución", "📦 Stock", "📝 Pedidos", "📈 Dashboard", 
-     "📑 Contratos", "🔍 Diagnóstico", "📤 Exportar Datos", "📥 Importar Datos"],
-    key="navigation"
-)
+def mostrar_sidebar_siciap():
+    """Navegación y configuración de PostgreSQL en el sidebar; devuelve la opción elegida"""
+    # Inicializar el estado de sesión para la navegación si no existe
+    if 'nav_option' not in st.session_state:
+        st.session_state.nav_option = "Órdenes"
+
+    # Diseño de la página con la navegación en el sidebar
+    # Navegación en el sidebar
+    st.sidebar.title("SICIAP")
+    st.sidebar.markdown("---")
+
+    # Navegación directa sin usar session_state
+    selected_option = st.sidebar.selectbox(
+        "Selecciona una opción:",
+        ["📋 Órdenes", "📊 Ejecución", "📦 Stock", "📝 Pedidos", "📈 Dashboard", 
+         "📑 Contratos", "🔍 Diagnóstico", "📤 Exportar Datos", "📥 Importar Datos"],
+        key="navigation"
+    )
 
-# Configuración de PostgreSQL en el sidebar
-st.sidebar.markdown("---")
-st.sidebar.header("Configuración de PostgreSQL")
-host = st.sidebar.text_input("Host", "localhost", key="global_host")
-port = st.sidebar.number_input("Puerto", value=5432, min_value=1, max_value=65535, key="global_port")
-dbname = st.sidebar.text_input("Base de datos", "postgres", key="global_dbname")
-user = st.sidebar.text_input("Usuario", "postgres", key="global_user")
-password = st.sidebar.text_input("Contraseña", "Dggies12345", type="password", key="global_password")
-
-# Botón para probar la conexión
-if st.sidebar.button("Probar Conexión", key="global_test_conn"):
-    conn = PostgresConnection(host, port, dbname, user, password)
-    if conn.connect():
-        st.sidebar.success("✅ Conexión exitosa a PostgreSQL!")
-        conn.close()
-    else:
-        st.sidebar.error("❌ No se pudo conectar a PostgreSQL")
+    # Configuración de PostgreSQL en el sidebar
+    st.sidebar.markdown("---")
+    st.sidebar.header("Configuración de PostgreSQL")
+    host = st.sidebar.text_input("Host", "localhost", key="global_host")
+    port = st.sidebar.number_input("Puerto", value=5432, min_value=1, max_value=65535, key="global_port")
+    dbname = st.sidebar.text_input("Base de datos", "postgres", key="global_dbname")
+    user = st.sidebar.text_input("Usuario", "postgres", key="global_user")
+    password = st.sidebar.text_input("Contraseña", "Dggies12345", type="password", key="global_password")
+
+    # Botón para probar la conexión
+    if st.sidebar.button("Probar Conexión", key="global_test_conn"):
+        conn = PostgresConnection(host, port, dbname, user, password)
+        if conn.connect():
+            st.sidebar.success("✅ Conexión exitosa a PostgreSQL!")
+            conn.close()
+        else:
+            st.sidebar.error("❌ No se pudo conectar a PostgreSQL")
+    
+    return selected_option
 
 # Esta función está duplicada, usar la función get_db_config() definida arriba
 # Se mantiene por compatibilidad pero ahora usa la configuración unificada
@@ -3736,10 +4544,9 @@ def test_db_connection():
     """
     try:
         db_config = get_db_config()
-        engine_string = f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['dbname']}?sslmode=require"
         logger.info(f"Intentando conectar a la base de datos: {db_config['dbname']} en {db_config['host']}:{db_config['port']}")
         
-        engine = create_engine(engine_string)
+        engine = get_siciap_engine()
         with engine.connect() as conn:
             result = conn.execute(text("SELECT 1 as test")).fetchone()
             if result and result[0] == 1:
@@ -3793,54 +4600,13 @@ def ordenes_page():
 
         # Botón para importar datos
         if st.button("Importar Datos de Órdenes", key="ordenes_import"):
-            # Crear conexión a PostgreSQL
-            db_conn = PostgresConnection(
-                db_config['host'], 
-                int(db_config['port']), 
-                db_config['dbname'], 
-                db_config['user'], 
-                db_config['password']
+            enviar_importacion_siciap(
+                "Importar órdenes", OrdenesProcessor, db_config, uploaded_files, table_name
             )
-            
-            if not db_conn.connect():
-                st.error("❌ Error al conectar a PostgreSQL. Verifica la configuración.")
-                return
 
-            # Crear procesador de órdenes
-            processor = OrdenesProcessor(db_conn)
-            
-            # Procesar cada archivo
-            with st.spinner("Importando archivos..."):
-                overall_success = True
-                for uploaded_file in uploaded_files:
-                    file_name = uploaded_file.name
-                    progress_text = st.empty()
-                    progress_text.write(f"Procesando {file_name}...")
-
-                    try:
-                        # Leer el archivo en memoria
-                        file_content = BytesIO(uploaded_file.getvalue())
-                        
-                        # Procesar e importar
-                        success = processor.process_excel_file(file_content, file_name, table_name)
-                        
-                        if success:
-                            progress_text.success(f"✅ {file_name} importado correctamente")
-                        else:
-                            progress_text.error(f"❌ Error al importar {file_name}")
-                            overall_success = False
-                    except Exception as e:
-                        progress_text.error(f"❌ Error al procesar {file_name}: {str(e)}")
-                        st.exception(e)
-                        overall_success = False
-            
-            # Cerrar conexión
-            db_conn.close()
-            
-            if overall_success:
-                st.success("✅ Proceso completado exitosamente. Conexión a PostgreSQL cerrada.")
-            else:
-                st.warning("⚠️ Proceso completado con errores. Conexión a PostgreSQL cerrada.")
+        # Estado de las importaciones en segundo plano de esta página
+        with st.expander("🧵 Importaciones en segundo plano", expanded=True):
+            jobs.mostrar_trabajos(app='siciap', usuario=jobs.usuario_de_sesion(), limite=5, clave="ordenes_trabajos")
     else:
         st.info("Por favor, selecciona uno o más archivos Excel para importar.")
 
@@ -3877,57 +4643,25 @@ def ejecucion_page():
         # Configuración adicional
         st.subheader("Configuración de Importación")
         table_name = st.text_input("Nombre de la tabla (predeterminado: siciap.ejecucion)", "siciap.ejecucion", key="ejecucion_table")
+        batch_size = st.number_input(
+            "Tamaño inicial de lote",
+            min_value=LOTE_IMPORTACION_MIN,
+            max_value=LOTE_IMPORTACION_MAX,
+            value=LOTE_IMPORTACION_INICIAL,
+            step=50,
+            help="Se ajusta automáticamente según la latencia medida de cada lote",
+            key="ejecucion_batch_size"
+        )
 
         # Botón para importar datos
         if st.button("Importar Datos de Ejecución", key="ejecucion_import"):
-            # Crear conexión a PostgreSQL
-            db_conn = PostgresConnection(
-                host=db_config['host'], 
-                port=int(db_config['port']), 
-                dbname=db_config['dbname'], 
-                user=db_config['user'], 
-                password=db_config['password']
+            enviar_importacion_siciap(
+                "Importar ejecución", EjecucionProcessor, db_config, uploaded_files, table_name, {'batch_size': int(batch_size)}
             )
-            
-            if not db_conn.connect():
-                st.error("❌ Error al conectar a PostgreSQL. Verifica la configuración.")
-                return
 
-            # Crear procesador de ejecución - CORREGIDO
-            processor = EjecucionProcessor(db_conn)
-            
-            # Procesar cada archivo
-            with st.spinner("Importando archivos..."):
-                overall_success = True
-                for uploaded_file in uploaded_files:
-                    file_name = uploaded_file.name
-                    progress_text = st.empty()
-                    progress_text.write(f"Procesando {file_name}...")
-
-                    try:
-                        # Leer el archivo en memoria
-                        file_content = BytesIO(uploaded_file.getvalue())
-                        
-                        # Procesar e importar
-                        success = processor.process_excel_file(file_content, file_name, table_name)
-                        
-                        if success:
-                            progress_text.success(f"✅ {file_name} importado correctamente")
-                        else:
-                            progress_text.error(f"❌ Error al importar {file_name}")
-                            overall_success = False
-                    except Exception as e:
-                        progress_text.error(f"❌ Error al procesar {file_name}: {str(e)}")
-                        st.exception(e)
-                        overall_success = False
-            
-            # Cerrar conexión
-            db_conn.close()
-            
-            if overall_success:
-                st.success("✅ Proceso completado exitosamente. Conexión a PostgreSQL cerrada.")
-            else:
-                st.warning("⚠️ Proceso completado con errores. Conexión a PostgreSQL cerrada.")
+        # Estado de las importaciones en segundo plano de esta página
+        with st.expander("🧵 Importaciones en segundo plano", expanded=True):
+            jobs.mostrar_trabajos(app='siciap', usuario=jobs.usuario_de_sesion(), limite=5, clave="ejecucion_trabajos")
     else:
         st.info("Por favor, selecciona uno o más archivos Excel para importar.")
 
@@ -3967,54 +4701,13 @@ def stock_page():
 
         # Botón para importar datos
         if st.button("Importar Datos de Stock", key="stock_import"):
-            # Crear conexión a PostgreSQL
-            db_conn = PostgresConnection(
-                host=db_config['host'], 
-                port=int(db_config['port']), 
-                dbname=db_config['dbname'], 
-                user=db_config['user'], 
-                password=db_config['password']
+            enviar_importacion_siciap(
+                "Importar stock", StockProcessor, db_config, uploaded_files, table_name
             )
-            
-            if not db_conn.connect():
-                st.error("❌ Error al conectar a PostgreSQL. Verifica la configuración.")
-                return
 
-            # Crear procesador de stock - CORREGIDO
-            processor = StockProcessor(db_conn)
-            
-            # Procesar cada archivo
-            with st.spinner("Importando archivos..."):
-                overall_success = True
-                for uploaded_file in uploaded_files:
-                    file_name = uploaded_file.name
-                    progress_text = st.empty()
-                    progress_text.write(f"Procesando {file_name}...")
-
-                    try:
-                        # Leer el archivo en memoria
-                        file_content = BytesIO(uploaded_file.getvalue())
-                        
-                        # Procesar e importar
-                        success = processor.process_excel_file(file_content, file_name, table_name)
-                        
-                        if success:
-                            progress_text.success(f"✅ {file_name} importado correctamente")
-                        else:
-                            progress_text.error(f"❌ Error al importar {file_name}")
-                            overall_success = False
-                    except Exception as e:
-                        progress_text.error(f"❌ Error al procesar {file_name}: {str(e)}")
-                        st.exception(e)
-                        overall_success = False
-            
-            # Cerrar conexión
-            db_conn.close()
-            
-            if overall_success:
-                st.success("✅ Proceso completado exitosamente. Conexión a PostgreSQL cerrada.")
-            else:
-                st.warning("⚠️ Proceso completado con errores. Conexión a PostgreSQL cerrada.")
+        # Estado de las importaciones en segundo plano de esta página
+        with st.expander("🧵 Importaciones en segundo plano", expanded=True):
+            jobs.mostrar_trabajos(app='siciap', usuario=jobs.usuario_de_sesion(), limite=5, clave="stock_trabajos")
     else:
         st.info("Por favor, selecciona uno o más archivos Excel para importar.")
 
@@ -4053,54 +4746,13 @@ def pedidos_page():
 
         # Botón para importar datos
         if st.button("Importar Datos de Pedidos", key="pedidos_import"):
-            # Crear conexión a PostgreSQL
-            db_conn = PostgresConnection(
-                host=db_config['host'], 
-                port=int(db_config['port']), 
-                dbname=db_config['dbname'], 
-                user=db_config['user'], 
-                password=db_config['password']
+            enviar_importacion_siciap(
+                "Importar pedidos", PedidosProcessor, db_config, uploaded_files, table_name
             )
-            
-            if not db_conn.connect():
-                st.error("❌ Error al conectar a PostgreSQL. Verifica la configuración.")
-                return
 
-            # Crear procesador de pedidos
-            processor = PedidosProcessor(db_conn)
-            
-            # Procesar cada archivo
-            with st.spinner("Importando archivos..."):
-                overall_success = True
-                for uploaded_file in uploaded_files:
-                    file_name = uploaded_file.name
-                    progress_text = st.empty()
-                    progress_text.write(f"Procesando {file_name}...")
-
-                    try:
-                        # Leer el archivo en memoria
-                        file_content = BytesIO(uploaded_file.getvalue())
-                        
-                        # Procesar e importar
-                        success = processor.process_excel_file(file_content, file_name, table_name)
-                        
-                        if success:
-                            progress_text.success(f"✅ {file_name} importado correctamente")
-                        else:
-                            progress_text.error(f"❌ Error al importar {file_name}")
-                            overall_success = False
-                    except Exception as e:
-                        progress_text.error(f"❌ Error al procesar {file_name}: {str(e)}")
-                        st.exception(e)
-                        overall_success = False
-            
-            # Cerrar conexión
-            db_conn.close()
-            
-            if overall_success:
-                st.success("✅ Proceso completado exitosamente. Conexión a PostgreSQL cerrada.")
-            else:
-                st.warning("⚠️ Proceso completado con errores. Conexión a PostgreSQL cerrada.")
+        # Estado de las importaciones en segundo plano de esta página
+        with st.expander("🧵 Importaciones en segundo plano", expanded=True):
+            jobs.mostrar_trabajos(app='siciap', usuario=jobs.usuario_de_sesion(), limite=5, clave="pedidos_trabajos")
     else:
         st.info("Por favor, selecciona uno o más archivos Excel para importar.")
 
@@ -4203,7 +4855,9 @@ def contracts_management_page():
                 # Formatear fechas
                 for fecha_col in ['fecha_inicio', 'fecha_fin']:
                     if fecha_col in llamados_df.columns:
-                        llamados_df[fecha_col] = safe_date_conversion(llamados_df[fecha_col]).dt.strftime('%d/%m/%Y')
+                        llamados_df[fecha_col] = safe_date_conversion(
+                            llamados_df[fecha_col], cache_key=('siciap.datosejecucion', fecha_col)
+                        ).dt.strftime('%d/%m/%Y')
                 
                 if not llamados_df.empty:
                     st.dataframe(llamados_df, use_container_width=True)
@@ -4353,7 +5007,9 @@ def contracts_management_page():
                 # Formatear fechas
                 for fecha_col in ['fecha_inicio', 'fecha_fin']:
                     if fecha_col in contratos_df.columns:
-                        contratos_df[fecha_col] = safe_date_conversion(contratos_df[fecha_col]).dt.strftime('%d/%m/%Y')
+                        contratos_df[fecha_col] = safe_date_conversion(
+                            contratos_df[fecha_col], cache_key=('siciap.datosejecucion', fecha_col)
+                        ).dt.strftime('%d/%m/%Y')
                 
                 if not contratos_df.empty:
                     st.dataframe(contratos_df, use_container_width=True)
@@ -4789,139 +5445,42 @@ def contracts_management_page():
 
 def ensure_datosejecucion_table(conn):
     """Asegura que la tabla datosejecucion existe con la estructura correcta"""
-    try:
-        with conn.conn.cursor() as cursor:
-            # Crear esquema si no existe
-            cursor.execute("CREATE SCHEMA IF NOT EXISTS siciap")
-            
-            # Crear tabla datosejecucion si no existe
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS siciap.datosejecucion (
-                    id SERIAL PRIMARY KEY,
-                    id_llamado INTEGER,
-                    licitacion VARCHAR(255),
-                    proveedor VARCHAR(255),
-                    descripcion_llamado TEXT,
-                    numero_contrato VARCHAR(255),
-                    fecha_inicio DATE,
-                    fecha_fin DATE,
-                    dirigido_a VARCHAR(100),
-                    lugares TEXT
-                )
-            """)
-            
-            # Crear índice para búsqueda rápida
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_datosejecucion_id_llamado 
-                ON siciap.datosejecucion(id_llamado)
-            """)
-            
-            conn.conn.commit()
-            logger.info("Tabla datosejecucion verificada/creada correctamente")
-            return True
-    except Exception as e:
-        logger.error(f"Error al verificar tabla datosejecucion: {str(e)}")
-        logger.error(traceback.format_exc())
-        return False
+    if conn.engine is None:
+        conn.connect()
+    resultado = asegurar_esquema_siciap(conn.engine)
+    return resultado['error'] is None
 
 def cargar_datos_desde_df(conn, df):
-    """Carga datos a la tabla datosejecucion desde un DataFrame - CORREGIDO para SQLAlchemy 2.0"""
+    """Carga datos a la tabla datosejecucion desde un DataFrame con un único upsert en bloque"""
     try:
         # Verificar si hay datos para importar
         if df.empty:
             st.error("No hay datos para importar en el DataFrame")
             return False
+        
+        if 'id_llamado' not in df.columns:
+            st.error("El DataFrame no contiene la columna 'id_llamado'")
+            return False
             
         # Limpiar y convertir datos
         for col in df.columns:
             if col in ['fecha_inicio', 'fecha_fin']:
                 # Convertir fechas usando la función segura
-                df[col] = safe_date_conversion(df[col])
+                df[col] = safe_date_conversion(df[col], cache_key=('siciap.datosejecucion', col))
         
-        # Contador de éxitos y errores
-        exitos = 0
-        errores = 0
-        
-        # Procesar cada fila
-        for _, row in df.iterrows():
-            try:
-                # Verificar si ya existe el registro para este id_llamado
-                check_query = text("""
-                    SELECT id FROM siciap.datosejecucion 
-                    WHERE id_llamado = :id_llamado
-                """)
-                
-                # Usar with para gestionar la conexión
-                with conn.engine.connect() as connection:
-                    result = connection.execute(check_query, {"id_llamado": row['id_llamado']}).fetchone()
-                
-                if result:
-                    # Preparar datos para actualizar
-                    update_data = {
-                        "id_llamado": row['id_llamado']
-                    }
-                    
-                    # Añadir solo columnas que existen en el DataFrame
-                    for col in ['licitacion', 'proveedor', 'descripcion_llamado', 
-                               'numero_contrato', 'fecha_inicio', 'fecha_fin', 
-                               'dirigido_a', 'lugares']:
-                        if col in df.columns:
-                            update_data[col] = row[col]
-                    
-                    # Construir consulta dinámica para actualizar solo las columnas disponibles
-                    cols_to_update = [f"{col} = :{col}" for col in update_data.keys() if col != 'id_llamado']
-                    
-                    if cols_to_update:
-                        update_query = text(f"""
-                            UPDATE siciap.datosejecucion
-                            SET {', '.join(cols_to_update)}
-                            WHERE id_llamado = :id_llamado
-                        """)
-                        
-                        # Ejecutar con la conexión y hacer commit
-                        with conn.engine.connect() as connection:
-                            connection.execute(update_query, update_data)
-                            connection.commit()  # Importante: commit para guardar cambios
-                else:
-                    # Preparar datos para insertar
-                    insert_data = {
-                        "id_llamado": row['id_llamado']
-                    }
-                    
-                    # Añadir solo columnas que existen en el DataFrame
-                    for col in ['licitacion', 'proveedor', 'descripcion_llamado', 
-                               'numero_contrato', 'fecha_inicio', 'fecha_fin', 
-                               'dirigido_a', 'lugares']:
-                        if col in df.columns:
-                            insert_data[col] = row[col]
-                    
-                    # Construir consulta dinámica para insertar solo las columnas disponibles
-                    cols = list(insert_data.keys())
-                    placeholders = [f":{col}" for col in cols]
-                    
-                    insert_query = text(f"""
-                        INSERT INTO siciap.datosejecucion 
-                        ({', '.join(cols)})
-                        VALUES 
-                        ({', '.join(placeholders)})
-                    """)
-                    
-                    # Ejecutar con la conexión y hacer commit
-                    with conn.engine.connect() as connection:
-                        connection.execute(insert_query, insert_data)
-                        connection.commit()  # Importante: commit para guardar cambios
-                
-                exitos += 1
-            except Exception as e:
-                logger.error(f"Error en fila {_}: {str(e)}")
-                errores += 1
+        # Staging + INSERT ... ON CONFLICT (id_llamado) DO UPDATE en una sola transacción
+        resultado = upsert_datosejecucion(conn, df, mode='upsert')
+        exitos = resultado['insertados'] + resultado['actualizados']
         
         # Mostrar resultados
         if exitos > 0:
-            st.success(f"✅ {exitos} registros importados correctamente")
+            st.success(
+                f"✅ {exitos} registros importados correctamente "
+                f"({resultado['insertados']} nuevos, {resultado['actualizados']} actualizados)"
+            )
         
-        if errores > 0:
-            st.warning(f"⚠️ {errores} registros con errores")
+        if resultado['errores'] > 0:
+            st.warning(f"⚠️ {resultado['errores']} registros sin id_llamado válido")
             
         return exitos > 0
     except Exception as e:
@@ -4931,190 +5490,245 @@ def cargar_datos_desde_df(conn, df):
 
 def ensure_database_structure(conn):
     """Asegura que la estructura de la base de datos sea correcta"""
-    try:
-        with conn.conn.cursor() as cursor:
-            # Verificar y crear la tabla datosejecucion si no existe
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS siciap.datosejecucion (
-                    id_llamado INTEGER PRIMARY KEY,
-                    licitacion VARCHAR(255),
-                    proveedor VARCHAR(255),
-                    descripcion_llamado TEXT,
-                    numero_contrato VARCHAR(100),
-                    fecha_inicio DATE,
-                    fecha_fin DATE,
-                    dirigido_a VARCHAR(100),
-                    lugares TEXT
-                );
-            """)
-            
-            conn.conn.commit()
-            return True
-    except Exception as e:
-        logger.error(f"Error al verificar estructura de BD: {str(e)}")
-        return False
-
-def crear_indices_siciap():
-    try:
-        # Configuración de base de datos
-        db_config = get_db_config()
-        engine_string = f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['dbname']}?sslmode=require"
-        engine = create_engine(engine_string)
-        
-        with engine.connect() as conn:
-            # Crear índices para mejorar rendimiento
-            indices = [
-                "CREATE INDEX IF NOT EXISTS idx_ordenes_codigo ON siciap.ordenes(codigo)",
-                "CREATE INDEX IF NOT EXISTS idx_ordenes_fecha_oc ON siciap.ordenes(fecha_oc)",
-                "CREATE INDEX IF NOT EXISTS idx_ordenes_estado ON siciap.ordenes(estado)",
-                "CREATE INDEX IF NOT EXISTS idx_ejecucion_codigo ON siciap.ejecucion(codigo)",
-                "CREATE INDEX IF NOT EXISTS idx_ejecucion_item ON siciap.ejecucion(item)",
-                "CREATE INDEX IF NOT EXISTS idx_stock_critico_codigo ON siciap.stock_critico(codigo)",
-                "CREATE INDEX IF NOT EXISTS idx_stock_critico_dmp ON siciap.stock_critico(dmp)"
-            ]
-            
-            for idx_sql in indices:
+    return ensure_datosejecucion_table(conn)
+
+def _crear_indices_siciap(conn):
+    """Índices de las tablas que crean las importaciones (pueden no existir todavía)"""
+    indices = [
+        "CREATE INDEX IF NOT EXISTS idx_ordenes_codigo ON siciap.ordenes(codigo)",
+        "CREATE INDEX IF NOT EXISTS idx_ordenes_fecha_oc ON siciap.ordenes(fecha_oc)",
+        "CREATE INDEX IF NOT EXISTS idx_ordenes_estado ON siciap.ordenes(estado)",
+        "CREATE INDEX IF NOT EXISTS idx_ejecucion_codigo ON siciap.ejecucion(codigo)",
+        "CREATE INDEX IF NOT EXISTS idx_ejecucion_item ON siciap.ejecucion(item)",
+        "CREATE INDEX IF NOT EXISTS idx_stock_critico_codigo ON siciap.stock_critico(codigo)",
+        "CREATE INDEX IF NOT EXISTS idx_stock_critico_dmp ON siciap.stock_critico(dmp)",
+        # Búsqueda item LIKE '%codigo%' en buscar_producto_integrado
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS idx_ejecucion_item_trgm ON siciap.ejecucion USING gin (item gin_trgm_ops)"
+    ]
+    for idx_sql in indices:
+        # Cada índice en su propio SAVEPOINT: si uno falla (tabla aún no
+        # importada, sin permisos para pg_trgm) los demás se crean igual
+        try:
+            with conn.begin_nested():
                 conn.execute(text(idx_sql))
-                print(f"Índice creado: {idx_sql}")
+        except Exception as idx_error:
+            logger.info(f"No se pudo crear el índice: {idx_sql} - {str(idx_error)}")
 
-        return True
-    except Exception as e:
-        print(f"Error al crear índices: {str(e)}")
-        traceback.print_exc()
-        return False
+def _migracion_fechas_ordenes(conn):
+    """Fechas de siciap.ordenes como DATE (tablas creadas con fechas en texto)"""
+    if conn.execute(text("SELECT to_regclass('siciap.ordenes')")).scalar() is None:
+        # Aún no importada: la primera carga crea la tabla con fechas DATE
+        return
+    if not asegurar_fechas_ordenes(conn.connection, crear_indices=True):
+        raise RuntimeError("No se pudieron convertir las fechas de siciap.ordenes a DATE")
 
-def buscar_producto_integrado(codigo):
+def _migracion_indice_unico_datosejecucion(conn):
     """
-    Función optimizada para buscar información integrada de un producto por su código
-    utilizando la relación directa entre las tres tablas a través del campo código.
+    Índice único sobre siciap.datosejecucion(id_llamado) para el upsert con ON CONFLICT.
+    Antes de crearlo se deja una sola fila por id_llamado (la de mayor id, la última
+    cargada); las demás se copian a siciap.datosejecucion_duplicados.
     """
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS siciap.datosejecucion_duplicados "
+        "(LIKE siciap.datosejecucion)"
+    ))
+    conn.execute(text("""
+        INSERT INTO siciap.datosejecucion_duplicados
+        SELECT d.* FROM siciap.datosejecucion d
+        WHERE EXISTS (
+            SELECT 1 FROM siciap.datosejecucion n
+            WHERE n.id_llamado = d.id_llamado AND n.id > d.id
+        )
+    """))
+    retirados = conn.execute(text("""
+        DELETE FROM siciap.datosejecucion d
+        USING siciap.datosejecucion n
+        WHERE n.id_llamado = d.id_llamado AND n.id > d.id
+    """)).rowcount
+    if retirados:
+        logger.warning(
+            f"datosejecucion: {retirados} filas con id_llamado repetido movidas a "
+            "siciap.datosejecucion_duplicados"
+        )
+    conn.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_datosejecucion_id_llamado "
+        "ON siciap.datosejecucion(id_llamado)"
+    ))
+
+def _migracion_archivos_cargados(conn):
+    cursor = conn.connection.cursor()
     try:
-        # Configuración de base de datos
-        db_config = get_db_config()
-        engine_string = f"postgresql://{db_config['user']}:{db_config['password']}@{db_config['host']}:{db_config['port']}/{db_config['dbname']}?sslmode=require"
-        engine = create_engine(engine_string)
-        
-        # Resultados
-        resultado = {
-            "producto": None,
-            "ordenes": None,
-            "ejecucion": None
-        }
-        
-        with engine.connect() as conn:
-            # 1. Información del producto desde stock_critico
-            query = text("""
+        _asegurar_tabla_archivos(cursor)
+    finally:
+        cursor.close()
+
+# Pasos versionados de SICIAP: nunca se modifica uno ya publicado, se agrega uno nuevo
+MIGRACIONES_SICIAP = [
+    (1, "Esquema siciap y tabla datosejecucion", [
+        "CREATE SCHEMA IF NOT EXISTS siciap",
+        """
+        CREATE TABLE IF NOT EXISTS siciap.datosejecucion (
+            id SERIAL PRIMARY KEY,
+            id_llamado INTEGER,
+            licitacion VARCHAR(255),
+            proveedor VARCHAR(255),
+            descripcion_llamado TEXT,
+            numero_contrato VARCHAR(255),
+            fecha_inicio DATE,
+            fecha_fin DATE,
+            dirigido_a VARCHAR(100),
+            lugares TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_datosejecucion_id_llamado ON siciap.datosejecucion(id_llamado)",
+    ]),
+    (2, "Registro de archivos importados", _migracion_archivos_cargados),
+    # Antes corría en cada render del dashboard (consulta al catálogo y, la
+    # primera vez, un ALTER TABLE ... TYPE DATE que reescribe la tabla)
+    (3, "Fechas de órdenes como DATE e índices", _migracion_fechas_ordenes),
+    (4, "Índice único de datosejecucion.id_llamado (sin duplicados)", _migracion_indice_unico_datosejecucion),
+]
+
+# Se reintentan en cada arranque del proceso: las tablas aparecen con la primera importación
+MIGRACIONES_SICIAP_REPETIBLES = [
+    ("Índices de ordenes, ejecucion y stock_critico", _crear_indices_siciap),
+]
+
+def asegurar_esquema_siciap(engine=None):
+    """
+    Aplica las migraciones pendientes de SICIAP una vez por proceso y destino
+    (después es solo una consulta en memoria).
+
+    Args:
+        engine: Engine destino (por defecto el de la configuración actual)
+
+    Returns:
+        dict de migraciones.aplicar (version, aplicadas, error)
+    """
+    return migraciones.aplicar(
+        engine or get_siciap_engine(), 'siciap', MIGRACIONES_SICIAP, MIGRACIONES_SICIAP_REPETIBLES
+    )
+
+def crear_indices_siciap():
+    """Crea los índices de SICIAP (paso repetible de las migraciones)"""
+    resultado = asegurar_esquema_siciap()
+    return resultado['error'] is None
+
+# Documento integrado del producto en una sola consulta: stock_critico + ordenes +
+# ejecucion agregados como JSON en el servidor (un round trip por búsqueda)
+_SQL_PRODUCTO_INTEGRADO = text("""
+    WITH p AS (
+        SELECT 
+            codigo, 
+            producto, 
+            concentracion, 
+            forma_farmaceutica, 
+            presentacion, 
+            clasificacion, 
+            stock_actual, 
+            stock_reservado, 
+            stock_disponible, 
+            dmp, 
+            estado_stock,
+            CASE 
+                WHEN stock_disponible IS NULL OR dmp IS NULL OR dmp = 0 THEN 'Sin datos'
+                WHEN stock_disponible < dmp * 0.3 THEN 'Crítico'
+                WHEN stock_disponible < dmp * 0.7 THEN 'Bajo'
+                ELSE 'Normal'
+            END AS nivel_criticidad
+        FROM 
+            siciap.stock_critico 
+        WHERE 
+            codigo = :codigo
+        LIMIT 1
+    )
+    SELECT
+        (SELECT row_to_json(p) FROM p) AS producto,
+        (
+            SELECT json_agg(o ORDER BY o.fecha_oc DESC)
+            FROM (
                 SELECT 
-                    codigo, 
-                    producto, 
-                    concentracion, 
-                    forma_farmaceutica, 
-                    presentacion, 
-                    clasificacion, 
-                    stock_actual, 
-                    stock_reservado, 
-                    stock_disponible, 
-                    dmp, 
-                    estado_stock,
-                    CASE 
-                        WHEN stock_disponible IS NULL OR dmp IS NULL OR dmp = 0 THEN 'Sin datos'
-                        WHEN stock_disponible < dmp * 0.3 THEN 'Crítico'
-                        WHEN stock_disponible < dmp * 0.7 THEN 'Bajo'
-                        ELSE 'Normal'
-                    END AS nivel_criticidad
+                    oc, 
+                    fecha_oc, 
+                    proveedor, 
+                    lugar_entrega_oc, 
+                    llamado, 
+                    cant_oc, 
+                    p_unit, 
+                    monto_oc, 
+                    cant_recep, 
+                    COALESCE(monto_recepcion, "monto_recepci_n"::numeric) AS monto_recepcion,
+                    saldo, 
+                    monto_saldo, 
+                    estado, 
+                    fec_ult_recep, 
+                    dias_de_atraso,
+                    plazo_entrega,
+                    COALESCE(fecha_recibido_proveedor, fecha_recibido_poveedor::date) AS fecha_recibido_proveedor
                 FROM 
-                    siciap.stock_critico 
+                    siciap.ordenes 
                 WHERE 
                     codigo = :codigo
-            """)
-            
-            producto_result = conn.execute(query, {"codigo": codigo}).fetchone()
-            
-            if producto_result:
-                # Convertir a diccionario
-                cols = conn.execute(query, {"codigo": codigo}).keys()
-                producto_dict = dict(zip(cols, producto_result))
-                resultado["producto"] = producto_dict
-
-                # 2. Información de órdenes de compra
-                query = text("""
-                    SELECT 
-                        oc, 
-                        fecha_oc, 
-                        proveedor, 
-                        lugar_entrega_oc, 
-                        llamado, 
-                        cant_oc, 
-                        p_unit, 
-                        monto_oc, 
-                        cant_recep, 
-                        COALESCE(monto_recepcion, "monto_recepci_n"::numeric) AS monto_recepcion,
-                        saldo, 
-                        monto_saldo, 
-                        estado, 
-                        fec_ult_recep, 
-                        dias_de_atraso,
-                        plazo_entrega,
-                        COALESCE(fecha_recibido_proveedor, fecha_recibido_poveedor::date) AS fecha_recibido_proveedor
-                    FROM 
-                        siciap.ordenes 
-                    WHERE 
-                        codigo = :codigo
-                    ORDER BY 
-                        fecha_oc DESC
-                """)
-                
-                ordenes_result = conn.execute(query, {"codigo": codigo}).fetchall()
-                
-                if ordenes_result:
-                    # Convertir a lista de diccionarios
-                    cols = conn.execute(query, {"codigo": codigo}).keys()
-                    ordenes_list = []
-                    for row in ordenes_result:
-                        ordenes_list.append(dict(zip(cols, row)))
-                    resultado["ordenes"] = ordenes_list
-
-                # 3. Información de ejecución
-                query = text("""
-                    SELECT 
-                        codigo,
-                        item, 
-                        cantidad_maxima, 
-                        cantidad_emitida, 
-                        cantidad_recepcionada, 
-                        cantidad_distribuida, 
-                        monto_adjudicado, 
-                        monto_emitido, 
-                        saldo, 
-                        porcentaje_emitido, 
-                        estado_stock, 
-                        estado_contrato
-                    FROM 
-                        siciap.ejecucion 
-                    WHERE 
-                        codigo = :codigo
-                    OR 
-                        item LIKE :codigo_pattern
-                """)
-                
-                ejecucion_result = conn.execute(query, {
-                    "codigo": codigo,
-                    "codigo_pattern": f"%{codigo}%"
-                }).fetchall()
-                
-                if ejecucion_result:
-                    # Convertir a lista de diccionarios
-                    cols = conn.execute(query, {
-                        "codigo": codigo,
-                        "codigo_pattern": f"%{codigo}%"
-                    }).keys()
-                    ejecucion_list = []
-                    for row in ejecucion_result:
-                        ejecucion_list.append(dict(zip(cols, row)))
-                    resultado["ejecucion"] = ejecucion_list
-
-        return resultado
+                    AND EXISTS (SELECT 1 FROM p)
+            ) o
+        ) AS ordenes,
+        (
+            SELECT json_agg(e)
+            FROM (
+                SELECT 
+                    codigo,
+                    item, 
+                    cantidad_maxima, 
+                    cantidad_emitida, 
+                    cantidad_recepcionada, 
+                    cantidad_distribuida, 
+                    monto_adjudicado, 
+                    monto_emitido, 
+                    saldo, 
+                    porcentaje_emitido, 
+                    estado_stock, 
+                    estado_contrato
+                FROM 
+                    siciap.ejecucion 
+                WHERE 
+                    (codigo = :codigo OR item LIKE :codigo_pattern ESCAPE '\\')
+                    AND EXISTS (SELECT 1 FROM p)
+            ) e
+        ) AS ejecucion
+""")
+
+# Segundos que se reutiliza el resultado de una búsqueda por código
+PRODUCTO_INTEGRADO_TTL = 300
+
+@st.cache_data(ttl=PRODUCTO_INTEGRADO_TTL, show_spinner=False)
+def _consultar_producto_integrado(codigo):
+    """Ejecuta la consulta integrada; las excepciones no se cachean"""
+    # Escapar comodines de LIKE para que el código se busque literalmente
+    codigo_like = codigo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    engine = get_siciap_engine()
+    with engine.connect() as conn:
+        row = conn.execute(_SQL_PRODUCTO_INTEGRADO, {
+            "codigo": codigo,
+            "codigo_pattern": f"%{codigo_like}%"
+        }).fetchone()
+    return {
+        "producto": row[0] if row else None,
+        "ordenes": row[1] if row else None,
+        "ejecucion": row[2] if row else None
+    }
 
+def buscar_producto_integrado(codigo):
+    """
+    Función optimizada para buscar información integrada de un producto por su código
+    utilizando la relación directa entre las tres tablas a través del campo código.
+    
+    Una sola consulta devuelve el producto y sus órdenes/ejecución agregadas en JSON;
+    el resultado se cachea PRODUCTO_INTEGRADO_TTL segundos por código. La búsqueda por
+    item usa el índice trigram idx_ejecucion_item_trgm (ver crear_indices_siciap).
+    """
+    try:
+        return _consultar_producto_integrado(str(codigo).strip())
     except Exception as e:
         print(f"Error en buscar_producto_integrado: {str(e)}")
         traceback.print_exc()
@@ -5841,97 +6455,31 @@ def importar_datos_ejecucion():
                     # Convertir fechas a formato adecuado
                     for date_col in ['fecha_inicio', 'fecha_fin']:
                         if date_col in mapped_df.columns:
-                            mapped_df[date_col] = safe_date_conversion(mapped_df[date_col])
-                    
-                    # Conexión a la base de datos
-                    db_config = get_db_config()
-                    conn = PostgresConnection(**db_config)
-                    
-                    if not conn.connect():
-                        st.error("❌ No se pudo conectar a PostgreSQL.")
-                        return
+                            mapped_df[date_col] = safe_date_conversion(
+                                mapped_df[date_col], cache_key=('siciap.datosejecucion', date_col)
+                            )
                     
-                    try:
-                        # Asegurar que la tabla existe
-                        ensure_datosejecucion_table(conn)
-                        
-                        # Contador de operaciones
-                        inserted = 0
-                        updated = 0
-                        errors = 0
-                        
-                        # Procesar según el modo seleccionado
-                        for _, row in mapped_df.iterrows():
-                            try:
-                                # Verificar si existe el registro
-                                check_query = text("""
-                                    SELECT id FROM siciap.datosejecucion 
-                                    WHERE id_llamado = :id_llamado
-                                """)
-                                
-                                id_llamado = int(row['id_llamado']) if pd.notna(row['id_llamado']) else None
-                                if id_llamado is None:
-                                    errors += 1
-                                    continue
-                                
-                                with conn.engine.connect() as connection:
-                                    result = connection.execute(check_query, {"id_llamado": id_llamado}).fetchone()
-                                    
-                                    # Preparar datos para la operación
-                                    data = {}
-                                    for col in mapped_df.columns:
-                                        # Convertir nan a None
-                                        data[col] = None if pd.isna(row[col]) else row[col]
-                                    
-                                    # Si existe y modo apropiado
-                                    if result and mode in ["Actualizar existentes", "Insertar y actualizar"]:
-                                        # Actualizar
-                                        cols_to_update = [f"{col} = :{col}" for col in data.keys() if col != 'id_llamado']
-                                        
-                                        if cols_to_update:
-                                            update_query = text(f"""
-                                                UPDATE siciap.datosejecucion
-                                                SET {', '.join(cols_to_update)}
-                                                WHERE id_llamado = :id_llamado
-                                            """)
-                                            
-                                            connection.execute(update_query, data)
-                                            connection.commit()
-                                            updated += 1
-                                    
-                                    # Si no existe y modo apropiado
-                                    elif not result and mode in ["Insertar nuevos registros", "Insertar y actualizar"]:
-                                        # Insertar
-                                        cols = list(data.keys())
-                                        placeholders = [f":{col}" for col in cols]
-                                        
-                                        insert_query = text(f"""
-                                            INSERT INTO siciap.datosejecucion 
-                                            ({', '.join(cols)})
-                                            VALUES 
-                                            ({', '.join(placeholders)})
-                                        """)
-                                        
-                                        connection.execute(insert_query, data)
-                                        connection.commit()
-                                        inserted += 1
-                            except Exception as e:
-                                logger.error(f"Error en fila {_}: {str(e)}")
-                                errors += 1
-                        
-                        # Mostrar resultados
-                        st.success(f"✅ Importación completada: {inserted} registros insertados, {updated} actualizados, {errors} con errores.")
-                        
-                        # Mostrar detalles si hay errores
-                        if errors > 0:
-                            st.warning(f"⚠️ Hubo {errors} errores durante la importación. Revisa el registro para más detalles.")
-                        
-                    except Exception as e:
-                        st.error(f"Error durante la importación: {str(e)}")
-                        st.error(traceback.format_exc())
-                    finally:
-                        # Cerrar conexión
-                        conn.close()
+                    # Aplicar todo el archivo con una sola operación de conjunto,
+                    # en segundo plano y con conexión propia del trabajo
+                    modos_upsert = {
+                        "Insertar nuevos registros": 'insert',
+                        "Actualizar existentes": 'update',
+                        "Insertar y actualizar": 'upsert'
+                    }
+                    id_trabajo = jobs.enviar(
+                        f"Importar datos de ejecución: {len(mapped_df)} registros ({mode})",
+                        importar_datosejecucion_trabajo,
+                        get_db_config(), mapped_df, modos_upsert[mode],
+                        app='siciap',
+                        usuario=st.session_state.get('username'),
+                        filas_totales=len(mapped_df)
+                    )
+                    st.success(f"🧵 Importación enviada en segundo plano (trabajo {id_trabajo}). "
+                               "El resultado (insertados, actualizados, errores) se ve abajo.")
+            
+            # Estado de las importaciones en segundo plano
+            with st.expander("🧵 Importaciones en segundo plano", expanded=True):
+                jobs.mostrar_trabajos(app='siciap', usuario=jobs.usuario_de_sesion(), limite=5, clave="datosejecucion_trabajos")
         
         except Exception as e:
             st.error(f"Error al leer el archivo: {str(e)}")
@@ -5939,22 +6487,34 @@ def importar_datos_ejecucion():
     else:
         st.info("Por favor, carga un archivo para importar datos.")
 
-# Mostrar la página correspondiente según la selección directamente
-if selected_option == "📋 Órdenes":
-    ordenes_page()
-elif selected_option == "📊 Ejecución":
-    ejecucion_page()
-elif selected_option == "📦 Stock":
-    stock_page()
-elif selected_option == "📝 Pedidos":
-    pedidos_page()  # Nueva opción
-elif selected_option == "📈 Dashboard":
-    dashboard_page()
-elif selected_option == "📑 Contratos":
-    contracts_management_page()
-if selected_option == "🔍 Diagnóstico":
-    diagnostico_dashboard()
-elif selected_option == "📤 Exportar Datos":
-    exportar_datos_ejecucion()
-elif selected_option == "📥 Importar Datos":
-    importar_datos_ejecucion()
\ No newline at end of file
+def render():
+    """Punto de entrada de SICIAP (main_app.py o streamlit run)"""
+    # Migraciones versionadas: una verificación por sesión, aplicadas una vez por proceso
+    if not st.session_state.get('esquema_siciap_verificado'):
+        asegurar_esquema_siciap()
+        st.session_state.esquema_siciap_verificado = True
+    
+    selected_option = mostrar_sidebar_siciap()
+    
+    # Mostrar la página correspondiente según la selección directamente
+    if selected_option == "📋 Órdenes":
+        ordenes_page()
+    elif selected_option == "📊 Ejecución":
+        ejecucion_page()
+    elif selected_option == "📦 Stock":
+        stock_page()
+    elif selected_option == "📝 Pedidos":
+        pedidos_page()  # Nueva opción
+    elif selected_option == "📈 Dashboard":
+        dashboard_page()
+    elif selected_option == "📑 Contratos":
+        contracts_management_page()
+    if selected_option == "🔍 Diagnóstico":
+        diagnostico_dashboard()
+    elif selected_option == "📤 Exportar Datos":
+        exportar_datos_ejecucion()
+    elif selected_option == "📥 Importar Datos":
+        importar_datos_ejecucion()
+
+if __name__ == "__main__":
+    render()
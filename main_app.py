@@ -2,6 +2,16 @@ import streamlit as st
 import sys
 import os
 
+# apps/ en sys.path para compartir el registro de conexiones con los módulos
+APPS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "apps")
+if APPS_PATH not in sys.path:
+    sys.path.insert(0, APPS_PATH)
+
+import app_loader
+import db_registry
+import jobs
+import migraciones
+
 # Configuración de la página principal
 st.set_page_config(
     page_title="Sistema Integrado de Gestión - MSPBS",
@@ -161,27 +171,19 @@ def get_db_engine(_host, _port, _dbname, _user, _password):
     
     # INTENTO 2: Conexión directa con psycopg2 (solo si API REST no está disponible o falló)
     try:
-        from sqlalchemy import create_engine
-        
         conn_str = f"postgresql://{user_para_conexion}:{password_escaped}@{host_para_conexion}:{_port}/{_dbname}?sslmode=require"
         
-        engine = create_engine(
+        # Pool compartido con los demás módulos (ver apps/db_registry.py)
+        engine = db_registry.obtener_engine(
+            'main',
             conn_str,
             connect_args={
                 "sslmode": "require",
                 "connect_timeout": 10
             },
-            pool_pre_ping=True,
-            pool_size=3,
-            max_overflow=5,
-            pool_recycle=3600
+            probar=True
         )
         
-        # Probar la conexión
-        with engine.connect() as conn:
-            from sqlalchemy import text
-            conn.execute(text("SELECT 1"))
-        
         # Si llegamos aquí, la conexión funcionó
         st.sidebar.success("✅ Conectado usando: psycopg2 (Directo)")
         return engine
@@ -435,6 +437,7 @@ def main():
             "📊 Seguimiento de Oxigeno": "licitaciones",
             "📋 Sistema SICIAP": "siciap", 
             "📈 Tienda Virtual": "dashboard_mspbs",
+            "🧵 Trabajos": "trabajos",
             "⚙️ Configuración": "config"
         }
 
@@ -468,6 +471,8 @@ def main():
             run_siciap_app()
         elif app_key == "dashboard_mspbs":
             run_dashboard_mspbs()
+        elif app_key == "trabajos":
+            show_jobs_page()
         elif app_key == "config":
             show_config_page()
     except Exception as e:
@@ -589,6 +594,23 @@ def show_home_page():
             with col_d:
                 st.metric("Usuarios", "Multi-rol", "👥")
 
+def show_jobs_page():
+    """Página de trabajos en segundo plano (importaciones largas)"""
+    st.title("🧵 Trabajos en Segundo Plano")
+    st.markdown("---")
+    st.caption(
+        "Las importaciones largas se ejecutan fuera del script de la página: se puede "
+        "seguir navegando mientras avanzan. El estado se conserva aunque se reinicie el servidor."
+    )
+
+    # Los administradores ven todos los trabajos; el resto, solo los propios
+    usuario = jobs.usuario_de_sesion()
+    if st.button("🧹 Limpiar trabajos terminados", key="pagina_trabajos_limpiar"):
+        eliminados = jobs.limpiar_terminados(usuario=usuario)
+        st.success(f"✅ {eliminados} trabajos eliminados del historial")
+
+    jobs.mostrar_trabajos(usuario=usuario, clave='pagina_trabajos')
+
 def show_config_page():
     """Página de configuración del sistema"""
     st.title("⚙️ Configuración del Sistema")
@@ -615,10 +637,53 @@ def show_config_page():
     
     st.markdown("---")
     
+    # Estado de los pools de conexión compartidos
+    st.subheader("🔌 Pool de Conexiones")
+    
+    pool_config = db_registry.obtener_config_pool()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("pool_size", pool_config['pool_size'])
+    col2.metric("max_overflow", pool_config['max_overflow'])
+    col3.metric("pool_recycle (s)", pool_config['pool_recycle'])
+    col4.metric("pool_timeout (s)", pool_config['pool_timeout'])
+    
+    import pandas as pd
+    pools = db_registry.estadisticas_pools()
+    if pools:
+        df_pools = pd.DataFrame(pools).rename(columns={
+            'app': 'Aplicación',
+            'driver': 'Driver',
+            'host': 'Host',
+            'pool_size': 'Tamaño',
+            'en_uso': 'En uso',
+            'disponibles': 'Disponibles',
+            'overflow': 'Overflow',
+            'checkouts': 'Checkouts',
+            'espera_media_ms': 'Espera media (ms)',
+            'espera_max_ms': 'Espera máx. (ms)',
+            'statement_timeout_ms': 'Statement timeout (ms)'
+        })
+        st.dataframe(df_pools, use_container_width=True)
+    else:
+        st.info("Aún no hay pools de conexión directa abiertos en este proceso.")
+    
+    # Migraciones de esquema verificadas por este proceso
+    estado_migraciones = migraciones.estado()
+    if estado_migraciones:
+        st.subheader("🧱 Migraciones de Esquema")
+        df_migraciones = pd.DataFrame(estado_migraciones).rename(columns={
+            'app': 'Aplicación',
+            'version': 'Versión',
+            'aplicadas': 'Aplicadas en este arranque',
+            'error': 'Error'
+        })
+        st.dataframe(df_migraciones, use_container_width=True)
+    
+    st.markdown("---")
+    
     # Información del sistema
     st.subheader("📊 Información del Sistema")
     
-    import pandas as pd
     info_data = {
         "Componente": [
             "Seguimiento de Oxigeno", 
@@ -655,153 +720,73 @@ def show_config_page():
     
     df_modulos = pd.DataFrame(modulos)
     st.dataframe(df_modulos, use_container_width=True)
+    
+    # Tiempos de importación (una vez por proceso) y de render (cada rerun)
+    tiempos = app_loader.estadisticas()
+    if tiempos:
+        df_tiempos = pd.DataFrame(tiempos).rename(columns={
+            'modulo': 'Módulo',
+            'importaciones': 'Importaciones',
+            'ultimo_import_ms': 'Último import (ms)',
+            'renders': 'Renders',
+            'ultimo_render_ms': 'Último render (ms)',
+            'render_medio_ms': 'Render medio (ms)',
+            'render_max_ms': 'Render máx. (ms)'
+        })
+        st.dataframe(df_tiempos, use_container_width=True)
 
 # ================================================================================
 # FUNCIONES WRAPPER PARA INTEGRACIÓN CON MAIN_APP
 # ================================================================================
 
-def run_licitaciones_app():
-    """Función wrapper para ejecutar el Seguimiento de Oxigeno desde main_app.py"""
+def _ejecutar_subapp(nombre, titulo, ayuda_dependencias="Verifica que todas las dependencias estén instaladas."):
+    """
+    Importa la sub-aplicación una sola vez por proceso (se recarga solo si cambia
+    el archivo) y ejecuta su render()
+    """
+    import traceback
+    ruta = os.path.join(APPS_PATH, f"{nombre}.py")
+    if not os.path.exists(ruta):
+        st.error(f"❌ Módulo {titulo} no encontrado")
+        st.info(f"💡 Asegúrate de que el archivo apps/{nombre}.py existe")
+        return
+    
     try:
-        if os.path.exists("apps/licitaciones_app.py"):
-            apps_path = os.path.join(os.getcwd(), "apps")
-            if apps_path not in sys.path:
-                sys.path.insert(0, apps_path)
-            
-            import importlib.util
-            spec = importlib.util.spec_from_file_location("licitaciones_app", "apps/licitaciones_app.py")
-            if spec is None:
-                raise ImportError("No se pudo cargar licitaciones_app.py")
-            
-            licitaciones_module = importlib.util.module_from_spec(spec)
-            
-            try:
-                spec.loader.exec_module(licitaciones_module)
-            except SyntaxError as e:
-                st.error(f"❌ Error de sintaxis en licitaciones_app.py: {e}")
-                st.info("💡 El módulo tiene errores de sintaxis que deben corregirse.")
-                import traceback
-                with st.expander("Ver detalles del error"):
-                    st.code(traceback.format_exc())
-                return
-            except Exception as init_error:
-                st.error(f"❌ Error al inicializar módulo: {init_error}")
-                st.info("💡 Verifica que todas las dependencias estén instaladas.")
-                return
-            
-            if hasattr(licitaciones_module, 'main'):
-                try:
-                    licitaciones_module.main()
-                except Exception as main_error:
-                    st.error(f"❌ Error ejecutando módulo: {main_error}")
-                    import traceback
-                    with st.expander("Ver detalles del error"):
-                        st.code(traceback.format_exc())
-            else:
-                st.error("❌ El módulo licitaciones_app no tiene función main()")
-        else:
-            st.error("❌ Módulo de licitaciones no encontrado")
-            st.info("💡 Asegúrate de que el archivo apps/licitaciones_app.py existe")
-    except Exception as e:
-        st.error(f"❌ Error ejecutando Seguimiento de Oxigeno: {e}")
-        import traceback
+        app_loader.cargar(nombre, ruta)
+    except SyntaxError as e:
+        st.error(f"❌ Error de sintaxis en {nombre}.py: {e}")
+        st.info("💡 El módulo tiene errores de sintaxis que deben corregirse.")
         with st.expander("Ver detalles del error"):
             st.code(traceback.format_exc())
-
-def run_siciap_app():
-    """Función wrapper para ejecutar el sistema SICIAP desde main_app.py"""
+        return
+    except Exception as init_error:
+        st.error(f"❌ Error al inicializar módulo: {init_error}")
+        st.info(f"💡 {ayuda_dependencias}")
+        with st.expander("Ver detalles del error"):
+            st.code(traceback.format_exc())
+        return
+    
     try:
-        if os.path.exists("apps/siciap_app.py"):
-            apps_path = os.path.join(os.getcwd(), "apps")
-            if apps_path not in sys.path:
-                sys.path.insert(0, apps_path)
-            
-            import importlib.util
-            spec = importlib.util.spec_from_file_location("siciap_app", "apps/siciap_app.py")
-            if spec is None:
-                raise ImportError("No se pudo cargar siciap_app.py")
-            
-            siciap_module = importlib.util.module_from_spec(spec)
-            
-            try:
-                spec.loader.exec_module(siciap_module)
-            except SyntaxError as e:
-                st.error(f"❌ Error de sintaxis en siciap_app.py: {e}")
-                st.info("💡 El módulo tiene errores de sintaxis que deben corregirse.")
-                import traceback
-                with st.expander("Ver detalles del error"):
-                    st.code(traceback.format_exc())
-                return
-            except Exception as init_error:
-                st.error(f"❌ Error al inicializar módulo: {init_error}")
-                st.info("💡 Verifica que todas las dependencias estén instaladas (psycopg2-binary).")
-                import traceback
-                with st.expander("Ver detalles del error"):
-                    st.code(traceback.format_exc())
-                return
-            
-            # SICIAP ejecuta directamente el código del módulo
-            st.info("✅ Módulo SICIAP cargado correctamente")
-        else:
-            st.error("❌ Módulo SICIAP no encontrado")
-            st.info("💡 Asegúrate de que el archivo apps/siciap_app.py existe")
-    except Exception as e:
-        st.error(f"❌ Error ejecutando sistema SICIAP: {e}")
-        import traceback
+        app_loader.renderizar(nombre, ruta)
+    except Exception as main_error:
+        st.error(f"❌ Error ejecutando {titulo}: {main_error}")
         with st.expander("Ver detalles del error"):
             st.code(traceback.format_exc())
 
+def run_licitaciones_app():
+    """Función wrapper para ejecutar el Seguimiento de Oxigeno desde main_app.py"""
+    _ejecutar_subapp("licitaciones_app", "Seguimiento de Oxigeno")
+
+def run_siciap_app():
+    """Función wrapper para ejecutar el sistema SICIAP desde main_app.py"""
+    _ejecutar_subapp(
+        "siciap_app", "sistema SICIAP",
+        "Verifica que todas las dependencias estén instaladas (psycopg2-binary)."
+    )
+
 def run_dashboard_mspbs():
     """Función wrapper para ejecutar el Tienda Virtual desde main_app.py"""
-    try:
-        if os.path.exists("apps/dashboard_mspbs.py"):
-            apps_path = os.path.join(os.getcwd(), "apps")
-            if apps_path not in sys.path:
-                sys.path.insert(0, apps_path)
-            
-            import importlib.util
-            spec = importlib.util.spec_from_file_location("dashboard_mspbs", "apps/dashboard_mspbs.py")
-            if spec is None:
-                raise ImportError("No se pudo cargar dashboard_mspbs.py")
-            
-            dashboard_module = importlib.util.module_from_spec(spec)
-            
-            try:
-                spec.loader.exec_module(dashboard_module)
-            except SyntaxError as e:
-                st.error(f"❌ Error de sintaxis en dashboard_mspbs.py: {e}")
-                st.info("💡 El módulo tiene errores de sintaxis que deben corregirse.")
-                import traceback
-                with st.expander("Ver detalles del error"):
-                    st.code(traceback.format_exc())
-                return
-            except Exception as init_error:
-                st.error(f"❌ Error al inicializar módulo: {init_error}")
-                st.info("💡 Verifica que todas las dependencias estén instaladas.")
-                import traceback
-                with st.expander("Ver detalles del error"):
-                    st.code(traceback.format_exc())
-                return
-            
-            # Si el módulo tiene función main, ejecutarla
-            if hasattr(dashboard_module, 'main'):
-                try:
-                    dashboard_module.main()
-                except Exception as main_error:
-                    st.error(f"❌ Error ejecutando módulo: {main_error}")
-                    import traceback
-                    with st.expander("Ver detalles del error"):
-                        st.code(traceback.format_exc())
-            else:
-                st.info("✅ Módulo Tienda Virtual cargado (sin función main)")
-        else:
-            st.error("❌ Módulo Tienda Virtual no encontrado")
-            st.info("💡 Asegúrate de que el archivo apps/dashboard_mspbs.py existe")
-    except Exception as e:
-        st.error(f"❌ Error ejecutando Tienda Virtual: {e}")
-        import traceback
-        with st.expander("Ver detalles del error"):
-            st.code(traceback.format_exc())
+    _ejecutar_subapp("dashboard_mspbs", "Tienda Virtual")
 
 if __name__ == "__main__":
     main()
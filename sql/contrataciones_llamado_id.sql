@@ -0,0 +1,19 @@
+-- Columna llamado_id e índice para el Tablero Tienda Virtual (dashboard_mspbs).
+--
+-- Migración única para el DBA / operaciones, con el dueño de contrataciones_datos.
+-- El tablero solo tiene permiso de lectura y no la aplica: al arrancar verifica
+-- si la columna existe y, si no, filtra con el LIKE sobre id de siempre.
+--
+-- ADD COLUMN ... STORED reescribe la tabla con un lock ACCESS EXCLUSIVE:
+-- ejecutar en una ventana de mantenimiento, fuera de la actualización de datos.
+-- Si el proceso de actualización recrea la tabla, hay que volver a aplicarla
+-- (o incluir la columna en su CREATE TABLE).
+
+ALTER TABLE contrataciones_datos
+    ADD COLUMN IF NOT EXISTS llamado_id TEXT GENERATED ALWAYS AS (
+        COALESCE(substring(id FROM '^ocds-[^-]+-(\d+)'), substring(id FROM '(\d{5,})'))
+    ) STORED;
+
+-- CONCURRENTLY no bloquea las lecturas del tablero (no puede ir dentro de una transacción)
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_contrataciones_llamado_fecha
+    ON contrataciones_datos (llamado_id, fecha_orden_compra DESC, id DESC);
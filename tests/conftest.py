@@ -0,0 +1,6 @@
+"""Configuración común de los tests: los módulos de apps/ se importan por nombre"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'apps'))
@@ -0,0 +1,97 @@
+"""Clasificación de errores y bisección de lotes (biseccion)"""
+
+import pytest
+
+import biseccion
+
+
+class Error(Exception):
+    pass
+
+
+class DatabaseError(Error):
+    pass
+
+
+class DataError(DatabaseError):
+    pass
+
+
+class OperationalError(DatabaseError):
+    pass
+
+
+class InterfaceError(Error):
+    pass
+
+
+class StatementError(Exception):
+    """Como sqlalchemy.exc.StatementError: envuelve el error original en .orig"""
+
+    def __init__(self, orig, connection_invalidated=False):
+        super().__init__(str(orig))
+        self.orig = orig
+        self.connection_invalidated = connection_invalidated
+
+
+def _con_sqlstate(clase, codigo):
+    error = clase("error")
+    error.sqlstate = codigo
+    return error
+
+
+@pytest.mark.parametrize("error, esperado", [
+    (_con_sqlstate(DataError, '22P02'), True),
+    (_con_sqlstate(DatabaseError, '23505'), True),
+    (_con_sqlstate(DatabaseError, '42703'), False),
+    (_con_sqlstate(OperationalError, '08006'), False),
+    (DataError("valor fuera de rango"), True),
+    (StatementError(TypeError("no se puede adaptar")), True),
+    (OperationalError("server closed the connection"), False),
+    (InterfaceError("connection already closed"), False),
+    (StatementError(OperationalError("ssl syscall")), False),
+    (StatementError(DataError("x"), connection_invalidated=True), False),
+    (KeyError('columna'), False),
+    (TypeError('bug'), False),
+])
+def test_es_error_de_datos(error, esperado):
+    assert biseccion.es_error_de_datos(error) is esperado
+
+
+def _savepoint_nulo(nivel):
+    class _Nulo:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+    return _Nulo()
+
+
+def test_biseccion_aisla_filas_con_error_de_datos():
+    insertadas = []
+
+    def insertar(filas):
+        if 'mala' in filas:
+            raise _con_sqlstate(DataError, '22P02')
+        insertadas.extend(filas)
+
+    filas = ['a', 'b', 'mala', 'c', 'd']
+    rechazos = []
+    total = biseccion.insertar_con_biseccion(insertar, filas, list(range(5)), rechazos, _savepoint_nulo)
+
+    assert total == 4
+    assert insertadas == ['a', 'b', 'c', 'd']
+    assert rechazos == [(2, 'error')]
+
+
+def test_conexion_caida_aborta_sin_bisectar():
+    llamadas = []
+
+    def insertar(filas):
+        llamadas.append(len(filas))
+        raise OperationalError("server closed the connection unexpectedly")
+
+    with pytest.raises(OperationalError):
+        biseccion.insertar_con_biseccion(insertar, list(range(8)), list(range(8)), [], _savepoint_nulo)
+    assert llamadas == [8]
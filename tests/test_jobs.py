@@ -0,0 +1,54 @@
+"""Trabajos en segundo plano: cada usuario ve, cancela y limpia solo los suyos (jobs)"""
+
+import threading
+import time
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def cola(tmp_path, monkeypatch):
+    """Cola vacía con el estado en un directorio temporal"""
+    monkeypatch.setattr(jobs, 'JOBS_DIR', str(tmp_path))
+    monkeypatch.setattr(jobs, '_TRABAJOS', {})
+    monkeypatch.setattr(jobs, '_CARGADO', False)
+    liberar = threading.Event()
+    yield liberar
+    liberar.set()
+
+
+def _esperar(liberar):
+    liberar.wait(5)
+
+
+def test_listar_filtra_por_usuario(cola):
+    propio = jobs.enviar("propio", _esperar, cola, usuario='ana')
+    ajeno = jobs.enviar("ajeno", _esperar, cola, usuario='beto')
+    anonimo = jobs.enviar("anónimo", _esperar, cola)
+
+    assert [t.id for t in jobs.listar(usuario='ana')] == [propio]
+    assert [t.id for t in jobs.listar(usuario='')] == [anonimo]
+    assert {t.id for t in jobs.listar()} == {propio, ajeno, anonimo}
+
+
+def test_cancelar_solo_trabajos_propios(cola):
+    id_trabajo = jobs.enviar("importación", _esperar, cola, usuario='ana')
+
+    assert not jobs.cancelar(id_trabajo, usuario='beto')
+    assert not jobs.obtener(id_trabajo)._cancelar.is_set()
+    assert jobs.cancelar(id_trabajo, usuario='ana')
+
+
+def test_limpiar_terminados_solo_del_usuario(cola):
+    cola.set()
+    jobs.enviar("propio", _esperar, cola, usuario='ana')
+    jobs.enviar("ajeno", _esperar, cola, usuario='beto')
+    for _ in range(100):
+        if not any(t.activo for t in jobs.listar()):
+            break
+        time.sleep(0.05)
+
+    assert jobs.limpiar_terminados(usuario='ana') == 1
+    assert [t.usuario for t in jobs.listar()] == ['beto']
@@ -0,0 +1,170 @@
+"""
+Listado paginado por clave (consulta_ordenes_compra) y modificación y anulación
+de órdenes de compra con líneas de varios servicios beneficiarios.
+
+Necesita una base PostgreSQL descartable en TEST_DATABASE_URL: las filas se
+insertan en oxigeno.orden_de_compra dentro de una transacción que se revierte.
+"""
+
+import contextlib
+import os
+from datetime import date
+
+import pytest
+
+sqlalchemy = pytest.importorskip("sqlalchemy")
+pytest.importorskip("streamlit")
+licitaciones_app = pytest.importorskip("licitaciones_app")
+
+URL = os.getenv("TEST_DATABASE_URL")
+CODIGO = "test_paginacion_ordenes"
+
+pytestmark = pytest.mark.skipif(not URL, reason="TEST_DATABASE_URL no configurada")
+
+
+@pytest.fixture
+def conn():
+    engine = sqlalchemy.create_engine(URL)
+    with engine.connect() as conexion:
+        transaccion = conexion.begin()
+        try:
+            conexion.execute(sqlalchemy.text("CREATE SCHEMA IF NOT EXISTS oxigeno"))
+            conexion.execute(sqlalchemy.text("""
+                CREATE TABLE IF NOT EXISTS oxigeno.orden_de_compra (
+                    codigo_licitacion VARCHAR(255),
+                    "NUMERO_ORDEN_DE_COMPRA" VARCHAR(50),
+                    "FECHA_DE_EMISION" DATE,
+                    "SERVICIO_BENEFICIARIO" VARCHAR(255),
+                    "LOTE" VARCHAR(50),
+                    "ITEM" VARCHAR(50),
+                    "CANTIDAD_SOLICITADA" DECIMAL(15,2),
+                    "PRECIO_UNITARIO" DECIMAL(15,2),
+                    "EMPRESA_ADJUDICADA" VARCHAR(255)
+                )
+            """))
+            yield conexion
+        finally:
+            transaccion.rollback()
+    engine.dispose()
+
+
+def _insertar(conn, numero, fecha, servicio, item):
+    conn.execute(sqlalchemy.text("""
+        INSERT INTO oxigeno.orden_de_compra (
+            codigo_licitacion, "NUMERO_ORDEN_DE_COMPRA", "FECHA_DE_EMISION",
+            "SERVICIO_BENEFICIARIO", "LOTE", "ITEM", "CANTIDAD_SOLICITADA", "PRECIO_UNITARIO"
+        ) VALUES (:codigo, :numero, :fecha, :servicio, '1', :item, 10, 100)
+    """), {'codigo': CODIGO, 'numero': numero, 'fecha': fecha, 'servicio': servicio, 'item': item})
+
+
+def _paginar(conn, por_pagina):
+    paginas = []
+    cursor = None
+    while True:
+        query, params = licitaciones_app.consulta_ordenes_compra(
+            esquema=CODIGO, limite=por_pagina, despues_de=cursor
+        )
+        ordenes = [licitaciones_app.fila_orden_compra(row)
+                   for row in conn.execute(sqlalchemy.text(query), params)]
+        if not ordenes:
+            return paginas
+        paginas.append(ordenes)
+        cursor = ordenes[-1]['cursor']
+
+
+def test_orden_con_varias_fechas_aparece_una_vez_y_completa(conn):
+    # La orden 1 tiene una línea reciente y otra más antigua que las demás órdenes
+    _insertar(conn, '1', date(2024, 5, 1), 'HOSPITAL A', '1')
+    _insertar(conn, '1', date(2024, 1, 1), 'HOSPITAL B', '2')
+    _insertar(conn, '2', date(2024, 4, 1), 'HOSPITAL A', '1')
+    _insertar(conn, '3', date(2024, 3, 1), 'HOSPITAL A', '1')
+    _insertar(conn, '4', date(2024, 2, 1), 'HOSPITAL A', '1')
+
+    paginas = _paginar(conn, por_pagina=1)
+    ordenes = [orden for pagina in paginas for orden in pagina]
+
+    assert [orden['numero_orden'] for orden in ordenes] == ['1', '2', '3', '4']
+    orden_1 = ordenes[0]
+    assert orden_1['fecha_emision'] == date(2024, 5, 1)
+    assert orden_1['cantidad_items'] == 2
+    assert orden_1['monto_total'] == 2000
+    assert orden_1['servicio_beneficiario'] == 'HOSPITAL A / HOSPITAL B'
+
+
+class _EngineDePrueba:
+    """Engine que reutiliza la conexión del test (su transacción se revierte al final)"""
+
+    def __init__(self, conexion):
+        self.conexion = conexion
+
+    def begin(self):
+        return contextlib.nullcontext(self.conexion)
+
+
+@pytest.fixture
+def orden_varios_servicios(conn, monkeypatch):
+    """Orden 7 con una línea para HOSPITAL A (ítem 1) y otra para HOSPITAL B (ítem 2)"""
+    conn.execute(sqlalchemy.text("""
+        CREATE TABLE IF NOT EXISTS oxigeno.ejecucion_general (
+            codigo_licitacion VARCHAR(255),
+            "SERVICIO_BENEFICIARIO" VARCHAR(255),
+            "LOTE" NUMERIC,
+            "ITEM" NUMERIC,
+            "CANTIDAD_MAXIMA" NUMERIC,
+            "CANTIDAD_EMITIDA" NUMERIC,
+            "SALDO_A_EMITIR" NUMERIC,
+            "PORCENTAJE_EMITIDO" NUMERIC,
+            "EMPRESA_ADJUDICADA" VARCHAR(255),
+            "I_D" NUMERIC,
+            "MODALIDAD" VARCHAR(100)
+        )
+    """))
+    for servicio, item in (('HOSPITAL A', '1'), ('HOSPITAL B', '2')):
+        _insertar(conn, '7', date(2024, 5, 1), servicio, item)
+        conn.execute(sqlalchemy.text("""
+            INSERT INTO oxigeno.ejecucion_general (
+                codigo_licitacion, "SERVICIO_BENEFICIARIO", "LOTE", "ITEM",
+                "CANTIDAD_MAXIMA", "CANTIDAD_EMITIDA", "SALDO_A_EMITIR", "PORCENTAJE_EMITIDO"
+            ) VALUES (:codigo, :servicio, 1, :item, 100, 10, 90, 10)
+        """), {'codigo': CODIGO, 'servicio': servicio, 'item': int(item)})
+    monkeypatch.setattr(licitaciones_app, 'safe_get_engine', lambda: _EngineDePrueba(conn))
+    monkeypatch.setattr(licitaciones_app, 'registrar_actividad', lambda **kwargs: None)
+    return conn
+
+
+def _emitido(conn, servicio):
+    return conn.execute(sqlalchemy.text("""
+        SELECT "CANTIDAD_EMITIDA" FROM oxigeno.ejecucion_general
+        WHERE codigo_licitacion = :codigo AND "SERVICIO_BENEFICIARIO" = :servicio
+    """), {'codigo': CODIGO, 'servicio': servicio}).scalar()
+
+
+def test_anular_orden_con_varios_servicios_devuelve_saldo_a_cada_uno(orden_varios_servicios):
+    conn = orden_varios_servicios
+
+    exito, mensaje = licitaciones_app.anular_orden_compra(CODIGO, '7')
+
+    assert exito, mensaje
+    assert conn.execute(sqlalchemy.text("""
+        SELECT count(*) FROM oxigeno.orden_de_compra
+        WHERE codigo_licitacion = :codigo AND "NUMERO_ORDEN_DE_COMPRA" = '7'
+    """), {'codigo': CODIGO}).scalar() == 0
+    assert _emitido(conn, 'HOSPITAL A') == 0
+    assert _emitido(conn, 'HOSPITAL B') == 0
+
+
+def test_modificar_linea_de_otro_servicio(orden_varios_servicios):
+    conn = orden_varios_servicios
+
+    exito, mensaje = licitaciones_app.modificar_orden_compra(
+        CODIGO, '7', 'HOSPITAL B', '1', '2', 15, date(2024, 6, 1)
+    )
+
+    assert exito, mensaje
+    assert _emitido(conn, 'HOSPITAL A') == 10
+    assert _emitido(conn, 'HOSPITAL B') == 15
+    fechas = conn.execute(sqlalchemy.text("""
+        SELECT DISTINCT "FECHA_DE_EMISION" FROM oxigeno.orden_de_compra
+        WHERE codigo_licitacion = :codigo AND "NUMERO_ORDEN_DE_COMPRA" = '7'
+    """), {'codigo': CODIGO}).scalars().all()
+    assert fechas == [date(2024, 6, 1)]
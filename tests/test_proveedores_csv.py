@@ -0,0 +1,29 @@
+"""Normalización de proveedores importados por CSV (normalizar_proveedores_csv)"""
+
+import pytest
+
+pd = pytest.importorskip("pandas")
+pytest.importorskip("streamlit")
+licitaciones_app = pytest.importorskip("licitaciones_app")
+
+
+def test_ruc_numerico_con_celdas_vacias_no_agrega_digitos():
+    # pd.read_csv lee la columna como float si hay RUC numéricos y alguna celda vacía
+    df = pd.DataFrame({
+        'ruc': [80026564.0, float('nan'), 1234567.0],
+        'razon': ['EMPRESA A', 'EMPRESA B', 'EMPRESA C'],
+    })
+
+    validos, rechazos = licitaciones_app.normalizar_proveedores_csv(df, 'ruc', 'razon')
+
+    assert list(validos['ruc']) == ['80026564', '1234567']
+    assert list(rechazos['motivo']) == ["RUC vacío"]
+
+
+def test_ruc_con_puntos_de_miles_y_guion():
+    df = pd.DataFrame({'ruc': [' 80.026.564-5 '], 'razon': ['EMPRESA  A']})
+
+    validos, _rechazos = licitaciones_app.normalizar_proveedores_csv(df, 'ruc', 'razon')
+
+    assert list(validos['ruc']) == ['80026564-5']
+    assert list(validos['razon_social']) == ['EMPRESA A']